@@ -0,0 +1,1231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+asyncio 시리얼 전송 코어
+포트마다 스레드를 두지 않고 이벤트 루프 하나에서 여러 장치를 동시에 업로드한다.
+ROM 부트로더 명령/응답 매칭(SLIP 은 slip.py), 압축 쓰기를 코루틴으로 구현한다.
+
+프로필을 주면 esptool 하위 프로세스 경로와 같이 부트로더 헤더의 플래시 모드/속도/크기를
+프로필의 flash 설정으로 바꿔서 쓴다. 플래시 ID 는 읽지 않으므로 "detect" 크기는 헤더 값을 그대로 둔다.
+"""
+
+import asyncio
+import os
+import struct
+import sys
+import threading
+
+import serial
+from esptool.targets import CHIP_DEFS
+from esptool.util import FatalError, flash_size_bytes
+
+from boot_check import run_boot_check
+from chip_layouts import DEFAULT_CHIP, ChipLayoutError, layout_for_magic
+from cpu_pool import generated_source, get_pool, region_source
+from flash_core import (
+    STAGE_RESET,
+    STAGE_VERIFY,
+    STAGE_WRITE,
+    FlashCancelled,
+    FlashFailed,
+    FlashStalled,
+    SessionResult,
+    failure_cause,
+)
+from flash_job import RETRY_DELAY, STALL_RETRIES
+from hotplug import HotplugWatcher
+from image_check import FLASH_MODES, checksum, patch_flash_params
+from link_tuning import DEFAULT_LEVEL, LinkMeter, LinkTuning, merge_stats
+from metrics import QUEUE_DEPTH, SessionMetrics, record_result
+from partition_table import FlashRegion
+import profiling
+from profiles import ProfileError
+from resume import SessionJournal
+from serial_tuning import tune_serial
+from slip import SLIP_END, SlipDecoder, escape_into
+
+# ROM 부트로더 명령
+ESP_SPI_SET_PARAMS = 0x0B
+ESP_SYNC = 0x08
+ESP_READ_REG = 0x0A
+ESP_SPI_ATTACH = 0x0D
+ESP_CHANGE_BAUDRATE = 0x0F
+ESP_FLASH_DEFL_BEGIN = 0x10
+ESP_FLASH_DEFL_DATA = 0x11
+ESP_SPI_FLASH_MD5 = 0x13
+
+ROM_BAUD = 115200
+ROM_INVALID_RECV_MSG = 0x05
+# ROM 응답 끝의 상태 바이트 수 (칩을 알기 전 기본값, 칩별 값은 chip_layouts)
+STATUS_BYTES_LENGTH = 4
+# ROM 로더의 쓰기 블록 크기
+FLASH_WRITE_SIZE = 0x400
+
+DEFAULT_TIMEOUT = 3.0
+SYNC_TIMEOUT = 0.1
+SYNC_ATTEMPTS = 7
+ERASE_TIMEOUT_PER_MB = 30.0
+WRITE_TIMEOUT_PER_MB = 40.0
+MD5_TIMEOUT_PER_MB = 8.0
+DEFAULT_FLASH_SIZE = 16 * 1024 * 1024
+
+# 칩 판별 레지스터 (값은 chip_layouts 의 칩별 magic_values)
+CHIP_DETECT_MAGIC_REG_ADDR = 0x40001000
+
+# 이벤트 루프에 fd 를 등록할 수 없는 플랫폼(Windows)에서 포트를 확인하는 주기 (초)
+POLL_INTERVAL = 0.002
+READ_CHUNK = 4096
+
+
+class AioTransportError(Exception):
+    """ROM 부트로더와의 통신 오류"""
+
+    # 실패 원인 키 (flash_core.failure_cause)
+    cause = "protocol"
+
+
+class CommandTimeout(AioTransportError):
+    """명령 응답이 제한 시간 안에 오지 않음 (쓰기/검증 중이면 멈춤으로 기록)"""
+
+    cause = "timeout"
+
+    def __init__(self, description, timeout):
+        super().__init__(f"{description}: 응답 없음 ({timeout:.1f}초)")
+        self.timeout = timeout
+
+
+def _print_log(message, level="INFO"):
+    print(f"[{level}] {message}")
+
+
+def _no_progress(percentage, status_text):
+    pass
+
+
+def timeout_per_mb(seconds_per_mb, size):
+    return max(DEFAULT_TIMEOUT, seconds_per_mb * size / 1e6)
+
+
+class FrameEncoder:
+    """명령 패킷을 미리 잡아 둔 버퍼 안에서 바로 SLIP 프레임으로 만든다
+
+    헤더와 데이터 조각(공유 메모리의 memoryview 등)을 이어 붙이지 않고 버퍼로 한 번씩 복사한다.
+    이스케이프할 바이트가 없는 조각은 그대로 복사하고, 있으면 조각 하나만 임시로 치환한다.
+    반환한 memoryview 는 다음 encode 호출 전까지만 유효하다.
+    """
+
+    def __init__(self, capacity=2 * (FLASH_WRITE_SIZE + 32) + 2):
+        self.buf = bytearray(capacity)
+        self.view = memoryview(self.buf)
+        self.header = bytearray(8)
+
+    def encode(self, op, parts, chk=0):
+        length = sum(len(part) for part in parts)
+        need = 2 * (8 + length) + 2
+        if need > len(self.buf):
+            self.buf = bytearray(need)
+            self.view = memoryview(self.buf)
+        struct.pack_into("<BBHI", self.header, 0, 0x00, op, length, chk)
+        self.buf[0] = SLIP_END
+        pos = escape_into(self.view, 1, self.header)
+        for part in parts:
+            pos = escape_into(self.view, pos, part)
+        self.buf[pos] = SLIP_END
+        return self.view[: pos + 1]
+
+
+class AsyncSerialPort:
+    """pyserial 포트를 이벤트 루프에 연결 (읽기/쓰기 모두 비차단)
+
+    ser 는 timeout=0 으로 연 serial.Serial 또는 같은 속성을 가진 객체
+    (fileno/read/write/in_waiting/reset_input_buffer/baudrate/dtr/rts).
+    """
+
+    def __init__(self, ser, name=None):
+        self.ser = ser
+        self.name = name or getattr(ser, "port", "?")
+        self.decoder = SlipDecoder()
+        self.frames = asyncio.Queue()
+        self.loop = None
+        self.fd = None
+        self.poll_task = None
+        # 저지연 설정 (serial_tuning.PortTuning, 닫을 때 되돌림)
+        self.tuning = None
+
+    @classmethod
+    async def open(cls, port, baud=ROM_BAUD):
+        ser = serial.Serial()
+        ser.port = port
+        ser.baudrate = baud
+        ser.timeout = 0
+        ser.write_timeout = 0
+        # 포트를 열 때 DTR/RTS 가 튀지 않도록 먼저 설정
+        ser.dtr = False
+        ser.rts = False
+        ser.open()
+        transport = cls(ser, port)
+        transport.tuning = tune_serial(ser)
+        transport.start()
+        return transport
+
+    def start(self):
+        self.loop = asyncio.get_running_loop()
+        fd = None
+        if sys.platform != "win32" and hasattr(self.ser, "fileno"):
+            try:
+                fd = self.ser.fileno()
+            except (OSError, ValueError, AttributeError):
+                fd = None
+        if fd is not None:
+            self.fd = fd
+            self.loop.add_reader(fd, self._on_readable)
+        else:
+            self.poll_task = self.loop.create_task(self._poll())
+
+    def close(self):
+        if self.fd is not None:
+            self.loop.remove_reader(self.fd)
+            self.fd = None
+        if self.poll_task is not None:
+            self.poll_task.cancel()
+            self.poll_task = None
+        if self.tuning is not None:
+            self.tuning.restore()
+            self.tuning = None
+        try:
+            self.ser.close()
+        except Exception:
+            pass
+
+    def _feed(self, data):
+        for frame in self.decoder.feed(data):
+            self.frames.put_nowait(frame)
+
+    def _on_readable(self):
+        try:
+            data = self.ser.read(READ_CHUNK)
+        except (OSError, serial.SerialException):
+            data = b""
+        if data:
+            self._feed(data)
+
+    async def _poll(self):
+        while True:
+            waiting = self.ser.in_waiting
+            if waiting:
+                self._feed(self.ser.read(waiting))
+            else:
+                await asyncio.sleep(POLL_INTERVAL)
+
+    async def _writable(self):
+        if self.fd is None:
+            await asyncio.sleep(POLL_INTERVAL)
+            return
+        ready = self.loop.create_future()
+        self.loop.add_writer(self.fd, ready.set_result, None)
+        try:
+            await ready
+        finally:
+            self.loop.remove_writer(self.fd)
+
+    async def write(self, data):
+        view = memoryview(data)
+        while view:
+            if self.fd is not None:
+                # pyserial write 는 bytes 로 복사하므로 fd 에 바로 씀
+                try:
+                    written = os.write(self.fd, view)
+                except BlockingIOError:
+                    written = 0
+            else:
+                written = self.ser.write(view) or 0
+            view = view[written:]
+            if view:
+                await self._writable()
+
+    async def read_frame(self, timeout):
+        return await asyncio.wait_for(self.frames.get(), timeout)
+
+    def flush_input(self):
+        self.ser.reset_input_buffer()
+        self.decoder.reset()
+        while not self.frames.empty():
+            self.frames.get_nowait()
+
+    def set_baudrate(self, baud):
+        self.ser.baudrate = baud
+
+    async def enter_bootloader(self):
+        """DTR/RTS 로 다운로드 모드 진입 (flash_core.reset_device 와 같은 순서)"""
+        self.ser.dtr = False
+        self.ser.rts = True  # EN low
+        await asyncio.sleep(0.1)
+        self.ser.dtr = True  # IO0 low
+        self.ser.rts = False  # EN high
+        await asyncio.sleep(0.05)
+        self.ser.dtr = False
+
+    async def hard_reset(self):
+        self.ser.rts = True
+        await asyncio.sleep(0.1)
+        self.ser.rts = False
+
+
+class EspRomClient:
+    """ROM 부트로더 명령/응답 (응답은 명령 코드로 매칭)"""
+
+    def __init__(self, port):
+        self.port = port
+        self.lock = asyncio.Lock()
+        self.encoder = FrameEncoder()
+        # 연결한 칩의 레이아웃 (read_chip_info 후 설정)
+        self.layout = None
+        self.status_bytes = STATUS_BYTES_LENGTH
+
+    async def command(self, op, data=b"", chk=0, timeout=DEFAULT_TIMEOUT):
+        """data 는 bytes 또는 이어서 보낼 조각들의 tuple"""
+        parts = data if isinstance(data, tuple) else (data,)
+        async with self.lock:
+            await self.port.write(self.encoder.encode(op, parts, chk))
+            deadline = asyncio.get_running_loop().time() + timeout
+            while True:
+                remaining = deadline - asyncio.get_running_loop().time()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                frame = await self.port.read_frame(remaining)
+                if len(frame) < 8:
+                    continue
+                resp, op_ret, _, value = struct.unpack("<BBHI", frame[:8])
+                if resp != 0x01:
+                    continue
+                body = frame[8:]
+                if op_ret == op:
+                    return value, body
+                if body[:1] != b"\x00" and body[1:2] == bytes([ROM_INVALID_RECV_MSG]):
+                    raise AioTransportError(f"지원하지 않는 명령 (0x{op:02x})")
+                # 이전 명령의 늦은 응답은 버림
+
+    async def check_command(self, description, op, data=b"", chk=0, timeout=DEFAULT_TIMEOUT):
+        try:
+            value, body = await self.command(op, data, chk, timeout)
+        except asyncio.TimeoutError:
+            raise CommandTimeout(description, timeout)
+        if len(body) < self.status_bytes:
+            raise AioTransportError(f"{description}: 상태 응답이 짧습니다")
+        status = body[-self.status_bytes :]
+        if status[0] != 0:
+            raise AioTransportError(f"{description} 실패 (오류 0x{status[1]:02x})")
+        if len(body) > self.status_bytes:
+            return body[: -self.status_bytes]
+        return value
+
+    async def sync(self):
+        await self.command(
+            ESP_SYNC, b"\x07\x07\x12\x20" + 32 * b"\x55", timeout=SYNC_TIMEOUT
+        )
+        # ROM 은 SYNC 하나에 응답을 여러 개 보내므로 잠시 후 비움
+        await asyncio.sleep(0.05)
+        self.port.flush_input()
+
+    async def connect(self, attempts=5):
+        """다운로드 모드로 재시작 후 동기화"""
+        for attempt in range(attempts):
+            await self.port.enter_bootloader()
+            self.port.flush_input()
+            for _ in range(SYNC_ATTEMPTS):
+                try:
+                    await self.sync()
+                    return
+                except asyncio.TimeoutError:
+                    continue
+        raise AioTransportError("장치에 연결할 수 없습니다 (동기화 실패)")
+
+    async def change_baud(self, baud):
+        await self.command(ESP_CHANGE_BAUDRATE, struct.pack("<II", baud, 0))
+        self.port.set_baudrate(baud)
+        await asyncio.sleep(0.05)  # 속도 변경 중 들어온 잡음 제거
+        self.port.flush_input()
+
+    async def read_reg(self, addr):
+        return await self.check_command("레지스터 읽기", ESP_READ_REG, struct.pack("<I", addr))
+
+    async def read_chip_info(self):
+        """칩 종류와 MAC (esptool.detect_chip / read_mac 과 같은 레지스터)
+
+        이후 명령은 판별한 칩의 응답 형식(chip_layouts)을 따른다.
+        """
+        magic = await self.read_reg(CHIP_DETECT_MAGIC_REG_ADDR)
+        layout = layout_for_magic(magic)
+        if layout is None:
+            raise ChipLayoutError(f"지원하지 않는 칩입니다 (판별 값 0x{magic:08x})")
+        self.layout = layout
+        self.status_bytes = layout.status_bytes
+        mac0 = await self.read_reg(layout.mac_efuse_reg)
+        mac1 = await self.read_reg(layout.mac_efuse_reg + 4)
+        return {"chip": layout.name, "mac": layout.mac_from_words(mac0, mac1)}
+
+    async def measure_rtt(self, count=3):
+        """작은 명령의 왕복 시간 (최솟값, 초)"""
+        clock = asyncio.get_running_loop().time
+        best = None
+        for _ in range(count):
+            started = clock()
+            await self.read_reg(CHIP_DETECT_MAGIC_REG_ADDR)
+            elapsed = clock() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    async def spi_attach(self):
+        await self.check_command("SPI 플래시 연결", ESP_SPI_ATTACH, bytes(8))
+
+    async def set_flash_params(self, size=DEFAULT_FLASH_SIZE):
+        params = struct.pack("<IIIIII", 0, size, 64 * 1024, 4 * 1024, 256, 0xFFFF)
+        await self.check_command("플래시 설정", ESP_SPI_SET_PARAMS, params)
+
+    async def flash_md5(self, offset, size):
+        with profiling.span("rom.md5", "device", track=self.port.name, size=size):
+            res = await self.check_command(
+                "MD5 계산",
+                ESP_SPI_FLASH_MD5,
+                struct.pack("<IIII", offset, size, 0, 0),
+                timeout=timeout_per_mb(MD5_TIMEOUT_PER_MB, size),
+            )
+        if len(res) == 32:
+            return res.decode("ascii")
+        return bytes(res).hex()
+
+    async def write_compressed(
+        self,
+        offset,
+        size,
+        compressed,
+        on_block=None,
+        cancel_event=None,
+        erase_size=None,
+        meter=None,
+    ):
+        """압축된 데이터를 블록 단위로 전송 (ROM 이 begin 시점에 erase_size 만큼 지우기 수행)
+
+        meter(link_tuning.LinkMeter) 를 주면 블록별 응답 시간을 기록한다.
+        """
+        num_blocks = (len(compressed) + FLASH_WRITE_SIZE - 1) // FLASH_WRITE_SIZE
+        if erase_size is None:
+            erase_size = size
+        erase_size = (erase_size + FLASH_WRITE_SIZE - 1) // FLASH_WRITE_SIZE * FLASH_WRITE_SIZE
+        params = struct.pack("<IIII", erase_size, num_blocks, FLASH_WRITE_SIZE, offset)
+        if self.layout is None or self.layout.begin_encrypted_flag:
+            # 암호화 쓰기 안 함 (ESP32 ROM 에는 없는 항목)
+            params += struct.pack("<I", 0)
+        await self.check_command(
+            "압축 쓰기 시작",
+            ESP_FLASH_DEFL_BEGIN,
+            params,
+            timeout=timeout_per_mb(ERASE_TIMEOUT_PER_MB, erase_size),
+        )
+        view = memoryview(compressed)
+        block_timeout = timeout_per_mb(WRITE_TIMEOUT_PER_MB, FLASH_WRITE_SIZE * 4)
+        clock = asyncio.get_running_loop().time
+        if meter is not None:
+            meter.start_stream()
+        for seq in range(num_blocks):
+            if cancel_event is not None and cancel_event.is_set():
+                raise FlashCancelled()
+            block = view[seq * FLASH_WRITE_SIZE : (seq + 1) * FLASH_WRITE_SIZE]
+            header = struct.pack("<IIII", len(block), seq, 0, 0)
+            started = clock()
+            with profiling.span("rom.block", "device", track=self.port.name, seq=seq):
+                await self.check_command(
+                    "블록 쓰기",
+                    ESP_FLASH_DEFL_DATA,
+                    (header, block),
+                    checksum(block),
+                    timeout=block_timeout,
+                )
+            if meter is not None and not meter.done:
+                meter.add(block, clock() - started)
+            if on_block:
+                on_block(seq + 1, num_blocks)
+
+
+class PreparedRegion:
+    """장치 여러 대가 공유하는 영역 데이터 (압축/MD5 는 작업 프로세스에서 한 번만 계산)
+
+    전부 0xFF 인 섹터는 보내지 않는다. 구간마다 다음 구간 시작(마지막은 영역 끝)까지
+    지우기 범위를 잡으므로 건너뛴 섹터도 지워져서 0xFF 로 읽힌다.
+    """
+
+    def __init__(self, region, buffer):
+        self.region = region
+        self.buffer = buffer
+        self.size = buffer.info["size"]
+        self.md5 = buffer.info["md5"]
+        self.compressed = buffer.view
+        segments = buffer.info.get("segments") or [(0, self.size, 0, len(buffer.view))]
+        digests = buffer.info.get("segment_md5") or [self.md5]
+        # (영역 안 위치, 쓸 길이, 지울 길이, 압축 데이터, 지울 범위의 MD5)
+        self.segments = []
+        for i, (start, end, comp_start, comp_len) in enumerate(segments):
+            erase_end = segments[i + 1][0] if i + 1 < len(segments) else self.size
+            data = self.compressed[comp_start : comp_start + comp_len]
+            self.segments.append((start, end - start, erase_end - start, data, digests[i]))
+        self.skipped = self.size - sum(seg[1] for seg in self.segments)
+
+    def release(self):
+        # 공유 메모리를 닫기 전에 구간 뷰부터 해제
+        for segment in self.segments:
+            segment[3].release()
+        self.segments = []
+        self.buffer.release()
+
+
+def prepare_regions(regions, pool=None, level=DEFAULT_LEVEL):
+    """영역별 압축을 프로세스 풀에서 병렬로 실행"""
+    pool = pool or get_pool()
+    futures = [
+        pool.compress(region_source(region), level, skip_erased=True) for region in regions
+    ]
+    return [PreparedRegion(r, f.result()) for r, f in zip(regions, futures)]
+
+
+def flash_size_param(flash):
+    """프로필 flash 설정의 크기 → SPI_SET_PARAMS 크기 (detect/keep 은 기본값)"""
+    size = (flash or {}).get("size", "detect")
+    if size in ("detect", "keep"):
+        return DEFAULT_FLASH_SIZE
+    try:
+        return flash_size_bytes(size)
+    except FatalError:
+        raise ProfileError(f"알 수 없는 플래시 크기: {size}")
+
+
+def flash_header_codes(layout, flash):
+    """프로필 flash 설정 → 부트로더 헤더의 (모드, 속도, 크기) 값 (keep/detect 는 None)"""
+    chip = CHIP_DEFS[layout.esptool_name]
+    tables = (
+        ("mode", FLASH_MODES, ("keep",)),
+        ("freq", chip.FLASH_FREQUENCY, ("keep",)),
+        ("size", chip.FLASH_SIZES, ("keep", "detect")),
+    )
+    codes = []
+    for key, table, keep in tables:
+        value = flash.get(key, "keep")
+        if value in keep:
+            codes.append(None)
+        elif value in table:
+            codes.append(table[value])
+        else:
+            raise ProfileError(f"{layout.name} 에서 쓸 수 없는 플래시 {key}: {value}")
+    return tuple(codes)
+
+
+def _prepared_source(region, profile):
+    """압축할 영역 내용 (부트로더는 헤더의 플래시 설정을 프로필 값으로 바꿈, 작업 프로세스에서)"""
+    layout = profile.layout if profile is not None else None
+    if layout is None or region.is_erase or region.offset != layout.bootloader_offset:
+        return region_source(region)
+    codes = flash_header_codes(layout, profile.flash)
+    if codes == (None, None, None):
+        return region_source(region)
+    return generated_source(region.size, patch_flash_params, region.path, *codes)
+
+
+async def prepare_regions_async(regions, pool=None, level=DEFAULT_LEVEL, profile=None):
+    """prepare_regions 와 같지만 이벤트 루프를 막지 않음
+
+    profile(profiles.FirmwareProfile) 을 주면 부트로더 헤더에 프로필의 flash 설정을 넣는다.
+    """
+    pool = pool or get_pool()
+    buffers = await asyncio.gather(
+        *[
+            asyncio.wrap_future(
+                pool.compress(_prepared_source(r, profile), level, skip_erased=True)
+            )
+            for r in regions
+        ]
+    )
+    return [PreparedRegion(r, b) for r, b in zip(regions, buffers)]
+
+
+async def prepare_device_region(template, offset, mac, pool=None):
+    """MAC 으로 장치별 NVS 이미지를 만들어서 압축 → (PreparedRegion, identity)
+
+    시리얼 발급은 여기서, 이미지 인코딩과 압축은 작업 프로세스에서 한다.
+    """
+    pool = pool or get_pool()
+    identity = template.identity(mac)
+    source = generated_source(template.size, template.render, identity)
+    buffer = await asyncio.wrap_future(pool.compress(source, DEFAULT_LEVEL, skip_erased=True))
+    # 내용은 공유 메모리에 있으므로 경로는 이름으로만 씀 (None 이면 지우기 영역)
+    region = FlashRegion(
+        template.partition, offset, buffer.info["size"], f"device_{template.partition}.bin"
+    )
+    return PreparedRegion(region, buffer), identity
+
+
+def _with_region(prepared, item):
+    """같은 위치를 지우던 항목을 item 으로 바꾼 영역 목록 (FlashPlan.set_region 과 같음)"""
+    return sorted(
+        [p for p in prepared if p.region.offset != item.region.offset] + [item],
+        key=lambda p: p.region.offset,
+    )
+
+
+class DeviceSession:
+    """연결, 속도 변경, SPI 설정, 칩 정보 읽기까지 끝난 장치 (플래시 슬롯 대기 가능)"""
+
+    def __init__(self, port, transport, esp, info, connect_time, rtt=None):
+        self.port = port
+        self.transport = transport
+        self.esp = esp
+        self.info = info
+        self.connect_time = connect_time
+        # 명령 왕복 시간 (link_tuning 에서 사용)
+        self.rtt = rtt
+
+    def close(self):
+        self.transport.close()
+
+
+async def open_session(port, baud, open_port=AsyncSerialPort.open, efuse_regs=()):
+    """연결 단계만 수행해서 바로 쓸 수 있는 세션 반환 (실패 시 예외)
+
+    칩 종류는 연결할 때 판별하므로 한 스테이션에서 여러 칩을 섞어서 업로드할 수 있다.
+    efuse_regs 의 레지스터는 info["efuse"] 로 함께 읽는다 (프로필 선택용).
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    transport = await open_port(port, ROM_BAUD)
+    try:
+        with profiling.span("aio.connect", "device", track=port):
+            esp = EspRomClient(transport)
+            await esp.connect()
+            if int(baud) != ROM_BAUD:
+                await esp.change_baud(int(baud))
+            info = await esp.read_chip_info()
+            info["efuse"] = {addr: await esp.read_reg(addr) for addr in efuse_regs}
+            rtt = await esp.measure_rtt()
+            await esp.spi_attach()
+            await esp.set_flash_params()
+    except BaseException:
+        transport.close()
+        raise
+    return DeviceSession(port, transport, esp, info, loop.time() - started, rtt)
+
+
+class _AnyEvent:
+    """여러 취소 플래그 중 하나라도 설정되면 설정된 것으로 보는 플래그 (작업 스레드용)"""
+
+    def __init__(self, *events):
+        self.events = [event for event in events if event is not None]
+
+    def is_set(self):
+        return any(event.is_set() for event in self.events)
+
+
+async def verify_boot(port, config, cancel_event=None):
+    """부팅 확인(boot_check.run_boot_check)을 작업 스레드에서 실행
+
+    코루틴이 취소되면 작업 스레드도 다음 읽기 후 멈춘다.
+    """
+    stop = threading.Event()
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(
+            None, run_boot_check, port, config, _AnyEvent(cancel_event, stop)
+        )
+    finally:
+        stop.set()
+
+
+async def _retry_wait(cancel_event):
+    """재시도 전 USB 재인식 대기 (취소되면 FlashCancelled)"""
+    deadline = asyncio.get_running_loop().time() + RETRY_DELAY
+    while asyncio.get_running_loop().time() < deadline:
+        if cancel_event is not None and cancel_event.is_set():
+            raise FlashCancelled()
+        await asyncio.sleep(0.1)
+
+
+async def flash_device(
+    port,
+    baud,
+    prepared,
+    log=_print_log,
+    progress=_no_progress,
+    cancel_event=None,
+    open_port=AsyncSerialPort.open,
+    session=None,
+    meter=None,
+    retries=0,
+    journal=None,
+    boot_check=None,
+    on_written=None,
+    device_data=None,
+    device_offset=None,
+    flash=None,
+):
+    """장치 한 대 업로드 코루틴 (SessionResult 반환, 예외를 밖으로 던지지 않음)
+
+    session 을 주면 이미 끝난 연결 단계를 건너뛰고 바로 전송한다.
+    쓰기/검증 중 응답이 끊기면(멈춤, 포트 끊김) retries 번까지 다시 연결해서
+    끝까지 쓴 구간은 장치 MD5 로 확인하고 건너뛴다. journal(resume.SessionJournal) 을 주면
+    구간마다 진행을 기록해서 다음 실행에서도 같은 방식으로 이어 쓴다.
+    boot_check(boot_check.BootCheckConfig) 를 주면 포트를 닫고 부팅을 확인하며,
+    그 전에 on_written() 을 불러서 전송 슬롯을 돌려준다.
+    device_data(device_image.DeviceImageTemplate) 를 주면 연결할 때 읽은 MAC 으로
+    장치별 NVS 이미지를 만들어서 device_offset 에 함께 쓴다 (다시 연결하지 않음).
+    flash 는 선택한 프로필의 플래시 설정 (크기를 ROM 에 알려 줌, None 이면 기본 크기).
+    """
+    result = SessionResult(port)
+    metrics = SessionMetrics(port)
+    # 장치별 NVS 이미지 (첫 연결 뒤에 만들고, 재시도해도 같은 시리얼 사용)
+    device_item = None
+    # 영역별로 끝까지 쓴 길이 (이 길이 안의 구간은 장치 MD5 가 맞으면 다시 쓰지 않음)
+    written = {}
+    if journal is not None:
+        for item in prepared:
+            blocks = journal.candidate_blocks(item.region)
+            if blocks:
+                written[item.region.name] = min(blocks * journal.block_size, item.size)
+    # 장치 MD5 로 검증을 끝낸 영역
+    verified = set()
+
+    async def write_all(esp):
+        total = sum(len(p.compressed) for p in prepared) or 1
+        sent = 0
+        for item in prepared:
+            region = item.region
+            if region.name in verified:
+                sent += len(item.compressed)
+                continue
+            log(f"{region.name}: 0x{region.offset:08x} ({item.size} 바이트) 쓰는 중...")
+            metrics.enter_stage(STAGE_WRITE)
+            done_end = written.get(region.name, 0)
+            kept = 0
+            for start, length, erase, data, digest in item.segments:
+                base = sent
+                sent += len(data)
+                if start + erase <= done_end:
+                    if await esp.flash_md5(region.offset + start, erase) == digest:
+                        kept += erase
+                        continue
+
+                def on_block(done, count, base=base, data=data, length=length):
+                    written_bytes = base + min(done * FLASH_WRITE_SIZE, len(data))
+                    percent = 10 + 85 * written_bytes / total
+                    progress(percent, f"{region.name} 업로드 중... ({int(percent)}%)")
+                    # 압축 전 크기 기준으로 블록 수만큼 나눠서 기록
+                    metrics.add_bytes(length * done // count - length * (done - 1) // count)
+
+                await esp.write_compressed(
+                    region.offset + start,
+                    length,
+                    data,
+                    on_block,
+                    cancel_event,
+                    erase,
+                    meter,
+                )
+                written[region.name] = max(written.get(region.name, 0), start + erase)
+                # 장치별 이미지는 보드마다 달라서 저널에 기록하지 않음
+                if journal is not None and item is not device_item:
+                    journal.mark_written(region.offset + start + erase)
+            if kept:
+                log(f"{region.name}: 이미 기록된 {kept} 바이트 건너뜀 (장치 MD5 확인)")
+            if item.skipped:
+                result.bytes_skipped += item.skipped
+                log(f"{region.name}: 0xFF 블록 {item.skipped} 바이트 전송 생략")
+
+            metrics.enter_stage(STAGE_VERIFY)
+            digest = await esp.flash_md5(region.offset, item.size)
+            if digest != item.md5:
+                raise FlashFailed(f"{region.name}: MD5 불일치", "verify")
+            verified.add(region.name)
+            if journal is not None and item is not device_item:
+                journal.mark_verified(region.name)
+            log(f"{region.name}: 해시 검증 완료")
+
+    try:
+        # 쓰기 (멈춤/끊김 시 다시 연결해서 이어쓰기)
+        while True:
+            result.attempts += 1
+            try:
+                if session is None:
+                    progress(5, "장치에 연결 중... (5%)")
+                    session = await open_session(port, baud, open_port)
+                if flash is not None:
+                    await session.esp.set_flash_params(flash_size_param(flash))
+                metrics.observe_stage("connect", session.connect_time)
+                result.rtt = session.rtt
+                tuning = session.transport.tuning
+                log(
+                    f"포트 설정: {tuning.describe() if tuning else '변경 없음'}, "
+                    f"명령 왕복 {session.rtt * 1e3:.1f}ms"
+                )
+                if device_data is not None and device_item is None:
+                    device_item, identity = await prepare_device_region(
+                        device_data, device_offset, session.info["mac"]
+                    )
+                    prepared = _with_region(prepared, device_item)
+                    serial_number = identity.get("serial")
+                    log(
+                        f"장치 데이터: {device_data.partition} 0x{device_offset:05x} "
+                        f"(MAC {identity['mac']}"
+                        + (f", 시리얼 {serial_number})" if serial_number else ")")
+                    )
+                progress(10, "연결 완료, 펌웨어 업로드 시작... (10%)")
+                await write_all(session.esp)
+                break
+            except (AioTransportError, serial.SerialException, OSError) as e:
+                stall = None
+                if isinstance(e, CommandTimeout) and metrics.stage in (STAGE_WRITE, STAGE_VERIFY):
+                    # 명령 제한 시간이 이 경로의 멈춤 감시
+                    stall = FlashStalled(metrics.stage, e.timeout, metrics.written)
+                    result.record_stall(stall)
+                    log(f"진행 멈춤 감지: {stall}", "WARNING")
+                if result.attempts > retries:
+                    if stall is None:
+                        raise
+                    # 지역 변수에 든 예외를 던지면 트레이스백과 순환 참조가 되어
+                    # 공유 메모리 뷰가 GC 전까지 남으므로 새로 만들어 던짐
+                    raise FlashStalled(stall.stage, stall.idle, stall.bytes_done)
+                log(f"{stall or e} - 포트를 해제하고 다시 시도합니다 ({result.attempts + 1}회차)")
+                progress(5, "재연결 중... (5%)")
+                if session is not None:
+                    session.close()
+                    session = None
+                await _retry_wait(cancel_event)
+
+        if journal is not None:
+            journal.clear()
+        if boot_check is None or not boot_check.reset:
+            progress(95, "장치 재시작 중... (95%)")
+            metrics.enter_stage(STAGE_RESET)
+            await session.transport.hard_reset()
+        if boot_check is not None:
+            # 포트를 부팅 확인에 넘겨줌 (재시작은 부팅 확인의 리셋 한 번)
+            session.close()
+            session = None
+            if on_written is not None:
+                on_written()
+            progress(97, "부팅 확인 중... (97%)")
+            log("부팅 확인 중 (콘솔 출력 대기)...")
+            metrics.enter_stage("boot_check")
+            try:
+                boot = await verify_boot(port, boot_check, cancel_event)
+            except Exception as e:
+                raise FlashFailed(f"부팅 확인용 포트를 열 수 없습니다: {e}", "boot_check")
+            result.boot = boot.as_dict()
+            if cancel_event is not None and cancel_event.is_set():
+                raise FlashCancelled()
+            if not boot.ok:
+                tail = boot.console.decode("utf-8", "replace").strip().splitlines()[-10:]
+                for line in tail:
+                    log(f"  | {line}")
+                raise FlashFailed(f"부팅 확인 실패: {boot.reason}", "boot_check")
+            log(f"✓ 부팅 확인 완료 ({boot.boot_time:.1f}초): {boot.reason}", "SUCCESS")
+        result.finish(True)
+        progress(100, "업로드 완료! (100%)")
+
+    except (FlashCancelled, asyncio.CancelledError) as e:
+        result.cancelled = True
+        result.finish(False, "사용자 취소")
+        log("업로드가 취소되었습니다.", "WARNING")
+        if isinstance(e, asyncio.CancelledError):
+            raise
+    except Exception as e:
+        result.finish(False, str(e) or type(e).__name__, failure_cause(e))
+        log(f"펌웨어 업로드 중 오류 발생: {result.error}", "ERROR")
+    finally:
+        metrics.finish(result)
+        if session is not None:
+            session.close()
+        if device_item is not None:
+            device_item.release()
+    return result
+
+
+class PrefetchStation:
+    """포트가 들어오는 즉시 연결 단계를 미리 끝내 두고, 전송 슬롯이 비면 바로 쓰기 시작
+
+    연결(리셋, SYNC, 속도 변경, 칩 정보)은 슬롯 수와 관계없이 동시에 진행하고,
+    준비된 세션은 슬롯을 기다리는 동안 다운로드 모드로 대기한다.
+    profiles(profiles.ProfileSet) 를 주면 연결할 때 읽은 정보로 보드마다 프로필을 고른다.
+    멈춤/끊김은 retries 번까지 이어쓰기로 다시 시도하고(포트별 세션 저널),
+    boot_check 를 주면 쓰기가 끝난 장치는 슬롯을 돌려주고 부팅을 확인한다.
+    device_data(device_image.DeviceImageTemplate) 는 profiles 와 함께 주며,
+    보드마다 연결할 때 읽은 MAC 으로 NVS 이미지를 만들어서 함께 쓴다.
+    is_flashed(mac) 이 True 인 보드는 연결 직후 앱으로 재시작하고 on_skip(port, info) 을 부른다
+    (결과에는 넣지 않음).
+    이벤트 루프 스레드에서만 호출한다.
+    """
+
+    def __init__(
+        self,
+        baud,
+        prepared,
+        slots,
+        log_factory=None,
+        progress_factory=None,
+        on_result=None,
+        cancel_event=None,
+        open_port=AsyncSerialPort.open,
+        tuning=None,
+        profiles=None,
+        boot_check=None,
+        retries=STALL_RETRIES,
+        device_data=None,
+        is_flashed=None,
+        on_skip=None,
+    ):
+        self.baud = baud
+        # 영역 목록, 또는 profiles 를 줬으면 {프로필 이름: 영역 목록} (모두 미리 압축해 둠)
+        self.prepared = prepared
+        self.profiles = profiles
+        self.slot_count = slots
+        self.slots = asyncio.Semaphore(slots)
+        self.log_factory = log_factory
+        self.progress_factory = progress_factory
+        self.on_result = on_result
+        self.cancel_event = cancel_event
+        self.open_port = open_port
+        # 링크 측정 결과 저장소 (link_tuning.LinkTuning, None 이면 측정 안 함)
+        self.tuning = tuning
+        self.boot_check = boot_check
+        self.retries = retries
+        # 장치별 NVS 이미지 템플릿과 프로필별 파티션 위치 (파티션 테이블이 다를 수 있음)
+        self.device_data = device_data
+        self.device_offsets = (
+            {p.name: p.table.find(device_data.partition).offset for p in profiles}
+            if device_data is not None
+            else {}
+        )
+        self.is_flashed = is_flashed
+        self.on_skip = on_skip
+        self.tasks = {}
+        self.results = {}
+        # 연결은 끝났고 슬롯을 기다리는 세션 수
+        self.parked = 0
+
+    def is_busy(self, port):
+        return port in self.tasks
+
+    def queue_depth(self):
+        """연결을 마치고 전송 슬롯을 기다리는 장치 수 (metrics.QUEUE_DEPTH 수집용)"""
+        return {("slot",): self.parked}
+
+    def submit(self, port):
+        """포트 추가 (이미 처리 중이면 False)"""
+        if port in self.tasks:
+            return False
+        self.tasks[port] = asyncio.get_running_loop().create_task(self._run(port))
+        return True
+
+    async def join(self):
+        while self.tasks:
+            await asyncio.gather(*list(self.tasks.values()))
+        return self.results
+
+    async def _run(self, port):
+        log = self.log_factory(port) if self.log_factory else _print_log
+        progress = self.progress_factory(port) if self.progress_factory else _no_progress
+        info = {}
+        try:
+            progress(5, "장치에 연결 중... (5%)")
+            try:
+                efuse_regs = self.profiles.efuse_regs if self.profiles is not None else ()
+                session = await open_session(port, self.baud, self.open_port, efuse_regs)
+                if self.is_flashed is not None and self.is_flashed(session.info["mac"]):
+                    await self._skip(port, session, log)
+                    return
+                prepared, profile = self.prepared_for(session, log)
+                name = profile.name if profile is not None else None
+            except Exception as e:
+                result = SessionResult(port)
+                result.attempts = 1
+                cause = (
+                    failure_cause(e)
+                    if isinstance(e, (FlashFailed, ProfileError, ChipLayoutError))
+                    else "connect"
+                )
+                result.finish(False, str(e) or type(e).__name__, cause)
+                log(f"연결 실패: {result.error}", "ERROR")
+                record_result(result)
+            else:
+                info = session.info
+                log(
+                    f"연결 완료 {info['chip']} (MAC {info.get('mac', '?')}, "
+                    f"{session.connect_time:.2f}초) - 전송 대기"
+                )
+                self.parked += 1
+                parked = True
+                meter = LinkMeter() if self.tuning is not None else None
+                released = False
+
+                def release_slot():
+                    nonlocal released
+                    if not released:
+                        released = True
+                        self.slots.release()
+
+                try:
+                    await self.slots.acquire()
+                    self.parked -= 1
+                    parked = False
+                    try:
+                        result = await flash_device(
+                            port,
+                            self.baud,
+                            prepared,
+                            log,
+                            progress,
+                            self.cancel_event,
+                            self.open_port,
+                            session=session,
+                            meter=meter,
+                            retries=self.retries,
+                            journal=self.journal_for(port, prepared),
+                            boot_check=self.boot_check,
+                            on_written=release_slot,
+                            device_data=self.device_data,
+                            device_offset=self.device_offsets.get(name),
+                            flash=profile.flash if profile is not None else None,
+                        )
+                    finally:
+                        release_slot()
+                    if result.success and meter is not None:
+                        self._tune(session, meter, prepared, log)
+                finally:
+                    if parked:
+                        self.parked -= 1
+                        session.close()
+            self.results[port] = result
+            if self.on_result is not None:
+                self.on_result(result, info)
+        finally:
+            del self.tasks[port]
+
+    async def _skip(self, port, session, log):
+        """이미 업로드한 보드는 앱으로 재시작하고 건너뜀 (핫플러그 파이프라인과 같음)"""
+        try:
+            await session.transport.hard_reset()
+        finally:
+            session.close()
+        log(f"이미 업로드된 보드 (MAC {session.info['mac']}) - 건너뜀")
+        if self.on_skip is not None:
+            self.on_skip(port, session.info)
+
+    def journal_for(self, port, prepared):
+        """포트별 세션 저널 (FlashJob 과 같은 파일이라 어느 경로로 다시 올려도 이어 씀)"""
+        return SessionJournal(
+            port,
+            [item.region for item in prepared],
+            digests={item.region.name: item.buffer.info["sha256"] for item in prepared},
+        )
+
+    def prepared_for(self, session, log):
+        """세션의 보드에 맞는 (영역 목록, 프로필)
+
+        profiles 가 없으면 프로필은 None, 맞는 프로필이 없으면 세션을 닫고 ProfileError.
+        """
+        if self.profiles is None:
+            return self.prepared, None
+        try:
+            profile = self.profiles.select(session.info)
+        except Exception:
+            session.close()
+            raise
+        if len(self.profiles) > 1:
+            log(f"프로필: {profile.describe()}")
+        return self.prepared[profile.name], profile
+
+    def _tune(self, session, meter, prepared, log):
+        """첫 블록 측정값으로 다음 업로드의 압축 수준 다시 선택"""
+        rtt = session.rtt or 0.0
+        estimate = meter.estimate(rtt, nominal_link=int(self.baud) / 10)
+        stats = merge_stats(
+            [(item.size, item.buffer.info.get("level_stats")) for item in prepared]
+        )
+        if estimate is None or not stats:
+            return
+        link_bps, device_bps = estimate
+        entry = self.tuning.update(
+            session.info["chip"],
+            self.baud,
+            link_bps,
+            device_bps,
+            rtt,
+            stats,
+            sum(item.size for item in prepared),
+            self.slot_count,
+        )
+        log(
+            f"링크 측정: 전송 {link_bps / 1e3:.0f}KB/s, 장치 {device_bps / 1e3:.0f}KB/s, "
+            f"왕복 {rtt * 1e3:.1f}ms → 다음 압축 수준 {entry['level']}"
+        )
+
+
+async def _prepare_all(regions, level, profiles=None):
+    """영역 목록 또는 {프로필 이름: 영역 목록} 을 모두 미리 압축
+
+    level 은 압축 수준 하나, 또는 {프로필 이름: 압축 수준}.
+    profiles 를 주면 프로필마다 부트로더 헤더에 그 프로필의 flash 설정을 넣는다.
+    """
+    if not isinstance(regions, dict):
+        return await prepare_regions_async(regions, level=level)
+    names = list(regions)
+    levels = level if isinstance(level, dict) else dict.fromkeys(names, level)
+    by_name = {p.name: p for p in profiles} if profiles is not None else {}
+    prepared = await asyncio.gather(
+        *[
+            prepare_regions_async(regions[name], level=levels[name], profile=by_name.get(name))
+            for name in names
+        ]
+    )
+    return dict(zip(names, prepared))
+
+
+def _compression_levels(tuning, baud, profiles):
+    """이전 측정으로 고른 압축 수준 (프로필마다 대상 칩의 값)"""
+    if profiles is None:
+        return tuning.level_for(DEFAULT_CHIP, baud)
+    return {
+        p.name: tuning.level_for(p.layout.name if p.layout else DEFAULT_CHIP, baud)
+        for p in profiles
+    }
+
+
+def _release_all(prepared):
+    for items in prepared.values() if isinstance(prepared, dict) else [prepared]:
+        for item in items:
+            item.release()
+
+
+async def flash_devices(
+    ports,
+    baud,
+    regions,
+    log_factory=None,
+    progress_factory=None,
+    cancel_event=None,
+    slots=None,
+    on_result=None,
+    profiles=None,
+    boot_check=None,
+    retries=STALL_RETRIES,
+    device_data=None,
+):
+    """이벤트 루프 하나에서 여러 장치를 업로드 (동시 전송은 slots 개, 연결은 모두 미리)
+
+    압축 수준은 이전 측정으로 고른 값을 쓰고, 이번 측정 결과는 다음 업로드에 반영된다.
+    profiles 를 주면 regions 는 {프로필 이름: 영역 목록} 이고 보드마다 프로필을 고른다.
+    boot_check/retries/device_data 는 PrefetchStation 참고.
+    """
+    tuning = LinkTuning()
+    prepared = await _prepare_all(
+        regions, _compression_levels(tuning, baud, profiles), profiles
+    )
+    try:
+        station = PrefetchStation(
+            baud,
+            prepared,
+            slots or len(ports),
+            log_factory,
+            progress_factory,
+            on_result,
+            cancel_event,
+            tuning=tuning,
+            profiles=profiles,
+            boot_check=boot_check,
+            retries=retries,
+            device_data=device_data,
+        )
+        QUEUE_DEPTH.add_source(station.queue_depth)
+        for port in ports:
+            station.submit(port)
+        try:
+            results = await station.join()
+        finally:
+            QUEUE_DEPTH.remove_source(station.queue_depth)
+        return [results[port] for port in ports]
+    finally:
+        tuning.save()
+        _release_all(prepared)
+
+
+async def watch_devices(
+    baud,
+    regions,
+    slots,
+    log_factory=None,
+    progress_factory=None,
+    on_result=None,
+    stop_event=None,
+    profiles=None,
+    boot_check=None,
+    retries=STALL_RETRIES,
+    device_data=None,
+    registry=None,
+):
+    """새로 연결되는 포트를 감지해서 연결 프리페치 후 업로드 (stop_event 가 설정될 때까지)
+
+    registry(hotplug.FlashedRegistry) 를 주면 이미 업로드한 보드는 MAC 으로 구분해서 건너뛰고,
+    성공한 보드를 기록한다 (GUI 핫플러그 모드와 같음).
+    """
+    loop = asyncio.get_running_loop()
+    tuning = LinkTuning()
+    prepared = await _prepare_all(
+        regions, _compression_levels(tuning, baud, profiles), profiles
+    )
+
+    def finished(result, info):
+        # is_busy 가 풀리기 전에 불림 → 리셋으로 재열거된 포트를 다시 넣지 않음
+        watcher.mark_finished(result.port)
+        if registry is not None and result.success and "mac" in info:
+            registry.add(info["mac"])
+        if on_result is not None:
+            on_result(result, info)
+
+    def skipped(port, info):
+        watcher.mark_finished(port)
+
+    station = PrefetchStation(
+        baud,
+        prepared,
+        slots,
+        log_factory,
+        progress_factory,
+        finished,
+        tuning=tuning,
+        profiles=profiles,
+        boot_check=boot_check,
+        retries=retries,
+        device_data=device_data,
+        is_flashed=registry.contains if registry is not None else None,
+        on_skip=skipped,
+    )
+
+    def on_ready(port):
+        # 감시 스레드에서 호출됨
+        loop.call_soon_threadsafe(station.submit, port)
+        return True
+
+    watcher = HotplugWatcher(on_ready, is_busy=station.is_busy)
+    watcher.start()
+    QUEUE_DEPTH.add_source(station.queue_depth)
+    try:
+        while stop_event is None or not stop_event.is_set():
+            await asyncio.sleep(0.2)
+        await station.join()
+    finally:
+        watcher.stop()
+        QUEUE_DEPTH.remove_source(station.queue_depth)
+        for task in list(station.tasks.values()):
+            task.cancel()
+        tuning.save()
+        _release_all(prepared)
+
+
+def run_flash_devices(ports, baud, regions, **kwargs):
+    """동기 코드(GUI/CLI)에서 호출하는 진입점"""
+    return asyncio.run(flash_devices(ports, baud, regions, **kwargs))
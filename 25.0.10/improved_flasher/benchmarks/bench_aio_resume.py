@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+asyncio 전송 멈춤/이어쓰기/부팅 확인 자체 검사
+가상 ROM 장치가 블록 N 개를 받은 뒤 응답을 멈추게 해서
+  - 같은 실행 안에서 다시 연결해 끝까지 쓴 구간을 건너뛰는지 (멈춤 기록 포함)
+  - 재시도 없이 실패한 뒤 세션 저널로 다음 실행에서 이어 쓰는지
+  - 부팅 확인이 있으면 하드 리셋 없이 슬롯을 먼저 돌려주고 부팅 확인을 하는지
+를 확인한다. 멈춤 감지는 블록 명령 제한 시간(3초)을 기다리므로 몇 초 걸린다.
+
+    python benchmarks/bench_aio_resume.py
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import aio_transport as aio  # noqa: E402
+from boot_check import BootCheckConfig, BootCheckResult  # noqa: E402
+from bench_aio_transport import SimulatedRom, make_opener  # noqa: E402
+from flash_core import STAGE_WRITE  # noqa: E402
+from partition_table import FlashRegion  # noqa: E402
+from resume import SessionJournal  # noqa: E402
+
+FIRMWARE_OFFSET = 0x10000
+
+
+class StallingRom(SimulatedRom):
+    """연결 사이에 플래시 내용을 유지하고, 정한 수만큼 블록을 받으면 응답을 멈추는 장치"""
+
+    def __init__(self, reader, writer, baud, device):
+        super().__init__(reader, writer, baud)
+        self.device = device
+        self.sectors = device["sectors"]
+        self.stalled = False
+        device["connections"] += 1
+        device["blocks"].append(0)
+
+    def handle(self, frame):
+        if self.stalled:
+            return
+        if frame[1] == aio.ESP_FLASH_DEFL_DATA:
+            self.device["blocks"][-1] += 1
+            limit = self.device["stall_after"]
+            if limit and sum(self.device["blocks"]) > limit:
+                # 한 번만 멈춤 (다시 연결하면 정상 응답)
+                self.device["stall_after"] = 0
+                self.stalled = True
+                return
+        super().handle(frame)
+
+
+def make_segmented_image(segments, segment_size):
+    """0xFF 섹터로 나뉜 구간이 여러 개인 이미지"""
+    parts = []
+    for _ in range(segments):
+        parts.append(os.urandom(segment_size // 2) + bytes(segment_size // 2))
+        parts.append(b"\xff" * 4096)
+    return b"".join(parts)
+
+
+async def flash_once(args, path, device, **kwargs):
+    server = await asyncio.start_server(
+        lambda r, w: StallingRom(r, w, args.baud, device).run(), "127.0.0.1", 0
+    )
+    regions = [FlashRegion("Firmware", FIRMWARE_OFFSET, os.path.getsize(path), path)]
+    prepared = await aio._prepare_all(regions, 6)
+    try:
+        return await aio.flash_device(
+            "SIM0",
+            args.baud,
+            prepared,
+            log=lambda *a: None,
+            open_port=make_opener(server.sockets[0].getsockname()[1]),
+            **kwargs,
+        )
+    finally:
+        aio._release_all(prepared)
+        server.close()
+        # 닫힌 연결의 장치 쪽 작업이 끝나도록 잠깐 양보
+        await asyncio.sleep(0.1)
+
+
+def new_device(stall_after):
+    return {"sectors": {}, "connections": 0, "blocks": [], "stall_after": stall_after}
+
+
+def journal_for(path):
+    region = FlashRegion("Firmware", FIRMWARE_OFFSET, os.path.getsize(path), path)
+    return SessionJournal("SIM0", [region])
+
+
+def check_retry(args, path, total_blocks):
+    device = new_device(total_blocks * 2 // 3)
+    result = asyncio.run(flash_once(args, path, device, retries=1, journal=journal_for(path)))
+    assert result.success, result.error
+    assert result.attempts == 2 and device["connections"] == 2, (result.attempts, device)
+    assert len(result.stalls) == 1 and result.stalls[0]["stage"] == STAGE_WRITE, result.stalls
+    second = device["blocks"][1]
+    assert second < total_blocks - total_blocks // 3, device["blocks"]
+    print(f"재시도: 멈춤 {result.stalls[0]}, 두 번째 연결 블록 {second}/{total_blocks}")
+
+
+def check_journal(args, path, total_blocks):
+    device = new_device(total_blocks // 2)
+    result = asyncio.run(flash_once(args, path, device, journal=journal_for(path)))
+    assert not result.success and result.cause == "stall", (result.cause, result.error)
+    journal = journal_for(path)
+    assert journal.has_progress(), "저널에 진행이 없음"
+
+    device["blocks"].clear()
+    result = asyncio.run(flash_once(args, path, device, journal=journal))
+    assert result.success, result.error
+    resumed = device["blocks"][0]
+    assert resumed < total_blocks - total_blocks // 3, resumed
+    assert not journal_for(path).has_progress(), "성공 후 저널이 남음"
+    print(f"저널 이어쓰기: 다음 실행 블록 {resumed}/{total_blocks}")
+
+
+def check_boot(args, path):
+    events = []
+    original_reset = aio.AsyncSerialPort.hard_reset
+    original_check = aio.run_boot_check
+
+    async def hard_reset(self):
+        events.append("hard_reset")
+
+    def run_boot_check(port, config, cancel_event=None):
+        events.append("boot_check")
+        return BootCheckResult(True, "Setup completed successfully", 0.5, b"")
+
+    aio.AsyncSerialPort.hard_reset = hard_reset
+    aio.run_boot_check = run_boot_check
+    try:
+        for reset in (True, False):
+            events.clear()
+            result = asyncio.run(
+                flash_once(
+                    args,
+                    path,
+                    new_device(0),
+                    boot_check=BootCheckConfig(reset=reset),
+                    on_written=lambda: events.append("slot"),
+                )
+            )
+            assert result.success and result.boot["ok"], result.error
+            expected = ["slot", "boot_check"] if reset else ["hard_reset", "slot", "boot_check"]
+            assert events == expected, events
+    finally:
+        aio.AsyncSerialPort.hard_reset = original_reset
+        aio.run_boot_check = original_check
+    print("부팅 확인: 슬롯 반환 후 확인, 리셋은 한 번")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="asyncio 멈춤/이어쓰기 자체 검사")
+    parser.add_argument("--segments", type=int, default=8)
+    parser.add_argument("--segment-size", type=int, default=32 * 1024)
+    parser.add_argument("--baud", type=int, default=2000000)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="aio_resume_")
+    # 저널은 앱 데이터 폴더에 저장되므로 임시 폴더로 돌림
+    os.environ["LOCALAPPDATA"] = tmp
+    try:
+        path = os.path.join(tmp, "firmware.bin")
+        with open(path, "wb") as f:
+            f.write(make_segmented_image(args.segments, args.segment_size))
+        probe = new_device(0)
+        result = asyncio.run(flash_once(args, path, probe))
+        assert result.success, result.error
+        total_blocks = probe["blocks"][0]
+
+        check_retry(args, path, total_blocks)
+        check_journal(args, path, total_blocks)
+        check_boot(args, path)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
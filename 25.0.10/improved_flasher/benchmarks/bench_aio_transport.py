@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+asyncio 전송 코어 벤치마크
+가상 ESP32-S3 ROM 장치 N 대(별도 프로세스, TCP 소켓)에 동시에 업로드하면서
+업로더 프로세스의 CPU 시간과 스레드 수를 측정한다.
+
+    python benchmarks/bench_aio_transport.py --devices 32
+    python benchmarks/bench_aio_transport.py --devices 32 --mode threads
+    python benchmarks/bench_aio_transport.py --devices 8 --slots 2 --mode slots     # 연결 후 전송
+    python benchmarks/bench_aio_transport.py --devices 8 --slots 2 --mode prefetch  # 연결 프리페치
+"""
+
+import argparse
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import aio_transport as aio  # noqa: E402
+import slip  # noqa: E402
+from chip_layouts import layout_for  # noqa: E402
+from partition_table import FlashRegion  # noqa: E402
+
+
+# ---------------------------------------------------------------------------
+# 가상 장치 (ROM 부트로더 일부 명령만 구현)
+# ---------------------------------------------------------------------------
+
+
+class SimulatedRom:
+    def __init__(self, reader, writer, baud, sync_delay=0.0, chip="ESP32-S3"):
+        self.reader = reader
+        self.writer = writer
+        self.baud = baud
+        # 리셋 후 ROM 이 SYNC 에 응답하기까지 걸리는 시간 흉내
+        self.sync_delay = sync_delay
+        self.synced = False
+        self.decoder = slip.SlipDecoder()
+        # 섹터 번호 → 내용 (지운 적 없는 섹터는 이전 펌웨어가 남아 있는 것으로 보고 0x00)
+        self.sectors = {}
+        self.inflater = None
+        self.write_addr = 0
+        # 칩별 판별 값, MAC 위치, 응답 형식 (chip_layouts)
+        self.layout = layout_for(chip)
+        mac = os.urandom(4)
+        self.registers = {
+            aio.CHIP_DETECT_MAGIC_REG_ADDR: self.layout.magic_values[0],
+            self.layout.mac_efuse_reg: int.from_bytes(mac, "big"),
+            self.layout.mac_efuse_reg + 4: 0x7CDF,
+        }
+
+    def write(self, addr, data):
+        for i, b in enumerate(data):
+            sector = self.sectors.setdefault((addr + i) // 4096, bytearray(4096))
+            sector[(addr + i) % 4096] &= b
+
+    def read(self, addr, size):
+        out = bytearray()
+        for sector in range(addr // 4096, (addr + size + 4095) // 4096):
+            out += self.sectors.get(sector, bytes(4096))
+        start = addr % 4096
+        return bytes(out[start : start + size])
+
+    def reply(self, op, value=0, data=b""):
+        body = data + bytes(self.layout.status_bytes)
+        packet = struct.pack("<BBHI", 0x01, op, len(body), value) + body
+        self.writer.write(slip.encode(packet))
+
+    def handle(self, frame):
+        _, op, _, _ = struct.unpack("<BBHI", frame[:8])
+        data = frame[8:]
+        if op == aio.ESP_SYNC:
+            if not self.synced and self.sync_delay:
+                return
+            self.synced = True
+            for _ in range(8):
+                self.reply(op, 0x12345678)
+        elif op == aio.ESP_READ_REG:
+            addr = struct.unpack("<I", data[:4])[0]
+            self.reply(op, self.registers.get(addr, 0))
+        elif op == aio.ESP_FLASH_DEFL_BEGIN:
+            erase_size, _, _, offset = struct.unpack("<IIII", data[:16])
+            # ESP32 ROM 은 암호화 항목 없이 16바이트
+            assert len(data) == (20 if self.layout.begin_encrypted_flag else 16), len(data)
+            for sector in range(offset // 4096, (offset + erase_size + 4095) // 4096):
+                self.sectors[sector] = bytearray(b"\xff" * 4096)
+            self.inflater = zlib.decompressobj()
+            self.write_addr = offset
+            self.reply(op)
+        elif op == aio.ESP_FLASH_DEFL_DATA:
+            size = struct.unpack("<I", data[:4])[0]
+            chunk = self.inflater.decompress(data[16 : 16 + size])
+            self.write(self.write_addr, chunk)
+            self.write_addr += len(chunk)
+            self.reply(op)
+        elif op == aio.ESP_SPI_FLASH_MD5:
+            addr, size = struct.unpack("<II", data[:8])
+            digest = hashlib.md5(self.read(addr, size)).hexdigest()
+            self.reply(op, data=digest.encode("ascii"))
+        else:
+            self.reply(op)
+
+    async def run(self):
+        if self.sync_delay:
+            asyncio.get_running_loop().call_later(self.sync_delay, self._ready)
+        while True:
+            data = await self.reader.read(4096)
+            if not data:
+                break
+            # 실제 UART 속도만큼 지연 (10비트/바이트)
+            await asyncio.sleep(len(data) * 10 / self.baud)
+            for frame in self.decoder.feed(data):
+                self.handle(frame)
+            await self.writer.drain()
+        self.writer.close()
+
+    def _ready(self):
+        self.sync_delay = 0.0
+
+
+def simulator_main(conn, baud, sync_delay=0.0):
+    async def serve():
+        server = await asyncio.start_server(
+            lambda r, w: SimulatedRom(r, w, baud, sync_delay).run(), "127.0.0.1", 0
+        )
+        conn.send(server.sockets[0].getsockname()[1])
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(serve())
+
+
+# ---------------------------------------------------------------------------
+# 업로더 쪽: 소켓을 pyserial 처럼 보이게 하는 래퍼
+# ---------------------------------------------------------------------------
+
+
+class SocketSerial:
+    def __init__(self, sock):
+        self.sock = sock
+        self.sock.setblocking(False)
+        self.baudrate = aio.ROM_BAUD
+        self.dtr = False
+        self.rts = False
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def read(self, size):
+        try:
+            return self.sock.recv(size)
+        except BlockingIOError:
+            return b""
+
+    def write(self, data):
+        try:
+            return self.sock.send(data)
+        except BlockingIOError:
+            return 0
+
+    @property
+    def in_waiting(self):
+        return 0
+
+    def reset_input_buffer(self):
+        while self.read(65536):
+            pass
+
+    def close(self):
+        self.sock.close()
+
+
+def make_opener(tcp_port):
+    async def open_port(name, baud):
+        sock = socket.create_connection(("127.0.0.1", tcp_port))
+        transport = aio.AsyncSerialPort(SocketSerial(sock), name)
+        transport.start()
+        return transport
+
+    return open_port
+
+
+def make_image(size, blank=0.0):
+    """실제 펌웨어처럼 압축률이 중간 정도인 데이터 (blank: 0xFF 로 채운 끝부분 비율)"""
+    data_size = int(size * (1 - blank))
+    blocks = (os.urandom(1024) + bytes(1024) for _ in range(data_size // 2048 + 1))
+    return b"".join(blocks)[:data_size] + b"\xff" * (size - data_size)
+
+
+class ThreadSampler:
+    """측정 구간 동안 스레드 수 최댓값 기록"""
+
+    def __init__(self):
+        self.peak = threading.active_count()
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self.stop_event.wait(0.05):
+            self.peak = max(self.peak, threading.active_count())
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop_event.set()
+        self.thread.join()
+
+
+def run_aio(ports, baud, prepared, opener):
+    async def main():
+        return await asyncio.gather(
+            *[
+                aio.flash_device(port, baud, prepared, log=lambda *a: None, open_port=opener)
+                for port in ports
+            ]
+        )
+
+    return asyncio.run(main())
+
+
+def run_threads(ports, baud, prepared, opener):
+    # 비교용: 기존 방식처럼 장치마다 스레드 하나
+    results = [None] * len(ports)
+
+    def worker(idx, port):
+        results[idx] = asyncio.run(
+            aio.flash_device(port, baud, prepared, log=lambda *a: None, open_port=opener)
+        )
+
+    threads = [
+        threading.Thread(target=worker, args=(i, p)) for i, p in enumerate(ports)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def run_slots(ports, baud, prepared, opener, slots):
+    # 비교용: 슬롯을 잡은 뒤에 연결부터 시작
+    async def main():
+        semaphore = asyncio.Semaphore(slots)
+
+        async def one(port):
+            async with semaphore:
+                return await aio.flash_device(
+                    port, baud, prepared, log=lambda *a: None, open_port=opener
+                )
+
+        return await asyncio.gather(*[one(port) for port in ports])
+
+    return asyncio.run(main())
+
+
+def run_prefetch(ports, baud, prepared, opener, slots):
+    async def main():
+        station = aio.PrefetchStation(
+            baud, prepared, slots, log_factory=lambda port: lambda *a: None, open_port=opener
+        )
+        for port in ports:
+            station.submit(port)
+        results = await station.join()
+        return [results[port] for port in ports]
+
+    return asyncio.run(main())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="asyncio 전송 코어 벤치마크")
+    parser.add_argument("--devices", type=int, default=32)
+    parser.add_argument("--size", type=int, default=1024 * 1024, help="이미지 크기 (바이트)")
+    parser.add_argument("--baud", type=int, default=921600)
+    parser.add_argument(
+        "--mode", choices=("aio", "threads", "slots", "prefetch"), default="aio"
+    )
+    parser.add_argument("--slots", type=int, default=2, help="동시 전송 수 (slots/prefetch)")
+    parser.add_argument(
+        "--sync-delay", type=float, default=0.0, help="가상 장치 SYNC 응답 지연 (초)"
+    )
+    parser.add_argument(
+        "--blank", type=float, default=0.0, help="이미지 끝을 0xFF 로 채울 비율 (0~1)"
+    )
+    args = parser.parse_args()
+
+    parent, child = multiprocessing.Pipe()
+    sim = multiprocessing.Process(
+        target=simulator_main, args=(child, args.baud, args.sync_delay), daemon=True
+    )
+    sim.start()
+    tcp_port = parent.recv()
+
+    image_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".bench_image.bin")
+    with open(image_path, "wb") as f:
+        f.write(make_image(args.size, args.blank))
+    try:
+        prepared = aio.prepare_regions([FlashRegion("Firmware", 0x10000, args.size, image_path)])
+        ports = [f"SIM{i}" for i in range(args.devices)]
+        runner = {
+            "aio": run_aio,
+            "threads": run_threads,
+            "slots": lambda *a: run_slots(*a, args.slots),
+            "prefetch": lambda *a: run_prefetch(*a, args.slots),
+        }[args.mode]
+
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        with ThreadSampler() as sampler:
+            results = runner(ports, args.baud, prepared, make_opener(tcp_port))
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+    finally:
+        os.remove(image_path)
+        sim.terminate()
+    compressed_size = len(prepared[0].compressed)
+    skipped = prepared[0].skipped
+    for item in prepared:
+        item.release()
+
+    ok = sum(1 for r in results if r.success)
+    total_bytes = args.size * args.devices
+    print(f"모드            : {args.mode}")
+    print(f"장치            : {args.devices} (성공 {ok})")
+    print(f"이미지          : {args.size} 바이트, 압축 {compressed_size} 바이트")
+    print(f"0xFF 생략       : {skipped} 바이트")
+    print(f"소요 시간       : {wall:.2f} 초")
+    print(f"CPU 시간        : {cpu:.2f} 초 ({100 * cpu / wall:.0f}% of one core)")
+    print(f"최대 스레드 수  : {sampler.peak} (측정 스레드 포함)")
+    print(f"처리량          : {total_bytes / wall / 1e6:.2f} MB/s")
+    for r in results:
+        if not r.success:
+            print(f"  {r.port}: {r.error}")
+
+
+if __name__ == "__main__":
+    main()
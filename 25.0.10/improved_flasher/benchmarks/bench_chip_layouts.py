@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+여러 칩을 섞은 스테이션 자체 검사
+칩별 이미지 묶음(profiles/esp32, profiles/esp32s3, profiles/esp32c3, profile.json 없음)을 만들고
+ESP32 / ESP32-S3 / ESP32-C3 가상 ROM 장치를 섞어서 asyncio 전송으로 한 번에 업로드한다.
+  - 연결할 때 판별한 칩으로 프로필을 고름 (이미지 헤더의 chip id 기준)
+  - 부트로더는 칩별 위치(ESP32 0x1000, S3/C3 0x0)에, 앱은 파티션 테이블 위치에 쓰임
+  - ESP32 ROM 의 쓰기 시작 명령은 암호화 항목 없이 보냄 (가상 장치가 길이 확인)
+  - esptool 경로(FlashJob)도 같은 표에서 --chip 이름과 부트로더 위치를 가져옴
+
+    python benchmarks/bench_chip_layouts.py --devices 9
+"""
+
+import argparse
+import asyncio
+import hashlib
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import aio_transport as aio  # noqa: E402
+from bench_aio_transport import SimulatedRom, make_image, make_opener  # noqa: E402
+from chip_layouts import CHIP_LAYOUTS, image_layout, layout_for  # noqa: E402
+from flash_job import FlashJob  # noqa: E402
+from partition_table import MD5_MAGIC, PARTITION_TABLE_MAX_SIZE  # noqa: E402
+from profiles import ProfileError, ProfileSet  # noqa: E402
+
+CHIPS = ["ESP32", "ESP32-S3", "ESP32-C3"]
+APP_OFFSET = 0x10000
+
+
+def make_app_image(chip_id, size):
+    """헤더/세그먼트/체크섬이 맞는 ESP 앱 이미지 (image_check 검사 통과)"""
+    data = make_image(size)
+    header = struct.pack("<BBBBI", 0xE9, 1, 2, 0x20, 0x40080000)
+    header += struct.pack("<B3sHB2H4xB", 0xEE, bytes(3), chip_id, 0, 0, 0xFFFF, 0)
+    body = header + struct.pack("<II", 0x3FFB0000, len(data)) + data
+    checksum = 0xEF
+    for b in data:
+        checksum ^= b
+    body += b"\x00" * (15 - len(body) % 16)
+    return body + bytes([checksum])
+
+
+def make_partition_table():
+    entries = [
+        (0x01, 0x02, 0x9000, 0x6000, b"nvs"),
+        (0x01, 0x01, 0xF000, 0x1000, b"phy_init"),
+        (0x00, 0x00, APP_OFFSET, 0x100000, b"factory"),
+    ]
+    table = b"".join(
+        b"\xaa\x50" + struct.pack("<BBII", t, s, off, size) + name.ljust(16, b"\x00") + bytes(4)
+        for t, s, off, size, name in entries
+    )
+    table += MD5_MAGIC + hashlib.md5(table).digest()
+    return table + b"\xff" * (PARTITION_TABLE_MAX_SIZE - len(table))
+
+
+def make_profiles(root, size):
+    images = {}
+    for chip in CHIPS:
+        layout = layout_for(chip)
+        directory = os.path.join(root, "profiles", layout.esptool_name)
+        os.makedirs(directory)
+        files = {
+            "bootloader.bin": make_app_image(layout.image_chip_id, 16 * 1024),
+            "partitions.bin": make_partition_table(),
+            "firmware.bin": make_app_image(layout.image_chip_id, size),
+        }
+        for name, data in files.items():
+            with open(os.path.join(directory, name), "wb") as f:
+                f.write(data)
+        images[chip] = files
+    return images
+
+
+async def flash_gang(args, profiles, plans):
+    """칩별 가상 장치 서버를 띄우고 섞어서 업로드"""
+    servers = {}
+    devices = {}
+    for chip in CHIPS:
+
+        def factory(reader, writer, chip=chip):
+            rom = SimulatedRom(reader, writer, args.baud, chip=chip)
+            devices.setdefault(chip, []).append(rom)
+            return rom.run()
+
+        servers[chip] = await asyncio.start_server(factory, "127.0.0.1", 0)
+
+    ports = {f"SIM{i}": CHIPS[i % len(CHIPS)] for i in range(args.devices)}
+    openers = {chip: make_opener(s.sockets[0].getsockname()[1]) for chip, s in servers.items()}
+
+    async def open_port(port, baud):
+        return await openers[ports[port]](port, baud)
+
+    regions = {name: plan.regions for name, plan in plans.items()}
+    prepared = await aio._prepare_all(regions, 6)
+    chips_seen = {}
+    try:
+        station = aio.PrefetchStation(
+            args.baud,
+            prepared,
+            args.slots,
+            log_factory=lambda port: lambda *a: None,
+            on_result=lambda result, info: chips_seen.update({result.port: info.get("chip")}),
+            open_port=open_port,
+            profiles=profiles,
+        )
+        started = time.perf_counter()
+        for port in ports:
+            station.submit(port)
+        results = await station.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        aio._release_all(prepared)
+        for server in servers.values():
+            server.close()
+    return ports, devices, results, chips_seen, elapsed
+
+
+def check_esptool_path(profiles):
+    """FlashJob 의 --chip 이름과 부트로더 위치 (esptool 은 실행하지 않음)"""
+    for chip in CHIPS:
+        layout = layout_for(chip)
+        job = FlashJob("SIM", 921600, None, None, None, profiles=profiles, log=lambda *a: None)
+        job.device_info = {"chip": f"{chip} (revision v0.0)"}
+        job.select_profile()
+        job.layout = job.chip_layout()
+        plan = job.build_flash_plan()
+        assert job.layout is layout and job.profile.name == layout.esptool_name
+        assert plan.region("Bootloader").offset == layout.bootloader_offset
+        assert plan.region("Firmware").offset == APP_OFFSET
+    print("esptool 경로: 칩별 --chip 이름과 부트로더 위치 확인")
+
+
+def check(args):
+    # 표의 칩 판별 값/이미지 id 가 겹치지 않아야 함
+    magics = [m for layout in CHIP_LAYOUTS for m in layout.magic_values]
+    assert len(magics) == len(set(magics))
+    assert len({layout.image_chip_id for layout in CHIP_LAYOUTS}) == len(CHIP_LAYOUTS)
+
+    root = tempfile.mkdtemp(prefix="chips_")
+    try:
+        images = make_profiles(root, args.size)
+        profiles = ProfileSet.load(root)
+        errors = profiles.preload()
+        assert not errors, errors
+        assert profiles.chips == sorted(CHIPS), profiles.chips
+        for profile in profiles:
+            assert image_layout(profile.firmware_path) is profile.layout
+
+        plans = profiles.plans()
+        ports, devices, results, chips_seen, elapsed = asyncio.run(
+            flash_gang(args, profiles, plans)
+        )
+        for port, chip in ports.items():
+            assert results[port].success, f"{port} ({chip}): {results[port].error}"
+            assert chips_seen[port] == chip, (port, chips_seen[port], chip)
+        for chip, roms in devices.items():
+            layout = layout_for(chip)
+            files = images[chip]
+            bootloader = files["bootloader.bin"]
+            firmware = files["firmware.bin"]
+            for rom in roms:
+                assert rom.read(layout.bootloader_offset, len(bootloader)) == bootloader, chip
+                assert rom.read(APP_OFFSET, len(firmware)) == firmware, chip
+        counts = {chip: len(roms) for chip, roms in devices.items()}
+        print(f"장치 {len(ports)}대 {counts}: 칩별 프로필/부트로더 위치로 모두 업로드 ({elapsed:.2f}초)")
+
+        check_esptool_path(profiles)
+
+        # 한 칩용 이미지만 있는 스테이션에 다른 칩 보드가 연결되면 쓰지 않음
+        single = ProfileSet([next(p for p in profiles if p.layout.name == "ESP32-S3")])
+        try:
+            single.select({"chip": "ESP32"})
+            raise AssertionError("다른 칩 보드에 이미지를 씀")
+        except ProfileError:
+            pass
+        print("다른 칩 보드: 프로필 선택 단계에서 거부")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="여러 칩을 섞은 스테이션 자체 검사")
+    parser.add_argument("--devices", type=int, default=9)
+    parser.add_argument("--slots", type=int, default=4)
+    parser.add_argument("--size", type=int, default=128 * 1024)
+    parser.add_argument("--baud", type=int, default=2000000)
+    args = parser.parse_args()
+    check(args)
+
+
+if __name__ == "__main__":
+    main()
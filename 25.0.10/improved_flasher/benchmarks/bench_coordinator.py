@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+코디네이터 자체 검사 (localhost)
+코디네이터 하나와 스테이션 여러 개(스레드, 캐시 폴더 따로)를 띄워서 확인한다.
+  - 처음 동기화는 이미지를 받고, 두 번째는 하나도 받지 않음
+  - 결과가 빠짐/중복 없이 코디네이터 DB 에 모임
+  - 코디네이터가 꺼져도 캐시된 묶음으로 계속하고, 결과는 쌓였다가 재시작 후 전달됨
+  - 이미지가 바뀌면 스테이션이 새 묶음을 알아챔
+
+    python benchmarks/bench_coordinator.py --stations 8 --results 50
+"""
+
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import coordinator  # noqa: E402
+from flash_core import SessionResult  # noqa: E402
+from history_db import HistoryWriter  # noqa: E402
+
+
+def make_images(path, size):
+    os.makedirs(path)
+    for name, length in (
+        ("bootloader.bin", 20 * 1024),
+        ("partitions.bin", 3 * 1024),
+        ("firmware.bin", size),
+    ):
+        with open(os.path.join(path, name), "wb") as f:
+            f.write(os.urandom(length))
+    with open(os.path.join(path, "device_data.json"), "w", encoding="utf-8") as f:
+        f.write('{"partition": "nvs"}\n')
+    # 숨김 파일은 묶음에 들어가면 안 됨
+    with open(os.path.join(path, ".DS_Store"), "wb") as f:
+        f.write(b"x")
+
+
+def fake_result(station, n):
+    result = SessionResult(f"{station}-COM{n % 16}")
+    result.success = n % 7 != 0
+    result.cause = None if result.success else "verify"
+    result.attempts = 1
+    result.duration = 12.5
+    return result
+
+
+def record_results(station, cache_root, url, count, history_path):
+    """스테이션 하나: 동기화 → 결과 count 건 기록 → 종료"""
+    cache = coordinator.ContentCache(cache_root)
+    image_dir, client, uploader = coordinator.connect_station(url, station, cache=cache)
+    history = HistoryWriter(history_path, station, forward=uploader.submit)
+    for n in range(count):
+        history.record_result(fake_result(station, n), client.manifest["manifest_hash"])
+    history.close(10)
+    uploader.close(10)
+    return image_dir, client, uploader
+
+
+def count_rows(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return dict(conn.execute("SELECT station, COUNT(*) FROM sessions GROUP BY station"))
+    finally:
+        conn.close()
+
+
+def check(args):
+    tmp = tempfile.mkdtemp(prefix="coordinator_")
+    try:
+        images = os.path.join(tmp, "release")
+        make_images(images, args.size)
+        db_path = os.path.join(tmp, "coordinator.sqlite3")
+        server = coordinator.CoordinatorServer(
+            coordinator.Coordinator(images, db_path), port=0, host="127.0.0.1"
+        ).start()
+        url = server.url
+        port = server.server.server_address[1]
+        manifest = server.coordinator.manifest()
+        assert sorted(manifest["files"]) == [
+            "bootloader.bin",
+            "device_data.json",
+            "firmware.bin",
+            "partitions.bin",
+        ], manifest["files"]
+        set_size = sum(f["size"] for f in manifest["files"].values())
+
+        # 1. 스테이션 여러 대가 동시에 동기화 + 결과 전송
+        stations = [f"station{i:02d}" for i in range(args.stations)]
+        caches = {s: os.path.join(tmp, "cache", s) for s in stations}
+        clients = {}
+        errors = []
+
+        def worker(station):
+            try:
+                image_dir, client, _ = record_results(
+                    station,
+                    caches[station],
+                    url,
+                    args.results,
+                    os.path.join(tmp, f"{station}.sqlite3"),
+                )
+                for name in manifest["files"]:
+                    with open(os.path.join(images, name), "rb") as a, open(
+                        os.path.join(image_dir, name), "rb"
+                    ) as b:
+                        assert a.read() == b.read(), f"{station}: {name} 내용 다름"
+                clients[station] = client
+            except Exception as e:
+                errors.append(f"{station}: {e!r}")
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker, args=(s,)) for s in stations]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        assert not errors, errors
+        assert all(c.downloaded == set_size for c in clients.values())
+        rows = count_rows(db_path)
+        assert rows == {s: args.results for s in stations}, rows
+        workers = server.coordinator.workers()
+        assert [w["station"] for w in workers] == stations
+        assert all(w["results"] == args.results for w in workers), workers
+        print(
+            f"스테이션 {args.stations}대 동기화 + 결과 {args.stations * args.results}건 전송:"
+            f" {elapsed:.2f}초 (묶음 {set_size // 1024}KB/대)"
+        )
+
+        # 2. 같은 묶음으로 다시 시작하면 아무것도 받지 않음
+        station = stations[0]
+        client = coordinator.StationClient(url, station, coordinator.ContentCache(caches[station]))
+        client.sync()
+        assert client.downloaded == 0 and client.online
+        print("다시 동기화: 받은 바이트 0 (캐시 사용)")
+
+        # 3. 코디네이터 정지 → 캐시된 묶음으로 계속 + 결과는 쌓임
+        server.stop()
+        image_dir, client, uploader = record_results(
+            station, caches[station], url, args.results, os.path.join(tmp, "offline.sqlite3")
+        )
+        assert not client.online
+        assert image_dir == client.cache.set_dir(manifest)
+        assert len(uploader.pending) == args.results, len(uploader.pending)
+        try:
+            coordinator.StationClient(
+                url, "new", coordinator.ContentCache(os.path.join(tmp, "cache", "new"))
+            ).sync()
+            raise AssertionError("캐시 없는 스테이션이 오프라인에서 시작됨")
+        except coordinator.CoordinatorError:
+            pass
+        print(f"코디네이터 정지 중: 캐시된 묶음 사용, 결과 {args.results}건 대기")
+
+        # 4. 이미지 변경 후 같은 주소로 재시작 → 쌓인 결과 전달 + 새 묶음 알림
+        with open(os.path.join(images, "firmware.bin"), "ab") as f:
+            f.write(b"\x00" * 16)
+        server = coordinator.CoordinatorServer(
+            coordinator.Coordinator(images, db_path), port=port, host="127.0.0.1"
+        ).start()
+        client = coordinator.StationClient(url, station, coordinator.ContentCache(caches[station]))
+        client.manifest = manifest
+        uploader = coordinator.ResultUploader(client)
+        uploader.close(10)
+        assert not uploader.pending and not uploader._load_spool()
+        assert uploader.update_available
+        rows = count_rows(db_path)
+        assert rows[station] == 2 * args.results, rows
+
+        # 같은 결과를 다시 보내도 한 번만 저장됨
+        uids = [uid for (uid,) in server.coordinator.conn.execute("SELECT uid FROM received LIMIT 5")]
+        added = client.send_results([{"uid": uid, "station": station} for uid in uids])
+        assert added == 0, added
+        assert count_rows(db_path)[station] == 2 * args.results
+
+        client.sync()
+        assert client.downloaded == os.path.getsize(os.path.join(images, "firmware.bin"))
+        server.stop()
+        print("재시작 후: 쌓인 결과 전달, 재전송 중복 없음, 새 묶음에서 바뀐 이미지만 받음")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="코디네이터 자체 검사")
+    parser.add_argument("--stations", type=int, default=8)
+    parser.add_argument("--results", type=int, default=50, help="스테이션마다 기록할 결과 수")
+    parser.add_argument("--size", type=int, default=2 * 1024 * 1024, help="firmware.bin 크기")
+    args = parser.parse_args()
+    check(args)
+
+
+if __name__ == "__main__":
+    main()
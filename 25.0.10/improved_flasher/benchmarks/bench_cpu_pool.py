@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+프로세스 풀 벤치마크
+이미지 N 개의 압축/해시(0xFF 구간 분류, 압축 수준 표본 포함)를 스레드와 프로세스 풀에서 각각
+실행하면서 UI 루프를 흉내 낸 10ms 타이머가 얼마나 늦게 깨어나는지 측정한다.
+프로세스 풀 결과는 실제 업로드와 같이 부모가 만든 공유 메모리로 돌려받는다.
+
+    python benchmarks/bench_cpu_pool.py --jobs 16
+"""
+
+import argparse
+import concurrent.futures
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cpu_pool import CpuPool, compress_parts  # noqa: E402
+
+TICK = 0.01
+
+
+def make_image(size, seed):
+    """압축률이 중간 정도이고 중간에 0xFF 섹터가 섞인 이미지"""
+    rng = random.Random(seed)
+    blocks = []
+    for i in range(size // 4096):
+        if i % 7 == 3:
+            blocks.append(b"\xff" * 4096)
+        else:
+            blocks.append(rng.randbytes(2048) + bytes(2048))
+    return b"".join(blocks)
+
+
+def compress_file(path):
+    with open(path, "rb") as f:
+        parts, _ = compress_parts(f.read(), 9, True)
+    return sum(len(p) for p in parts)
+
+
+class TickMonitor:
+    """UI 루프처럼 10ms 마다 깨어나서 지연을 기록"""
+
+    def __init__(self):
+        self.worst = 0.0
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            start = time.perf_counter()
+            time.sleep(TICK)
+            self.worst = max(self.worst, time.perf_counter() - start - TICK)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop_event.set()
+        self.thread.join()
+
+
+def run_threads(paths, workers):
+    with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+        return list(executor.map(compress_file, paths))
+
+
+def run_processes(pool, paths):
+    futures = [pool.compress(path, 9, skip_erased=True) for path in paths]
+    sizes = []
+    for future in futures:
+        with future.result() as buffer:
+            sizes.append(len(buffer))
+    return sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="프로세스 풀 벤치마크")
+    parser.add_argument("--jobs", type=int, default=16)
+    parser.add_argument("--size", type=int, default=1024 * 1024)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="cpu_pool_")
+    pool = CpuPool(args.workers)
+    try:
+        paths = []
+        for seed in range(args.jobs):
+            path = os.path.join(tmp, f"image{seed}.bin")
+            with open(path, "wb") as f:
+                f.write(make_image(args.size, seed))
+            paths.append(path)
+        # 작업 프로세스 시작 시간은 측정에서 제외
+        run_processes(pool, paths[: args.workers])
+
+        sizes = {}
+        for name, runner in (
+            ("threads", lambda: run_threads(paths, args.workers)),
+            ("processes", lambda: run_processes(pool, paths)),
+        ):
+            start = time.perf_counter()
+            with TickMonitor() as monitor:
+                sizes[name] = runner()
+            wall = time.perf_counter() - start
+            print(
+                f"{name:10s}: {wall:6.2f} 초, "
+                f"UI 타이머 최대 지연 {monitor.worst * 1000:6.1f} ms"
+            )
+        # 공유 메모리로 받은 결과가 스레드에서 바로 압축한 크기와 같아야 함
+        assert sizes["threads"] == sizes["processes"], sizes
+    finally:
+        pool.shutdown()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OTA 일괄 업데이트 자체 검사 (localhost 가상 장치)
+ota_push.py 의 장치 쪽 약속을 따르는 가상 장치(tests/ota_device.py 의 StandInDevice)를
+여러 대 띄워서 확인한다.
+  - 정상 장치는 Range 로 나눠 받고, 중간에 끊긴 장치는 이어받아서 모두 성공
+  - 요청 거부 / 응답 없음 / 받다 멈춤 / 해시 불일치 / 재시작 후 옛 이미지 는 원인별로 실패
+  - 장치들이 동시에 받으므로 전체 시간이 한 대씩 할 때보다 짧음
+  - 모니터링 지표의 쓴 바이트/결과 수가 세션 결과와 맞음
+
+    python benchmarks/bench_ota_push.py --devices 40 --slots 16
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "tests"))
+
+import metrics  # noqa: E402
+import ota_push  # noqa: E402
+from ota_device import BEHAVIORS, StandInDevice  # noqa: E402
+
+
+async def run(args, image_path, image):
+    behaviors = list(BEHAVIORS)
+    kinds = [behaviors[i % len(behaviors)] if i < 2 * len(behaviors) else "ok" for i in range(args.devices)]
+    devices = [
+        await StandInDevice(kind, args.rate, args.chunk, args.reboot_delay).start() for kind in kinds
+    ]
+    targets = [f"127.0.0.1:{d.port}" for d in devices]
+    progress_seen = {t: [] for t in targets}
+
+    def progress_factory(target):
+        return lambda percent, text: progress_seen[target].append(percent)
+
+    def log_factory(target):
+        if args.verbose:
+            return lambda message, level="INFO": print(f"[{level}] [{target}] {message}")
+        return lambda message, level="INFO": None
+
+    started = time.perf_counter()
+    try:
+        results = await ota_push.push_devices(
+            targets,
+            image_path,
+            slots=args.slots,
+            log_factory=log_factory,
+            progress_factory=progress_factory,
+            server_port=0,
+            advertise="127.0.0.1",
+            listen="127.0.0.1",
+        )
+    finally:
+        for device in devices:
+            await device.stop()
+    elapsed = time.perf_counter() - started
+    return devices, kinds, targets, results, progress_seen, elapsed
+
+
+def check(args):
+    # 지연 시간을 줄여서 실패 경로도 빨리 확인
+    ota_push.FIRST_BYTE_TIMEOUT = 2.0
+    ota_push.DOWNLOAD_STALL_TIMEOUT = 2.0
+    ota_push.BOOT_TIMEOUT = 3.0
+    ota_push.BOOT_POLL_INTERVAL = 0.1
+
+    tmp = tempfile.mkdtemp(prefix="ota_")
+    try:
+        image_path = os.path.join(tmp, "firmware.bin")
+        with open(image_path, "wb") as f:
+            f.write(os.urandom(args.size))
+        image = ota_push.OtaImage(image_path)
+        bytes_before = sum(
+            v for _, labels, v in metrics.BYTES_WRITTEN.samples() if "ota:" in labels
+        )
+        devices, kinds, targets, results, progress_seen, elapsed = asyncio.run(
+            run(args, image_path, image)
+        )
+
+        for device, kind, target, result in zip(devices, kinds, targets, results):
+            expected = BEHAVIORS[kind]
+            if expected is None:
+                assert result.success, f"{target} ({kind}): {result.error}"
+                assert device.image_sha256 == image.sha256
+                assert progress_seen[target][-1] == 100
+                assert progress_seen[target] == sorted(progress_seen[target]), kind
+            else:
+                assert not result.success, f"{target} ({kind}) 성공하면 안 됨"
+                assert result.cause == expected, f"{kind}: {result.cause} != {expected} ({result.error})"
+        drops = [d for d, k in zip(devices, kinds) if k == "drop"]
+        assert all(d.range_requests > -(-args.size // args.chunk) for d in drops)
+
+        ok = sum(r.success for r in results)
+        bytes_after = sum(
+            v for _, labels, v in metrics.BYTES_WRITTEN.samples() if "ota:" in labels
+        )
+        sent = bytes_after - bytes_before
+        # 성공 장치는 이미지 전체, 끊긴 장치는 다시 받은 만큼 더
+        assert sent >= ok * args.size, (sent, ok * args.size)
+        flashed = sum(v for _, _, v in metrics.BOARDS_FLASHED.samples())
+        assert flashed == ok, (flashed, ok)
+
+        serial_estimate = ok * (args.size / args.rate + args.reboot_delay)
+        print(
+            f"장치 {args.devices}대 (동시 {args.slots}), 이미지 {args.size // 1024}KB,"
+            f" 장치당 {args.rate / 1e6:.1f}MB/s: {elapsed:.2f}초"
+        )
+        print(
+            f"성공 {ok}대, 실패 원인: "
+            + ", ".join(f"{k}={r.cause}" for k, r in zip(kinds, results) if not r.success)
+        )
+        print(f"한 대씩 했다면 약 {serial_estimate:.1f}초 (x{serial_estimate / elapsed:.1f})")
+        print(f"서버가 보낸 바이트 {sent} (성공 장치 이미지 합 {ok * args.size})")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OTA 일괄 업데이트 자체 검사")
+    parser.add_argument("--devices", type=int, default=40)
+    parser.add_argument("--slots", type=int, default=16)
+    parser.add_argument("--size", type=int, default=1024 * 1024, help="firmware.bin 크기")
+    parser.add_argument("--rate", type=float, default=2e6, help="장치당 받는 속도 (바이트/초)")
+    parser.add_argument("--chunk", type=int, default=256 * 1024, help="장치의 Range 요청 크기")
+    parser.add_argument("--reboot-delay", type=float, default=0.5)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+    check(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+펌웨어 프로필 자동 선택 자체 검사
+eFuse 값이 다른 가상 ESP32-S3 장치를 섞어서 asyncio 전송으로 한 번에 업로드하고,
+장치마다 맞는 프로필의 이미지가 쓰였는지 가상 플래시 내용으로 확인한다.
+프로필 이미지는 시작할 때 한 번만 압축하므로 보드가 바뀌어도 추가 준비 시간이 없다.
+
+    python benchmarks/bench_profiles.py --devices 12
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import aio_transport as aio  # noqa: E402
+from bench_aio_transport import SimulatedRom, make_image, make_opener  # noqa: E402
+from partition_table import FlashRegion  # noqa: E402
+from profiles import FirmwareProfile, ProfileError, ProfileSet  # noqa: E402
+
+# 보드 변형을 구분하는 eFuse 레지스터 (가상 장치)
+VARIANT_REG = 0x6000705C
+VARIANT_MASK = 0x000F0000
+FIRMWARE_OFFSET = 0x10000
+
+
+def check_selection():
+    """선택 규칙: 조건 수 → priority → 이름 순, 읽지 못한 값은 불일치"""
+    base = tempfile.gettempdir()
+    profiles = ProfileSet(
+        [
+            FirmwareProfile("any", base),
+            FirmwareProfile("s3", base, match={"chip": ["ESP32-S3", "ESP32-S2"]}),
+            FirmwareProfile("s3-16mb", base, match={"chip": "esp32-s3", "flash_size": "16MB"}),
+            FirmwareProfile("lab", base, match={"mac_prefix": "7c:df"}, priority=5),
+            FirmwareProfile(
+                "rev1", base, match={"efuse": {hex(VARIANT_REG): {"mask": "0xf0000", "value": "0x10000"}}}
+            ),
+        ]
+    )
+    s3 = {"chip": "ESP32-S3", "mac": "aa:bb:cc:00:00:01"}
+    assert profiles.select(s3).name == "s3"
+    assert profiles.select(dict(s3, flash_size="16MB")).name == "s3-16mb"
+    # 조건 수가 같으면 priority
+    assert profiles.select({"chip": "ESP32-C3", "mac": "7c:df:a1:00:00:01"}).name == "lab"
+    assert profiles.select(dict(s3, mac="7c:df:a1:00:00:01")).name == "lab"
+    assert profiles.select({"chip": "ESP32-C3", "efuse": {VARIANT_REG: 0x12345}}).name == "rev1"
+    # eFuse 를 읽지 않았으면 해당 프로필은 제외
+    assert profiles.select({"chip": "ESP32-C3"}).name == "any"
+    assert profiles.efuse_regs == [VARIANT_REG]
+
+    strict = ProfileSet([FirmwareProfile("s3", base, match={"chip": "ESP32-S3"})])
+    assert strict.needs_device_info
+    try:
+        strict.select({"chip": "ESP32"})
+        raise AssertionError("맞지 않는 보드에 프로필이 선택됨")
+    except ProfileError:
+        pass
+    assert not ProfileSet([FirmwareProfile("default", base)]).needs_device_info
+    try:
+        FirmwareProfile("bad", base, match={"board": "x"})
+        raise AssertionError("알 수 없는 조건을 받아들임")
+    except ProfileError:
+        pass
+    print("선택 규칙 검사 통과")
+
+
+async def flash_mixed(args, profiles, images):
+    """변형별 가상 장치 서버를 띄우고 섞어서 업로드"""
+    variants = {"rev0": 0x00000, "rev1": 0x10000, "rev7": 0x70000}
+    servers = {}
+    devices = {}
+
+    for name, value in variants.items():
+
+        def factory(reader, writer, name=name, value=value):
+            rom = SimulatedRom(reader, writer, args.baud)
+            rom.registers[VARIANT_REG] = value | 0x1234
+            devices.setdefault(name, []).append(rom)
+            return rom.run()
+
+        servers[name] = await asyncio.start_server(factory, "127.0.0.1", 0)
+
+    ports = {f"SIM{i}": list(variants)[i % len(variants)] for i in range(args.devices)}
+    openers = {
+        name: make_opener(server.sockets[0].getsockname()[1]) for name, server in servers.items()
+    }
+
+    async def open_port(port, baud):
+        return await openers[ports[port]](port, baud)
+
+    regions = {
+        name: [FlashRegion("Firmware", FIRMWARE_OFFSET, len(data), path)]
+        for name, (path, data) in images.items()
+    }
+    started = time.perf_counter()
+    prepared = await aio._prepare_all(regions, 6)
+    prepare_time = time.perf_counter() - started
+    results = {}
+    try:
+        station = aio.PrefetchStation(
+            args.baud,
+            prepared,
+            args.slots,
+            log_factory=lambda port: lambda *a: None,
+            open_port=open_port,
+            profiles=profiles,
+        )
+        started = time.perf_counter()
+        for port in ports:
+            station.submit(port)
+        results = await station.join()
+        flash_time = time.perf_counter() - started
+    finally:
+        aio._release_all(prepared)
+        for server in servers.values():
+            server.close()
+    return ports, devices, results, prepare_time, flash_time
+
+
+def check_flash(args):
+    tmp = tempfile.mkdtemp(prefix="profiles_")
+    try:
+        images = {}
+        for name in ("rev0", "rev1", "generic"):
+            data = make_image(args.size)
+            path = os.path.join(tmp, f"{name}.bin")
+            with open(path, "wb") as f:
+                f.write(data)
+            images[name] = (path, data)
+
+        def efuse(value):
+            return {"efuse": {hex(VARIANT_REG): {"mask": hex(VARIANT_MASK), "value": hex(value)}}}
+
+        profiles = ProfileSet(
+            [
+                FirmwareProfile("rev0", tmp, match=dict(efuse(0x00000), chip="ESP32-S3")),
+                FirmwareProfile("rev1", tmp, match=dict(efuse(0x10000), chip="ESP32-S3")),
+                FirmwareProfile("generic", tmp, match={"chip": "ESP32-S3"}),
+            ]
+        )
+        expected = {"rev0": "rev0", "rev1": "rev1", "rev7": "generic"}
+        ports, devices, results, prepare_time, flash_time = asyncio.run(
+            flash_mixed(args, profiles, images)
+        )
+        for port, variant in ports.items():
+            assert results[port].success, f"{port} ({variant}): {results[port].error}"
+        for variant, roms in devices.items():
+            data = images[expected[variant]][1]
+            for rom in roms:
+                assert rom.read(FIRMWARE_OFFSET, len(data)) == data, f"{variant}: 다른 프로필 이미지가 쓰임"
+        counts = {v: len(r) for v, r in devices.items()}
+        print(
+            f"장치 {len(ports)}대 (변형별 {counts}), 모두 맞는 프로필로 업로드"
+            f" - 프로필 3개 미리 압축 {prepare_time:.2f}초, 업로드 {flash_time:.2f}초"
+        )
+
+        # 맞는 프로필이 없는 보드는 연결 단계에서 "profile" 원인으로 실패
+        strict = ProfileSet([FirmwareProfile("rev0", tmp, match=efuse(0x00000))])
+        args_few = argparse.Namespace(**dict(vars(args), devices=3))
+        ports, _, results, _, _ = asyncio.run(
+            flash_mixed(args_few, strict, {"rev0": images["rev0"]})
+        )
+        causes = {ports[p]: results[p].cause for p in ports}
+        assert results["SIM0"].success, results["SIM0"].error
+        assert causes["rev1"] == "profile" and causes["rev7"] == "profile", causes
+        print("맞는 프로필이 없는 보드: 업로드하지 않고 실패 (원인 profile)")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="펌웨어 프로필 자동 선택 자체 검사")
+    parser.add_argument("--devices", type=int, default=9)
+    parser.add_argument("--slots", type=int, default=4)
+    parser.add_argument("--size", type=int, default=256 * 1024)
+    parser.add_argument("--baud", type=int, default=2000000)
+    args = parser.parse_args()
+    check_selection()
+    check_flash(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+프로파일링 자체 검사
+  - 꺼져 있을 때 span() 비용 (빈 with 문과 비교)
+  - 켜고 가상 ROM 장치 여러 대를 asyncio 전송으로 업로드하면서 작업 스레드도 돌린 뒤
+    저장한 Chrome trace JSON 을 검사 (구간/스택 샘플 두 프로세스, 스레드·장치 이름,
+    장치별 줄의 구간이 겹치지 않고 안쪽 구간이 바깥 구간 안에 들어가는지)
+  - 켰을 때 업로드 시간 차이
+
+    python benchmarks/bench_profiling.py --devices 4
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import aio_transport as aio  # noqa: E402
+import profiling  # noqa: E402
+from bench_aio_transport import SimulatedRom, make_image, make_opener  # noqa: E402
+from partition_table import FlashRegion  # noqa: E402
+
+FIRMWARE_OFFSET = 0x10000
+
+
+def measure_disabled_overhead(calls):
+    """꺼진 span() 한 번의 추가 비용 (ns)"""
+    assert not profiling.is_enabled()
+    null = contextlib.nullcontext()
+
+    def loop(make):
+        started = time.perf_counter_ns()
+        for _ in range(calls):
+            with make():
+                pass
+        return time.perf_counter_ns() - started
+
+    baseline = min(loop(lambda: null) for _ in range(3))
+    spans = min(loop(lambda: profiling.span("x", "bench", port="SIM0")) for _ in range(3))
+    per_call = max(0, spans - baseline) / calls
+    print(f"꺼진 span(): 호출당 추가 {per_call:.0f}ns (빈 with 문 대비, {calls}회)")
+    return per_call
+
+
+async def flash_all(args, path):
+    server = await asyncio.start_server(
+        lambda r, w: SimulatedRom(r, w, args.baud).run(), "127.0.0.1", 0
+    )
+    regions = [FlashRegion("Firmware", FIRMWARE_OFFSET, args.size, path)]
+    prepared = await aio._prepare_all(regions, 6)
+    try:
+        station = aio.PrefetchStation(
+            args.baud,
+            prepared,
+            args.slots,
+            log_factory=lambda port: lambda *a: None,
+            open_port=make_opener(server.sockets[0].getsockname()[1]),
+        )
+        started = time.perf_counter()
+        for i in range(args.devices):
+            station.submit(f"SIM{i}")
+        results = await station.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        aio._release_all(prepared)
+        server.close()
+    for port, result in results.items():
+        assert result.success, f"{port}: {result.error}"
+    return elapsed
+
+
+def busy_worker(stop):
+    """파이프라인 작업 스레드 흉내 (구간 + 샘플에 잡힐 계산)"""
+    while not stop.is_set():
+        with profiling.span("worker.step", "pipeline"):
+            sum(i * i for i in range(20000))
+
+
+def flash_with_workers(args, path):
+    """작업 스레드 2개를 함께 돌리면서 업로드 (걸린 시간 반환)"""
+    stop = threading.Event()
+    workers = [threading.Thread(target=busy_worker, args=(stop,), name=f"worker-{i}") for i in range(2)]
+    for t in workers:
+        t.start()
+    try:
+        return asyncio.run(flash_all(args, path))
+    finally:
+        stop.set()
+        for t in workers:
+            t.join()
+
+
+def check_nesting(events):
+    """같은 줄의 구간은 겹치지 않거나 완전히 안에 들어가야 함 (Chrome trace X 이벤트 규칙)"""
+    by_tid = {}
+    for e in events:
+        if e.get("ph") == "X":
+            by_tid.setdefault((e["pid"], e["tid"]), []).append(e)
+    for spans in by_tid.values():
+        spans.sort(key=lambda e: (e["ts"], -e["dur"]))
+        open_ends = []
+        for e in spans:
+            end = e["ts"] + e["dur"]
+            while open_ends and open_ends[-1] <= e["ts"] + 1e-3:
+                open_ends.pop()
+            if open_ends:
+                assert end <= open_ends[-1] + 1e-3, f"구간이 엇갈림: {e}"
+            open_ends.append(end)
+
+
+def check_trace(args, tmp, image_path, plain_time):
+    trace_path = os.path.join(tmp, "traces", "trace.json")
+    recorder = profiling.start(trace_path, args.interval / 1000.0)
+    try:
+        traced_time = flash_with_workers(args, image_path)
+    finally:
+        profiling.stop()
+    assert not profiling.is_enabled()
+    try:
+        profiling.stop()
+    except Exception as e:  # 두 번 멈춰도 오류 없어야 함
+        raise AssertionError(e)
+
+    with open(trace_path, encoding="utf-8") as f:
+        trace = json.load(f)
+    events = trace["traceEvents"]
+    spans = [e for e in events if e.get("ph") == "X" and e["pid"] == profiling.SPAN_PID]
+    samples = [e for e in events if e.get("ph") == "X" and e["pid"] == profiling.SAMPLE_PID]
+    names = {
+        e["args"]["name"] for e in events if e.get("ph") == "M" and e["name"] == "thread_name"
+    }
+    span_names = {e["name"] for e in spans}
+    assert {"aio.connect", "rom.block", "rom.md5", "worker.step"} <= span_names, span_names
+    assert samples, "스택 샘플이 없음"
+    assert {"worker-0", "worker-1", "MainThread"} <= names, names
+    assert {f"SIM{i}" for i in range(args.devices)} <= names, names
+    # 장치별 구간은 장치 줄에만 (이벤트 루프 스레드 줄에서 서로 엇갈리지 않게)
+    tracks = set(recorder.tracks.values())
+    assert all(e["tid"] in tracks for e in spans if e["name"].startswith("rom.")), "장치 구간이 스레드 줄에 기록됨"
+    assert any("busy_worker" in e["name"] for e in samples), "작업 스레드 스택이 샘플에 없음"
+    check_nesting(events)
+
+    other = trace["otherData"]
+    size_kb = os.path.getsize(trace_path) / 1024
+    print(
+        f"trace: 구간 {len(spans)}개, 샘플 프레임 {len(samples)}개, {size_kb:.0f}KB"
+        f" (샘플 {other['samples']}회, 샘플링 {other['sample_overhead_ms']}ms)"
+    )
+    print(recorder.summary())
+    print(
+        f"업로드 {args.devices}대: 끔 {plain_time:.2f}초, 켬 {traced_time:.2f}초"
+        f" ({(traced_time / plain_time - 1) * 100:+.0f}%, 작업 스레드 2개 동시 실행)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="프로파일링 자체 검사")
+    parser.add_argument("--devices", type=int, default=4)
+    parser.add_argument("--slots", type=int, default=4)
+    parser.add_argument("--size", type=int, default=512 * 1024)
+    parser.add_argument("--baud", type=int, default=2000000)
+    parser.add_argument("--interval", type=float, default=5.0, help="샘플링 주기 (ms)")
+    parser.add_argument("--calls", type=int, default=200000)
+    args = parser.parse_args()
+
+    measure_disabled_overhead(args.calls)
+    tmp = tempfile.mkdtemp(prefix="profiling_")
+    try:
+        image_path = os.path.join(tmp, "firmware.bin")
+        with open(image_path, "wb") as f:
+            f.write(make_image(args.size))
+        plain_time = flash_with_workers(args, image_path)
+        check_trace(args, tmp, image_path, plain_time)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
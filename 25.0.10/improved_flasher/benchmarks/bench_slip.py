@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SLIP 코덱 벤치마크
+slip.py 의 인코더/디코더를 예전 바이트 단위 루프 구현과 비교한다.
+무작위 왕복 검사는 tests/test_slip.py (같은 비교 기준 구현 사용).
+
+    python benchmarks/bench_slip.py
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import slip  # noqa: E402
+
+
+# ---------------------------------------------------------------------------
+# 비교 기준: 예전 바이트 단위 구현
+# ---------------------------------------------------------------------------
+
+
+def reference_encode(packet):
+    out = bytearray([slip.SLIP_END])
+    for b in packet:
+        if b == slip.SLIP_END:
+            out += bytes([slip.SLIP_ESC, slip.SLIP_ESC_END])
+        elif b == slip.SLIP_ESC:
+            out += bytes([slip.SLIP_ESC, slip.SLIP_ESC_ESC])
+        else:
+            out.append(b)
+    out.append(slip.SLIP_END)
+    return bytes(out)
+
+
+class ReferenceDecoder:
+    def __init__(self):
+        self.frame = bytearray()
+        self.in_frame = False
+        self.escape = False
+
+    def feed(self, data):
+        frames = []
+        for b in data:
+            if not self.in_frame:
+                if b == slip.SLIP_END:
+                    self.in_frame = True
+                continue
+            if self.escape:
+                self.escape = False
+                if b == slip.SLIP_ESC_END:
+                    self.frame.append(slip.SLIP_END)
+                elif b == slip.SLIP_ESC_ESC:
+                    self.frame.append(slip.SLIP_ESC)
+                else:
+                    self.frame = bytearray()
+                    self.in_frame = False
+                continue
+            if b == slip.SLIP_ESC:
+                self.escape = True
+            elif b == slip.SLIP_END:
+                if self.frame:
+                    frames.append(bytes(self.frame))
+                    self.frame = bytearray()
+            else:
+                self.frame.append(b)
+        return frames
+
+
+# ---------------------------------------------------------------------------
+# 벤치마크
+# ---------------------------------------------------------------------------
+
+
+def timed(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def bench(size, repeat):
+    # 압축된 펌웨어 블록처럼 무작위 데이터 (특수 바이트가 약 2/256)
+    blocks = [os.urandom(1024 + 16) for _ in range(size // 1024)]
+    stream = b"".join(slip.encode(block) for block in blocks)
+    total = sum(len(block) for block in blocks)
+
+    def decode_with(decoder_cls):
+        decoder = decoder_cls()
+        for pos in range(0, len(stream), 4096):
+            decoder.feed(stream[pos : pos + 4096])
+
+    rows = [
+        ("인코드", lambda: [reference_encode(b) for b in blocks], lambda: [slip.encode(b) for b in blocks]),
+        ("디코드", lambda: decode_with(ReferenceDecoder), lambda: decode_with(slip.SlipDecoder)),
+    ]
+    print(f"데이터 {total // 1024}KB ({len(blocks)} 블록), 최솟값 {repeat}회")
+    print(f"{'':8}{'바이트 루프':>14}{'slip.py':>14}{'배율':>8}")
+    for label, old, new in rows:
+        old_time = timed(old, repeat)
+        new_time = timed(new, repeat)
+        print(
+            f"{label:8}{total / old_time / 1e6:>11.1f}MB/s{total / new_time / 1e6:>11.1f}MB/s"
+            f"{old_time / new_time:>7.0f}x"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SLIP 코덱 벤치마크")
+    parser.add_argument("--size", type=int, default=4 * 1024 * 1024, help="벤치마크 데이터 크기")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    bench(args.size, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
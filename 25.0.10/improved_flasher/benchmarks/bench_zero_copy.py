@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+이미지 스트리밍 메모리/복사 벤치마크
+8MB 이미지를 16개 포트로 보낼 때의 메모리 사용량과 CPU 시간을 기존 방식과 비교한다.
+
+- 준비 단계 (작업 프로세스): 파일 전체 read + 압축 조각 join 후 공유 메모리 복사
+  vs mmap + 공유 메모리로 바로 복사
+- 전송 단계 (업로더 프로세스): 블록마다 헤더 이어 붙이기 + 바이트 단위 SLIP/체크섬 + bytes 복사
+  vs FrameEncoder 버퍼 재사용 + memoryview 그대로 os.write
+
+각 모드는 별도 프로세스에서 실행해서 최대 RSS 를 따로 잰다.
+mmap 으로 읽은 페이지는 페이지 캐시를 공유하므로 할당량(tracemalloc)에는 잡히지 않는다.
+
+    python benchmarks/bench_zero_copy.py
+    python benchmarks/bench_zero_copy.py --size 2097152 --ports 4
+"""
+
+import argparse
+import multiprocessing
+import os
+import resource
+import struct
+import sys
+import time
+import tracemalloc
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import aio_transport as aio  # noqa: E402
+import cpu_pool  # noqa: E402
+from block_filter import data_segments  # noqa: E402
+from image_check import ESP_CHECKSUM_MAGIC  # noqa: E402
+
+
+def _legacy_slip_encode(packet):
+    out = bytearray([0xC0])
+    for b in packet:
+        if b == 0xC0:
+            out += b"\xdb\xdc"
+        elif b == 0xDB:
+            out += b"\xdb\xdd"
+        else:
+            out.append(b)
+    out.append(0xC0)
+    return bytes(out)
+
+
+def _legacy_checksum(data, state=ESP_CHECKSUM_MAGIC):
+    for b in data:
+        state ^= b
+    return state
+
+
+def prepare_copy(path):
+    """기존 방식: 파일 전체를 읽고 압축 조각을 이어 붙인 뒤 공유 메모리로 복사"""
+    with open(path, "rb") as f:
+        data = f.read()
+    parts = [zlib.compress(data[a:b], 9) for a, b in data_segments(data)]
+    compressed = b"".join(parts)
+    buffer = cpu_pool.SharedBuffer(len(compressed))
+    return buffer.filled(cpu_pool._write_shared(buffer.name, [compressed]))
+
+
+def prepare_zero(path):
+    buffer = cpu_pool.SharedBuffer(cpu_pool.compress_bound(os.path.getsize(path), True))
+    return buffer.filled(*cpu_pool._compress_task(buffer.name, path, 9, True))
+
+
+def stream_copy(compressed, ports, sink):
+    """기존 방식: 블록마다 새 bytes 를 여러 번 만듦"""
+    view = memoryview(compressed)
+    for seq in range(0, len(view), aio.FLASH_WRITE_SIZE):
+        block = view[seq : seq + aio.FLASH_WRITE_SIZE]
+        for _ in range(ports):
+            header = struct.pack("<IIII", len(block), seq, 0, 0)
+            data = header + block
+            packet = struct.pack("<BBHI", 0, aio.ESP_FLASH_DEFL_DATA, len(data), _legacy_checksum(block)) + data
+            frame = _legacy_slip_encode(packet)
+            os.write(sink, bytes(memoryview(frame)))  # pyserial write 의 to_bytes 복사
+
+
+def stream_zero(compressed, ports, sink):
+    view = memoryview(compressed)
+    encoders = [aio.FrameEncoder() for _ in range(ports)]
+    header = bytearray(16)
+    for seq in range(0, len(view), aio.FLASH_WRITE_SIZE):
+        block = view[seq : seq + aio.FLASH_WRITE_SIZE]
+        chk = aio.checksum(block)
+        for encoder in encoders:
+            struct.pack_into("<IIII", header, 0, len(block), seq, 0, 0)
+            os.write(sink, encoder.encode(aio.ESP_FLASH_DEFL_DATA, (header, block), chk))
+
+
+def run_mode(mode, path, ports, conn):
+    prepare = prepare_copy if mode == "copy" else prepare_zero
+    stream = stream_copy if mode == "copy" else stream_zero
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    buffer = prepare(path)
+    prepare_time = time.perf_counter() - started
+    _, prepare_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    sink = os.open(os.devnull, os.O_WRONLY)
+    tracemalloc.start()
+    cpu = time.process_time()
+    stream(buffer.view, ports, sink)
+    cpu = time.process_time() - cpu
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    os.close(sink)
+    buffer.release()
+    conn.send(
+        {
+            "prepare_time": prepare_time,
+            "prepare_peak": prepare_peak,
+            "stream_cpu": cpu,
+            "stream_peak": peak,
+            "compressed": buffer.size,
+            "rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        }
+    )
+
+
+def make_image(size):
+    blocks = (os.urandom(1024) + bytes(1024) for _ in range(size // 2048 + 1))
+    return b"".join(blocks)[:size]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="이미지 스트리밍 메모리/복사 벤치마크")
+    parser.add_argument("--size", type=int, default=8 * 1024 * 1024)
+    parser.add_argument("--ports", type=int, default=16)
+    args = parser.parse_args()
+
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".bench_image.bin")
+    with open(path, "wb") as f:
+        f.write(make_image(args.size))
+    ctx = multiprocessing.get_context("spawn")
+    results = {}
+    try:
+        for mode in ("copy", "zero"):
+            parent, child = ctx.Pipe()
+            proc = ctx.Process(target=run_mode, args=(mode, path, args.ports, child))
+            proc.start()
+            results[mode] = parent.recv()
+            proc.join()
+    finally:
+        os.remove(path)
+
+    print(f"이미지 {args.size // 1024}KB, 압축 {results['zero']['compressed'] // 1024}KB, 포트 {args.ports}개")
+    print(f"{'':16}{'기존(copy)':>14}{'zero-copy':>14}")
+    rows = [
+        ("준비 시간(초)", "prepare_time", 1, "{:.2f}"),
+        ("준비 할당 최대(MB)", "prepare_peak", 1024 * 1024, "{:.1f}"),
+        ("전송 CPU(초)", "stream_cpu", 1, "{:.2f}"),
+        ("전송 할당 최대(KB)", "stream_peak", 1024, "{:.1f}"),
+        ("최대 RSS(MB)", "rss", 1024, "{:.1f}"),
+    ]
+    for label, key, scale, fmt in rows:
+        copy = fmt.format(results["copy"][key] / scale)
+        zero = fmt.format(results["zero"][key] / scale)
+        print(f"{label:16}{copy:>14}{zero:>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+0xFF 블록 분류
+지운 플래시는 이미 0xFF 로 읽히므로 전부 0xFF 인 섹터와 이미지 끝의 채움 바이트는
+보내지 않아도 된다. 섹터마다 비교하지 않고 버퍼 전체를 find 로 검색해서 빈 구간 후보를 찾고
+그 자리에서만 memcmp 로 비교하므로, 파이썬 반복은 빈 구간 수에 비례하고 수 MB 이미지도 1ms 안팎이다.
+bytes 와 mmap 모두 받는다 (복사하지 않음).
+"""
+
+import mmap
+import os
+
+from partition_table import FLASH_SECTOR_SIZE
+
+ERASED_SECTOR = b"\xff" * FLASH_SECTOR_SIZE
+# 쓰기 길이 정렬 (esptool 과 같이 4바이트)
+WRITE_ALIGN = 4
+# 빈 섹터 후보를 찾는 검색어 (이보다 짧은 0xFF 는 무시하고, 길면 find 가 느려짐)
+CANDIDATE = b"\xff" * 64
+# 빈 섹터가 이어지는 길이를 잴 때 한 번에 비교하는 최대 길이 (섹터 64개)
+MAX_STRIDE = 64 * FLASH_SECTOR_SIZE
+_ERASED_STRIDE = b"\xff" * MAX_STRIDE
+_ERASED_VIEW = memoryview(_ERASED_STRIDE)
+
+
+def _align_up(value, align):
+    return (value + align - 1) // align * align
+
+
+def _align_down(value, align):
+    return value // align * align
+
+
+def _is_blank(data, pos, length):
+    # bytes 는 startswith 로 제자리 비교, mmap 은 조각 하나만 복사해서 비교 (둘 다 memcmp)
+    if isinstance(data, bytes):
+        return data.startswith(_ERASED_VIEW[:length], pos)
+    chunk = data[pos : pos + length]
+    return len(chunk) == length and _ERASED_STRIDE.startswith(chunk)
+
+
+def _erased_until(data, pos):
+    """섹터 경계 pos 부터 전부 0xFF 인 섹터가 끝나는 위치 (섹터 경계)
+
+    비교 길이를 두 배씩 늘리고 어긋나면 반씩 줄이므로 긴 빈 구간도 비교 횟수는 몇 번이다.
+    """
+    stride = FLASH_SECTOR_SIZE
+    while True:
+        if _is_blank(data, pos, stride):
+            pos += stride
+            stride = min(stride * 2, MAX_STRIDE)
+        elif stride > FLASH_SECTOR_SIZE:
+            stride //= 2
+        else:
+            return pos
+
+
+def erased_spans(data):
+    """전부 0xFF 인 섹터가 이어지는 구간 [(start, end)] (섹터 경계)
+
+    버퍼 전체에서 find 로 0xFF 후보를 찾고 그 자리에서만 섹터를 비교하므로
+    파이썬 반복은 섹터 수가 아니라 0xFF 가 몰린 곳의 수에 비례한다.
+    """
+    spans = []
+    pos = 0
+    while True:
+        found = data.find(CANDIDATE, pos)
+        if found < 0:
+            return spans
+        start = _align_down(found, FLASH_SECTOR_SIZE)
+        end = _erased_until(data, start)
+        if end == start:
+            # 섹터 중간에서 시작한 0xFF 는 다음 섹터부터 빈 구간일 수 있음
+            start += FLASH_SECTOR_SIZE
+            end = _erased_until(data, start)
+        if end > start:
+            spans.append((start, end))
+        # end 의 섹터는 비어 있지 않음
+        pos = end + FLASH_SECTOR_SIZE
+
+
+def _data_end(data, spans):
+    size = len(data)
+    end = size
+    last = _align_down(size, FLASH_SECTOR_SIZE)
+    if spans and spans[-1][1] == last and not data[last:size].rstrip(b"\xff"):
+        end = spans[-1][0]
+    # 남은 끝의 0xFF 는 한 섹터 남짓이므로 섹터 크기로 잘라서 확인
+    while end > 0:
+        chunk = data[max(0, end - FLASH_SECTOR_SIZE) : end]
+        used = len(chunk.rstrip(b"\xff"))
+        end -= len(chunk) - used
+        if used:
+            break
+    return min(size, _align_up(end, WRITE_ALIGN))
+
+
+def data_end(data):
+    """끝의 0xFF 를 잘라낸 길이 (4바이트 정렬)"""
+    return _data_end(data, erased_spans(data))
+
+
+def data_segments(data):
+    """0xFF 가 아닌 섹터가 이어지는 구간 [(start, end)]
+
+    start 는 섹터 경계, 마지막 구간의 end 는 끝의 0xFF 를 잘라낸 위치.
+    첫 구간은 항상 0 에서 시작한다 (앞쪽 빈 섹터도 지우기 범위에 들어가야 하므로).
+    전부 0xFF 이면 지우기만 하도록 앞의 4바이트 하나만 남긴다.
+    """
+    spans = erased_spans(data)
+    end = _data_end(data, spans)
+    segments = []
+    start = 0
+    for span_start, span_end in spans:
+        span_end = min(span_end, _align_down(end, FLASH_SECTOR_SIZE))
+        if span_end <= span_start or span_start == 0:
+            continue
+        segments.append((start, span_start))
+        start = span_end
+    if start < end:
+        segments.append((start, end))
+    return segments or [(0, min(len(data), WRITE_ALIGN))]
+
+
+def split_file(path, work_dir, prefix):
+    """파일을 data_segments 구간별 사본으로 나눔 → [(start, end, 경로)]
+
+    구간이 파일 전체 하나면 사본 없이 원본 경로를 돌려준다.
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return [(0, 0, path)]
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            segments = data_segments(data)
+            if segments == [(0, size)]:
+                return [(0, size, path)]
+            pieces = []
+            with memoryview(data) as view:
+                for start, end in segments:
+                    piece = os.path.join(work_dir, f"{prefix}_{start:x}.bin")
+                    with open(piece, "wb") as out:
+                        out.write(view[start:end])
+                    pieces.append((start, end, piece))
+            return pieces
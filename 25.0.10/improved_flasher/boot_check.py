@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+업로드 후 부팅 확인
+앱 전송 속도로 포트를 다시 열고 직접 한 번 재시작해서 콘솔 출력을 링 버퍼에 받고,
+성공/실패 패턴을 하나로 합친 정규식으로 검사해서 펌웨어가 실제로 동작하는지 확인한다.
+reset=True(기본)면 업로드 쪽은 쓰기 후 재시작하지 않는다 (esptool --after no_reset).
+"""
+
+import json
+import os
+import re
+import time
+
+import serial
+
+from ring_buffer import ByteRingBuffer
+
+# 이미지 폴더에 이 파일이 있으면 기본 패턴 대신 사용
+BOOT_CHECK_FILE = "boot_check.json"
+
+DEFAULT_BOOT_BAUD = 115200
+DEFAULT_BOOT_TIMEOUT = 15.0
+# 성공 패턴 이후에도 이 시간 동안은 실패 패턴(바로 뒤 크래시 등)을 기다림
+DEFAULT_SETTLE_TIME = 1.0
+CONSOLE_BUFFER_SIZE = 64 * 1024
+# 읽은 조각 경계에 걸친 패턴을 놓치지 않도록 다시 검사하는 길이
+MATCH_OVERLAP = 256
+
+DEFAULT_SUCCESS_PATTERNS = [
+    r"Setup completed successfully",
+]
+DEFAULT_FAILURE_PATTERNS = [
+    r"Guru Meditation Error",
+    r"abort\(\) was called",
+    r"Backtrace:",
+    r"Brownout detector was triggered",
+    r"invalid header",
+    r"Failed to initialize NVS",
+]
+
+
+class BootCheckConfig:
+    """부팅 확인 설정 (패턴은 정규식 문자열)"""
+
+    def __init__(
+        self,
+        success=None,
+        failure=None,
+        baud=DEFAULT_BOOT_BAUD,
+        timeout=DEFAULT_BOOT_TIMEOUT,
+        settle=DEFAULT_SETTLE_TIME,
+        reset=True,
+    ):
+        self.success = list(success or DEFAULT_SUCCESS_PATTERNS)
+        self.failure = list(failure or DEFAULT_FAILURE_PATTERNS)
+        self.baud = int(baud)
+        self.timeout = float(timeout)
+        self.settle = float(settle)
+        self.reset = reset
+
+        # 패턴마다 이름 붙은 그룹 → 한 번의 검색으로 어떤 패턴인지 구분
+        groups = [f"(?P<ok{i}>{p})" for i, p in enumerate(self.success)]
+        groups += [f"(?P<fail{i}>{p})" for i, p in enumerate(self.failure)]
+        try:
+            self.matcher = re.compile("|".join(groups).encode("utf-8"))
+        except re.error as e:
+            raise ValueError(f"부팅 확인 패턴 오류: {e}")
+
+    @classmethod
+    def load(cls, image_dir):
+        """이미지 폴더의 boot_check.json (없으면 기본값)"""
+        path = os.path.join(image_dir, BOOT_CHECK_FILE)
+        if not os.path.isfile(path):
+            return cls()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                config = json.load(f)
+        except (OSError, ValueError) as e:
+            raise ValueError(f"{BOOT_CHECK_FILE} 을 읽을 수 없습니다: {e}")
+        return cls(
+            success=config.get("success"),
+            failure=config.get("failure"),
+            baud=config.get("baud", DEFAULT_BOOT_BAUD),
+            timeout=config.get("timeout", DEFAULT_BOOT_TIMEOUT),
+            settle=config.get("settle", DEFAULT_SETTLE_TIME),
+            reset=config.get("reset", True),
+        )
+
+
+class BootCheckResult:
+    def __init__(self, ok, reason, boot_time, console):
+        self.ok = ok
+        self.reason = reason
+        self.boot_time = boot_time
+        self.console = console
+
+    def as_dict(self):
+        return {
+            "ok": self.ok,
+            "reason": self.reason,
+            "boot_time": round(self.boot_time, 2) if self.boot_time is not None else None,
+        }
+
+
+class BootMatcher:
+    """스트림을 조각 단위로 받아 성공/실패 패턴 검사"""
+
+    def __init__(self, config):
+        self.config = config
+        self.window = b""
+        self.success = None
+        self.failure = None
+
+    def feed(self, data):
+        self.window += data
+        # 실패는 성공 이후에도 검사 (settle 구간)
+        for match in self.config.matcher.finditer(self.window):
+            text = match.group(0).decode("utf-8", "replace")
+            if match.lastgroup.startswith("fail"):
+                self.failure = text
+                break
+            if self.success is None:
+                self.success = text
+        self.window = self.window[-MATCH_OVERLAP:]
+
+
+def _open_console(port, baud, deadline):
+    """앱 콘솔 포트 열기 (USB 재인식 중이면 deadline 까지 재시도)"""
+    while True:
+        ser = serial.Serial()
+        ser.port = port
+        ser.baudrate = baud
+        ser.timeout = 0.05
+        # 포트를 열 때 자동 리셋 회로가 다운로드 모드로 들어가지 않도록
+        ser.dtr = False
+        ser.rts = False
+        try:
+            ser.open()
+            return ser
+        except serial.SerialException:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.2)
+
+
+def run_boot_check(port, config, cancel_event=None):
+    """재시작(config.reset) 후 콘솔을 읽어서 부팅 성공 여부 판정
+
+    네이티브 USB 보드는 재시작하면 포트가 다시 열거되므로, 읽다가 끊기면
+    남은 제한 시간 안에서 포트를 다시 열고 이어서 읽는다.
+    """
+    console = ByteRingBuffer(CONSOLE_BUFFER_SIZE)
+    matcher = BootMatcher(config)
+    started = time.monotonic()
+    success_at = None
+
+    ser = _open_console(port, config.baud, started + config.timeout)
+    try:
+        if config.reset:
+            # 처음부터 받기 위해 직접 재시작 (EN 펄스, 쓰기 후 유일한 재시작)
+            try:
+                ser.rts = True
+                time.sleep(0.1)
+                ser.rts = False
+            except (serial.SerialException, OSError):
+                # 펄스 도중에 포트가 사라짐 (아래 읽기에서 다시 엶)
+                pass
+            started = time.monotonic()
+
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                return BootCheckResult(False, "사용자 취소", None, console.tail())
+            try:
+                data = ser.read(max(1, ser.in_waiting))
+            except (serial.SerialException, OSError):
+                # 재시작으로 USB 가 다시 열거됨 → 같은 이름으로 다시 열기
+                ser.close()
+                try:
+                    ser = _open_console(port, config.baud, started + config.timeout)
+                except serial.SerialException:
+                    return BootCheckResult(
+                        False,
+                        f"{config.timeout:.0f}초 안에 포트가 다시 열리지 않았습니다",
+                        None,
+                        console.tail(),
+                    )
+                continue
+            now = time.monotonic()
+            if data:
+                console.write(data)
+                matcher.feed(data)
+            if matcher.failure is not None:
+                return BootCheckResult(
+                    False, matcher.failure, now - started, console.tail()
+                )
+            if matcher.success is not None and success_at is None:
+                success_at = now
+            if success_at is not None and now - success_at >= config.settle:
+                return BootCheckResult(
+                    True, matcher.success, success_at - started, console.tail()
+                )
+            if success_at is None and now - started >= config.timeout:
+                return BootCheckResult(
+                    False,
+                    f"{config.timeout:.0f}초 안에 부팅 완료 메시지가 없습니다",
+                    None,
+                    console.tail(),
+                )
+    finally:
+        ser.close()
@@ -72,6 +72,14 @@ Write-Host "[4/5] EXE 파일 빌드 중..." -ForegroundColor Yellow
 Write-Host "  이 과정은 1-2분 정도 소요될 수 있습니다..." -ForegroundColor Gray
 Write-Host ""
 
+# 장치별 데이터 템플릿/보정값/부팅 확인 설정 파일 (있을 때만 포함)
+$extraData = @()
+foreach ($optional in @("device_data.json", "calibration.csv", "boot_check.json")) {
+    if (Test-Path $optional) {
+        $extraData += @("--add-data", "$optional;.")
+    }
+}
+
 # PyInstaller 명령 실행 (버전 정보가 포함된 이름으로 빌드)
 pyinstaller --noconfirm `
     --onefile `
@@ -85,6 +93,7 @@ pyinstaller --noconfirm `
     --hidden-import=serial `
     --hidden-import=serial.tools `
     --hidden-import=serial.tools.list_ports `
+    @extraData `
     flasher_gui.py
 
 if ($LASTEXITCODE -ne 0) {
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+칩별 플래시 레이아웃과 ROM 부트로더 차이
+연결 단계에서 읽은 칩 판별 값, 또는 이미지 헤더의 chip id 로 칩을 정하고
+부트로더 위치, esptool --chip 이름, MAC eFuse 위치, ROM 응답 형식을 이 표에서 가져온다.
+값은 esptool targets/*.py 의 ROM 클래스와 같다.
+"""
+
+import struct
+
+# 이 도구가 처음부터 지원하던 칩 (칩을 알 수 없을 때 측정값 저장 등에 사용)
+DEFAULT_CHIP = "ESP32-S3"
+
+# 이미지 헤더의 chip id 위치 (image_check 과 같은 헤더)
+IMAGE_MAGIC = 0xE9
+IMAGE_CHIP_ID_OFFSET = 12
+
+
+class ChipLayoutError(Exception):
+    """지원하지 않는 칩"""
+
+    # 실패 원인 키 (flash_core.failure_cause)
+    cause = "chip"
+
+
+class ChipLayout:
+    """칩 한 종류의 레이아웃"""
+
+    def __init__(
+        self,
+        name,
+        esptool_name,
+        image_chip_id,
+        magic_values,
+        bootloader_offset,
+        mac_efuse_reg,
+        status_bytes=4,
+        begin_encrypted_flag=True,
+    ):
+        self.name = name
+        self.esptool_name = esptool_name
+        self.image_chip_id = image_chip_id
+        self.magic_values = tuple(magic_values)
+        self.bootloader_offset = bootloader_offset
+        # MAC 하위 4바이트 레지스터 (상위 2바이트는 다음 레지스터의 하위 16비트)
+        self.mac_efuse_reg = mac_efuse_reg
+        # ROM 응답 끝의 상태 바이트 수 (스텁은 2, ROM 은 4)
+        self.status_bytes = status_bytes
+        # FLASH_DEFL_BEGIN 에 암호화 쓰기 여부 항목이 있는지 (ESP32 ROM 은 없음)
+        self.begin_encrypted_flag = begin_encrypted_flag
+
+    def mac_from_words(self, mac0, mac1):
+        """eFuse 두 단어 → "aa:bb:cc:dd:ee:ff" (esptool read_mac 과 같은 순서)"""
+        return ":".join(f"{b:02x}" for b in struct.pack(">II", mac1, mac0)[2:])
+
+    def __repr__(self):
+        return f"ChipLayout({self.name!r})"
+
+
+CHIP_LAYOUTS = [
+    ChipLayout(
+        "ESP32",
+        "esp32",
+        0,
+        [0x00F01D83],
+        0x1000,
+        0x3FF5A000 + 0x004,
+        begin_encrypted_flag=False,
+    ),
+    ChipLayout("ESP32-S2", "esp32s2", 2, [0x000007C6], 0x1000, 0x3F41A000 + 0x044),
+    ChipLayout("ESP32-S3", "esp32s3", 9, [0x00000009], 0x0, 0x60007000 + 0x044),
+    ChipLayout(
+        "ESP32-C3",
+        "esp32c3",
+        5,
+        [0x6921506F, 0x1B31506F, 0x4881606F, 0x4361606F],
+        0x0,
+        0x60008800 + 0x044,
+    ),
+]
+
+_BY_NAME = {}
+for _layout in CHIP_LAYOUTS:
+    _BY_NAME[_layout.name.upper()] = _layout
+    _BY_NAME[_layout.esptool_name.upper()] = _layout
+_BY_MAGIC = {magic: layout for layout in CHIP_LAYOUTS for magic in layout.magic_values}
+_BY_IMAGE_ID = {layout.image_chip_id: layout for layout in CHIP_LAYOUTS}
+
+
+def layout_for(chip):
+    """칩 이름("ESP32-S3", "esp32s3", esptool 의 "ESP32-S3 (QFN56) ..." 설명 포함) → 레이아웃"""
+    if isinstance(chip, ChipLayout):
+        return chip
+    name = (chip or "").strip().upper().split(" ", 1)[0]
+    layout = _BY_NAME.get(name)
+    if layout is None:
+        raise ChipLayoutError(f"지원하지 않는 칩입니다 ({chip or '알 수 없음'})")
+    return layout
+
+
+def layout_for_magic(magic):
+    """칩 판별 레지스터 값 → 레이아웃 (모르는 값이면 None)"""
+    return _BY_MAGIC.get(magic)
+
+
+def layout_for_image_id(chip_id):
+    """이미지 헤더의 chip id → 레이아웃 (모르는 값이면 None)"""
+    return _BY_IMAGE_ID.get(chip_id)
+
+
+def image_layout(path):
+    """이미지 파일 헤더만 읽어서 대상 칩 레이아웃 (ESP 이미지가 아니거나 읽을 수 없으면 None)"""
+    try:
+        with open(path, "rb") as f:
+            header = f.read(IMAGE_CHIP_ID_OFFSET + 2)
+    except OSError:
+        return None
+    if len(header) < IMAGE_CHIP_ID_OFFSET + 2 or header[0] != IMAGE_MAGIC:
+        return None
+    return layout_for_image_id(struct.unpack_from("<H", header, IMAGE_CHIP_ID_OFFSET)[0])
+
+
+def supported_chips():
+    return [layout.name for layout in CHIP_LAYOUTS]
@@ -0,0 +1,614 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+여러 스테이션 PC 를 묶는 코디네이터
+코디네이터 프로세스 하나가 펌웨어 묶음(매니페스트 + 이미지)을 LAN 에 제공하고 세션 결과를 모은다.
+스테이션은 시작할 때 매니페스트를 받아서 없는 이미지만 로컬 캐시(sha256 이름)로 내려받고,
+업로드 결과는 이력 DB 에 기록한 뒤 묶음으로 코디네이터에 보낸다.
+코디네이터에 연결할 수 없으면 마지막으로 받은 묶음으로 계속 업로드하고 결과는 쌓아 두었다가 보낸다.
+
+    python coordinator.py serve --images ./release --port 8470
+    python coordinator.py workers --url http://10.0.0.5:8470
+    python flasher_cli.py --coordinator http://10.0.0.5:8470 --watch
+    ESP32-S3_Flasher.exe --coordinator http://10.0.0.5:8470
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import queue
+import shutil
+import socket
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from flash_core import app_data_dir
+from history_db import COLUMNS, SCHEMA, manifest_hash
+
+DEFAULT_PORT = 8470
+COORDINATOR_DB_NAME = "coordinator.sqlite3"
+CACHE_DIR_NAME = "coordinator_cache"
+MANIFEST_FILE_NAME = "manifest.json"
+SPOOL_FILE_NAME = "pending_results.jsonl"
+# 묶음에 넣는 파일 (이미지 폴더의 숨김 파일이 아닌 것만)
+IMAGE_EXTENSIONS = (".bin", ".json", ".csv")
+TOKEN_HEADER = "X-Station-Token"
+
+REQUEST_TIMEOUT = 5.0
+# 한 번에 보내는 결과 수 / 보내기 실패 후 다시 시도까지 / 살아 있음 알림 주기 (초)
+UPLOAD_BATCH = 200
+RETRY_INTERVAL = 5.0
+HEARTBEAT_INTERVAL = 30.0
+COPY_CHUNK = 1024 * 1024
+
+RECEIVED_SCHEMA = """
+CREATE TABLE IF NOT EXISTS received (uid TEXT PRIMARY KEY, ts REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS workers (
+    station TEXT PRIMARY KEY,
+    host TEXT,
+    manifest_hash TEXT,
+    online INTEGER,
+    last_seen REAL,
+    results INTEGER DEFAULT 0
+);
+"""
+
+
+class CoordinatorError(Exception):
+    """코디네이터 통신/캐시 오류"""
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(COPY_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# ---------------------------------------------------------------------------
+# 코디네이터 (서버)
+# ---------------------------------------------------------------------------
+
+
+class Coordinator:
+    """이미지 폴더의 묶음 제공 + 결과/스테이션 기록 (HTTP 처리 스레드들이 함께 씀)"""
+
+    def __init__(self, images_dir, db_path=None, token=None):
+        self.images_dir = os.path.abspath(images_dir)
+        self.token = token
+        self.lock = threading.Lock()
+        # 이름 → (크기, mtime, sha256), 파일이 바뀔 때만 해시를 다시 계산
+        self.digests = {}
+        # HTTP 처리 스레드들이 잠금 아래에서 연결 하나를 같이 씀
+        self.conn = sqlite3.connect(
+            db_path or os.path.join(app_data_dir(), COORDINATOR_DB_NAME), check_same_thread=False
+        )
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA + RECEIVED_SCHEMA)
+
+    def manifest(self):
+        """{"manifest_hash", "files": {이름: {"sha256", "size"}}} (이미지 폴더를 다시 훑음)"""
+        files = {}
+        with self.lock:
+            for name in sorted(os.listdir(self.images_dir)):
+                path = os.path.join(self.images_dir, name)
+                if name.startswith(".") or not name.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                if not os.path.isfile(path):
+                    continue
+                st = os.stat(path)
+                cached = self.digests.get(name)
+                if cached is None or cached[:2] != (st.st_size, st.st_mtime_ns):
+                    cached = self.digests[name] = (st.st_size, st.st_mtime_ns, file_sha256(path))
+                files[name] = {"sha256": cached[2], "size": cached[0]}
+        return {
+            "manifest_hash": manifest_hash({name: f["sha256"] for name, f in files.items()}),
+            "files": files,
+        }
+
+    def blob_path(self, sha256):
+        """현재 묶음에 있는 이미지 경로 (없으면 None)"""
+        for name, info in self.manifest()["files"].items():
+            if info["sha256"] == sha256:
+                return os.path.join(self.images_dir, name)
+        return None
+
+    def register(self, data):
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO workers (station, host, manifest_hash, online, last_seen)"
+                " VALUES (?, ?, ?, ?, ?) ON CONFLICT (station) DO UPDATE SET"
+                " host = excluded.host, manifest_hash = excluded.manifest_hash,"
+                " online = excluded.online, last_seen = excluded.last_seen",
+                (
+                    data["station"],
+                    data.get("host"),
+                    data.get("manifest_hash"),
+                    int(bool(data.get("online", True))),
+                    now,
+                ),
+            )
+
+    def add_results(self, station, rows):
+        """결과 묶음 저장 → 새로 저장한 수 (uid 가 같은 재전송은 무시)"""
+        sql = f"INSERT INTO sessions ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+        added = 0
+        with self.lock, self.conn:
+            for row in rows:
+                cur = self.conn.execute(
+                    "INSERT OR IGNORE INTO received (uid, ts) VALUES (?, ?)",
+                    (row["uid"], time.time()),
+                )
+                if cur.rowcount:
+                    row = dict(row, station=row.get("station") or station)
+                    self.conn.execute(sql, tuple(row.get(c) for c in COLUMNS))
+                    added += 1
+            self.conn.execute(
+                "UPDATE workers SET results = results + ?, last_seen = ? WHERE station = ?",
+                (added, time.time(), station),
+            )
+        return added
+
+    def workers(self):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT station, host, manifest_hash, online, last_seen, results"
+                " FROM workers ORDER BY station"
+            ).fetchall()
+        keys = ("station", "host", "manifest_hash", "online", "last_seen", "results")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    coordinator = None
+
+    def _authorized(self):
+        token = self.coordinator.token
+        if token and self.headers.get(TOKEN_HEADER) != token:
+            self.send_error(403)
+            return False
+        return True
+
+    def _send_json(self, data, status=200):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length).decode("utf-8"))
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        path = self.path.split("?", 1)[0]
+        if path == "/manifest":
+            self._send_json(self.coordinator.manifest())
+        elif path == "/workers":
+            self._send_json(self.coordinator.workers())
+        elif path.startswith("/images/"):
+            self._send_blob(path[len("/images/") :])
+        else:
+            self.send_error(404)
+
+    def _send_blob(self, sha256):
+        blob = self.coordinator.blob_path(sha256)
+        if blob is None:
+            self.send_error(404)
+            return
+        with open(blob, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(size))
+            self.end_headers()
+            self.wfile.flush()
+            # 파일 내용을 사용자 공간으로 복사하지 않고 소켓으로 바로 전송
+            self.connection.sendfile(f)
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        path = self.path.split("?", 1)[0]
+        try:
+            data = self._read_json()
+        except (ValueError, UnicodeDecodeError):
+            self.send_error(400)
+            return
+        try:
+            if path == "/register":
+                self.coordinator.register(data)
+                self._send_json({"manifest_hash": self.coordinator.manifest()["manifest_hash"]})
+            elif path == "/results":
+                added = self.coordinator.add_results(data["station"], data["results"])
+                self._send_json({"added": added})
+            else:
+                self.send_error(404)
+        except (KeyError, TypeError, sqlite3.Error) as e:
+            self._send_json({"error": str(e)}, 400)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class CoordinatorServer:
+    """코디네이터 HTTP 서버 (백그라운드 스레드)"""
+
+    def __init__(self, coordinator, port=DEFAULT_PORT, host="0.0.0.0"):
+        self.coordinator = coordinator
+        handler = type("Handler", (_Handler,), {"coordinator": coordinator})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, name="coordinator", daemon=True
+        )
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        if host == "0.0.0.0":
+            host = "127.0.0.1"
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.coordinator.close()
+
+
+# ---------------------------------------------------------------------------
+# 스테이션 (작업자)
+# ---------------------------------------------------------------------------
+
+
+def _request(url, token=None, data=None, timeout=REQUEST_TIMEOUT):
+    headers = {}
+    body = None
+    if data is not None:
+        body = json.dumps(data).encode("utf-8")
+        headers["Content-Type"] = "application/json"
+    if token:
+        headers[TOKEN_HEADER] = token
+    return urllib.request.urlopen(
+        urllib.request.Request(url, data=body, headers=headers), timeout=timeout
+    )
+
+
+def _request_json(url, token=None, data=None, timeout=REQUEST_TIMEOUT):
+    with _request(url, token, data, timeout) as response:
+        return json.loads(response.read().decode("utf-8"))
+
+
+class ContentCache:
+    """sha256 이름으로 저장하는 이미지 캐시 + 묶음별 폴더 (원래 파일 이름으로 연결)
+
+        blobs/<sha256>
+        sets/<manifest_hash>/<이름>
+        manifest.json    마지막으로 다 받은 묶음
+    """
+
+    def __init__(self, root=None):
+        self.root = root or os.path.join(app_data_dir(), CACHE_DIR_NAME)
+        self.blob_dir = os.path.join(self.root, "blobs")
+        self.set_root = os.path.join(self.root, "sets")
+        os.makedirs(self.blob_dir, exist_ok=True)
+        os.makedirs(self.set_root, exist_ok=True)
+
+    def blob(self, sha256):
+        return os.path.join(self.blob_dir, sha256)
+
+    def has_blob(self, sha256):
+        return os.path.isfile(self.blob(sha256))
+
+    def store(self, sha256, stream):
+        """stream 을 받아서 해시가 맞으면 캐시에 저장 (중간에 끊기면 남기지 않음)"""
+        digest = hashlib.sha256()
+        fd, tmp = tempfile.mkstemp(dir=self.blob_dir, prefix=".part_")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in iter(lambda: stream.read(COPY_CHUNK), b""):
+                    digest.update(chunk)
+                    f.write(chunk)
+            if digest.hexdigest() != sha256:
+                raise CoordinatorError(f"이미지 해시 불일치 ({sha256[:12]})")
+            os.replace(tmp, self.blob(sha256))
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def set_dir(self, manifest):
+        return os.path.join(self.set_root, manifest["manifest_hash"])
+
+    def materialize(self, manifest):
+        """묶음 폴더 구성 (하드 링크, 안 되면 복사) → 폴더 경로"""
+        target = self.set_dir(manifest)
+        os.makedirs(target, exist_ok=True)
+        for name, info in manifest["files"].items():
+            path = os.path.join(target, name)
+            if os.path.isfile(path) and os.path.getsize(path) == info["size"]:
+                continue
+            tmp = path + ".tmp"
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            try:
+                os.link(self.blob(info["sha256"]), tmp)
+            except OSError:
+                shutil.copyfile(self.blob(info["sha256"]), tmp)
+            os.replace(tmp, path)
+        return target
+
+    def save_manifest(self, manifest):
+        path = os.path.join(self.root, MANIFEST_FILE_NAME)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(path + ".tmp", path)
+
+    def load_manifest(self):
+        try:
+            with open(os.path.join(self.root, MANIFEST_FILE_NAME), "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not os.path.isdir(self.set_dir(manifest)):
+            return None
+        return manifest
+
+
+class StationClient:
+    """스테이션 쪽: 묶음 받기 (없는 이미지만) + 오프라인 시 캐시 사용"""
+
+    def __init__(self, url, station=None, cache=None, token=None, log=None):
+        self.url = url.rstrip("/")
+        self.station = station or socket.gethostname()
+        self.cache = cache or ContentCache()
+        self.token = token
+        self.log = log or (lambda message, level="INFO": None)
+        self.manifest = None
+        self.online = False
+        self.downloaded = 0
+
+    def sync(self):
+        """현재 묶음을 캐시에 맞추고 이미지 폴더 경로 반환
+
+        코디네이터에 연결할 수 없으면 마지막 묶음 폴더를 쓴다 (그것도 없으면 CoordinatorError).
+        """
+        try:
+            manifest = _request_json(self.url + "/manifest", self.token)
+            for name, info in manifest["files"].items():
+                if self.cache.has_blob(info["sha256"]):
+                    continue
+                self.log(f"코디네이터에서 {name} 받는 중 ({info['size']} 바이트)...")
+                with _request(f"{self.url}/images/{info['sha256']}", self.token) as response:
+                    self.cache.store(info["sha256"], response)
+                self.downloaded += info["size"]
+            path = self.cache.materialize(manifest)
+            self.cache.save_manifest(manifest)
+            self.manifest = manifest
+            self.online = True
+            self.log(f"펌웨어 묶음 {manifest['manifest_hash'][:12]} 사용 (코디네이터)")
+            return path
+        except (OSError, ValueError, KeyError, CoordinatorError) as e:
+            manifest = self.cache.load_manifest()
+            if manifest is None:
+                raise CoordinatorError(
+                    f"코디네이터에 연결할 수 없고 캐시된 이미지도 없습니다: {e}"
+                )
+            self.manifest = manifest
+            self.online = False
+            self.log(
+                f"코디네이터 연결 실패, 캐시된 묶음 {manifest['manifest_hash'][:12]} 로 계속합니다: {e}",
+                "WARNING",
+            )
+            return self.cache.set_dir(manifest)
+
+    def register(self):
+        """살아 있음 알림 → 코디네이터의 현재 묶음 해시"""
+        reply = _request_json(
+            self.url + "/register",
+            self.token,
+            {
+                "station": self.station,
+                "host": socket.gethostname(),
+                "manifest_hash": self.manifest["manifest_hash"] if self.manifest else None,
+                "online": self.online,
+            },
+        )
+        return reply.get("manifest_hash")
+
+    def send_results(self, rows):
+        reply = _request_json(
+            self.url + "/results", self.token, {"station": self.station, "results": rows}
+        )
+        return reply.get("added", 0)
+
+
+class ResultUploader:
+    """이력 DB 에 기록한 결과를 묶음으로 코디네이터에 보냄 (보내지 못한 것은 파일에 쌓아 둠)
+
+    HistoryWriter(forward=uploader.submit) 로 연결한다.
+    """
+
+    def __init__(self, client, spool_path=None):
+        self.client = client
+        self.spool_path = spool_path or os.path.join(client.cache.root, SPOOL_FILE_NAME)
+        self.queue = queue.Queue()
+        self.pending = self._load_spool()
+        # 코디네이터가 알려 준 최신 묶음 해시 (지금 쓰는 것과 다르면 재시작 시 적용)
+        self.latest_manifest = None
+        self.thread = threading.Thread(target=self._run, name="coordinator", daemon=True)
+        self.thread.start()
+
+    @property
+    def update_available(self):
+        manifest = self.client.manifest
+        return bool(
+            self.latest_manifest
+            and manifest
+            and self.latest_manifest != manifest["manifest_hash"]
+        )
+
+    def submit(self, rows):
+        """결과 묶음 추가 (이력 DB 스레드에서 호출, 바로 반환)"""
+        self.queue.put([dict(row, uid=uuid.uuid4().hex) for row in rows])
+
+    def close(self, timeout=2.0):
+        self.queue.put(None)
+        self.thread.join(timeout)
+
+    def _load_spool(self):
+        try:
+            with open(self.spool_path, "r", encoding="utf-8") as f:
+                return [json.loads(line) for line in f if line.strip()]
+        except (OSError, ValueError):
+            return []
+
+    def _append_spool(self, rows):
+        try:
+            with open(self.spool_path, "a", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps(row) + "\n")
+        except OSError:
+            pass
+
+    def _rewrite_spool(self):
+        try:
+            with open(self.spool_path + ".tmp", "w", encoding="utf-8") as f:
+                for row in self.pending:
+                    f.write(json.dumps(row) + "\n")
+            os.replace(self.spool_path + ".tmp", self.spool_path)
+        except OSError:
+            pass
+
+    def _flush(self):
+        """쌓인 결과 보내기 → 성공 여부"""
+        sent = False
+        try:
+            while self.pending:
+                batch = self.pending[:UPLOAD_BATCH]
+                try:
+                    self.client.send_results(batch)
+                except urllib.error.HTTPError as e:
+                    # 코디네이터가 받을 수 없는 묶음은 다시 보내도 같으므로 버림
+                    if e.code != 400:
+                        raise
+                self.pending = self.pending[len(batch) :]
+                sent = True
+            return True
+        except (OSError, ValueError):
+            return False
+        finally:
+            if sent:
+                self._rewrite_spool()
+
+    def _heartbeat(self):
+        try:
+            self.latest_manifest = self.client.register()
+            return True
+        except (OSError, ValueError):
+            return False
+
+    def _run(self):
+        online = self._heartbeat()
+        next_heartbeat = time.monotonic() + HEARTBEAT_INTERVAL
+        next_retry = 0.0
+        stop = False
+        while not stop:
+            now = time.monotonic()
+            wake = next_heartbeat
+            if self.pending:
+                wake = min(wake, next_retry)
+            try:
+                rows = self.queue.get(timeout=max(0.0, wake - now))
+                if rows is None:
+                    stop = True
+                else:
+                    self.pending.extend(rows)
+                    self._append_spool(rows)
+            except queue.Empty:
+                pass
+            now = time.monotonic()
+            if now >= next_heartbeat:
+                online = self._heartbeat()
+                next_heartbeat = now + HEARTBEAT_INTERVAL
+            if self.pending and (stop or online or now >= next_retry):
+                online = self._flush()
+                if not online:
+                    next_retry = now + RETRY_INTERVAL
+
+
+def connect_station(url, station=None, token=None, log=None, cache=None):
+    """GUI/CLI 용: 묶음 받기 + 결과 업로더 생성 → (이미지 폴더, StationClient, ResultUploader)"""
+    client = StationClient(url, station, cache=cache, token=token, log=log)
+    image_dir = client.sync()
+    return image_dir, client, ResultUploader(client)
+
+
+# ---------------------------------------------------------------------------
+# 명령줄
+# ---------------------------------------------------------------------------
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="스테이션 코디네이터")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("serve", help="펌웨어 묶음 제공 + 결과 수집")
+    p.add_argument("--images", required=True, help="bootloader/partitions/firmware 등이 있는 폴더")
+    p.add_argument("--host", default="0.0.0.0")
+    p.add_argument("--port", type=int, default=DEFAULT_PORT)
+    p.add_argument("--db", default=None, help="결과 DB (기본: 앱 데이터 폴더)")
+    p.add_argument("--token", default=None, help="스테이션이 보내야 하는 토큰 (선택)")
+    p = sub.add_parser("workers", help="등록된 스테이션 목록")
+    p.add_argument("--url", required=True)
+    p.add_argument("--token", default=None)
+    args = parser.parse_args(argv)
+
+    if args.command == "workers":
+        now = time.time()
+        for worker in _request_json(args.url.rstrip("/") + "/workers", args.token):
+            state = "온라인" if worker["online"] else "오프라인(캐시)"
+            print(
+                f"{worker['station']:<16} {state:<10} 묶음 {str(worker['manifest_hash'])[:12]}"
+                f"  결과 {worker['results']}건  {now - worker['last_seen']:.0f}초 전"
+            )
+        return 0
+
+    coordinator = Coordinator(args.images, args.db, args.token)
+    manifest = coordinator.manifest()
+    server = CoordinatorServer(coordinator, args.port, args.host)
+    print(f"[INFO] 코디네이터 {server.url} (묶음 {manifest['manifest_hash'][:12]})")
+    for name, info in manifest["files"].items():
+        print(f"  {name:<20} {info['size']:>10} 바이트  {info['sha256'][:12]}")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server.server_close()
+        coordinator.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
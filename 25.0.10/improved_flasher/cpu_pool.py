@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CPU 작업용 프로세스 풀
+압축, 해시 계산, 장치별 이미지 생성처럼 GIL 을 오래 잡는 작업을 별도 프로세스에서 실행한다.
+큰 결과는 공유 메모리로 돌려받아서 시리얼 스레드와 Tk 루프가 멈추지 않게 한다.
+
+공유 메모리는 부모 프로세스가 만들어서 이름만 작업 프로세스로 넘긴다.
+Windows 는 마지막 핸들이 닫히면 이름 있는 매핑이 사라지므로, 작업 프로세스가 만들고 닫으면
+부모가 열기 전에 없어진다.
+"""
+
+import concurrent.futures
+import contextlib
+import hashlib
+import mmap
+import multiprocessing
+import os
+import threading
+import zlib
+from multiprocessing import shared_memory
+
+from block_filter import data_end, data_segments
+from link_tuning import level_stats
+from partition_table import FLASH_SECTOR_SIZE
+
+# 시리얼 스레드와 UI 용으로 코어 하나는 남겨 둠
+DEFAULT_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+
+
+class SharedBuffer:
+    """부모 프로세스가 만든 공유 메모리 (작업 프로세스가 채우고, 다 쓰면 release)"""
+
+    def __init__(self, capacity):
+        self.shm = shared_memory.SharedMemory(create=True, size=max(capacity, 1))
+        self.name = self.shm.name
+        self.capacity = capacity
+        self.size = 0
+        self.info = {}
+        self.view = self.shm.buf[:0]
+
+    def filled(self, size, info=None):
+        """작업 프로세스가 size 바이트를 채운 뒤 호출"""
+        self.view.release()
+        self.size = size
+        self.info = info or {}
+        self.view = self.shm.buf[:size]
+        return self
+
+    def __len__(self):
+        return self.size
+
+    def tobytes(self):
+        return bytes(self.view)
+
+    def release(self):
+        if self.shm is None:
+            return
+        self.view.release()
+        self.shm.close()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+        self.shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def region_source(region):
+    """작업 프로세스로 넘길 영역 내용 (지우기 영역은 데이터 대신 크기만)"""
+    if region.is_erase:
+        return ("fill", 0xFF, region.size)
+    return region.path
+
+
+def generated_source(size, func, *args):
+    """작업 프로세스에서 func(*args) 로 만드는 size 바이트 이하의 내용
+
+    func 와 args 는 pickle 할 수 있어야 한다 (모듈 최상위 함수 또는 그런 객체의 메서드).
+    """
+    return ("generate", func, args, size)
+
+
+@contextlib.contextmanager
+def _source_data(source):
+    """영역 내용 (파일은 mmap 으로 열어서 통째로 읽어 들이지 않음)"""
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                yield b""
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                yield mapped
+        return
+    if isinstance(source, tuple) and source[0] == "fill":
+        yield bytes([source[1]]) * source[2]
+        return
+    if isinstance(source, tuple) and source[0] == "generate":
+        yield source[1](*source[2])
+        return
+    yield bytes(source)
+
+
+def source_size(source):
+    """영역 내용의 원본 크기 (파일은 stat 만)"""
+    if isinstance(source, str):
+        return os.path.getsize(source)
+    if isinstance(source, tuple) and source[0] == "fill":
+        return source[2]
+    if isinstance(source, tuple) and source[0] == "generate":
+        return source[3]
+    return len(source)
+
+
+def compress_bound(size, skip_erased=False):
+    """zlib compressBound 와 같은 최대 압축 크기 (구간별 압축이면 구간마다 헤더/체크섬이 붙음)"""
+    streams = size // FLASH_SECTOR_SIZE + 1 if skip_erased else 1
+    return size + (size >> 12) + (size >> 14) + (size >> 25) + 13 * streams
+
+
+def _write_shared(name, parts):
+    """부모가 만든 공유 메모리에 조각들을 바로 복사 (중간에 이어 붙이지 않음) → 크기"""
+    size = sum(len(part) for part in parts)
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        if size > shm.size:
+            raise ValueError(f"공유 메모리가 작습니다 ({size} > {shm.size})")
+        pos = 0
+        for part in parts:
+            shm.buf[pos : pos + len(part)] = part
+            pos += len(part)
+    finally:
+        shm.close()
+    return size
+
+
+def _digests(data):
+    return {
+        "size": len(data),
+        "md5": hashlib.md5(data).hexdigest(),
+        "sha256": hashlib.sha256(data).hexdigest(),
+    }
+
+
+def compress_parts(data, level, skip_erased):
+    """압축 조각 목록과 원본 정보 → (parts, info)"""
+    info = _digests(data)
+    if not skip_erased:
+        return [zlib.compress(data, level)], info
+    # 0xFF 가 아닌 구간만 따로 압축해서 이어 붙임 (구간 위치는 info 로 전달)
+    parts = []
+    segments = []
+    offset = 0
+    with memoryview(data) as view:
+        for start, end in data_segments(data):
+            part = zlib.compress(view[start:end], level)
+            segments.append((start, end, offset, len(part)))
+            parts.append(part)
+            offset += len(part)
+        # 압축 수준 선택용 표본 통계 (link_tuning)
+        info["level_stats"] = level_stats(view[: data_end(data)])
+        # 구간별 지울 범위(다음 구간 시작까지)의 MD5 (이어쓰기 때 장치 MD5 와 비교)
+        ends = [seg[0] for seg in segments[1:]] + [len(data)]
+        info["segment_md5"] = [
+            hashlib.md5(view[seg[0] : end]).hexdigest() for seg, end in zip(segments, ends)
+        ]
+    info["segments"] = segments
+    return parts, info
+
+
+def _compress_task(name, source, level, skip_erased):
+    with _source_data(source) as data:
+        parts, info = compress_parts(data, level, skip_erased)
+    return _write_shared(name, parts), info
+
+
+def _digest_task(source):
+    with _source_data(source) as data:
+        return _digests(data)
+
+
+def _generate_task(name, source):
+    with _source_data(source) as data:
+        return _write_shared(name, [data]), _digests(data)
+
+
+def _chain(future, buffer):
+    """작업이 채운 공유 메모리를 돌려주는 Future (실패하거나 취소되면 메모리 해제)"""
+    out = concurrent.futures.Future()
+
+    def done(f):
+        try:
+            out.set_result(buffer.filled(*f.result()))
+        except BaseException as e:
+            buffer.release()
+            out.set_exception(e)
+
+    future.add_done_callback(done)
+    return out
+
+
+class CpuPool:
+    """압축/해시 작업 풀 (처음 쓸 때 프로세스 시작)"""
+
+    def __init__(self, workers=DEFAULT_WORKERS):
+        self.workers = workers
+        self.executor = None
+        self.lock = threading.Lock()
+
+    def _executor(self):
+        with self.lock:
+            if self.executor is None:
+                # Tk/시리얼 스레드가 있는 프로세스를 fork 하지 않도록 spawn 사용
+                self.executor = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self.executor
+
+    def compress(self, source, level=9, skip_erased=False):
+        """zlib 압축 → Future[SharedBuffer] (info 에 원본 size/md5/sha256)
+
+        skip_erased=True 면 전부 0xFF 인 섹터와 끝의 채움 바이트를 빼고 구간별로 압축하고
+        info["segments"] 에 (시작, 끝, 압축 위치, 압축 길이) 목록을 넣는다.
+        """
+        buffer = SharedBuffer(compress_bound(source_size(source), skip_erased))
+        try:
+            future = self._executor().submit(_compress_task, buffer.name, source, level, skip_erased)
+        except BaseException:
+            buffer.release()
+            raise
+        return _chain(future, buffer)
+
+    def digest(self, source):
+        """원본 size/md5/sha256 → Future[dict]"""
+        return self._executor().submit(_digest_task, source)
+
+    def generate(self, size, func, *args):
+        """func(*args) 가 만든 size 바이트 이하의 이미지 → Future[SharedBuffer] (info 에 size/md5/sha256)"""
+        source = generated_source(size, func, *args)
+        buffer = SharedBuffer(source_size(source))
+        try:
+            future = self._executor().submit(_generate_task, buffer.name, source)
+        except BaseException:
+            buffer.release()
+            raise
+        return _chain(future, buffer)
+
+    def shutdown(self):
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown(wait=False, cancel_futures=True)
+                self.executor = None
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_digest_cache = {}
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = CpuPool()
+        return _pool
+
+
+def _cache_key(source):
+    if isinstance(source, str):
+        st = os.stat(source)
+        return (os.path.abspath(source), st.st_size, st.st_mtime_ns)
+    return source
+
+
+def region_digests(regions, pool=None):
+    """영역별 원본 해시 {name: {size, md5, sha256}} (같은 파일은 한 번만 계산)"""
+    pool = pool or get_pool()
+    keys = {region.name: _cache_key(region_source(region)) for region in regions}
+    pending = {}
+    for region in regions:
+        key = keys[region.name]
+        with _pool_lock:
+            cached = key in _digest_cache
+        if not cached and key not in pending:
+            pending[key] = pool.digest(region_source(region))
+    for key, future in pending.items():
+        info = future.result()
+        with _pool_lock:
+            _digest_cache[key] = info
+    with _pool_lock:
+        return {name: _digest_cache[key] for name, key in keys.items()}
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+장치별 NVS 이미지 생성
+시리얼 번호, 보정값, MAC 기반 ID 처럼 보드마다 다른 값을 NVS 파티션 이미지로 만들어서
+펌웨어와 같은 esptool 세션에서 함께 쓴다.
+
+고정 항목과 페이지 헤더(CRC 포함)는 템플릿을 읽을 때 한 번만 인코딩해 두고,
+장치마다 바뀌는 항목은 미리 잡아 둔 자리에 다시 인코딩만 한다.
+형식은 ESP-IDF nvs_partition_gen.py (버전 2) 와 같다.
+"""
+
+import csv
+import json
+import math
+import os
+import struct
+import threading
+import zlib
+
+from flash_core import app_data_dir
+
+# 이미지 폴더에 이 파일이 있으면 장치별 데이터를 함께 쓴다
+DEVICE_DATA_FILE = "device_data.json"
+SERIAL_REGISTRY_FILE = "device_serials.json"
+
+NVS_PAGE_SIZE = 4096
+NVS_ENTRY_SIZE = 32
+NVS_ENTRIES_PER_PAGE = 126
+NVS_FIRST_ENTRY = 64
+NVS_KEY_MAX = 15
+PAGE_STATE_ACTIVE = 0xFFFFFFFE
+NVS_VERSION = 0xFE  # 버전 2 (blob 을 조각 + 인덱스로 저장)
+
+TYPE_STRING = 0x21
+TYPE_BLOB_DATA = 0x42
+TYPE_BLOB_INDEX = 0x48
+INTEGER_TYPES = {
+    "u8": (0x01, "<B"),
+    "i8": (0x11, "<b"),
+    "u16": (0x02, "<H"),
+    "i16": (0x12, "<h"),
+    "u32": (0x04, "<I"),
+    "i32": (0x14, "<i"),
+    "u64": (0x08, "<Q"),
+    "i64": (0x18, "<q"),
+}
+
+ENTRY_WRITTEN = 0b10
+ENTRY_ERASED = 0b00
+
+
+class DeviceImageError(Exception):
+    """장치 데이터 템플릿 또는 값 오류"""
+
+
+def nvs_crc(data):
+    return zlib.crc32(data, 0xFFFFFFFF) & 0xFFFFFFFF
+
+
+def _entry(ns, type_code, span, chunk_index, key, data):
+    entry = bytearray(b"\xff" * NVS_ENTRY_SIZE)
+    entry[0] = ns
+    entry[1] = type_code
+    entry[2] = span
+    entry[3] = chunk_index
+    entry[8:24] = key.encode("ascii").ljust(16, b"\x00")
+    entry[24:32] = data
+    entry[4:8] = struct.pack("<I", nvs_crc(bytes(entry[0:4]) + bytes(entry[8:32])))
+    return entry
+
+
+def _data_entries(payload):
+    """가변 길이 데이터를 32바이트 항목들로 (마지막은 0xFF 채움)"""
+    padded = payload.ljust(math.ceil(len(payload) / NVS_ENTRY_SIZE) * NVS_ENTRY_SIZE, b"\xff")
+    return [padded[i : i + NVS_ENTRY_SIZE] for i in range(0, len(padded), NVS_ENTRY_SIZE)]
+
+
+def encode_item(ns, key, type_name, value):
+    """값 하나를 NVS 항목 목록(각 32바이트)으로 인코딩"""
+    if type_name in INTEGER_TYPES:
+        code, fmt = INTEGER_TYPES[type_name]
+        try:
+            raw = struct.pack(fmt, int(value, 0) if isinstance(value, str) else value)
+        except (struct.error, ValueError) as e:
+            raise DeviceImageError(f"{key}: {type_name} 값이 아닙니다 ({value!r}): {e}")
+        return [_entry(ns, code, 1, 0xFF, key, raw.ljust(8, b"\xff"))]
+
+    if type_name == "string":
+        payload = str(value).encode("utf-8") + b"\x00"
+        chunks = _data_entries(payload)
+        header = struct.pack("<HHI", len(payload), 0xFFFF, nvs_crc(payload))
+        return [_entry(ns, TYPE_STRING, 1 + len(chunks), 0xFF, key, header)] + chunks
+
+    if type_name in ("blob", "float"):
+        if type_name == "float":
+            payload = struct.pack("<f", float(value))
+        elif isinstance(value, str):
+            payload = bytes.fromhex(value)
+        else:
+            payload = bytes(value)
+        chunks = _data_entries(payload)
+        header = struct.pack("<HHI", len(payload), 0xFFFF, nvs_crc(payload))
+        data = _entry(ns, TYPE_BLOB_DATA, 1 + len(chunks), 0, key, header)
+        index = _entry(
+            ns, TYPE_BLOB_INDEX, 1, 0xFF, key, struct.pack("<IBBH", len(payload), 1, 0, 0xFFFF)
+        )
+        return [data] + chunks + [index]
+
+    raise DeviceImageError(f"{key}: 지원하지 않는 형식 {type_name!r}")
+
+
+def reserved_span(type_name, max_length):
+    """장치별 값이 들어갈 자리의 항목 수 (최대 길이 기준)"""
+    if type_name in INTEGER_TYPES:
+        return 1
+    if type_name == "string":
+        return 1 + math.ceil((max_length + 1) / NVS_ENTRY_SIZE)
+    if type_name == "float":
+        return 3
+    if type_name == "blob":
+        return 2 + math.ceil(max_length / NVS_ENTRY_SIZE)
+    raise DeviceImageError(f"지원하지 않는 형식 {type_name!r}")
+
+
+def _set_state(page, index, state):
+    pos = 32 + index // 4
+    shift = (index % 4) * 2
+    page[pos] = (page[pos] & ~(0b11 << shift)) | (state << shift)
+
+
+class SerialRegistry:
+    """MAC 별 시리얼 번호 (같은 보드는 다시 올려도 같은 번호)"""
+
+    def __init__(self, fmt="{counter:06d}", path=None):
+        self.fmt = fmt
+        self.path = path or os.path.join(app_data_dir(), SERIAL_REGISTRY_FILE)
+        self.lock = threading.Lock()
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.data = json.load(f)
+        except (OSError, ValueError):
+            self.data = {"counter": 0, "macs": {}}
+
+    def serial_for(self, mac):
+        with self.lock:
+            serial = self.data["macs"].get(mac)
+            if serial is None:
+                self.data["counter"] += 1
+                serial = self.fmt.format(counter=self.data["counter"], mac=mac.replace(":", ""))
+                self.data["macs"][mac] = serial
+                try:
+                    with open(self.path, "w", encoding="utf-8") as f:
+                        json.dump(self.data, f, indent=2)
+                except OSError:
+                    pass
+            return serial
+
+
+def load_calibration(path):
+    """보정값 CSV (mac 열 + 값 열들) → {mac: {열: 값}}"""
+    table = {}
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        for row in csv.DictReader(f):
+            mac = row.pop("mac", "").strip().lower()
+            if mac:
+                table[mac] = {k: v.strip() for k, v in row.items()}
+    return table
+
+
+class DeviceImageTemplate:
+    """NVS 한 페이지짜리 장치 데이터 템플릿
+
+    fields 항목: {"key", "type", "value"} (고정) 또는
+    {"key", "type", "source", "max_length"} (장치별, source 는 identity 키).
+    """
+
+    def __init__(self, partition, size, namespace, fields, serials=None, calibration=None):
+        self.partition = partition
+        self.size = size
+        self.namespace = namespace
+        self.serials = serials
+        self.calibration = calibration or {}
+        if size < 2 * NVS_PAGE_SIZE or size % NVS_PAGE_SIZE:
+            # NVS 는 빈 페이지가 하나 이상 있어야 초기화됨
+            raise DeviceImageError(f"{partition} 파티션 크기가 NVS 에 맞지 않습니다 (0x{size:x})")
+        if len(namespace) > NVS_KEY_MAX:
+            raise DeviceImageError(f"네임스페이스 이름이 너무 깁니다: {namespace}")
+
+        page = bytearray(b"\xff" * NVS_PAGE_SIZE)
+        header = struct.pack("<IIB", PAGE_STATE_ACTIVE, 0, NVS_VERSION).ljust(28, b"\xff")
+        page[0:28] = header
+        page[28:32] = struct.pack("<I", nvs_crc(header[4:28]))
+
+        self.page = page
+        self.slots = []
+        self.next_index = 0
+        self._place(encode_item(0, namespace, "u8", 1))
+        for field in fields:
+            key = field["key"]
+            if len(key) > NVS_KEY_MAX:
+                raise DeviceImageError(f"키 이름이 너무 깁니다: {key}")
+            type_name = field.get("type", "string")
+            if "source" in field:
+                span = reserved_span(type_name, int(field.get("max_length", 32)))
+                self.slots.append((field, self.next_index, span))
+                self._check_room(span)
+                self.next_index += span
+            else:
+                self._place(encode_item(1, key, type_name, field["value"]))
+        self.tail = b"\xff" * (size - NVS_PAGE_SIZE)
+
+    def __getstate__(self):
+        # 작업 프로세스(cpu_pool)로 넘길 때는 render 에 필요한 값만 (시리얼 기록은 부모 프로세스에서)
+        state = dict(self.__dict__)
+        state["serials"] = None
+        state["calibration"] = {}
+        return state
+
+    def _check_room(self, count):
+        if self.next_index + count > NVS_ENTRIES_PER_PAGE:
+            raise DeviceImageError("장치 데이터가 NVS 한 페이지를 넘습니다")
+
+    def _write(self, page, index, entries):
+        for i, entry in enumerate(entries):
+            pos = NVS_FIRST_ENTRY + (index + i) * NVS_ENTRY_SIZE
+            page[pos : pos + NVS_ENTRY_SIZE] = entry
+            _set_state(page, index + i, ENTRY_WRITTEN)
+
+    def _place(self, entries):
+        self._check_room(len(entries))
+        self._write(self.page, self.next_index, entries)
+        self.next_index += len(entries)
+
+    def identity(self, mac):
+        """MAC 으로 장치 식별 정보 구성 (mac, mac_id, serial, 보정값 열)"""
+        mac = mac.lower()
+        raw = bytes.fromhex(mac.replace(":", ""))
+        identity = {
+            "mac": mac,
+            "mac_hex": raw.hex().upper(),
+            "mac_id": int.from_bytes(raw[-4:], "big"),
+        }
+        if self.serials is not None:
+            identity["serial"] = self.serials.serial_for(mac)
+        identity.update(self.calibration.get(mac, {}))
+        return identity
+
+    def render(self, identity):
+        """장치 한 대 분량의 파티션 이미지 (bytes)"""
+        page = bytearray(self.page)
+        for field, index, span in self.slots:
+            source = field["source"]
+            if source not in identity:
+                raise DeviceImageError(f"{field['key']}: 장치 정보에 {source} 값이 없습니다")
+            entries = encode_item(1, field["key"], field.get("type", "string"), identity[source])
+            if len(entries) > span:
+                raise DeviceImageError(
+                    f"{field['key']}: 값이 max_length 를 넘습니다 ({identity[source]!r})"
+                )
+            self._write(page, index, entries)
+            # 남는 자리는 지워진 항목으로 표시해서 NVS 가 건너뛰게 함
+            for i in range(len(entries), span):
+                _set_state(page, index + i, ENTRY_ERASED)
+        return bytes(page) + self.tail
+
+    def render_for_mac(self, mac):
+        return self.render(self.identity(mac))
+
+
+def load_device_template(image_dir, table):
+    """이미지 폴더의 device_data.json 으로 템플릿 생성 (파일이 없으면 None)"""
+    path = os.path.join(image_dir, DEVICE_DATA_FILE)
+    if not os.path.isfile(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+    except (OSError, ValueError) as e:
+        raise DeviceImageError(f"{DEVICE_DATA_FILE} 을 읽을 수 없습니다: {e}")
+
+    name = config.get("partition", "nvs")
+    part = table.find(name)
+    if part is None:
+        raise DeviceImageError(f"파티션 테이블에 {name} 파티션이 없습니다")
+
+    calibration = None
+    if config.get("calibration"):
+        cal_path = os.path.join(image_dir, config["calibration"])
+        try:
+            calibration = load_calibration(cal_path)
+        except OSError as e:
+            raise DeviceImageError(f"보정값 파일을 읽을 수 없습니다: {e}")
+
+    return DeviceImageTemplate(
+        part.name,
+        part.size,
+        config.get("namespace", "device"),
+        config.get("fields", []),
+        serials=SerialRegistry(config.get("serial_format", "{counter:06d}")),
+        calibration=calibration,
+    )
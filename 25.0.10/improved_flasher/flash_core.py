@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+esptool 실행 코어
+esptool 하위 프로세스를 실행하고 출력 파이프를 감시해서 멈춤(stall)을 감지한다.
+"""
+
+import os
+import queue
+import re
+import subprocess
+import sys
+import threading
+import time
+
+import esptool
+import serial
+from esptool.cmds import detect_flash_size
+from esptool.util import flash_size_bytes
+
+import profiling
+
+# PyInstaller 로 빌드된 EXE 는 "-m esptool" 을 쓸 수 없으므로 자기 자신을 재실행
+ESPTOOL_PASSTHROUGH = "--run-esptool"
+
+STAGE_CONNECT = "connect"
+STAGE_ERASE = "erase"
+STAGE_WRITE = "write"
+STAGE_VERIFY = "verify"
+STAGE_RESET = "reset"
+
+STAGE_NAMES = {
+    STAGE_CONNECT: "연결",
+    STAGE_ERASE: "지우기",
+    STAGE_WRITE: "쓰기",
+    STAGE_VERIFY: "검증",
+    STAGE_RESET: "재시작",
+}
+
+# 단계별로 진행 이벤트 없이 기다릴 수 있는 최대 시간 (초)
+DEFAULT_STALL_THRESHOLDS = {
+    STAGE_CONNECT: 25.0,
+    STAGE_ERASE: 60.0,
+    STAGE_WRITE: 10.0,
+    STAGE_VERIFY: 15.0,
+    STAGE_RESET: 10.0,
+}
+DEFAULT_HARD_TIMEOUT = 300.0
+
+WRITE_PATTERN = re.compile(r"Writing at 0x([0-9a-fA-F]+)")
+WROTE_PATTERN = re.compile(r"Wrote (\d+) bytes")
+
+
+class EsptoolFailed(Exception):
+    """esptool 이 오류 코드로 종료된 경우 (연결 끊김 등)"""
+
+
+class FlashCancelled(Exception):
+    """사용자가 업로드를 취소한 경우"""
+
+    def __init__(self):
+        super().__init__("사용자 취소")
+
+
+class FlashFailed(Exception):
+    """원인 분류(cause)가 붙은 업로드 실패"""
+
+    def __init__(self, message, cause):
+        super().__init__(message)
+        self.cause = cause
+
+
+class FlashStalled(Exception):
+    """진행 없이 제한 시간을 넘긴 경우"""
+
+    def __init__(self, stage, idle, bytes_done):
+        self.stage = stage
+        self.idle = idle
+        self.bytes_done = bytes_done
+        super().__init__(
+            f"{STAGE_NAMES.get(stage, stage)} 단계에서 {idle:.1f}초 동안 진행 없음"
+        )
+
+
+# 실패 원인 분류 (모니터링 지표의 cause 라벨)
+CAUSE_CANCELLED = "cancelled"
+CAUSE_STALL = "stall"
+CAUSE_ESPTOOL = "esptool"
+CAUSE_PORT = "port"
+CAUSE_TIMEOUT = "timeout"
+CAUSE_OTHER = "other"
+
+
+def failure_cause(exc):
+    """예외 → 실패 원인 키"""
+    if isinstance(exc, FlashCancelled):
+        return CAUSE_CANCELLED
+    if isinstance(exc, FlashStalled):
+        return CAUSE_STALL
+    if isinstance(exc, EsptoolFailed):
+        return CAUSE_ESPTOOL
+    if getattr(exc, "cause", None):
+        # FlashFailed 와 원인 키를 클래스 속성으로 가진 예외 (aio_transport 등)
+        return exc.cause
+    if isinstance(exc, TimeoutError):
+        return CAUSE_TIMEOUT
+    if isinstance(exc, (serial.SerialException, OSError)):
+        return CAUSE_PORT
+    return CAUSE_OTHER
+
+
+def app_data_dir():
+    """저널/설정 등 로컬 상태를 저장하는 폴더"""
+    base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    name = "ESP32-S3_Flasher" if os.environ.get("LOCALAPPDATA") else ".esp32s3_flasher"
+    path = os.path.join(base, name)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+# ESP32 USB-UART 브리지로 판단하는 포트 설명 키워드
+ESP32_PORT_KEYWORDS = ["esp32", "cp210", "ch340", "serial", "uart"]
+
+
+def is_esp32_port(port):
+    """list_ports 항목이 ESP32 장치로 보이는지 확인"""
+    desc_lower = (port.description or "").lower()
+    return any(keyword in desc_lower for keyword in ESP32_PORT_KEYWORDS)
+
+
+def esptool_command(args):
+    """esptool 실행 명령 구성 (EXE 에서는 자기 자신을 passthrough 모드로 실행)"""
+    if getattr(sys, "frozen", False):
+        return [sys.executable, ESPTOOL_PASSTHROUGH] + list(args)
+    return [sys.executable, "-u", "-m", "esptool"] + list(args)
+
+
+def classify_line(line):
+    """esptool 출력 한 줄을 (단계, 바이트 카운터) 로 분류"""
+    match = WRITE_PATTERN.search(line)
+    if match:
+        return STAGE_WRITE, int(match.group(1), 16)
+    match = WROTE_PATTERN.search(line)
+    if match:
+        return STAGE_VERIFY, int(match.group(1))
+    if "erased from" in line or "Compressed" in line or "Erasing" in line:
+        return STAGE_ERASE, None
+    if "Hash of data verified" in line:
+        return STAGE_WRITE, None
+    if "Hard resetting" in line or "Leaving" in line:
+        return STAGE_RESET, None
+    if (
+        "Connecting" in line
+        or "Chip is" in line
+        or "Uploading stub" in line
+        or "Changing baud" in line
+    ):
+        return STAGE_CONNECT, None
+    return None, None
+
+
+class StallWatchdog:
+    """진행 이벤트와 바이트 카운터로 단계별 멈춤 감지"""
+
+    def __init__(self, thresholds=None, hard_timeout=DEFAULT_HARD_TIMEOUT, observer=None):
+        self.thresholds = dict(DEFAULT_STALL_THRESHOLDS)
+        if thresholds:
+            self.thresholds.update(thresholds)
+        self.hard_timeout = hard_timeout
+        # 단계 전환/쓴 바이트를 받는 객체 (metrics.SessionMetrics, None 이면 생략)
+        self.observer = observer
+        self.start()
+
+    def start(self):
+        now = time.monotonic()
+        self.started = now
+        self.last_progress = now
+        self.stage = STAGE_CONNECT
+        self.counter = None
+        self.bytes_done = 0
+        if self.observer is not None:
+            self.observer.enter_stage(STAGE_CONNECT)
+
+    def feed(self, stage, counter=None):
+        """진행 이벤트 기록 (단계가 바뀌거나 카운터가 변하면 타이머 리셋)"""
+        if stage is None:
+            return
+        if stage != self.stage or counter != self.counter:
+            self.last_progress = time.monotonic()
+            if stage != self.stage and self.observer is not None:
+                self.observer.enter_stage(stage)
+        if stage == STAGE_WRITE and counter is not None and self.counter is not None:
+            if counter > self.counter:
+                self.bytes_done += counter - self.counter
+                if self.observer is not None:
+                    self.observer.add_bytes(counter - self.counter)
+        self.stage = stage
+        self.counter = counter
+
+    def check(self):
+        """멈춤이면 FlashStalled 발생"""
+        now = time.monotonic()
+        idle = now - self.last_progress
+        if idle > self.thresholds.get(self.stage, DEFAULT_STALL_THRESHOLDS[STAGE_WRITE]):
+            raise FlashStalled(self.stage, idle, self.bytes_done)
+        if self.hard_timeout and now - self.started > self.hard_timeout:
+            raise FlashStalled(self.stage, now - self.started, self.bytes_done)
+
+
+class SessionResult:
+    """장치 한 대의 업로드 세션 결과"""
+
+    def __init__(self, port):
+        self.port = port
+        self.success = False
+        self.error = None
+        self.attempts = 0
+        self.cancelled = False
+        self.stalls = []
+        # 부팅 확인 결과 (boot_check.BootCheckResult.as_dict)
+        self.boot = None
+        # 전부 0xFF 라서 보내지 않은 바이트 수 (block_filter)
+        self.bytes_skipped = 0
+        # 명령 왕복 시간 (초, 측정한 경우만)
+        self.rtt = None
+        # 실패 원인 키 (failure_cause, 성공이면 None)
+        self.cause = None
+        self.started_at = time.time()
+        self.duration = 0.0
+
+    def record_stall(self, stall):
+        self.stalls.append(
+            {
+                "attempt": self.attempts,
+                "stage": stall.stage,
+                "idle": round(stall.idle, 1),
+                "bytes": stall.bytes_done,
+            }
+        )
+
+    def finish(self, success, error=None, cause=None):
+        self.success = success
+        self.error = error
+        if not success:
+            self.cause = CAUSE_CANCELLED if self.cancelled else (cause or CAUSE_OTHER)
+        self.duration = time.time() - self.started_at
+
+    def summary(self):
+        state = "성공" if self.success else ("취소" if self.cancelled else "실패")
+        text = f"{self.port}: {state}, 시도 {self.attempts}회, {self.duration:.1f}초"
+        if self.stalls:
+            text += f", 멈춤 {len(self.stalls)}회"
+        if self.rtt is not None:
+            text += f", 왕복 {self.rtt * 1e3:.1f}ms"
+        if self.bytes_skipped:
+            text += f", 0xFF {self.bytes_skipped // 1024}KB 생략"
+        if self.boot and self.boot["ok"]:
+            text += f", 부팅 {self.boot['boot_time']:.1f}초"
+        return text
+
+
+def _pump(stream, lines):
+    """파이프를 읽어서 큐에 넣는 스레드 본체 (EOF 시 None)"""
+    try:
+        for line in iter(stream.readline, ""):
+            lines.put(line)
+    except (OSError, ValueError):
+        pass
+    finally:
+        lines.put(None)
+
+
+def run_esptool(args, on_line, watchdog, poll_interval=0.2, cancel_event=None):
+    """esptool 하위 프로세스 실행
+
+    멈춤 감지 시 FlashStalled, 취소 요청 시 FlashCancelled 를 발생시키며
+    두 경우 모두 프로세스를 종료해서 포트를 해제한다.
+    """
+    env = dict(os.environ, PYTHONUNBUFFERED="1")
+    creationflags = getattr(subprocess, "CREATE_NO_WINDOW", 0)
+    process = subprocess.Popen(
+        esptool_command(args),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        universal_newlines=True,
+        bufsize=1,
+        env=env,
+        creationflags=creationflags,
+    )
+
+    lines = queue.Queue()
+    reader = threading.Thread(target=_pump, args=(process.stdout, lines), daemon=True)
+    reader.start()
+    watchdog.start()
+
+    try:
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                raise FlashCancelled()
+            try:
+                with profiling.span("esptool.pipe_wait", "pipe"):
+                    line = lines.get(timeout=poll_interval)
+            except queue.Empty:
+                watchdog.check()
+                continue
+            if line is None:
+                break
+            line = line.strip()
+            if line:
+                with profiling.span("esptool.line", "parse"):
+                    watchdog.feed(*classify_line(line))
+                    on_line(line)
+            watchdog.check()
+        return process.wait()
+    finally:
+        # 멈춤/취소/예외 시 프로세스를 종료해서 COM 포트를 즉시 해제
+        if process.poll() is None:
+            process.kill()
+            try:
+                process.wait(timeout=0.5)
+            except subprocess.TimeoutExpired:
+                pass
+        reader.join(timeout=0.2)
+
+
+def reset_device(port, bootloader=False):
+    """DTR/RTS 로 장치 재시작 (bootloader=True 면 다운로드 모드로 진입)"""
+    with serial.Serial() as ser:
+        ser.port = port
+        # 포트를 열 때 DTR/RTS 가 튀지 않도록 먼저 설정
+        ser.dtr = False
+        ser.rts = False
+        ser.open()
+        ser.rts = True  # EN low
+        time.sleep(0.1)
+        if bootloader:
+            ser.dtr = True  # IO0 low
+            ser.rts = False  # EN high
+            time.sleep(0.05)
+            ser.dtr = False
+        else:
+            ser.rts = False
+
+
+def probe_device(port, efuse_regs=()):
+    """다운로드 모드로 연결해서 칩 정보, MAC, 플래시 크기, 요청한 eFuse 레지스터 읽기
+
+    포트만 닫고 리셋하지 않으므로 장치는 ROM 전송 속도의 다운로드 모드로 남는다
+    (이어서 esptool 을 --before no_reset 으로 실행 가능).
+    """
+    esp = esptool.detect_chip(port, esptool.ESPLoader.ESP_ROM_BAUD)
+    try:
+        esp.flash_spi_attach(0)
+        return {
+            "chip": esp.CHIP_NAME,
+            "description": esp.get_chip_description(),
+            "mac": ":".join(f"{b:02x}" for b in esp.read_mac()),
+            "flash_size": detect_flash_size(esp),
+            "efuse": {addr: esp.read_reg(addr) for addr in efuse_regs},
+        }
+    finally:
+        esp._port.close()
+
+
+def erase_ranges(port, ranges, flash_size=None, reset=True):
+    """ROM FLASH_BEGIN 으로 [(offset, size)] 범위만 지우고 다운로드 모드로 남김
+
+    esptool write_flash 는 쓰는 길이만큼만 지우므로, 보내지 않는 빈 섹터는 여기서 먼저 지운다.
+    포트만 닫고 리셋하지 않으므로 이어서 esptool 을 --before no_reset 으로 실행한다.
+    reset=False 면 이미 다운로드 모드인 장치에 동기화만 한다.
+    """
+    esp = esptool.detect_chip(
+        port, esptool.ESPLoader.ESP_ROM_BAUD, "default_reset" if reset else "no_reset"
+    )
+    try:
+        esp.flash_spi_attach(0)
+        size = flash_size if flash_size not in (None, "detect", "keep") else detect_flash_size(esp)
+        if size:
+            # ROM 의 기본 플래시 크기보다 뒤쪽 주소도 지울 수 있도록 (esptool write_flash 와 같음)
+            esp.flash_set_parameters(flash_size_bytes(size))
+        for offset, length in ranges:
+            esp.flash_begin(length, offset)
+    finally:
+        esp._port.close()
+
@@ -0,0 +1,624 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+장치 한 대 업로드 작업
+GUI 와 CLI 가 함께 쓰는 업로드 흐름 (계획 → 이어쓰기 확인 → esptool 실행 → 재시도/취소).
+"""
+
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+
+from block_filter import split_file
+from boot_check import run_boot_check
+from chip_layouts import ChipLayoutError, image_layout, layout_for
+from cpu_pool import get_pool, region_digests
+from flash_core import (
+    EsptoolFailed,
+    FlashCancelled,
+    FlashFailed,
+    FlashStalled,
+    SessionResult,
+    StallWatchdog,
+    erase_ranges,
+    failure_cause,
+    probe_device,
+    reset_device,
+    run_esptool,
+)
+from history_db import manifest_hash
+from metrics import SessionMetrics
+import profiling
+from profiles import FLASH_DEFAULTS
+from partition_table import (
+    FlashRegion,
+    PartitionTableError,
+    esptool_region_args,
+    load_partition_table,
+    plan_flash,
+    sector_align,
+)
+from resume import SessionJournal, resume_regions
+from serial_tuning import tune_port
+
+# 멈춤/연결 끊김 후 자동 재시도 횟수
+STALL_RETRIES = 1
+# 재시도 전 USB 재인식 대기 시간 (초)
+RETRY_DELAY = 2.0
+
+
+def _print_log(message, level="INFO"):
+    print(f"[{level}] {message}")
+
+
+def _no_progress(percentage, status_text):
+    pass
+
+
+class FlashJob:
+    """장치 한 대에 대한 업로드 작업"""
+
+    def __init__(
+        self,
+        port,
+        baud,
+        bootloader_path,
+        partitions_path,
+        firmware_path,
+        clear_nvs=False,
+        auto_retry=True,
+        log=_print_log,
+        progress=_no_progress,
+        device_data=None,
+        device_info=None,
+        boot_check=None,
+        history=None,
+        profiles=None,
+    ):
+        self.port = port
+        self.baud = str(baud)
+        self.bootloader_path = bootloader_path
+        self.partitions_path = partitions_path
+        self.firmware_path = firmware_path
+        self.clear_nvs = clear_nvs
+        self.auto_retry = auto_retry
+        self.log = log
+        self.progress = progress
+        # 장치별 NVS 이미지 템플릿 (device_image.DeviceImageTemplate) 과 연결 단계에서 읽은 정보
+        self.device_data = device_data
+        self.device_info = device_info or {}
+        # 업로드 후 부팅 확인 설정 (boot_check.BootCheckConfig, None 이면 생략)
+        self.boot_check = boot_check
+        # 업로드 이력 기록 (history_db.HistoryWriter, None 이면 기록 안 함)
+        self.history = history
+        # 보드별 프로필 선택 (profiles.ProfileSet, None 이면 위 경로의 이미지를 그대로 씀)
+        self.profiles = profiles
+        self.profile = None
+        self.flash_params = dict(FLASH_DEFAULTS)
+        # 이미지 대상 칩 레이아웃 (chip_layouts.ChipLayout, 계획 수립 시 결정)
+        self.layout = None
+        self.manifest_hash = None
+        self.cancel_event = threading.Event()
+        self.result = SessionResult(port)
+        self.metrics = None
+        self.writing_started = False
+        self.plan = None
+        self.verified_regions = set()
+        # 연결 단계가 장치를 다운로드 모드로 남겨 뒀으면 esptool 이 다시 리셋하지 않음
+        self.in_download_mode = False
+        # 부팅 확인을 별도 단계에서 실행 (run 은 쓰기까지만, 이후 run_boot_check 호출)
+        self.defer_boot_check = False
+
+    def cancel(self):
+        """협조적 취소 요청 (esptool 프로세스는 다음 폴링 주기에 종료됨)"""
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def check_cancel(self):
+        if self.cancel_event.is_set():
+            raise FlashCancelled()
+
+    @property
+    def boot_pending(self):
+        """쓰기는 성공했고 미뤄 둔 부팅 확인이 남았는지"""
+        return self.defer_boot_check and self.boot_check is not None and self.result.success
+
+    @property
+    def boot_check_resets(self):
+        """부팅 확인이 직접 재시작하는지 (그러면 esptool 은 재시작하지 않아 보드가 한 번만 부팅)"""
+        return self.boot_check is not None and self.boot_check.reset
+
+    def run(self):
+        """업로드 실행 후 SessionResult 반환 (예외를 밖으로 던지지 않음)
+
+        defer_boot_check 이면 쓰기까지만 하고, 결과 기록은 run_boot_check 가 끝날 때 한다.
+        """
+        port = self.port
+        result = self.result
+        work_dir = None
+        tuning = None
+        self.metrics = SessionMetrics(port)
+        try:
+            self.progress(0, "연결 중...")
+            self.log(f"\n{'='*60}")
+            self.log("펌웨어 업로드 시작")
+            self.log(f"포트: {port}")
+            self.log(f"전송 속도: {self.baud}")
+            self.log(f"{'='*60}\n")
+
+            if self.profiles is not None:
+                with profiling.span("job.select_profile", "device", port=port):
+                    self.select_profile()
+            self.layout = self.chip_layout()
+            self.log(f"대상 칩: {self.layout.name}")
+
+            # 파티션 테이블 기준으로 쓰기/지우기 계획 수립
+            plan = self.plan = self.build_flash_plan()
+            work_dir = tempfile.mkdtemp(prefix="esp32_flash_")
+            if self.device_data is not None:
+                self.add_device_region(plan, work_dir)
+
+            # 연결 단계
+            self.progress(5, f"{self.layout.name}에 연결 중... (5%)")
+
+            # esptool 명령 구성 (주소/파일 인자는 시도마다 남은 영역으로 구성)
+            base_command = [
+                "--chip",
+                self.layout.esptool_name,
+                "--port",
+                port,
+                "--baud",
+                self.baud,
+                "--no-stub",
+                "--after",
+                "no_reset" if self.boot_check_resets else "hard_reset",
+                "write_flash",
+                "-z",
+                "--flash_mode",
+                self.flash_params["mode"],
+                "--flash_freq",
+                self.flash_params["freq"],
+                "--flash_size",
+                self.flash_params["size"],
+            ]
+            # USB-시리얼 지연 시간 낮추기 (esptool 이 포트를 여는 동안 유지, 끝나면 복원)
+            tuning = tune_port(port)
+            if tuning.applied:
+                self.log(f"포트 저지연 설정: {tuning.describe()}")
+
+            # 이미지 해시는 작업 프로세스에서 한 번만 계산해서 모든 장치가 공유
+            digests = region_digests(plan.regions)
+            # 장치별 NVS 이미지는 보드마다 달라서 묶음 해시에서 제외
+            device_part = self.device_data.partition if self.device_data is not None else None
+            self.manifest_hash = manifest_hash(
+                {name: info["sha256"] for name, info in digests.items() if name != device_part}
+            )
+            journal = SessionJournal(
+                port,
+                plan.regions,
+                digests={name: info["sha256"] for name, info in digests.items()},
+            )
+
+            # 연결 완료
+            self.progress(10, "연결 완료, 펌웨어 업로드 시작... (10%)")
+
+            # esptool 실행 (출력을 실시간으로 캡처, 멈춤/끊김 시 이어쓰기로 재시도)
+            max_attempts = 1 + STALL_RETRIES if self.auto_retry else 1
+            while True:
+                self.check_cancel()
+                result.attempts += 1
+                try:
+                    with profiling.span("job.resume_check", "device", port=port):
+                        regions = self.remaining_regions(journal, work_dir)
+                    # 장치 MD5 로 이미 확인되어 건너뛴 영역
+                    self.verified_regions.update(
+                        {r.name for r in plan.regions} - {r.name for r in regions}
+                    )
+                    self.check_cancel()
+                    if regions:
+                        regions, gaps = self.skip_blank(regions, work_dir)
+                        if gaps:
+                            self.erase_gaps(gaps)
+                        # 이미 다운로드 모드로 대기 중이면 리셋/부트 모드 진입 없이 동기화만
+                        before = "no_reset" if self.in_download_mode else "default_reset"
+                        self.in_download_mode = False
+                        command = (
+                            ["--before", before]
+                            + base_command
+                            + esptool_region_args(regions, work_dir)
+                        )
+                        with profiling.span("job.esptool", "device", port=port):
+                            self.run_esptool_with_progress(command, regions, journal)
+                    break
+                except (FlashStalled, EsptoolFailed) as e:
+                    if isinstance(e, FlashStalled):
+                        result.record_stall(e)
+                        self.log(f"진행 멈춤 감지: {e}", "WARNING")
+                    if result.attempts >= max_attempts:
+                        raise
+                    self.log(f"포트를 해제하고 다시 시도합니다 ({result.attempts + 1}회차)")
+                    self.progress(5, "재연결 중... (5%)")
+                    if self.cancel_event.wait(RETRY_DELAY):
+                        raise FlashCancelled()
+
+            journal.clear()
+            # 쓰기는 끝났으므로 이후 취소 시에는 앱으로 재시작
+            self.writing_started = False
+            # esptool 이 장치 MD5 로 확인한 영역만 완료로 인정
+            missing = self.unverified_regions()
+            if missing:
+                raise FlashFailed("해시 검증되지 않은 영역: " + ", ".join(missing), "verify")
+            if self.boot_check is not None and not self.defer_boot_check:
+                with profiling.span("job.boot_check", "device", port=port):
+                    self.verify_boot()
+            result.finish(True)
+            if self.boot_pending:
+                self.progress(96, "쓰기 완료, 부팅 확인 대기 중... (96%)")
+                self.log("쓰기 완료, 부팅 확인 단계로 넘어갑니다.")
+            else:
+                self.report_success()
+
+        except FlashCancelled:
+            result.cancelled = True
+            result.finish(False, "사용자 취소")
+            self.progress(0, "취소됨")
+            self.log("업로드가 취소되었습니다.", "WARNING")
+            self.leave_known_state()
+
+        except Exception as e:
+            result.finish(False, str(e), failure_cause(e))
+            self.progress(0, "오류 발생")
+            self.log(f"펌웨어 업로드 중 오류 발생:\n{str(e)}", "ERROR")
+
+        finally:
+            if tuning is not None:
+                tuning.restore()
+            if work_dir:
+                shutil.rmtree(work_dir, ignore_errors=True)
+            if not self.boot_pending:
+                self.record_session()
+
+        return result
+
+    def run_boot_check(self):
+        """미뤄 둔 부팅 확인 실행 후 SessionResult 반환 (파이프라인의 부팅 확인 단계)"""
+        result = self.result
+        try:
+            with profiling.span("job.boot_check", "device", port=self.port):
+                self.verify_boot()
+            result.finish(True)
+            self.report_success()
+        except FlashCancelled:
+            result.cancelled = True
+            result.finish(False, "사용자 취소")
+            self.progress(0, "취소됨")
+            self.log("부팅 확인이 취소되었습니다.", "WARNING")
+            self.leave_known_state()
+        except Exception as e:
+            result.finish(False, str(e), failure_cause(e))
+            self.progress(0, "오류 발생")
+            self.log(f"부팅 확인 중 오류 발생:\n{str(e)}", "ERROR")
+        finally:
+            self.record_session()
+        return result
+
+    def skip_boot_check(self):
+        """미뤄 둔 부팅 확인 없이 끝냄 (파이프라인 취소) - 앱으로 재시작하고 취소로 기록"""
+        self.result.cancelled = True
+        self.result.finish(False, "사용자 취소")
+        self.leave_known_state()
+        self.record_session()
+
+    def report_success(self):
+        self.progress(100, "업로드 완료! (100%)")
+        self.log("\n" + "=" * 60)
+        self.log("✓ 펌웨어 업로드가 성공적으로 완료되었습니다!", "SUCCESS")
+        self.log("=" * 60 + "\n")
+
+    def record_session(self):
+        """세션 결과를 로그/지표/이력 DB 에 기록"""
+        self.log(f"세션 결과 - {self.result.summary()}")
+        self.metrics.finish(self.result)
+        if self.history is not None:
+            self.history.record(self)
+
+    def verify_boot(self):
+        """하드 리셋 후 콘솔 출력으로 펌웨어가 실제로 동작하는지 확인"""
+        self.progress(97, "부팅 확인 중... (97%)")
+        self.log("부팅 확인 중 (콘솔 출력 대기)...")
+        self.metrics.enter_stage("boot_check")
+        try:
+            boot = run_boot_check(self.port, self.boot_check, self.cancel_event)
+        except Exception as e:
+            raise FlashFailed(f"부팅 확인용 포트를 열 수 없습니다: {e}", "boot_check")
+        self.result.boot = boot.as_dict()
+        self.check_cancel()
+        if not boot.ok:
+            tail = boot.console.decode("utf-8", "replace").strip().splitlines()[-10:]
+            for line in tail:
+                self.log(f"  | {line}")
+            raise FlashFailed(f"부팅 확인 실패: {boot.reason}", "boot_check")
+        self.log(f"✓ 부팅 확인 완료 ({boot.boot_time:.1f}초): {boot.reason}", "SUCCESS")
+
+    def unverified_regions(self):
+        """해시 검증을 거치지 않은 영역 이름 목록"""
+        if self.plan is None:
+            return []
+        return [r.name for r in self.plan.regions if r.name not in self.verified_regions]
+
+    def leave_known_state(self):
+        """취소 후 장치를 정해진 상태로 재시작 (쓰기 중이었으면 다운로드 모드)"""
+        bootloader = self.writing_started
+        try:
+            reset_device(self.port, bootloader=bootloader)
+            state = "다운로드 모드" if bootloader else "앱"
+            self.log(f"장치를 {state}로 재시작했습니다.")
+        except Exception as e:
+            self.log(f"장치 재시작 실패: {e}", "WARNING")
+
+    def connect_device(self):
+        """단일 업로드의 연결 단계: 칩/MAC/eFuse 를 한 번에 읽고 다운로드 모드로 남김
+
+        프로필 선택과 장치 데이터가 같은 연결의 정보를 쓰고, 이후 이어쓰기 확인/빈 섹터
+        지우기/esptool 은 리셋 없이 붙는다 (파이프라인은 연결 단계에서 읽은 정보를 넘겨줌).
+        esptool 명령줄에 장치별 이미지 파일이 있어야 하므로 MAC 은 esptool 전에 읽는다.
+        """
+        efuse_regs = self.profiles.efuse_regs if self.profiles is not None else ()
+        self.device_info = probe_device(self.port, efuse_regs)
+        self.in_download_mode = True
+
+    def select_profile(self):
+        """장치 정보로 프로필을 고르고 이미지 경로/플래시 설정 적용"""
+        profiles = self.profiles
+        if profiles.needs_device_info and not self.device_info.get("chip"):
+            self.log("프로필 선택을 위해 장치 정보 읽는 중...")
+            self.connect_device()
+        profile = self.profile = profiles.select(self.device_info)
+        self.bootloader_path = profile.bootloader_path
+        self.partitions_path = profile.partitions_path
+        self.firmware_path = profile.firmware_path
+        self.flash_params = dict(profile.flash)
+        if len(profiles) > 1:
+            self.log(f"프로필: {profile.describe()}")
+
+    def chip_layout(self):
+        """이미지 대상 칩 레이아웃 (연결 단계에서 읽은 칩과 다르면 FlashFailed)"""
+        layout = self.profile.layout if self.profile is not None else None
+        if layout is None:
+            layout = image_layout(self.firmware_path)
+        chip = self.device_info.get("chip")
+        try:
+            device = layout_for(chip) if chip else None
+        except ChipLayoutError as e:
+            raise FlashFailed(str(e), "chip")
+        if layout is None:
+            if device is None:
+                raise FlashFailed("firmware.bin 의 대상 칩을 알 수 없습니다", "image")
+            layout = device
+        if device is not None and device is not layout:
+            raise FlashFailed(f"{layout.name} 용 이미지를 {device.name} 보드에 쓸 수 없습니다", "chip")
+        return layout
+
+    def build_flash_plan(self):
+        """partitions.bin 을 해석해서 최소 쓰기 계획 생성"""
+        try:
+            if self.profile is not None:
+                # 시작할 때 읽어 둔 파티션 테이블 사용
+                plan = self.profile.plan(self.clear_nvs)
+            else:
+                plan = plan_flash(
+                    load_partition_table(self.partitions_path),
+                    self.bootloader_path,
+                    self.partitions_path,
+                    self.firmware_path,
+                    bootloader_offset=self.layout.bootloader_offset,
+                    clear_nvs=self.clear_nvs,
+                )
+        except (OSError, PartitionTableError) as e:
+            raise FlashFailed(f"파티션 테이블 오류: {e}", "image")
+
+        for line in plan.describe():
+            self.log(line)
+        return plan
+
+    def add_device_region(self, plan, work_dir):
+        """장치별 NVS 이미지를 만들어서 같은 세션의 쓰기 계획에 추가"""
+        if not self.device_info.get("mac"):
+            self.log("장치 데이터 생성을 위해 MAC 읽는 중...")
+            self.connect_device()
+        mac = self.device_info["mac"]
+        template = self.device_data
+        # 시리얼 발급은 여기서, 이미지 인코딩은 작업 프로세스에서 (결과는 공유 메모리)
+        identity = template.identity(mac)
+        path = os.path.join(work_dir, f"device_{template.partition}.bin")
+        with get_pool().generate(template.size, template.render, identity).result() as image:
+            with open(path, "wb") as f:
+                f.write(image.view)
+            size = len(image)
+        offset = plan.table.find(template.partition).offset
+        region = FlashRegion(template.partition, offset, size, path)
+        plan.set_region(region)
+        serial = identity.get("serial")
+        self.log(
+            f"장치 데이터: {template.partition} 0x{region.offset:05x} "
+            f"(MAC {mac}" + (f", 시리얼 {serial})" if serial else ")")
+        )
+
+    def skip_blank(self, regions, work_dir):
+        """파일 영역을 0xFF 가 아닌 구간별 조각으로 나눔 → (조각 영역 목록, 지우기만 할 [(offset, size)])
+
+        조각은 영역 이름을 그대로 쓰고 write_flash 의 주소/파일 쌍 하나씩이 된다.
+        esptool 은 조각 길이만큼만 지우므로, 원래 영역이 지우던 범위 중 조각이 덮지 않는
+        섹터는 지우기 목록으로 돌려준다 (erase_gaps).
+        """
+        pieces = []
+        gaps = []
+        skipped = 0
+        for region in regions:
+            if region.is_erase:
+                pieces.append(region)
+                continue
+            covered = region.offset
+            for start, end, path in split_file(region.path, work_dir, f"piece_{region.name}"):
+                offset = region.offset + start
+                if offset > covered:
+                    gaps.append((covered, offset - covered))
+                pieces.append(FlashRegion(region.name, offset, end - start, path))
+                covered = offset + sector_align(end - start)
+                skipped -= end - start
+            skipped += region.size
+            erase_end = region.offset + region.erase_size
+            if covered < erase_end:
+                gaps.append((covered, erase_end - covered))
+        if skipped:
+            self.log(f"0xFF 블록 {skipped} 바이트 전송 생략")
+        self.result.bytes_skipped = skipped
+        return pieces, gaps
+
+    def erase_gaps(self, gaps):
+        """보내지 않는 빈 섹터만 먼저 지우고 다운로드 모드로 남김 (이어서 esptool 은 리셋 없이 연결)"""
+        total = sum(size for _, size in gaps)
+        self.log(f"빈 섹터 {total // 1024}KB 지우는 중 ({len(gaps)}개 구간, 전송 없음)...")
+        self.writing_started = True
+        reset = not self.in_download_mode
+        self.in_download_mode = False
+        try:
+            with profiling.span("job.erase_gaps", "device", port=self.port):
+                erase_ranges(self.port, gaps, self.flash_params["size"], reset=reset)
+        except Exception as e:
+            # 연결 끊김 등은 esptool 실패와 같이 재시도
+            raise EsptoolFailed(f"빈 섹터 지우기 실패: {e}")
+        self.in_download_mode = True
+
+    def remaining_regions(self, journal, work_dir):
+        """이전 시도 기록이 있으면 장치 MD5 로 확인한 뒤 남은 영역만 반환
+
+        연결 단계가 다운로드 모드로 남겨 둔 장치는 리셋하지 않고 확인하며,
+        확인이 끝나면 다시 다운로드 모드로 남는다.
+        """
+        if not journal.has_progress():
+            return journal.regions
+        self.log("이전 업로드 기록 발견, 장치에 기록된 블록 확인 중...")
+        reset = not self.in_download_mode
+        self.in_download_mode = False
+        try:
+            regions = resume_regions(
+                self.port, self.baud, journal, work_dir, self.log, reset=reset
+            )
+            self.in_download_mode = bool(regions)
+            return regions
+        except Exception as e:
+            # 확인에 실패하면 처음부터 전체 쓰기
+            self.log(f"이어쓰기 확인 실패, 처음부터 업로드합니다: {e}", "WARNING")
+            journal.clear()
+            return journal.regions
+
+    def run_esptool_with_progress(self, command, regions, journal=None):
+        """esptool 실행하면서 진행률 추적 (멈춤 감지 시 FlashStalled 발생)"""
+        file_names = [region.name for region in regions]
+        file_addresses = [f"0x{region.offset:08x}" for region in regions]
+        # 조각으로 나뉜 영역은 마지막 조각까지 검증되어야 완료
+        last_piece = {name: i for i, name in enumerate(file_names)}
+        phase_progress_range = 67.5 / len(regions)  # 파일 구간: 25% ~ 92.5%
+        state = {"file_index": -1}
+
+        def on_line(line):
+            self.log(line)
+            current_file_index = state["file_index"]
+
+            # 연결 완료 감지
+            if "Chip is " in line:
+                self.device_info.setdefault("chip", line.split("Chip is", 1)[1].strip())
+                self.progress(15, f"{self.layout.name} 감지 완료... (15%)")
+
+            elif line.startswith("MAC:"):
+                self.device_info.setdefault("mac", line[4:].strip().lower())
+
+            elif "Uploading stub" in line:
+                self.progress(20, "업로드 스텁 준비 중... (20%)")
+
+            # 각 파일 쓰기 시작 감지
+            elif "Writing" in line and "at 0x" in line:
+                self.writing_started = True
+                # 이어쓰기용으로 전송이 끝난 위치 기록
+                address_match = re.search(r"at 0x([0-9a-fA-F]+)", line)
+                if journal is not None and address_match:
+                    journal.mark_written(int(address_match.group(1), 16))
+
+                # 주소로 현재 파일 파악
+                for i, addr in enumerate(file_addresses):
+                    if addr in line.lower():
+                        if current_file_index != i:
+                            current_file_index = state["file_index"] = i
+                            base_file_progress = 25 + (i * phase_progress_range)
+                            self.progress(
+                                base_file_progress,
+                                f"{file_names[i]} 업로드 시작... ({int(base_file_progress)}%)",
+                            )
+                        break
+
+                # 진행률 패턴 매칭 (예: "Writing at 0x00008000... (100 %)")
+                progress_match = re.search(r"\((\d+)\s*%\)", line)
+                if progress_match and current_file_index >= 0:
+                    file_percent = int(progress_match.group(1))
+
+                    # 전체 진행률 계산 (파일 구간을 영역 수로 균등 분할)
+                    base_file_progress = 25 + (
+                        current_file_index * phase_progress_range
+                    )
+                    total_progress = base_file_progress + (
+                        file_percent * phase_progress_range / 100
+                    )
+
+                    current_file = file_names[current_file_index]
+                    status_text = (
+                        f"{current_file} 업로드 중... ({int(total_progress)}%)"
+                    )
+
+                    self.progress(total_progress, status_text)
+
+            # 파일 완료 감지
+            elif "Hash of data verified" in line and current_file_index >= 0:
+                completed_file = file_names[current_file_index]
+                if last_piece[completed_file] == current_file_index:
+                    self.verified_regions.add(completed_file)
+                    if journal is not None:
+                        journal.mark_verified(completed_file)
+                completion_progress = 25 + (
+                    (current_file_index + 1) * phase_progress_range
+                )
+                status_text = f"{completed_file} 완료! ({int(completion_progress)}%)"
+                self.progress(completion_progress, status_text)
+
+                # 다음 파일 예고 (마지막 파일이 아닌 경우)
+                if current_file_index < len(file_names) - 1:
+                    time.sleep(0.5)  # 잠시 완료 상태 표시
+                    next_file = file_names[current_file_index + 1]
+                    status_text = (
+                        f"{next_file} 준비 중... ({int(completion_progress)}%)"
+                    )
+                    self.progress(completion_progress, status_text)
+
+            # 하드 리셋 감지
+            elif "Hard resetting" in line:
+                self.progress(95, "장치 재시작 중... (95%)")
+
+            # 오류 감지
+            elif "Error" in line or "Failed" in line:
+                self.log(f"오류 감지: {line}", "ERROR")
+
+        # 파이프를 감시하면서 실행 (멈춤/취소 시 프로세스 종료 → 포트 해제)
+        return_code = run_esptool(
+            command,
+            on_line,
+            StallWatchdog(observer=self.metrics),
+            cancel_event=self.cancel_event,
+        )
+        if return_code != 0:
+            raise EsptoolFailed(f"esptool 실행 실패 (코드: {return_code})")
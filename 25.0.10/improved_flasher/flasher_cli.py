@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ESP32-S3 Firmware Flasher (명령줄 버전)
+GUI 와 같은 업로드 코어를 사용한다. Ctrl+C 로 업로드를 취소할 수 있다.
+포트를 여러 개 주면 asyncio 전송으로 이벤트 루프 하나에서 동시에 업로드한다.
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+
+import aio_transport
+from coordinator import CoordinatorError, connect_station
+from flash_job import STALL_RETRIES, FlashJob
+from boot_check import BootCheckConfig
+from cpu_pool import region_digests
+from device_image import DeviceImageError, load_device_template
+from history_db import HistoryWriter, manifest_hash
+from hotplug import FlashedRegistry
+from metrics import start_server
+from partition_table import PartitionTableError
+import profiling
+from profiles import ProfileError, ProfileSet
+
+# Ctrl+C 후 작업 종료를 기다리는 최대 시간 (초)
+CANCEL_TIMEOUT = 2.0
+
+
+def default_image_dir():
+    """바이너리 파일 기본 위치 (EXE 내부 또는 스크립트 폴더)"""
+    if getattr(sys, "frozen", False):
+        return sys._MEIPASS
+    return os.path.dirname(os.path.abspath(__file__))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="ESP32-S3 펌웨어 업로드 (CLI)")
+    parser.add_argument(
+        "--port", nargs="+", default=[], help="시리얼 포트 (예: COM4, 여러 개 가능)"
+    )
+    parser.add_argument("--baud", default="921600", help="전송 속도 (기본 921600)")
+    parser.add_argument(
+        "--images", default=default_image_dir(), help="바이너리 파일 폴더"
+    )
+    parser.add_argument(
+        "--clear-nvs", action="store_true", help="NVS 영역 초기화"
+    )
+    parser.add_argument(
+        "--no-retry", action="store_true", help="멈춤/끊김 시 자동 재시도 안 함"
+    )
+    parser.add_argument(
+        "--no-boot-check", action="store_true", help="업로드 후 부팅 확인 안 함"
+    )
+    parser.add_argument(
+        "--aio",
+        action="store_true",
+        help="esptool 대신 asyncio 전송 사용 (포트가 여러 개면 자동)",
+    )
+    parser.add_argument(
+        "--slots",
+        type=int,
+        default=None,
+        help="동시 전송 장치 수 (asyncio 전송, 나머지는 연결을 끝내고 대기)",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="새로 연결되는 ESP32 포트를 계속 감지해서 업로드 (asyncio 전송, Ctrl+C 로 종료)",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=None,
+        help="모니터링 지표(Prometheus) 를 이 포트로 제공 (127.0.0.1 에서만 접속 가능)",
+    )
+    parser.add_argument(
+        "--coordinator",
+        default=None,
+        metavar="URL",
+        help="코디네이터에서 펌웨어 묶음을 받고 결과를 보냄 (--images 대신, 예: http://10.0.0.5:8470)",
+    )
+    parser.add_argument(
+        "--coordinator-token", default=None, help="코디네이터 접속 토큰 (선택)"
+    )
+    parser.add_argument(
+        "--trace",
+        default=None,
+        metavar="TRACE.json",
+        help="모든 스레드 스택 샘플과 구간 시간을 Chrome trace JSON 으로 저장",
+    )
+    parser.add_argument(
+        "--trace-interval",
+        type=float,
+        default=profiling.DEFAULT_INTERVAL * 1e3,
+        help="스택 샘플링 주기 (ms, 기본 %(default)g)",
+    )
+    args = parser.parse_args(argv)
+    if not args.port and not args.watch:
+        parser.error("--port 또는 --watch 가 필요합니다")
+    return args
+
+
+def run_job(job):
+    """작업을 별도 스레드에서 실행하고 Ctrl+C/SIGTERM 시 취소"""
+    worker = threading.Thread(target=job.run, daemon=True)
+
+    def request_cancel(signum=None, frame=None):
+        print("\n[WARNING] 취소 요청, 포트를 해제하는 중...")
+        job.cancel()
+
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, request_cancel)
+
+    worker.start()
+    try:
+        while worker.is_alive():
+            worker.join(0.1)
+    except KeyboardInterrupt:
+        request_cancel()
+        worker.join(CANCEL_TIMEOUT)
+    return job.result
+
+
+def run_aio(args, profiles, device_data=None, forward=None, boot_check=None):
+    """모든 포트를 이벤트 루프 하나에서 동시에 업로드
+
+    부팅 확인, 멈춤 감지(명령 제한 시간), 재시도/이어쓰기, 장치별 데이터는 FlashJob 과 같은 옵션을 따른다.
+    """
+    try:
+        plans = profiles.plans(args.clear_nvs)
+    except (OSError, PartitionTableError) as e:
+        print(f"[ERROR] 파티션 테이블 오류: {e}")
+        return 2
+    manifests = {}
+    for profile in profiles:
+        plan = plans[profile.name]
+        if len(profiles) > 1:
+            print(f"[INFO] 프로필 {profile.describe()}")
+        for line in plan.describe():
+            print(line)
+        digests = region_digests(plan.regions)
+        manifests[profile.name] = manifest_hash(
+            {name: info["sha256"] for name, info in digests.items()}
+        )
+
+    def log_factory(port):
+        return lambda message, level="INFO": print(f"[{level}] [{port}] {message}")
+
+    history = HistoryWriter(forward=forward)
+    results = []
+
+    def on_result(result, info):
+        print(f"세션 결과 - {result.summary()}")
+        results.append(result)
+        try:
+            profile = profiles.select(info)
+        except ProfileError:
+            # 연결 전에 실패해서 보드 정보가 없는 경우
+            profile = None
+        history.record_result(
+            result,
+            manifests[profile.name] if profile else None,
+            os.path.basename(profile.firmware_path) if profile else None,
+            info,
+        )
+
+    regions = {name: plan.regions for name, plan in plans.items()}
+    retries = 0 if args.no_retry else STALL_RETRIES
+    try:
+        if args.watch:
+            print("[INFO] 포트 감시 중 (Ctrl+C 로 종료)...")
+            asyncio.run(
+                aio_transport.watch_devices(
+                    args.baud,
+                    regions,
+                    args.slots or 4,
+                    log_factory=log_factory,
+                    on_result=on_result,
+                    profiles=profiles,
+                    boot_check=boot_check,
+                    retries=retries,
+                    device_data=device_data,
+                    registry=FlashedRegistry(profiles.digest()),
+                )
+            )
+        else:
+            aio_transport.run_flash_devices(
+                args.port,
+                args.baud,
+                regions,
+                log_factory=log_factory,
+                slots=args.slots,
+                on_result=on_result,
+                profiles=profiles,
+                boot_check=boot_check,
+                retries=retries,
+                device_data=device_data,
+            )
+    except KeyboardInterrupt:
+        print("\n[WARNING] 취소됨")
+        history.close()
+        return 0 if args.watch and all(r.success for r in results) else 130
+    history.close()
+    if all(r.success for r in results):
+        return 0
+    return 130 if any(r.cancelled for r in results) else 1
+
+
+def main(argv=None):
+    multiprocessing.freeze_support()
+    args = parse_args(argv)
+    if args.trace is None:
+        return run_station(args)
+    profiling.start(args.trace, args.trace_interval / 1e3)
+    try:
+        return run_station(args)
+    finally:
+        recorder = profiling.stop()
+        print(f"[INFO] 트레이스 저장: {recorder.summary()}")
+
+
+def run_station(args):
+    """코디네이터 연결(선택) 후 업로드"""
+    if args.coordinator is None:
+        return run(args)
+    try:
+        args.images, client, uploader = connect_station(
+            args.coordinator,
+            token=args.coordinator_token,
+            log=lambda message, level="INFO": print(f"[{level}] {message}"),
+        )
+    except CoordinatorError as e:
+        print(f"[ERROR] {e}")
+        return 2
+    try:
+        return run(args, uploader.submit)
+    finally:
+        # 남은 결과를 보내 보고, 못 보낸 것은 다음 실행 때 보냄
+        uploader.close()
+        if uploader.update_available:
+            print("[INFO] 코디네이터에 새 펌웨어 묶음이 있습니다. 다시 실행하면 적용됩니다.")
+
+
+def run(args, forward=None):
+    # 이미지 폴더의 모든 프로필을 미리 읽고 검사 (profiles 폴더가 없으면 이미지 폴더 하나)
+    try:
+        profiles = ProfileSet.load(args.images)
+    except ProfileError as e:
+        print(f"[ERROR] {e}")
+        return 2
+    errors = profiles.preload()
+    if errors:
+        print("[ERROR] 펌웨어 파일 검사 실패:\n" + "\n".join(errors))
+        return 2
+    if len(profiles) > 1:
+        print(f"[INFO] 프로필 {len(profiles)}개 (보드마다 자동 선택)")
+
+    try:
+        device_data = load_device_template(args.images, profiles.default.table)
+    except (OSError, DeviceImageError) as e:
+        print(f"[ERROR] 장치 데이터 템플릿 오류: {e}")
+        return 2
+    if device_data is not None:
+        errors = profiles.missing_partition(device_data.partition)
+        if errors:
+            print("[ERROR] 장치 데이터 템플릿 오류:\n" + "\n".join(errors))
+            return 2
+
+    boot_check = None
+    if not args.no_boot_check:
+        try:
+            boot_check = BootCheckConfig.load(args.images)
+        except ValueError as e:
+            print(f"[ERROR] {e}")
+            return 2
+
+    if args.metrics_port is not None:
+        try:
+            server = start_server(args.metrics_port)
+            print(f"[INFO] 모니터링 지표: {server.address}")
+        except OSError as e:
+            print(f"[WARNING] 지표 서버를 시작할 수 없습니다: {e}")
+
+    if args.aio or args.watch or len(args.port) > 1:
+        return run_aio(args, profiles, device_data, forward, boot_check)
+
+    history = HistoryWriter(forward=forward)
+    default = profiles.default
+    job = FlashJob(
+        args.port[0],
+        args.baud,
+        default.bootloader_path,
+        default.partitions_path,
+        default.firmware_path,
+        clear_nvs=args.clear_nvs,
+        auto_retry=not args.no_retry,
+        device_data=device_data,
+        boot_check=boot_check,
+        history=history,
+        profiles=profiles,
+    )
+    result = run_job(job)
+    history.close()
+    if result.success:
+        return 0
+    return 130 if result.cancelled else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
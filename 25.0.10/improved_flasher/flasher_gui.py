@@ -7,7 +7,10 @@ ESP32-S3 Firmware Flasher with GUI
 
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext
+import argparse
+import queue
 import threading
+import multiprocessing
 import sys
 import os
 import serial.tools.list_ports
@@ -17,14 +20,40 @@ import re
 import time
 from contextlib import redirect_stdout, redirect_stderr
 
+from boot_check import BootCheckConfig
+from device_image import DeviceImageError, load_device_template
+from flash_core import ESPTOOL_PASSTHROUGH, app_data_dir, is_esp32_port
+from flash_job import FlashJob
+from coordinator import CoordinatorError, connect_station
+from history_db import HistoryWriter
+from hotplug import FlashedRegistry, HotplugWatcher
+from metrics import start_server
+import profiling
+from profiles import ProfileError, ProfileSet
+from pipeline import PipelineItem, build_station_pipeline
+from serial_monitor import SerialMonitorPanel
+
+# 창을 닫을 때 업로드 취소 완료를 기다리는 최대 시간 (초)
+CLOSE_TIMEOUT = 2.0
+# 파이프라인에서 동시에 연결/업로드할 최대 장치 수
+PIPELINE_FLASH_WORKERS = 4
+# 파이프라인 현황 갱신 주기 (ms)
+PIPELINE_VIEW_INTERVAL = 500
+# 작업 스레드가 넣은 Tk 호출을 메인 스레드에서 꺼내 실행하는 주기 (ms)
+UI_CALL_INTERVAL = 50
+
 
 class FirmwareFlasher:
-    def __init__(self, root):
+    def __init__(self, root, metrics_port=None, coordinator=None, coordinator_token=None):
         self.root = root
         self.root.title("ESP32-S3 펌웨어 업로드 도구 v2.0")
-        self.root.geometry("800x700")
+        self.root.geometry("800x820")
         self.root.resizable(True, True)  # 사용자가 크기 조절 가능하게 변경
-        self.root.minsize(700, 600)  # 최소 크기 설정
+        self.root.minsize(700, 700)  # 최소 크기 설정
+        # Tk 는 스레드 안전하지 않으므로 작업 스레드의 화면 갱신은 대기열로 넘겨서
+        # 메인 스레드가 after 로 실행 (call_in_ui)
+        self.ui_thread = threading.get_ident()
+        self.ui_calls = queue.Queue()
 
         # 바이너리 파일 경로 설정
         if getattr(sys, "frozen", False):
@@ -34,15 +63,69 @@ class FirmwareFlasher:
             # 일반 Python 스크립트 실행
             self.base_path = os.path.dirname(os.path.abspath(__file__))
 
-        self.bootloader_path = os.path.join(self.base_path, "bootloader.bin")
-        self.partitions_path = os.path.join(self.base_path, "partitions.bin")
-        self.firmware_path = os.path.join(self.base_path, "firmware.bin")
+        # 코디네이터 모드: 받은 펌웨어 묶음 폴더를 사용 (로그 창이 생기기 전 메시지는 모아 둠)
+        self.uploader = None
+        pending_logs = []
+        if coordinator:
+            try:
+                self.base_path, _, self.uploader = connect_station(
+                    coordinator,
+                    token=coordinator_token,
+                    log=lambda message, level="INFO": pending_logs.append((message, level)),
+                )
+            except CoordinatorError as e:
+                pending_logs.append((f"{e} (내장 이미지 사용)", "ERROR"))
+
+        # 보드 변형별 프로필 (profiles 폴더가 없으면 이미지 폴더 하나가 기본 프로필)
+        try:
+            self.profiles = ProfileSet.load(self.base_path)
+        except ProfileError as e:
+            pending_logs.append((str(e), "ERROR"))
+            self.profiles = None
+        self.profiles_logged = False
+        default = self.profiles.default if self.profiles is not None else None
+        self.bootloader_path = (
+            default.bootloader_path if default else os.path.join(self.base_path, "bootloader.bin")
+        )
+        self.partitions_path = (
+            default.partitions_path if default else os.path.join(self.base_path, "partitions.bin")
+        )
+        self.firmware_path = (
+            default.firmware_path if default else os.path.join(self.base_path, "firmware.bin")
+        )
+        self.device_template = None
+        self.boot_config = None
 
         self.is_flashing = False
+        self.last_result = None
+        self.current_job = None
+        self.pipeline = None
+        self.monitor = None
+        self.hotplug = HotplugWatcher(self.on_hotplug_port, is_busy=self.is_port_busy)
+        self.flashed_registry = None
+        # 업로드 이력 DB (백그라운드 스레드에서 모아서 기록)
+        self.history = HistoryWriter(
+            forward=self.uploader.submit if self.uploader is not None else None
+        )
+        self.metrics_server = None
         self.setup_ui()
+        for message, level in pending_logs:
+            self.log(message, level)
         self.refresh_ports()
+        if metrics_port is not None:
+            self.start_metrics(metrics_port)
         self.check_initial_port()
         self.auto_refresh_ports()
+        self.run_ui_calls()
+
+    def start_metrics(self, port):
+        """모니터링 지표 서버 시작 (localhost, 실패해도 업로드에는 영향 없음)"""
+        try:
+            self.metrics_server = start_server(port)
+        except OSError as e:
+            self.log(f"지표 서버를 시작할 수 없습니다 (포트 {port}): {e}", "WARNING")
+            return
+        self.log(f"모니터링 지표: {self.metrics_server.address}", "INFO")
 
     def check_initial_port(self):
         """초기 포트 상태 확인 및 메시지 표시"""
@@ -52,7 +135,7 @@ class FirmwareFlasher:
                 "SUCCESS",
             )
         else:
-            self.log("USB 케이블로 ESP32-S3 장치를 연결하세요.", "WARNING")
+            self.log("USB 케이블로 ESP32 장치를 연결하세요.", "WARNING")
 
     def auto_refresh_ports(self):
         """5초마다 자동으로 포트 재검색"""
@@ -118,15 +201,36 @@ class FirmwareFlasher:
             row=3, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=15
         )
 
-        # 파일 정보
-        info_frame = ttk.LabelFrame(main_frame, text="펌웨어 파일 정보", padding="10")
+        # 파일 정보 (쓰기 위치는 이미지 대상 칩과 파티션 테이블 기준)
+        default = self.profiles.default if self.profiles is not None else None
+        chips = ", ".join(self.profiles.chips) if self.profiles is not None else ""
+        info_frame = ttk.LabelFrame(
+            main_frame,
+            text=f"펌웨어 파일 정보 ({chips})" if chips else "펌웨어 파일 정보",
+            padding="10",
+        )
         info_frame.grid(row=4, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=10)
 
+        offsets = default.offsets() if default is not None else {}
+
+        def address(name):
+            return f"0x{offsets[name]:x}" if name in offsets else "?"
+
         files_info = [
-            ("Bootloader:", self.bootloader_path, "0x0"),
-            ("Partitions:", self.partitions_path, "0x8000"),
-            ("Firmware:", self.firmware_path, "0x10000"),
+            ("Bootloader:", self.bootloader_path, address("Bootloader")),
+            ("Partitions:", self.partitions_path, address("Partitions")),
+            ("Firmware:", self.firmware_path, address("Firmware")),
         ]
+        if self.profiles is not None and len(self.profiles) > 1:
+            # 프로필이 여러 개면 프로필별 한 줄 (보드마다 자동 선택)
+            files_info = [
+                (
+                    "프로필:" if idx == 0 else "",
+                    profile.firmware_path,
+                    profile.describe(),
+                )
+                for idx, profile in enumerate(self.profiles)
+            ]
 
         for idx, (label, path, addr) in enumerate(files_info):
             ttk.Label(info_frame, text=label, font=("Arial", 9, "bold")).grid(
@@ -144,6 +248,24 @@ class FirmwareFlasher:
                 info_frame, text=f"{addr} - {os.path.basename(path)}", font=("Arial", 9)
             ).grid(row=idx, column=2, sticky=tk.W, padx=5)
 
+        # NVS 는 기본적으로 유지 (보정값 등 보존), 필요할 때만 초기화
+        self.clear_nvs_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            info_frame, text="NVS 영역 초기화", variable=self.clear_nvs_var
+        ).grid(row=len(files_info), column=0, columnspan=3, sticky=tk.W, pady=(5, 0))
+
+        # 진행이 멈추면 esptool 을 종료하고 한 번 더 시도
+        self.auto_retry_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(
+            info_frame, text="멈춤 감지 시 자동 재시도", variable=self.auto_retry_var
+        ).grid(row=len(files_info) + 1, column=0, columnspan=3, sticky=tk.W)
+
+        # 하드 리셋 후 콘솔 출력으로 실제 부팅 여부 확인
+        self.boot_check_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(
+            info_frame, text="업로드 후 부팅 확인", variable=self.boot_check_var
+        ).grid(row=len(files_info) + 2, column=0, columnspan=3, sticky=tk.W)
+
         # 진행률 바와 퍼센트 표시
         progress_frame = ttk.Frame(main_frame)
         progress_frame.grid(row=5, column=0, columnspan=3, pady=15, sticky=(tk.W, tk.E))
@@ -195,10 +317,67 @@ class FirmwareFlasher:
         )
         self.flash_btn.grid(row=0, column=0, padx=10, pady=5)
 
+        self.cancel_btn = ttk.Button(
+            btn_frame,
+            text="업로드 취소",
+            command=self.cancel_flashing,
+            width=18,
+            state="disabled",
+        )
+        self.cancel_btn.grid(row=0, column=1, padx=10, pady=5)
+
         self.clear_btn = ttk.Button(
             btn_frame, text="로그 지우기", command=self.clear_log, width=18
         )
-        self.clear_btn.grid(row=0, column=1, padx=10, pady=5)
+        self.clear_btn.grid(row=0, column=2, padx=10, pady=5)
+
+        ttk.Button(
+            btn_frame, text="시리얼 모니터", command=self.open_monitor, width=18
+        ).grid(row=0, column=3, padx=10, pady=5)
+
+        # 느린 스테이션 원인 확인용 (UI/작업 스레드 스택 샘플 + 구간 시간)
+        self.trace_var = tk.BooleanVar(value=profiling.is_enabled())
+        ttk.Checkbutton(
+            btn_frame,
+            text="트레이스 기록",
+            variable=self.trace_var,
+            command=self.toggle_trace,
+        ).grid(row=1, column=3, padx=10)
+
+        # 스테이션 파이프라인 현황 (단계별 대기/진행/완료/실패/평균 시간)
+        pipeline_frame = ttk.LabelFrame(main_frame, text="스테이션 파이프라인", padding="5")
+        pipeline_frame.grid(row=9, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=5)
+        pipeline_frame.columnconfigure(0, weight=1)
+
+        columns = ("queued", "busy", "done", "failed", "latency")
+        self.pipeline_view = ttk.Treeview(
+            pipeline_frame, columns=columns, height=4, selectmode="none"
+        )
+        self.pipeline_view.heading("#0", text="단계")
+        self.pipeline_view.column("#0", width=90)
+        for column, title in zip(
+            columns, ["대기", "진행 중", "완료", "실패", "평균 시간(초)"]
+        ):
+            self.pipeline_view.heading(column, text=title)
+            self.pipeline_view.column(column, width=80, anchor="center")
+        self.pipeline_view.grid(row=0, column=0, sticky=(tk.W, tk.E))
+
+        self.pipeline_btn = ttk.Button(
+            pipeline_frame,
+            text="연결된 모든 장치 업로드",
+            command=self.flash_all_ports,
+            width=24,
+        )
+        self.pipeline_btn.grid(row=0, column=1, padx=10, sticky=tk.N)
+
+        # 새로 연결되는 보드를 자동으로 업로드 (무인 생산 모드)
+        self.hotplug_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            pipeline_frame,
+            text="자동 업로드 (연결 즉시)",
+            variable=self.hotplug_var,
+            command=self.toggle_hotplug,
+        ).grid(row=0, column=1, padx=10, sticky=tk.S)
 
         # 그리드 가중치 설정 - 창 크기 조정 시 레이아웃 최적화
         self.root.columnconfigure(0, weight=1)
@@ -212,11 +391,37 @@ class FirmwareFlasher:
         log_frame.columnconfigure(0, weight=1)
         log_frame.rowconfigure(0, weight=1)
 
+    def call_in_ui(self, func, *args):
+        """Tk 를 건드리는 호출을 메인 스레드에서 실행 (메인 스레드면 바로 실행)"""
+        if threading.get_ident() == self.ui_thread:
+            func(*args)
+        else:
+            self.ui_calls.put((func, args))
+
+    def run_ui_calls(self):
+        """작업 스레드가 넣은 Tk 호출 실행 (UI_CALL_INTERVAL 마다)"""
+        self.root.after(UI_CALL_INTERVAL, self.run_ui_calls)
+        while True:
+            try:
+                func, args = self.ui_calls.get_nowait()
+            except queue.Empty:
+                break
+            func(*args)
+
     def log(self, message, level="INFO"):
-        """로그 메시지 추가"""
-        self.log_text.insert(tk.END, f"[{level}] {message}\n")
-        self.log_text.see(tk.END)
-        self.root.update_idletasks()
+        """로그 메시지 추가 (어느 스레드에서든 호출 가능)"""
+        if threading.get_ident() != self.ui_thread:
+            # 화면은 대기열을 비운 뒤 Tk 이벤트 루프가 한 번에 다시 그림
+            self.ui_calls.put((self._write_log, (message, level)))
+            return
+        self._write_log(message, level)
+        with profiling.span("tk.update_idletasks", "ui"):
+            self.root.update_idletasks()
+
+    def _write_log(self, message, level):
+        with profiling.span("gui.log", "ui"):
+            self.log_text.insert(tk.END, f"[{level}] {message}\n")
+            self.log_text.see(tk.END)
 
     def clear_log(self):
         """로그 지우기"""
@@ -231,11 +436,7 @@ class FirmwareFlasher:
         esp32_port = None
         for port in ports:
             # ESP32-S3 관련 키워드 검색
-            desc_lower = port.description.lower()
-            if any(
-                keyword in desc_lower
-                for keyword in ["esp32", "cp210", "ch340", "serial", "uart"]
-            ):
+            if is_esp32_port(port):
                 esp32_port = f"{port.device} - {port.description}"
                 break
 
@@ -259,23 +460,55 @@ class FirmwareFlasher:
             self.port_combo.current(0)
 
     def check_files(self):
-        """필수 파일 존재 확인"""
-        files = [
-            ("Bootloader", self.bootloader_path),
-            ("Partitions", self.partitions_path),
-            ("Firmware", self.firmware_path),
-        ]
-
-        missing = []
-        for name, path in files:
-            if not os.path.isfile(path):
-                missing.append(name)
+        """필수 파일 존재 확인 + 모든 프로필 검사 (결과는 이미지별로 캐시됨)"""
+        if self.profiles is None:
+            messagebox.showerror("파일 오류", "펌웨어 프로필을 읽을 수 없습니다 (로그 참고)")
+            return False
 
-        if missing:
-            error_msg = f"다음 파일을 찾을 수 없습니다:\n" + "\n".join(missing)
+        # 파일 확인, 헤더/체크섬/해시/칩 종류 검사, 파티션 테이블 읽기
+        errors = self.profiles.preload()
+        if errors:
+            error_msg = "펌웨어 파일 검사 실패:\n" + "\n".join(errors)
             messagebox.showerror("파일 오류", error_msg)
             self.log(error_msg, "ERROR")
             return False
+        if len(self.profiles) > 1 and not self.profiles_logged:
+            self.profiles_logged = True
+            self.log(f"프로필 {len(self.profiles)}개를 읽었습니다 (보드마다 자동 선택).", "INFO")
+        return self.check_station_files()
+
+    def check_station_files(self):
+        """스테이션 공통 설정 (장치별 데이터 템플릿, 부팅 확인 패턴)"""
+        # 장치별 NVS 데이터 (device_data.json 이 있을 때만, 한 번만 읽음)
+        if self.device_template is None:
+            try:
+                self.device_template = load_device_template(
+                    self.base_path, self.profiles.default.table
+                )
+                if self.device_template is not None:
+                    errors = self.profiles.missing_partition(self.device_template.partition)
+                    if errors:
+                        self.device_template = None
+                        raise DeviceImageError("\n".join(errors))
+            except (OSError, DeviceImageError) as e:
+                error_msg = f"장치 데이터 템플릿 오류:\n{e}"
+                messagebox.showerror("파일 오류", error_msg)
+                self.log(error_msg, "ERROR")
+                return False
+            if self.device_template is not None:
+                self.log(
+                    f"장치별 데이터를 {self.device_template.partition} 파티션에 함께 씁니다.",
+                    "INFO",
+                )
+
+        # 부팅 확인 패턴 (boot_check.json 이 없으면 기본값)
+        if self.boot_config is None:
+            try:
+                self.boot_config = BootCheckConfig.load(self.base_path)
+            except ValueError as e:
+                messagebox.showerror("파일 오류", str(e))
+                self.log(str(e), "ERROR")
+                return False
         return True
 
     def start_flashing(self):
@@ -306,207 +539,361 @@ class FirmwareFlasher:
         # 확인 대화상자 제거 - 바로 실행
         # (원하면 유지 가능)
         port_name = self.port_var.get().split(" - ")[0]
+        if self.pipeline is not None and self.pipeline.is_active(port_name):
+            messagebox.showwarning("경고", f"{port_name} 은 파이프라인에서 처리 중입니다.")
+            return
 
         # 스레드로 업로드 실행
         self.is_flashing = True
         self.flash_btn.config(state="disabled")
+        self.cancel_btn.config(state="normal")
         self.progress_var.set(0)
 
-        thread = threading.Thread(target=self.flash_firmware, args=(port_name,))
+        # 모니터가 같은 포트를 열고 있으면 업로드 동안 해제
+        self.release_monitor(port_name)
+
+        # 작업을 먼저 만들어 두어야 시작 직후에도 취소 가능
+        self.current_job = self.create_job(port_name)
+        thread = threading.Thread(target=self.flash_firmware, args=(self.current_job,))
         thread.daemon = True
         thread.start()
 
-    def flash_firmware(self, port):
-        """실제 펌웨어 업로드 실행"""
+    def create_job(self, port):
+        """현재 UI 설정으로 업로드 작업 생성"""
+        return FlashJob(
+            port,
+            self.baud_var.get(),
+            self.bootloader_path,
+            self.partitions_path,
+            self.firmware_path,
+            clear_nvs=self.clear_nvs_var.get(),
+            auto_retry=self.auto_retry_var.get(),
+            log=self.log,
+            progress=self.update_progress,
+            device_data=self.device_template,
+            boot_check=self.boot_config if self.boot_check_var.get() else None,
+            history=self.history,
+            profiles=self.profiles,
+        )
+
+    def flash_firmware(self, job):
+        """실제 펌웨어 업로드 실행 (작업 스레드)"""
+        result = None
         try:
-            self.status_var.set("연결 중...")
-            self.log(f"\n{'='*60}")
-            self.log(f"ESP32-S3 펌웨어 업로드 시작")
-            self.log(f"포트: {port}")
-            self.log(f"전송 속도: {self.baud_var.get()}")
-            self.log(f"{'='*60}\n")
-
-            # 각 파일별 업로드 진행률 관리
-            files_to_flash = [
-                ("Bootloader", self.bootloader_path, "0x0"),
-                ("Partitions", self.partitions_path, "0x8000"),
-                ("Firmware", self.firmware_path, "0x10000"),
-            ]
+            result = job.run()
+        finally:
+            self.call_in_ui(self.on_flash_finished, job, result)
+
+    def on_flash_finished(self, job, result):
+        """업로드 스레드가 끝난 뒤 메인 스레드에서 버튼 복구 및 결과 표시"""
+        self.resume_monitor(job.port)
+        # 바쁜 포트에서 빠지기 전에 기록 (재열거된 포트를 핫플러그가 다시 넣지 않게)
+        self.hotplug.mark_finished(job.port)
+        self.current_job = None
+        self.is_flashing = False
+        self.flash_btn.config(state="normal")
+        self.cancel_btn.config(state="disabled")
+        if result is None:
+            return
+        self.last_result = result
+        if result.success:
+            messagebox.showinfo("성공", "펌웨어 업로드가 완료되었습니다!")
+        elif not result.cancelled:
+            messagebox.showerror("오류", f"펌웨어 업로드 중 오류 발생:\n{result.error}")
 
-            total_files = len(files_to_flash)
-
-            # 연결 단계
-            self.update_progress(5, "ESP32-S3에 연결 중... (5%)")
-
-            # esptool 명령 구성
-            command = [
-                "--chip",
-                "esp32s3",
-                "--port",
-                port,
-                "--baud",
-                self.baud_var.get(),
-                "--no-stub",
-                "--before",
-                "default_reset",
-                "--after",
-                "hard_reset",
-                "write_flash",
-                "-z",
-                "--flash_mode",
-                "dio",
-                "--flash_freq",
-                "80m",
-                "--flash_size",
-                "detect",
-                "0x0",
-                self.bootloader_path,
-                "0x8000",
-                self.partitions_path,
-                "0x10000",
-                self.firmware_path,
-            ]
+    def cancel_flashing(self):
+        """진행 중인 업로드 취소"""
+        job = self.current_job
+        if job is None or job.cancelled:
+            return
+        self.log("업로드 취소 요청...", "WARNING")
+        self.cancel_btn.config(state="disabled")
+        job.cancel()
+
+    def ensure_pipeline(self):
+        """스테이션 파이프라인 생성 및 시작 (한 번만)"""
+        if self.pipeline is not None:
+            return self.pipeline
+        self.flashed_registry = FlashedRegistry(self.firmware_digest())
+        self.pipeline = build_station_pipeline(
+            self.create_pipeline_job,
+            flash_workers=PIPELINE_FLASH_WORKERS,
+            on_done=self.pipeline_callback(self.on_pipeline_done),
+            on_fail=self.pipeline_callback(self.on_pipeline_fail),
+            on_skip=self.pipeline_callback(self.on_pipeline_skip),
+            is_flashed=self.flashed_registry.contains,
+            efuse_regs=self.profiles.efuse_regs,
+        )
+        self.pipeline.start()
+        self.update_pipeline_view()
+        return self.pipeline
 
-            # 연결 완료
-            self.update_progress(10, "연결 완료, 펌웨어 업로드 시작... (10%)")
+    def pipeline_callback(self, handler):
+        """파이프라인 작업 스레드에서 불리는 완료 콜백
 
-            # esptool 실행 (출력을 실시간으로 캡처)
-            self.run_esptool_with_progress(command)
+        리셋으로 다시 열거된 포트가 재제출되지 않도록 핫플러그 기록은 포트 해제 전에 바로 하고,
+        화면 처리는 메인 스레드로 넘긴다.
+        """
 
-            self.update_progress(100, "업로드 완료! (100%)")
-            self.log("\n" + "=" * 60)
-            self.log("✓ 펌웨어 업로드가 성공적으로 완료되었습니다!", "SUCCESS")
-            self.log("=" * 60 + "\n")
+        def callback(item):
+            self.hotplug.mark_finished(item.port)
+            self.call_in_ui(handler, item)
 
-            messagebox.showinfo("성공", "펌웨어 업로드가 완료되었습니다!")
+        return callback
 
-        except Exception as e:
-            self.update_progress(0, "오류 발생")
-            error_msg = f"펌웨어 업로드 중 오류 발생:\n{str(e)}"
-            self.log(error_msg, "ERROR")
-            messagebox.showerror("오류", error_msg)
+    def create_pipeline_job(self, item):
+        """파이프라인용 업로드 작업 (로그에 포트 표시, 진행률 바는 사용 안 함)"""
+        port = item.port
 
-        finally:
-            self.is_flashing = False
-            self.flash_btn.config(state="normal")
+        def log(message, level="INFO"):
+            self.log(f"[{port}] {message}", level)
 
-    def update_progress(self, percentage, status_text):
-        """진행률과 상태 업데이트"""
-        self.progress_var.set(percentage)
-        self.percent_var.set(f"{int(percentage)}%")
-        self.status_var.set(status_text)
-        self.root.update_idletasks()
-
-    def run_esptool_with_progress(self, command):
-        """esptool 실행하면서 진행률 추적"""
-        import subprocess
-        import sys
-
-        # esptool 프로세스 실행
-        process = subprocess.Popen(
-            [sys.executable, "-m", "esptool"] + command[1:],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            universal_newlines=True,
-            bufsize=1,
+        job = self.create_job(port)
+        job.log = log
+        # 연결 단계에서 읽은 MAC 으로 장치 데이터 생성 (다시 연결하지 않음)
+        job.device_info = item.info
+        job.progress = lambda percentage, status_text: None
+        return job
+
+    def flash_all_ports(self):
+        """연결된 ESP32 포트를 모두 파이프라인에 추가"""
+        if not self.check_files():
+            return
+        pipeline = self.ensure_pipeline()
+        busy_port = self.current_job.port if self.current_job else None
+        added = 0
+        for port in serial.tools.list_ports.comports():
+            if not is_esp32_port(port) or port.device == busy_port:
+                continue
+            if self.submit_to_pipeline(pipeline, port.device):
+                added += 1
+        if added:
+            self.log(f"파이프라인에 {added}대 추가", "INFO")
+        else:
+            self.log("파이프라인에 추가할 새 장치가 없습니다.", "WARNING")
+
+    def on_pipeline_done(self, item):
+        self.resume_monitor(item.port)
+        mac = item.info.get("mac", "?")
+        if "mac" in item.info:
+            self.flashed_registry.add(mac)
+        boot = item.result.boot if item.result else None
+        boot_text = f", 부팅 {boot['boot_time']:.1f}초" if boot else ""
+        self.log(
+            f"[{item.port}] 완료 (MAC {mac}, {item.total_time:.1f}초{boot_text})",
+            "SUCCESS",
         )
 
-        current_phase = "연결"
-        file_names = ["Bootloader", "Partitions", "Firmware"]
-        file_addresses = ["0x00000000", "0x00008000", "0x00010000"]
-        current_file_index = -1
-        base_progress = 10  # 연결 완료 후 시작 진행률
-        phase_progress_range = 90 / 4  # 연결(10%) + 3개 파일(각 22.5%) = 100%
+    def on_pipeline_fail(self, item):
+        self.resume_monitor(item.port)
+        self.log(f"[{item.port}] {item.failed_stage} 단계 실패: {item.error}", "ERROR")
 
-        while True:
-            output = process.stdout.readline()
-            if output == "" and process.poll() is not None:
-                break
+    def on_pipeline_skip(self, item):
+        self.resume_monitor(item.port)
+        self.log(f"[{item.port}] 건너뜀: {item.error}", "INFO")
 
-            if output:
-                line = output.strip()
-                self.log(line)
-
-                # 연결 완료 감지
-                if "Chip is ESP32-S3" in line:
-                    self.update_progress(15, "ESP32-S3 감지 완료... (15%)")
-
-                elif "Uploading stub" in line:
-                    self.update_progress(20, "업로드 스텁 준비 중... (20%)")
-
-                # 각 파일 쓰기 시작 감지
-                elif "Writing" in line and "at 0x" in line:
-                    # 주소로 현재 파일 파악
-                    for i, addr in enumerate(file_addresses):
-                        if addr.replace("0x", "0x").lower() in line.lower():
-                            if current_file_index != i:
-                                current_file_index = i
-                                current_phase = file_names[i]
-                                base_file_progress = 25 + (i * phase_progress_range)
-                                self.update_progress(
-                                    base_file_progress,
-                                    f"{current_phase} 업로드 시작... ({int(base_file_progress)}%)",
-                                )
-                            break
-
-                    # 진행률 패턴 매칭 (예: "Writing at 0x00008000... (100 %)")
-                    progress_match = re.search(r"\((\d+)\s*%\)", line)
-                    if progress_match and current_file_index >= 0:
-                        file_percent = int(progress_match.group(1))
-
-                        # 전체 진행률 계산 (각 파일당 22.5% 할당)
-                        base_file_progress = 25 + (
-                            current_file_index * phase_progress_range
-                        )
-                        total_progress = base_file_progress + (
-                            file_percent * phase_progress_range / 100
-                        )
-
-                        current_file = file_names[current_file_index]
-                        status_text = (
-                            f"{current_file} 업로드 중... ({int(total_progress)}%)"
-                        )
-
-                        self.update_progress(total_progress, status_text)
-
-                # 파일 완료 감지
-                elif "Hash of data verified" in line and current_file_index >= 0:
-                    completed_file = file_names[current_file_index]
-                    completion_progress = 25 + (
-                        (current_file_index + 1) * phase_progress_range
-                    )
-                    status_text = (
-                        f"{completed_file} 완료! ({int(completion_progress)}%)"
-                    )
-                    self.update_progress(completion_progress, status_text)
-
-                    # 다음 파일 예고 (마지막 파일이 아닌 경우)
-                    if current_file_index < len(file_names) - 1:
-                        time.sleep(0.5)  # 잠시 완료 상태 표시
-                        next_file = file_names[current_file_index + 1]
-                        status_text = (
-                            f"{next_file} 준비 중... ({int(completion_progress)}%)"
-                        )
-                        self.update_progress(completion_progress, status_text)
-
-                # 하드 리셋 감지
-                elif "Hard resetting" in line:
-                    self.update_progress(95, "장치 재시작 중... (95%)")
-
-                # 오류 감지
-                elif "Error" in line or "Failed" in line:
-                    self.log(f"오류 감지: {line}", "ERROR")
-
-        # 프로세스 완료 대기
-        return_code = process.wait()
-        if return_code != 0:
-            raise Exception(f"esptool 실행 실패 (코드: {return_code})")
+    def firmware_digest(self):
+        """업로드 기록을 구분하기 위한 펌웨어 식별값 (프로필이 여러 개면 모두 합친 값)"""
+        return self.profiles.digest()
+
+    def is_port_busy(self, port):
+        if self.current_job is not None and self.current_job.port == port:
+            return True
+        return self.pipeline is not None and self.pipeline.is_active(port)
+
+    def toggle_hotplug(self):
+        """자동 업로드 모드 켜기/끄기"""
+        if not self.hotplug_var.get():
+            self.hotplug.stop()
+            self.log("자동 업로드 모드 종료", "INFO")
+            return
+        if not self.check_files():
+            self.hotplug_var.set(False)
+            return
+        self.ensure_pipeline()
+        # 이미 꽂혀 있던 보드도 대상에 포함 (MAC 으로 중복 업로드 방지)
+        self.hotplug.start()
+        self.log("자동 업로드 모드 시작 - 보드를 연결하면 바로 업로드합니다.", "SUCCESS")
+
+    def on_hotplug_port(self, port):
+        """핫플러그 감시 스레드에서 호출 - 안정된 새 포트를 파이프라인에 추가"""
+        if self.submit_to_pipeline(self.pipeline, port):
+            self.log(f"새 장치 감지, 자동 업로드 대기열에 추가: {port}", "INFO")
+            return True
+        return False
+
+    def submit_to_pipeline(self, pipeline, port):
+        """모니터 포트를 해제하고 파이프라인에 추가 (거절되면 다시 연결)"""
+        self.release_monitor(port)
+        if pipeline.submit(PipelineItem(port)):
+            return True
+        self.resume_monitor(port)
+        return False
+
+    def open_monitor(self):
+        """시리얼 모니터 창 열기 (이미 열려 있으면 앞으로)"""
+        if self.monitor is not None:
+            self.monitor.window.lift()
+            return
+        port = self.port_var.get().split(" - ")[0]
+        if not port or "찾을 수 없습니다" in port:
+            messagebox.showwarning("경고", "모니터할 포트를 선택하세요.")
+            return
+        if self.is_port_busy(port):
+            messagebox.showwarning("경고", f"{port} 은 업로드 중입니다.")
+            return
+        self.monitor = SerialMonitorPanel(self.root, port, on_close=self.on_monitor_closed)
+
+    def on_monitor_closed(self):
+        self.monitor = None
+
+    def release_monitor(self, port):
+        monitor = self.monitor
+        if monitor is not None and monitor.release_port(port):
+            self.log(f"업로드를 위해 시리얼 모니터 포트 해제: {port}", "INFO")
+
+    def resume_monitor(self, port):
+        monitor = self.monitor
+        if monitor is not None:
+            monitor.resume_port(port)
+
+    def update_pipeline_view(self):
+        """단계별 큐 깊이/지연 시간 표시 갱신"""
+        if self.pipeline is None:
+            return
+        for stats in self.pipeline.stats():
+            values = (
+                stats["queued"],
+                stats["busy"],
+                stats["done"],
+                stats["failed"],
+                f"{stats['avg_latency']:.1f}",
+            )
+            if self.pipeline_view.exists(stats["name"]):
+                self.pipeline_view.item(stats["name"], values=values)
+            else:
+                self.pipeline_view.insert(
+                    "", tk.END, iid=stats["name"], text=stats["name"], values=values
+                )
+        self.root.after(PIPELINE_VIEW_INTERVAL, self.update_pipeline_view)
+
+    @property
+    def pipeline_busy(self):
+        return self.pipeline is not None and self.pipeline.in_flight > 0
+
+    def on_close(self):
+        """창 닫기 - 업로드 중이면 취소하고 포트가 해제된 뒤 종료"""
+        if self.pipeline_busy:
+            if not messagebox.askyesno(
+                "종료 확인", "파이프라인 업로드가 진행 중입니다.\n취소하고 종료하시겠습니까?"
+            ):
+                return
+            self.hotplug.stop()
+            self.pipeline.cancel_all()
+            self.cancel_flashing()
+            self._close_when_idle(time.monotonic() + CLOSE_TIMEOUT)
+            return
+        if self.is_flashing:
+            if not messagebox.askyesno(
+                "종료 확인", "업로드가 진행 중입니다.\n취소하고 종료하시겠습니까?"
+            ):
+                return
+            self.cancel_flashing()
+            self._close_when_idle(time.monotonic() + CLOSE_TIMEOUT)
+            return
+        self.hotplug.stop()
+        self.close_history()
+        self.stop_trace()
+        self.root.destroy()
+
+    def _close_when_idle(self, deadline):
+        # 작업 스레드의 화면 갱신이 대기열로 들어오므로 join 대신 after 로 대기
+        if (self.is_flashing or self.pipeline_busy) and time.monotonic() < deadline:
+            self.root.after(50, self._close_when_idle, deadline)
+            return
+        self.close_history()
+        self.stop_trace()
+        self.root.destroy()
+
+    def close_history(self):
+        self.history.close()
+        if self.uploader is not None:
+            # 못 보낸 결과는 파일에 남아서 다음 실행 때 보냄
+            self.uploader.close()
+
+    def update_progress(self, percentage, status_text):
+        """진행률과 상태 업데이트 (어느 스레드에서든 호출 가능)"""
+        if threading.get_ident() != self.ui_thread:
+            self.ui_calls.put((self._set_progress, (percentage, status_text)))
+            return
+        self._set_progress(percentage, status_text)
+        with profiling.span("tk.update_idletasks", "ui"):
+            self.root.update_idletasks()
+
+    def _set_progress(self, percentage, status_text):
+        with profiling.span("gui.progress", "ui"):
+            self.progress_var.set(percentage)
+            self.percent_var.set(f"{int(percentage)}%")
+            self.status_var.set(status_text)
+
+    def toggle_trace(self):
+        """트레이스 기록 시작/중지 (중지하면 Chrome trace JSON 으로 저장)"""
+        if self.trace_var.get():
+            path = profiling.default_trace_path(os.path.join(app_data_dir(), "traces"))
+            try:
+                profiling.start(path)
+            except RuntimeError as e:
+                self.log(str(e), "WARNING")
+                return
+            self.log(f"트레이스 기록 시작 (중지하면 {path} 에 저장)", "INFO")
+        else:
+            self.stop_trace()
+
+    def stop_trace(self):
+        try:
+            recorder = profiling.stop()
+        except OSError as e:
+            self.log(f"트레이스를 저장할 수 없습니다: {e}", "ERROR")
+            return
+        if recorder is not None:
+            self.log(
+                f"트레이스 저장: {recorder.summary()} (chrome://tracing 또는 ui.perfetto.dev 에서 열기)",
+                "INFO",
+            )
 
 
 def main():
     """메인 함수"""
+    # EXE 에서 작업 프로세스로 실행된 경우 (cpu_pool)
+    multiprocessing.freeze_support()
+    # EXE 에서 esptool 하위 프로세스로 재실행된 경우
+    if len(sys.argv) > 1 and sys.argv[1] == ESPTOOL_PASSTHROUGH:
+        sys.stdout.reconfigure(line_buffering=True)
+        esptool.main(sys.argv[2:])
+        return
+
+    parser = argparse.ArgumentParser(description="ESP32-S3 펌웨어 업로드 도구")
+    parser.add_argument(
+        "--metrics-port", type=int, default=None, help="모니터링 지표(Prometheus) 포트"
+    )
+    parser.add_argument("--coordinator", default=None, help="코디네이터 URL")
+    parser.add_argument("--coordinator-token", default=None, help="코디네이터 접속 토큰")
+    parser.add_argument(
+        "--trace", default=None, metavar="TRACE.json", help="시작부터 트레이스 기록 (종료 시 저장)"
+    )
+    args, _ = parser.parse_known_args()
+
+    if args.trace:
+        profiling.start(args.trace)
+
     root = tk.Tk()
-    app = FirmwareFlasher(root)
+    app = FirmwareFlasher(
+        root,
+        metrics_port=args.metrics_port,
+        coordinator=args.coordinator,
+        coordinator_token=args.coordinator_token,
+    )
+    root.protocol("WM_DELETE_WINDOW", app.on_close)
     root.mainloop()
 
 
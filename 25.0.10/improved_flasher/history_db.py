@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+업로드 이력 저장소 (SQLite)
+세션마다 MAC, 포트, 펌웨어 묶음 해시, 스테이션, 결과, 소요 시간을 기록한다.
+쓰기는 별도 스레드에서 모아서 한 번에 커밋하므로 업로드 속도에 영향을 주지 않는다.
+
+    python history_db.py mac aa:bb:cc:dd:ee:ff   # 보드별 이력
+    python history_db.py daily --days 7          # 일별 처리량
+    python history_db.py bridges                 # USB 브리지 종류별 실패율
+"""
+
+import argparse
+import hashlib
+import os
+import queue
+import socket
+import sqlite3
+import sys
+import threading
+import time
+
+import serial.tools.list_ports
+
+from flash_core import app_data_dir
+
+HISTORY_FILE_NAME = "flash_history.sqlite3"
+# 이 개수만큼 모이거나 이 시간이 지나면 한 번에 커밋
+BATCH_SIZE = 50
+FLUSH_INTERVAL = 0.5
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    station TEXT,
+    port TEXT,
+    mac TEXT,
+    chip TEXT,
+    usb_bridge TEXT,
+    manifest_hash TEXT,
+    firmware TEXT,
+    success INTEGER NOT NULL,
+    cancelled INTEGER NOT NULL,
+    error TEXT,
+    attempts INTEGER,
+    duration REAL,
+    boot_time REAL,
+    stalls INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_mac ON sessions (mac, ts);
+CREATE INDEX IF NOT EXISTS idx_sessions_port ON sessions (port, ts);
+CREATE INDEX IF NOT EXISTS idx_sessions_manifest ON sessions (manifest_hash, ts);
+CREATE INDEX IF NOT EXISTS idx_sessions_station ON sessions (station, ts);
+CREATE INDEX IF NOT EXISTS idx_sessions_ts ON sessions (ts);
+"""
+
+COLUMNS = (
+    "ts",
+    "station",
+    "port",
+    "mac",
+    "chip",
+    "usb_bridge",
+    "manifest_hash",
+    "firmware",
+    "success",
+    "cancelled",
+    "error",
+    "attempts",
+    "duration",
+    "boot_time",
+    "stalls",
+)
+
+# USB-UART 브리지 제조사 VID
+USB_BRIDGES = {
+    0x10C4: "CP210x",
+    0x1A86: "CH34x",
+    0x0403: "FTDI",
+    0x067B: "PL2303",
+    0x303A: "ESP USB",
+}
+
+
+def default_db_path():
+    return os.path.join(app_data_dir(), HISTORY_FILE_NAME)
+
+
+def manifest_hash(digests):
+    """이미지 묶음 식별값 ({이름: sha256} → 하나의 sha256)"""
+    text = "\n".join(f"{name}:{digests[name]}" for name in sorted(digests))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def usb_bridge(port):
+    """포트의 USB 브리지 종류 (알 수 없으면 None)"""
+    for info in serial.tools.list_ports.comports():
+        if info.device == port:
+            if info.vid is None:
+                return None
+            return USB_BRIDGES.get(info.vid, f"{info.vid:04x}:{info.pid or 0:04x}")
+    return None
+
+
+def connect(path=None):
+    conn = sqlite3.connect(path or default_db_path())
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+class HistoryWriter:
+    """세션 기록을 큐에 넣고 백그라운드 스레드가 모아서 커밋"""
+
+    def __init__(self, path=None, station=None, forward=None):
+        self.path = path or default_db_path()
+        self.station = station or socket.gethostname()
+        # 커밋한 기록 묶음을 넘겨받는 함수 (예: coordinator.ResultUploader.submit)
+        self.forward = forward
+        self.queue = queue.Queue()
+        self.bridges = {}
+        self.thread = threading.Thread(target=self._run, name="history-db", daemon=True)
+        self.thread.start()
+
+    def record(self, job):
+        """FlashJob 결과 기록 (큐에 넣기만 하므로 바로 반환)"""
+        self.record_result(
+            job.result, job.manifest_hash, os.path.basename(job.firmware_path), job.device_info
+        )
+
+    def record_result(self, result, manifest=None, firmware=None, info=None):
+        """SessionResult 기록 (asyncio 전송처럼 FlashJob 이 없는 경우)"""
+        info = info or {}
+        boot = result.boot or {}
+        self.queue.put(
+            {
+                "ts": result.started_at,
+                "station": self.station,
+                "port": result.port,
+                "mac": info.get("mac"),
+                "chip": info.get("chip"),
+                "usb_bridge": None,
+                "manifest_hash": manifest,
+                "firmware": firmware,
+                "success": int(result.success),
+                "cancelled": int(result.cancelled),
+                "error": result.error,
+                "attempts": result.attempts,
+                "duration": round(result.duration, 2),
+                "boot_time": boot.get("boot_time"),
+                "stalls": len(result.stalls),
+            }
+        )
+
+    def close(self, timeout=2.0):
+        """남은 기록을 커밋하고 종료"""
+        self.queue.put(None)
+        self.thread.join(timeout)
+
+    def _bridge(self, port):
+        if port not in self.bridges:
+            try:
+                self.bridges[port] = usb_bridge(port)
+            except Exception:
+                self.bridges[port] = None
+        return self.bridges[port]
+
+    def _run(self):
+        try:
+            conn = connect(self.path)
+        except sqlite3.Error:
+            # DB 를 열 수 없으면 기록만 버리고 업로드는 계속
+            conn = None
+        sql = f"INSERT INTO sessions ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+        batch = []
+        rows = []
+        deadline = None
+        stop = False
+        while not stop:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                row = self.queue.get(timeout=timeout)
+                if row is None:
+                    stop = True
+                else:
+                    row["usb_bridge"] = self._bridge(row["port"])
+                    batch.append(tuple(row[c] for c in COLUMNS))
+                    rows.append(row)
+                    if deadline is None:
+                        deadline = time.monotonic() + FLUSH_INTERVAL
+            except queue.Empty:
+                pass
+            if batch and (stop or len(batch) >= BATCH_SIZE or time.monotonic() >= deadline):
+                try:
+                    if conn is not None:
+                        with conn:
+                            conn.executemany(sql, batch)
+                except sqlite3.Error:
+                    # 기록 실패가 업로드를 막으면 안 됨
+                    pass
+                if self.forward is not None:
+                    try:
+                        self.forward(rows)
+                    except Exception:
+                        pass
+                batch = []
+                rows = []
+                deadline = None
+        if conn is not None:
+            conn.close()
+
+
+# ---- 조회 ----
+
+
+def mac_history(conn, mac, limit=50):
+    return conn.execute(
+        "SELECT datetime(ts, 'unixepoch', 'localtime'), station, port, firmware,"
+        " substr(manifest_hash, 1, 12), success, duration, boot_time, error"
+        " FROM sessions WHERE mac = ? ORDER BY ts DESC LIMIT ?",
+        (mac.lower(), limit),
+    ).fetchall()
+
+
+def daily_throughput(conn, days=7):
+    since = time.time() - days * 86400
+    return conn.execute(
+        "SELECT date(ts, 'unixepoch', 'localtime') AS day, count(*), sum(success),"
+        " round(avg(CASE WHEN success THEN duration END), 1)"
+        " FROM sessions WHERE ts >= ? GROUP BY day ORDER BY day",
+        (since,),
+    ).fetchall()
+
+
+def failure_by_bridge(conn, days=30):
+    since = time.time() - days * 86400
+    return conn.execute(
+        "SELECT coalesce(usb_bridge, '?'), count(*), count(*) - sum(success),"
+        " round(100.0 * (count(*) - sum(success)) / count(*), 1)"
+        " FROM sessions WHERE ts >= ? AND NOT cancelled"
+        " GROUP BY usb_bridge ORDER BY 4 DESC",
+        (since,),
+    ).fetchall()
+
+
+def _print_rows(headers, rows):
+    widths = [
+        max(len(str(h)), *(len(str(r[i])) for r in rows)) if rows else len(str(h))
+        for i, h in enumerate(headers)
+    ]
+    print("  ".join(str(h).ljust(w) for h, w in zip(headers, widths)))
+    for row in rows:
+        print("  ".join(str(v if v is not None else "").ljust(w) for v, w in zip(row, widths)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="업로드 이력 조회")
+    parser.add_argument("--db", default=None, help="이력 DB 파일 (기본: 앱 데이터 폴더)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("mac", help="보드별 이력")
+    p.add_argument("mac")
+    p.add_argument("--limit", type=int, default=50)
+    p = sub.add_parser("daily", help="일별 처리량")
+    p.add_argument("--days", type=int, default=7)
+    p = sub.add_parser("bridges", help="USB 브리지 종류별 실패율")
+    p.add_argument("--days", type=int, default=30)
+    args = parser.parse_args(argv)
+
+    conn = connect(args.db)
+    if args.command == "mac":
+        _print_rows(
+            ["시각", "스테이션", "포트", "펌웨어", "묶음 해시", "성공", "소요(초)", "부팅(초)", "오류"],
+            mac_history(conn, args.mac, args.limit),
+        )
+    elif args.command == "daily":
+        _print_rows(["날짜", "전체", "성공", "평균 소요(초)"], daily_throughput(conn, args.days))
+    else:
+        _print_rows(["브리지", "전체", "실패", "실패율(%)"], failure_by_bridge(conn, args.days))
+    conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+핫플러그 자동 업로드
+새로 연결된 ESP32 포트를 감지해서 안정화(디바운스) 후 파이프라인에 넣고,
+이미 업로드한 보드는 MAC 으로 구분해서 다시 쓰지 않는다.
+"""
+
+import json
+import os
+import threading
+import time
+
+import serial.tools.list_ports
+
+from flash_core import app_data_dir, is_esp32_port
+
+# 포트 목록 확인 주기 (초)
+POLL_INTERVAL = 0.5
+# 포트가 이 시간 동안 계속 보여야 새 장치로 인정 (리셋 중 재열거 무시)
+SETTLE_TIME = 1.5
+# 업로드가 끝난 포트가 이 시간 안에 사라졌다 다시 나타나면 같은 보드로 봄
+# (네이티브 USB 보드는 리셋할 때마다 포트가 다시 열거됨)
+FINISH_HOLD_TIME = 5.0
+
+REGISTRY_FILE_NAME = "flashed_macs.json"
+
+
+class FlashedRegistry:
+    """펌웨어별로 업로드가 끝난 보드 MAC 기록"""
+
+    def __init__(self, firmware_digest, path=None):
+        self.firmware_digest = firmware_digest
+        self.path = path or os.path.join(app_data_dir(), REGISTRY_FILE_NAME)
+        self.lock = threading.Lock()
+        self.data = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def contains(self, mac):
+        with self.lock:
+            return mac in self.data.get(self.firmware_digest, [])
+
+    def add(self, mac):
+        with self.lock:
+            macs = self.data.setdefault(self.firmware_digest, [])
+            if mac in macs:
+                return
+            macs.append(mac)
+            try:
+                with open(self.path, "w", encoding="utf-8") as f:
+                    json.dump(self.data, f, indent=2)
+            except OSError:
+                pass
+
+
+class HotplugWatcher:
+    """포트 연결/해제를 감시하다가 안정된 새 ESP32 포트를 on_ready 로 전달
+
+    on_ready(port) 가 True 를 반환하면 그 포트는 처리된 것으로 보고,
+    포트가 사라졌다가 다시 나타날 때(보드 교체)까지 다시 전달하지 않는다.
+    업로드가 끝나면 mark_finished(port) 를 불러서, 리셋으로 다시 열거된 포트가
+    연결(다운로드 모드 진입)도 하기 전에 다시 전달되지 않도록 한다.
+    """
+
+    def __init__(
+        self,
+        on_ready,
+        is_busy=None,
+        matcher=is_esp32_port,
+        poll_interval=POLL_INTERVAL,
+        settle_time=SETTLE_TIME,
+        hold_time=FINISH_HOLD_TIME,
+    ):
+        self.on_ready = on_ready
+        self.is_busy = is_busy or (lambda port: False)
+        self.matcher = matcher
+        self.poll_interval = poll_interval
+        self.settle_time = settle_time
+        self.hold_time = hold_time
+        self.first_seen = {}
+        self.consumed = set()
+        # 업로드가 끝난 포트 → 끝난 시각 (다른 스레드에서 기록하므로 잠금)
+        self.finished = {}
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, skip_present=False):
+        """감시 시작 (skip_present=True 면 이미 꽂혀 있는 포트는 무시)"""
+        if self.running:
+            return
+        self.first_seen = {}
+        self.consumed = set()
+        if skip_present:
+            self.consumed = set(self._present())
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name="hotplug", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def mark_finished(self, port):
+        """업로드(성공/실패/건너뜀)가 끝난 포트 기록 (아무 스레드에서나 호출)
+
+        hold_time 동안은 포트가 재열거되어도 처리된 것으로 유지한다.
+        """
+        with self.lock:
+            self.finished[port] = time.monotonic()
+
+    def _present(self):
+        return {
+            port.device
+            for port in serial.tools.list_ports.comports()
+            if self.matcher(port)
+        }
+
+    def poll(self):
+        """포트 목록 한 번 확인 (감시 스레드에서 호출)"""
+        now = time.monotonic()
+        present = self._present()
+
+        # 사라진 포트는 기록 삭제 → 다시 꽂으면 새 장치
+        for port in list(self.first_seen):
+            if port not in present:
+                del self.first_seen[port]
+        self.consumed &= present
+        with self.lock:
+            for port, finished_at in list(self.finished.items()):
+                if now - finished_at >= self.hold_time:
+                    del self.finished[port]
+            self.consumed |= present & set(self.finished)
+
+        for port in sorted(present):
+            if port in self.consumed:
+                continue
+            first = self.first_seen.setdefault(port, now)
+            if now - first < self.settle_time or self.is_busy(port):
+                continue
+            if self.on_ready(port):
+                self.consumed.add(port)
+
+    def _run(self):
+        while not self.stop_event.wait(self.poll_interval):
+            try:
+                self.poll()
+            except Exception:
+                # 포트 열거 실패는 다음 주기에 다시 시도
+                pass
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+업로드 전 오프라인 이미지 검사
+시리얼 통신을 시작하기 전에 bootloader.bin / firmware.bin / partitions.bin 을 검증한다.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+
+from flash_core import app_data_dir
+from partition_table import PartitionTableError, parse_partition_table
+
+ESP_IMAGE_MAGIC = 0xE9
+ESP_CHECKSUM_MAGIC = 0xEF
+IMAGE_HEADER_SIZE = 24  # 기본 헤더 8바이트 + 확장 헤더 16바이트
+SEGMENT_HEADER_SIZE = 8
+MAX_SEGMENTS = 16
+
+CHIP_ID_ESP32S3 = 9
+
+# 헤더 3번째 바이트의 플래시 모드 (esptool 과 같은 값)
+FLASH_MODES = {"qio": 0, "qout": 1, "dio": 2, "dout": 3}
+
+# 앱 데이터 폴더에 저장 (EXE 의 이미지 폴더는 실행할 때마다 새로 풀리는 임시 폴더)
+CACHE_FILE_NAME = "image_check.json"
+
+
+class ImageCheckError(Exception):
+    """이미지 검사 실패"""
+
+
+def checksum(data, state=ESP_CHECKSUM_MAGIC):
+    """모든 바이트의 XOR (정수 하나로 바꿔서 절반씩 접음, 바이트 단위 루프 없음)
+
+    이미지 세그먼트 체크섬과 ROM 명령 체크섬(aio_transport)이 함께 쓴다.
+    """
+    value = int.from_bytes(data, "little")
+    width = len(data)
+    while width > 1:
+        half = (width + 1) // 2
+        value = (value >> (half * 8)) ^ (value & ((1 << (half * 8)) - 1))
+        width = half
+    return state ^ value
+
+
+def _check_app_image(buf, expected_chip_id):
+    """ESP 이미지 헤더, 세그먼트, 체크섬, SHA-256 검사"""
+    size = len(buf)
+    if size < IMAGE_HEADER_SIZE:
+        raise ImageCheckError(f"파일이 너무 작습니다 ({size} bytes)")
+
+    magic, segment_count = struct.unpack_from("<BB", buf, 0)
+    if magic != ESP_IMAGE_MAGIC:
+        raise ImageCheckError(f"ESP 이미지가 아닙니다 (magic 0x{magic:02x})")
+    if not 0 < segment_count <= MAX_SEGMENTS:
+        raise ImageCheckError(f"세그먼트 개수 이상: {segment_count}")
+
+    entry = struct.unpack_from("<I", buf, 4)[0]
+    chip_id = struct.unpack_from("<H", buf, 12)[0]
+    hash_appended = buf[23] == 1
+    if expected_chip_id is not None and chip_id != expected_chip_id:
+        raise ImageCheckError(
+            f"다른 칩용 이미지입니다 (chip id {chip_id}, 필요 {expected_chip_id})"
+        )
+
+    pos = IMAGE_HEADER_SIZE
+    segments = []
+    chk = ESP_CHECKSUM_MAGIC
+    for idx in range(segment_count):
+        if pos + SEGMENT_HEADER_SIZE > size:
+            raise ImageCheckError(f"세그먼트 {idx} 헤더가 잘렸습니다 (파일 손상)")
+        load_addr, length = struct.unpack_from("<II", buf, pos)
+        pos += SEGMENT_HEADER_SIZE
+        if pos + length > size:
+            raise ImageCheckError(f"세그먼트 {idx} 데이터가 잘렸습니다 (파일 손상)")
+        chk = checksum(buf[pos : pos + length], chk)
+        segments.append((load_addr, length))
+        pos += length
+
+    # 체크섬 바이트는 16바이트 경계의 마지막 바이트에 위치
+    pos += 15 - (pos % 16)
+    if pos >= size:
+        raise ImageCheckError("체크섬 바이트가 없습니다 (파일 손상)")
+    if buf[pos] != chk:
+        raise ImageCheckError(
+            f"체크섬 불일치 (파일 0x{buf[pos]:02x}, 계산 0x{chk:02x})"
+        )
+    pos += 1
+
+    digest = None
+    if hash_appended:
+        if pos + 32 > size:
+            raise ImageCheckError("SHA-256 해시가 잘렸습니다 (파일 손상)")
+        digest = bytes(buf[pos : pos + 32])
+        if hashlib.sha256(buf[:pos]).digest() != digest:
+            raise ImageCheckError("SHA-256 불일치 (파일 손상)")
+
+    return {
+        "chip_id": chip_id,
+        "entry": entry,
+        "segments": segments,
+        "sha256": digest.hex() if digest else None,
+        # 체크섬까지의 길이 (해시가 붙었으면 이 길이만큼의 SHA-256 이 뒤에 옴)
+        "length": pos,
+    }
+
+
+def patch_flash_params(path, mode=None, freq=None, size=None):
+    """부트로더 이미지 헤더의 플래시 모드/속도/크기를 바꾼 내용 (esptool write_flash 와 같음)
+
+    freq/size 는 헤더 4번째 바이트의 하위/상위 4비트 값, None 이면 그대로 둔다.
+    SHA-256 이 붙은 이미지는 해시를 다시 계산한다. ESP 이미지가 아니면 그대로 돌려준다.
+    """
+    with open(path, "rb") as f:
+        image = bytearray(f.read())
+    try:
+        info = _check_app_image(image, None)
+    except ImageCheckError:
+        return bytes(image)
+    if mode is not None:
+        image[2] = mode
+    if freq is not None:
+        image[3] = (image[3] & 0xF0) | freq
+    if size is not None:
+        image[3] = (image[3] & 0x0F) | size
+    if info["sha256"]:
+        length = info["length"]
+        image[length : length + 32] = hashlib.sha256(image[:length]).digest()
+    return bytes(image)
+
+
+def check_image(path, kind="app", expected_chip_id=CHIP_ID_ESP32S3):
+    """파일 하나 검사 (mmap 으로 읽어서 복사 최소화)"""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ImageCheckError("빈 파일입니다")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            buf = memoryview(mm)
+            try:
+                if kind == "partitions":
+                    try:
+                        table = parse_partition_table(bytes(buf))
+                    except PartitionTableError as e:
+                        raise ImageCheckError(str(e))
+                    if table.md5_ok is None:
+                        raise ImageCheckError("파티션 테이블에 MD5 항목이 없습니다")
+                    return {"partitions": [p.name for p in table]}
+                return _check_app_image(buf, expected_chip_id)
+            finally:
+                buf.release()
+
+
+def _file_stamp(path):
+    """캐시 키용 (위치, 크기/수정 시각)
+
+    EXE 에 묶인 파일은 실행할 때마다 새 임시 폴더에 새 수정 시각으로 풀리므로
+    번들 안의 상대 경로와 EXE 파일 자체의 크기/수정 시각을 쓴다.
+    """
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    bundle = getattr(sys, "_MEIPASS", None)
+    if bundle and path.startswith(os.path.abspath(bundle) + os.sep):
+        exe = os.stat(sys.executable)
+        location = "exe:" + os.path.relpath(path, bundle).replace(os.sep, "/")
+        return location, f"{st.st_size}:{exe.st_size}:{exe.st_mtime_ns}"
+    return path, f"{st.st_size}:{st.st_mtime_ns}"
+
+
+class ImageSetValidator:
+    """이미지 묶음 검사기 (결과를 앱 데이터 폴더에 캐시해서 이미지당 한 번만 검사)"""
+
+    def __init__(self, base_path, expected_chip_id=CHIP_ID_ESP32S3):
+        self.base_path = base_path
+        self.expected_chip_id = expected_chip_id
+        self.cache_path = os.path.join(app_data_dir(), CACHE_FILE_NAME)
+        self.cache = self._load_cache()
+
+    def _load_cache(self):
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_cache(self):
+        try:
+            with open(self.cache_path, "w", encoding="utf-8") as f:
+                json.dump(self.cache, f, indent=2)
+        except OSError:
+            # 저장할 수 없으면 메모리 캐시만 사용
+            pass
+
+    def _cache_key(self, path, kind):
+        location, stamp = _file_stamp(path)
+        return f"{location}|{kind}|{stamp}"
+
+    def check(self, path, kind="app"):
+        """(성공 여부, 결과 또는 오류 메시지) 반환"""
+        key = self._cache_key(path, kind)
+        cached = self.cache.get(key)
+        if cached is not None and cached.get("chip") == self.expected_chip_id:
+            return cached["ok"], cached["result"]
+
+        try:
+            ok, result = True, check_image(path, kind, self.expected_chip_id)
+        except ImageCheckError as e:
+            ok, result = False, str(e)
+
+        # 같은 파일의 이전 버전 캐시는 제거
+        prefix = key.split("|", 1)[0] + "|"
+        for old in [k for k in self.cache if k.startswith(prefix)]:
+            del self.cache[old]
+        self.cache[key] = {"ok": ok, "result": result, "chip": self.expected_chip_id}
+        self._save_cache()
+        return ok, result
+
+    def validate(self, files):
+        """[(이름, 경로, 종류)] 검사 후 오류 메시지 목록 반환"""
+        errors = []
+        for name, path, kind in files:
+            ok, result = self.check(path, kind)
+            if not ok:
+                errors.append(f"{name}: {result}")
+        return errors
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+링크 속도 기반 압축 수준 선택
+첫 블록들의 응답 시간으로 전송 속도와 장치의 압축 해제/쓰기 속도를 추정하고,
+이미지 표본의 수준별 압축률/압축 속도와 합쳐서 전체 시간이 가장 짧은 zlib 수준을 고른다.
+결과는 장치 종류/전송 속도별로 앱 데이터 폴더에 저장해서 다음 업로드부터 쓴다.
+asyncio 전송(--aio/--watch) 전용. esptool 경로는 esptool 이 압축 수준을 정하므로 쓰지 않는다.
+"""
+
+import json
+import os
+import threading
+import time
+import zlib
+
+from flash_core import app_data_dir
+
+TUNING_FILE_NAME = "link_tuning.json"
+
+LEVEL_CANDIDATES = (1, 3, 6, 9)
+DEFAULT_LEVEL = 9
+# ROM 로더의 쓰기 블록 크기 (고정, 블록당 왕복 시간 계산용)
+WRITE_BLOCK_SIZE = 0x400
+
+# 압축률 표본: 이미지에서 고르게 뽑은 조각들
+SAMPLE_CHUNKS = 4
+SAMPLE_CHUNK_SIZE = 64 * 1024
+# 속도 추정에 쓰는 첫 블록 수
+MEASURE_BLOCKS = 32
+# SLIP 프레임 + 명령 헤더 + 블록 헤더 (이스케이프 제외)
+BLOCK_OVERHEAD = 2 + 8 + 16
+# 새 측정값 반영 비율
+SMOOTHING = 0.5
+
+
+def level_stats(data):
+    """수준별 (압축률, 호스트 압축 속도 B/s) → {수준: [ratio, rate]} (작업 프로세스에서 호출)"""
+    view = memoryview(data)
+    if len(view) <= SAMPLE_CHUNKS * SAMPLE_CHUNK_SIZE:
+        sample = bytes(view)
+    else:
+        step = len(view) // SAMPLE_CHUNKS
+        sample = b"".join(
+            view[i * step : i * step + SAMPLE_CHUNK_SIZE] for i in range(SAMPLE_CHUNKS)
+        )
+    stats = {}
+    if not sample:
+        return stats
+    for level in LEVEL_CANDIDATES:
+        started = time.perf_counter()
+        size = len(zlib.compress(sample, level))
+        elapsed = max(time.perf_counter() - started, 1e-6)
+        stats[level] = [size / len(sample), len(sample) / elapsed]
+    return stats
+
+
+def merge_stats(items):
+    """영역별 level_stats 를 크기 가중 평균 → {수준: [ratio, rate]}"""
+    total = sum(size for size, stats in items if stats)
+    merged = {}
+    for level in LEVEL_CANDIDATES:
+        ratio = rate = 0.0
+        for size, stats in items:
+            entry = stats.get(level) or stats.get(str(level)) if stats else None
+            if entry:
+                ratio += entry[0] * size / total
+                rate += entry[1] * size / total
+        if ratio:
+            merged[level] = [ratio, rate]
+    return merged
+
+
+class LinkMeter:
+    """첫 블록들의 (전송 바이트, 해제 후 바이트, 응답 시간) 기록"""
+
+    def __init__(self, limit=MEASURE_BLOCKS):
+        self.limit = limit
+        self.samples = []
+        self.inflater = None
+
+    @property
+    def done(self):
+        return len(self.samples) >= self.limit
+
+    def start_stream(self):
+        """압축 스트림(구간) 시작마다 호출"""
+        self.inflater = zlib.decompressobj()
+
+    def add(self, block, elapsed):
+        if self.done or self.inflater is None:
+            return
+        try:
+            raw = len(self.inflater.decompress(block))
+        except zlib.error:
+            self.inflater = None
+            return
+        self.samples.append((len(block) + BLOCK_OVERHEAD, raw, elapsed))
+
+    def estimate(self, rtt, nominal_link=None):
+        """(전송 B/s, 장치 B/s) 추정. 표본이 부족하면 None
+
+        블록당 시간 - rtt = 전송 바이트 / link + 해제 바이트 / device 를 최소제곱으로 푼다.
+        압축률이 비슷해서 두 값이 구분되지 않으면 nominal_link(UART 속도) 로 장치 쪽만 푼다.
+        """
+        if len(self.samples) < 4:
+            return None
+        sww = swr = srr = swy = sry = 0.0
+        for wire, raw, elapsed in self.samples:
+            y = max(elapsed - rtt, 0.0)
+            sww += wire * wire
+            swr += wire * raw
+            srr += raw * raw
+            swy += wire * y
+            sry += raw * y
+        det = sww * srr - swr * swr
+        if det > 1e-9 * sww * srr:
+            a = (swy * srr - sry * swr) / det
+            b = (sry * sww - swy * swr) / det
+            if a > 0 and b > 0:
+                return 1 / a, 1 / b
+        if nominal_link:
+            a = 1 / nominal_link
+            b = (sry - a * swr) / srr if srr else 0
+            if b > 0:
+                return nominal_link, 1 / b
+            return nominal_link, float("inf")
+        return None
+
+
+def estimate_time(ratio, host_rate, link_bps, device_bps, rtt, raw_size, devices=1):
+    """수준 하나로 raw_size 바이트를 쓰는 데 걸리는 예상 시간 (초)
+
+    호스트 압축은 모든 장치가 결과를 공유하므로 장치 수로 나눈다.
+    """
+    wire = raw_size * ratio
+    blocks = wire / WRITE_BLOCK_SIZE + 1
+    return (
+        raw_size / host_rate / devices
+        + (wire + blocks * BLOCK_OVERHEAD) / link_bps
+        + raw_size / device_bps
+        + blocks * rtt
+    )
+
+
+def choose(stats, link_bps, device_bps, rtt, raw_size, devices=1):
+    """예상 시간이 가장 짧은 (수준, 예상 시간)"""
+    best = None
+    for level, (ratio, host_rate) in stats.items():
+        seconds = estimate_time(ratio, host_rate, link_bps, device_bps, rtt, raw_size, devices)
+        if best is None or seconds < best[1]:
+            best = (int(level), seconds)
+    return best
+
+
+class LinkTuning:
+    """장치 종류/전송 속도별 측정값과 선택 결과 (JSON)"""
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(app_data_dir(), TUNING_FILE_NAME)
+        self.lock = threading.Lock()
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.data = json.load(f)
+        except (OSError, ValueError):
+            self.data = {}
+
+    @staticmethod
+    def key(chip, baud):
+        return f"{chip}@{int(baud)}"
+
+    def get(self, chip, baud):
+        with self.lock:
+            return self.data.get(self.key(chip, baud))
+
+    def level_for(self, chip, baud):
+        entry = self.get(chip, baud)
+        return entry["level"] if entry else DEFAULT_LEVEL
+
+    def update(self, chip, baud, link_bps, device_bps, rtt, stats, raw_size, devices=1):
+        """새 측정값을 반영하고 다시 선택 → 저장된 항목 반환"""
+        with self.lock:
+            key = self.key(chip, baud)
+            entry = self.data.get(key)
+            if entry:
+                link_bps = entry["link_bps"] + SMOOTHING * (link_bps - entry["link_bps"])
+                device_bps = entry["device_bps"] + SMOOTHING * (device_bps - entry["device_bps"])
+                rtt = entry["rtt"] + SMOOTHING * (rtt - entry["rtt"])
+            level, seconds = choose(
+                stats, link_bps, device_bps, rtt, raw_size, devices
+            )
+            entry = {
+                "level": level,
+                "link_bps": round(link_bps),
+                "device_bps": round(device_bps) if device_bps != float("inf") else 1e12,
+                "rtt": round(rtt, 5),
+                "estimated_seconds": round(seconds, 2),
+                "updated": time.time(),
+            }
+            self.data[key] = entry
+            return entry
+
+    def save(self):
+        with self.lock:
+            try:
+                with open(self.path, "w", encoding="utf-8") as f:
+                    json.dump(self.data, f, indent=2)
+            except OSError:
+                pass
@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+스테이션 모니터링 지표 (Prometheus 텍스트 형식)
+업로드 수, 원인별 실패 수, 단계별 소요 시간 히스토그램, 포트별 전송 속도,
+진행 중인 세션 수, 대기열 길이를 localhost HTTP 로 내보낸다.
+
+값은 스레드마다 따로 가진 dict 에만 더하고 (잠금 없음), 수집 요청이 올 때 합친다.
+끝난 스레드의 값은 수집할 때 한 번 합쳐 두고 버린다.
+
+    python flasher_cli.py --port COM4 --metrics-port 9464
+    curl http://127.0.0.1:9464/metrics
+"""
+
+import bisect
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_PORT = 9464
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# 단계별 소요 시간 구간 (초)
+STAGE_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        if value == float("inf"):
+            return "+Inf"
+        return repr(value)
+    return str(value)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels_text(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Shards:
+    """스레드별 값 조각 {라벨 튜플: 값}
+
+    쓰기는 현재 스레드의 dict 만 바꾸므로 잠금이 필요 없다.
+    조각 목록에 추가할 때와 수집할 때만 잠금을 잡는다.
+    """
+
+    def __init__(self, merge):
+        self.merge = merge
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.shards = []
+        # 끝난 스레드들의 값을 합친 것
+        self.retired = {}
+
+    def mine(self):
+        try:
+            return self.local.values
+        except AttributeError:
+            values = self.local.values = {}
+            with self.lock:
+                self.shards.append((threading.current_thread(), values))
+            return values
+
+    def snapshot(self):
+        with self.lock:
+            total = {key: self.merge(None, value) for key, value in self.retired.items()}
+            alive = []
+            for entry in self.shards:
+                thread, values = entry
+                # dict.copy 는 GIL 아래에서 한 번에 끝남 (쓰는 스레드와 경합 없음)
+                values = values.copy()
+                if thread.is_alive():
+                    alive.append(entry)
+                else:
+                    for key, value in values.items():
+                        self.retired[key] = self.merge(self.retired.get(key), value)
+                for key, value in values.items():
+                    total[key] = self.merge(total.get(key), value)
+            self.shards = alive
+            return total
+
+
+def _add(current, value):
+    return value if current is None else current + value
+
+
+def _add_lists(current, value):
+    if current is None:
+        return list(value)
+    return [a + b for a, b in zip(current, value)]
+
+
+class Counter:
+    """증가만 하는 값"""
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.shards = _Shards(_add)
+
+    def inc(self, amount=1, *labels):
+        values = self.shards.mine()
+        values[labels] = values.get(labels, 0) + amount
+
+    def samples(self):
+        values = self.shards.snapshot()
+        if not values and not self.labelnames:
+            values = {(): 0}
+        for labels, value in sorted(values.items()):
+            yield self.name, _labels_text(self.labelnames, labels), value
+
+
+class Gauge:
+    """오르내리는 값 (inc/dec 은 스레드별로 더하고, set 은 마지막 값으로 덮어씀)
+
+    add_source(fn) 로 수집할 때마다 부르는 함수를 붙일 수 있다 (fn() → {라벨 튜플: 값}).
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.shards = _Shards(_add)
+        self.fixed = {}
+        self.sources = []
+
+    def inc(self, amount=1, *labels):
+        values = self.shards.mine()
+        values[labels] = values.get(labels, 0) + amount
+
+    def dec(self, amount=1, *labels):
+        self.inc(-amount, *labels)
+
+    def set(self, value, *labels):
+        self.fixed[labels] = value
+
+    def add_source(self, fn):
+        self.sources.append(fn)
+
+    def remove_source(self, fn):
+        try:
+            self.sources.remove(fn)
+        except ValueError:
+            pass
+
+    def samples(self):
+        total = dict(self.fixed)
+        for labels, value in self.shards.snapshot().items():
+            total[labels] = total.get(labels, 0) + value
+        for fn in list(self.sources):
+            try:
+                for labels, value in fn().items():
+                    total[labels] = total.get(labels, 0) + value
+            except Exception:
+                continue
+        if not total and not self.labelnames:
+            total = {(): 0}
+        for labels, value in sorted(total.items()):
+            yield self.name, _labels_text(self.labelnames, labels), value
+
+
+class Histogram:
+    """구간별 개수 + 합 + 개수 (구간은 값 이하 누적으로 내보냄)"""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=STAGE_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.bounds = tuple(sorted(buckets))
+        self.shards = _Shards(_add_lists)
+
+    def observe(self, value, *labels):
+        values = self.shards.mine()
+        cell = values.get(labels)
+        if cell is None:
+            # 구간별 개수 (마지막은 +Inf), 합, 개수
+            cell = values[labels] = [0] * (len(self.bounds) + 1) + [0.0, 0]
+        cell[bisect.bisect_left(self.bounds, value)] += 1
+        cell[-2] += value
+        cell[-1] += 1
+
+    def samples(self):
+        bounds = self.bounds + (float("inf"),)
+        for labels, cell in sorted(self.shards.snapshot().items()):
+            running = 0
+            for bound, count in zip(bounds, cell):
+                running += count
+                le = 'le="' + _format_value(float(bound)) + '"'
+                yield self.name + "_bucket", _labels_text(self.labelnames, labels, le), running
+            text = _labels_text(self.labelnames, labels)
+            yield self.name + "_sum", text, cell[-2]
+            yield self.name + "_count", text, cell[-1]
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+BOARDS_FLASHED = REGISTRY.register(
+    Counter("flasher_boards_flashed_total", "Boards flashed successfully")
+)
+FAILURES = REGISTRY.register(
+    Counter("flasher_failures_total", "Failed flash sessions by cause", ("cause",))
+)
+STAGE_SECONDS = REGISTRY.register(
+    Histogram("flasher_stage_seconds", "Time spent in each flash session stage", ("stage",))
+)
+PIPELINE_STAGE_SECONDS = REGISTRY.register(
+    Histogram(
+        "flasher_pipeline_stage_seconds", "Time spent in each station pipeline stage", ("stage",)
+    )
+)
+BYTES_WRITTEN = REGISTRY.register(
+    Counter("flasher_bytes_written_total", "Image bytes written to flash per port", ("port",))
+)
+PORT_RATE = REGISTRY.register(
+    Gauge(
+        "flasher_port_bytes_per_second",
+        "Write throughput of the current or last session per port",
+        ("port",),
+    )
+)
+ACTIVE_SESSIONS = REGISTRY.register(
+    Gauge("flasher_active_sessions", "Flash sessions in progress")
+)
+QUEUE_DEPTH = REGISTRY.register(
+    Gauge("flasher_queue_depth", "Devices waiting in each queue", ("queue",))
+)
+
+
+class SessionMetrics:
+    """업로드 세션 하나의 단계 시간/쓴 바이트 기록 (세션을 돌리는 스레드에서만 호출)"""
+
+    def __init__(self, port):
+        self.port = port
+        self.stage = None
+        self.stage_started = None
+        self.write_started = None
+        self.written = 0
+        self.active = True
+        ACTIVE_SESSIONS.inc()
+
+    def enter_stage(self, stage):
+        now = time.monotonic()
+        if self.stage is not None:
+            STAGE_SECONDS.observe(now - self.stage_started, self.stage)
+        self.stage = stage
+        self.stage_started = now
+
+    def observe_stage(self, stage, seconds):
+        """다른 곳에서 잰 단계 시간 (예: 미리 끝낸 연결 단계)"""
+        STAGE_SECONDS.observe(seconds, stage)
+
+    def add_bytes(self, count):
+        now = time.monotonic()
+        if self.write_started is None:
+            self.write_started = now
+        self.written += count
+        BYTES_WRITTEN.inc(count, self.port)
+        elapsed = now - self.write_started
+        if elapsed > 0:
+            PORT_RATE.set(self.written / elapsed, self.port)
+
+    def finish(self, result):
+        """결과 기록 (여러 번 불러도 한 번만 센다)"""
+        if self.stage is not None:
+            STAGE_SECONDS.observe(time.monotonic() - self.stage_started, self.stage)
+            self.stage = None
+        if not self.active:
+            return
+        self.active = False
+        ACTIVE_SESSIONS.dec()
+        record_result(result)
+
+
+def record_result(result):
+    if result.success:
+        BOARDS_FLASHED.inc()
+    else:
+        FAILURES.inc(1, result.cause or "other")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MetricsServer:
+    """지표 HTTP 서버 (백그라운드 스레드, 기본은 localhost 에서만 접속 가능)"""
+
+    def __init__(self, port=DEFAULT_PORT, host="127.0.0.1", registry=REGISTRY):
+        handler = type("Handler", (_Handler,), {"registry": registry})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, name="metrics", daemon=True
+        )
+
+    @property
+    def address(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def start_server(port=DEFAULT_PORT, host="127.0.0.1"):
+    """지표 서버 시작 → MetricsServer (포트를 열 수 없으면 OSError)"""
+    return MetricsServer(port, host).start()
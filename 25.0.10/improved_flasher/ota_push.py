@@ -0,0 +1,609 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Wi-Fi OTA 일괄 업데이트
+이미 설치된 장치(현장 장비, 번인 랙)를 USB 연결 없이 업데이트한다.
+firmware.bin 을 로컬 HTTP 서버로 제공하고 (Range 요청 지원, 끊겨도 이어받기),
+이벤트 루프 하나에서 여러 장치에 동시에 업데이트 요청을 보낸다.
+장치별 진행률/결과는 USB 업로드와 같은 SessionResult, 모니터링 지표, 이력 DB 로 기록한다.
+
+장치 펌웨어 쪽 약속 (HTTP, 기본 포트 80):
+    POST /ota   {"url", "size", "sha256", "report"}
+                → 2xx 로 수락 (본문 JSON 에 "mac", "chip", "version" 이 있으면 기록)
+                장치는 url 을 받아서 (Range 로 이어받기 가능) sha256 을 확인하고,
+                report 주소로 {"state": "done"} 또는 {"state": "failed", "error": ...} 를 보낸 뒤 재시작
+    GET  /ota   → {"state", "image_sha256"} (재시작 후 새 이미지로 부팅했는지 확인)
+
+    python ota_push.py --device 10.0.0.21 10.0.0.22 --slots 16
+    python ota_push.py --devices-file rack3.txt --images ./release --metrics-port 9464
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import re
+import socket
+import sys
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from flash_core import (
+    DEFAULT_STALL_THRESHOLDS,
+    STAGE_CONNECT,
+    STAGE_ERASE,
+    STAGE_RESET,
+    STAGE_VERIFY,
+    STAGE_WRITE,
+    FlashCancelled,
+    FlashFailed,
+    FlashStalled,
+    SessionResult,
+    failure_cause,
+)
+from history_db import HistoryWriter, manifest_hash
+from metrics import QUEUE_DEPTH, SessionMetrics, start_server
+
+DEFAULT_SERVER_PORT = 8471
+DEVICE_PORT = 80
+OTA_PATH = "/ota"
+DEFAULT_SLOTS = 16
+
+# 업데이트 요청 응답 대기 (초)
+TRIGGER_TIMEOUT = 5.0
+# 첫 바이트까지 (장치가 OTA 파티션을 지우는 동안) / 이후 진행 없이 기다릴 수 있는 시간 (초)
+FIRST_BYTE_TIMEOUT = DEFAULT_STALL_THRESHOLDS[STAGE_ERASE]
+DOWNLOAD_STALL_TIMEOUT = 20.0
+# 다 받은 뒤 장치의 결과 보고까지 / 재시작 후 새 이미지로 응답할 때까지 (초)
+REPORT_TIMEOUT = 60.0
+BOOT_TIMEOUT = 60.0
+BOOT_POLL_INTERVAL = 1.0
+# 한 번의 sendfile 로 보내는 크기 (진행률 갱신 단위)
+SEND_CHUNK = 64 * 1024
+
+RANGE_PATTERN = re.compile(r"bytes=(\d*)-(\d*)$")
+
+
+def _print_log(message, level="INFO"):
+    print(f"[{level}] {message}")
+
+
+def _no_progress(percentage, status_text):
+    pass
+
+
+def parse_range(header, size):
+    """Range 헤더 → (시작, 끝) 반쯤 열린 구간, 전체 요청이면 None
+
+    여러 구간 요청은 전체 전송으로 처리한다. 만족할 수 없는 구간은 ValueError.
+    """
+    if not header:
+        return None
+    match = RANGE_PATTERN.match(header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last:
+            raise ValueError(header)
+        # 마지막 n 바이트
+        start = max(0, size - int(last))
+        end = size
+    else:
+        start = int(first)
+        end = min(size, int(last) + 1) if last else size
+    if start >= size or start >= end:
+        raise ValueError(header)
+    return start, end
+
+
+class OtaImage:
+    """OTA 로 보낼 이미지 (파일에서 바로 sendfile)"""
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self.name = os.path.basename(path)
+        digest = hashlib.sha256()
+        with open(self.path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        self.sha256 = digest.hexdigest()
+        self.size = os.path.getsize(self.path)
+
+
+class _Transfer:
+    """장치 한 대의 다운로드 상태 (HTTP 스레드가 이벤트 루프로 넘겨서 갱신)"""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.changed = asyncio.Event()
+        # 장치에 보낸 가장 먼 위치 / 아직 지표에 넣지 않은 바이트 수
+        self.end = 0
+        self.unreported = 0
+        self.requests = 0
+        self.last_activity = loop.time()
+        self.report = None
+
+    def on_bytes(self, end, count):
+        self.loop.call_soon_threadsafe(self._bytes, end, count)
+
+    def on_request(self):
+        self.loop.call_soon_threadsafe(self._request)
+
+    def on_report(self, data):
+        self.loop.call_soon_threadsafe(self._report, data)
+
+    def _bytes(self, end, count):
+        self.end = max(self.end, end)
+        self.unreported += count
+        self.last_activity = self.loop.time()
+        self.changed.set()
+
+    def _request(self):
+        self.requests += 1
+        self.last_activity = self.loop.time()
+        self.changed.set()
+
+    def _report(self, data):
+        self.report = data
+        self.changed.set()
+
+    def take_bytes(self):
+        count = self.unreported
+        self.unreported = 0
+        return count
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_ref = None
+
+    def _session(self, prefix):
+        """/<prefix>/<token>[/...] → (token, _Transfer) (없으면 404 후 None)"""
+        parts = self.path.split("?", 1)[0].strip("/").split("/")
+        if len(parts) >= 2 and parts[0] == prefix:
+            transfer = self.server_ref.sessions.get(parts[1])
+            if transfer is not None:
+                return transfer
+        self.send_error(404)
+        return None
+
+    def do_HEAD(self):
+        self._serve(body=False)
+
+    def do_GET(self):
+        self._serve(body=True)
+
+    def _serve(self, body):
+        transfer = self._session("fw")
+        if transfer is None:
+            return
+        image = self.server_ref.image
+        try:
+            span = parse_range(self.headers.get("Range"), image.size)
+        except ValueError:
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{image.size}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        start, end = span or (0, image.size)
+        self.send_response(200 if span is None else 206)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", f'"{image.sha256}"')
+        self.send_header("Content-Length", str(end - start))
+        if span is not None:
+            self.send_header("Content-Range", f"bytes {start}-{end - 1}/{image.size}")
+        self.end_headers()
+        transfer.on_request()
+        if not body:
+            return
+        with open(image.path, "rb") as f:
+            pos = start
+            while pos < end:
+                # 파일에서 소켓으로 바로 전송 (끊기면 예외로 빠져나가고 장치가 Range 로 이어받음)
+                sent = self.connection.sendfile(f, pos, min(SEND_CHUNK, end - pos))
+                if not sent:
+                    break
+                pos += sent
+                transfer.on_bytes(pos, sent)
+
+    def do_POST(self):
+        transfer = self._session("report")
+        if transfer is None:
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            data = json.loads(self.rfile.read(length).decode("utf-8"))
+        except (ValueError, UnicodeDecodeError):
+            self.send_error(400)
+            return
+        transfer.on_report(data)
+        self.send_response(204)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class OtaServer:
+    """이미지 제공 + 결과 보고 수신 HTTP 서버 (백그라운드 스레드)
+
+    장치마다 임의 토큰 주소를 주므로 어떤 장치가 얼마나 받았는지 서버에서 바로 알 수 있다.
+    """
+
+    def __init__(self, image, port=DEFAULT_SERVER_PORT, host="0.0.0.0", advertise=None):
+        self.image = image
+        self.sessions = {}
+        handler = type("Handler", (_Handler,), {"server_ref": self})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        # 장치가 이 PC 에 접속할 주소 (None 이면 장치마다 경로를 보고 고름)
+        self.advertise = advertise
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, name="ota-server", daemon=True
+        )
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def open_session(self, transfer, device_host):
+        """장치용 토큰 발급 → (이미지 주소, 보고 주소)"""
+        token = uuid.uuid4().hex
+        self.sessions[token] = transfer
+        base = f"http://{self.advertise or local_address_for(device_host)}:{self.port}"
+        return token, f"{base}/fw/{token}/{self.image.name}", f"{base}/report/{token}"
+
+    def close_session(self, token):
+        self.sessions.pop(token, None)
+
+
+def local_address_for(host):
+    """host 로 나가는 인터페이스의 내 주소 (패킷은 보내지 않음)"""
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        try:
+            s.connect((host, DEVICE_PORT))
+            return s.getsockname()[0]
+        except OSError:
+            return "127.0.0.1"
+
+
+def parse_target(target):
+    """"10.0.0.21" / "10.0.0.21:8080" → (호스트, 포트)"""
+    host, sep, port = target.rpartition(":")
+    if sep and port.isdigit():
+        return host, int(port)
+    return target, DEVICE_PORT
+
+
+async def http_json(host, port, method, path, data=None, timeout=TRIGGER_TIMEOUT):
+    """장치에 HTTP 요청 하나 → (상태 코드, JSON 본문 또는 None)"""
+
+    async def request():
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            body = json.dumps(data).encode("utf-8") if data is not None else b""
+            head = (
+                f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n"
+            )
+            writer.write(head.encode("ascii") + body)
+            await writer.drain()
+            raw = await reader.read()
+        finally:
+            writer.close()
+        head, _, content = raw.partition(b"\r\n\r\n")
+        status_line = head.split(b"\r\n", 1)[0].split()
+        if len(status_line) < 2 or not status_line[1].isdigit():
+            raise ConnectionError(f"잘못된 HTTP 응답: {head[:40]!r}")
+        try:
+            payload = json.loads(content.decode("utf-8")) if content.strip() else None
+        except (ValueError, UnicodeDecodeError):
+            payload = None
+        return int(status_line[1]), payload
+
+    return await asyncio.wait_for(request(), timeout)
+
+
+async def _wait_change(transfer, timeout):
+    transfer.changed.clear()
+    try:
+        await asyncio.wait_for(transfer.changed.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
+
+
+def _check_cancel(cancel_event):
+    if cancel_event is not None and cancel_event.is_set():
+        raise FlashCancelled()
+
+
+async def push_device(
+    target,
+    server,
+    log=_print_log,
+    progress=_no_progress,
+    cancel_event=None,
+    slot=None,
+    on_info=None,
+):
+    """장치 한 대 OTA 업데이트 코루틴 (SessionResult 반환, 예외를 밖으로 던지지 않음)
+
+    slot(asyncio.Semaphore) 은 요청부터 결과 보고까지만 잡는다 (재시작 대기는 슬롯 밖).
+    """
+    loop = asyncio.get_running_loop()
+    host, port = parse_target(target)
+    label = f"ota:{target}"
+    image = server.image
+    result = SessionResult(label)
+    result.attempts = 1
+    metrics = SessionMetrics(label)
+    transfer = _Transfer(loop)
+    token = None
+    holding = False
+    try:
+        if slot is not None:
+            await slot.acquire()
+            holding = True
+        _check_cancel(cancel_event)
+        token, url, report_url = server.open_session(transfer, host)
+
+        metrics.enter_stage(STAGE_CONNECT)
+        progress(5, "OTA 업데이트 요청 중... (5%)")
+        try:
+            status, reply = await http_json(
+                host,
+                port,
+                "POST",
+                OTA_PATH,
+                {"url": url, "size": image.size, "sha256": image.sha256, "report": report_url},
+            )
+        except (OSError, asyncio.TimeoutError) as e:
+            raise FlashFailed(f"OTA 요청 실패: {e or type(e).__name__}", "connect")
+        if not 200 <= status < 300:
+            raise FlashFailed(f"장치가 OTA 요청을 거부함 (HTTP {status})", "ota_rejected")
+        info = reply if isinstance(reply, dict) else {}
+        if on_info is not None:
+            on_info(info)
+        log(
+            f"OTA 요청 수락 ({info.get('chip', '?')}, MAC {info.get('mac', '?')},"
+            f" 현재 {info.get('version', '?')})"
+        )
+
+        metrics.enter_stage(STAGE_WRITE)
+        progress(10, "장치가 펌웨어를 받는 중... (10%)")
+        started = loop.time()
+        while transfer.report is None and transfer.end < image.size:
+            _check_cancel(cancel_event)
+            await _wait_change(transfer, 0.5)
+            count = transfer.take_bytes()
+            if count:
+                metrics.add_bytes(count)
+                percent = 10 + 80 * transfer.end / image.size
+                progress(percent, f"펌웨어 전송 중... ({int(percent)}%)")
+            limit = FIRST_BYTE_TIMEOUT if transfer.end == 0 else DOWNLOAD_STALL_TIMEOUT
+            idle = loop.time() - transfer.last_activity
+            if idle > limit:
+                raise FlashStalled(STAGE_WRITE, idle, transfer.end)
+        metrics.add_bytes(transfer.take_bytes())
+        if transfer.report is None:
+            elapsed = loop.time() - started
+            log(
+                f"전송 완료 ({image.size} 바이트, {elapsed:.1f}초,"
+                f" 요청 {transfer.requests}회) - 장치 검증 대기"
+            )
+
+        metrics.enter_stage(STAGE_VERIFY)
+        progress(90, "장치에서 검증 중... (90%)")
+        deadline = loop.time() + REPORT_TIMEOUT
+        while transfer.report is None:
+            _check_cancel(cancel_event)
+            if loop.time() > deadline:
+                raise FlashStalled(STAGE_VERIFY, REPORT_TIMEOUT, transfer.end)
+            await _wait_change(transfer, 0.5)
+        report = transfer.report
+        if report.get("state") != "done":
+            raise FlashFailed(f"장치 보고: {report.get('error') or report.get('state')}", "verify")
+        server.close_session(token)
+        token = None
+        if holding:
+            slot.release()
+            holding = False
+
+        metrics.enter_stage(STAGE_RESET)
+        progress(95, "장치 재시작 대기 중... (95%)")
+        boot_started = loop.time()
+        while True:
+            _check_cancel(cancel_event)
+            try:
+                status, state = await http_json(host, port, "GET", OTA_PATH)
+                if (
+                    status == 200
+                    and isinstance(state, dict)
+                    and state.get("image_sha256") == image.sha256
+                ):
+                    break
+            except (OSError, asyncio.TimeoutError):
+                pass
+            if loop.time() - boot_started > BOOT_TIMEOUT:
+                raise FlashFailed("재시작 후 새 펌웨어로 응답하지 않음", "boot_check")
+            await asyncio.sleep(BOOT_POLL_INTERVAL)
+        result.boot = {"ok": True, "boot_time": round(loop.time() - boot_started, 2)}
+        result.finish(True)
+        progress(100, "OTA 업데이트 완료! (100%)")
+        log(f"새 펌웨어로 재시작 확인 ({result.boot['boot_time']}초)", "SUCCESS")
+
+    except (FlashCancelled, asyncio.CancelledError) as e:
+        result.cancelled = True
+        result.finish(False, "사용자 취소")
+        log("OTA 업데이트가 취소되었습니다.", "WARNING")
+        if isinstance(e, asyncio.CancelledError):
+            raise
+    except Exception as e:
+        if isinstance(e, FlashStalled):
+            result.record_stall(e)
+        result.finish(False, str(e) or type(e).__name__, failure_cause(e))
+        log(f"OTA 업데이트 중 오류 발생: {result.error}", "ERROR")
+    finally:
+        if token is not None:
+            server.close_session(token)
+        if holding:
+            slot.release()
+        metrics.finish(result)
+    return result
+
+
+async def push_devices(
+    targets,
+    image_path,
+    slots=DEFAULT_SLOTS,
+    log_factory=None,
+    progress_factory=None,
+    on_result=None,
+    cancel_event=None,
+    server_port=DEFAULT_SERVER_PORT,
+    advertise=None,
+    listen="0.0.0.0",
+):
+    """여러 장치에 동시에 OTA 업데이트 (동시 전송은 slots 대) → 장치 순서대로 SessionResult"""
+    image = OtaImage(image_path)
+    server = OtaServer(image, server_port, listen, advertise).start()
+    slot = asyncio.Semaphore(slots)
+    waiting = {"count": len(targets)}
+
+    def queue_depth():
+        return {("ota_slot",): waiting["count"]}
+
+    async def run(target):
+        log = log_factory(target) if log_factory else _print_log
+        progress = progress_factory(target) if progress_factory else _no_progress
+        info = {}
+        with_slot = _SlotCounter(slot, waiting)
+        result = await push_device(
+            target, server, log, progress, cancel_event, with_slot, on_info=info.update
+        )
+        if on_result is not None:
+            on_result(result, info)
+        return result
+
+    QUEUE_DEPTH.add_source(queue_depth)
+    try:
+        return await asyncio.gather(*(run(target) for target in targets))
+    finally:
+        QUEUE_DEPTH.remove_source(queue_depth)
+        server.stop()
+
+
+class _SlotCounter:
+    """슬롯을 기다리는 장치 수를 세는 세마포어 포장 (metrics.QUEUE_DEPTH 수집용)"""
+
+    def __init__(self, slot, waiting):
+        self.slot = slot
+        self.waiting = waiting
+
+    async def acquire(self):
+        try:
+            await self.slot.acquire()
+        finally:
+            self.waiting["count"] -= 1
+
+    def release(self):
+        self.slot.release()
+
+
+def run_push_devices(targets, image_path, **kwargs):
+    """동기 코드(GUI/CLI)에서 호출하는 진입점"""
+    return asyncio.run(push_devices(targets, image_path, **kwargs))
+
+
+def load_targets(path):
+    """장치 목록 파일 (한 줄에 하나, # 뒤는 주석)"""
+    targets = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                targets.append(line)
+    return targets
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Wi-Fi OTA 일괄 업데이트")
+    parser.add_argument("--device", nargs="+", default=[], help="장치 주소 (예: 10.0.0.21, host:port)")
+    parser.add_argument("--devices-file", default=None, help="장치 주소 목록 파일")
+    parser.add_argument(
+        "--images",
+        default=os.path.dirname(os.path.abspath(__file__)),
+        help="firmware.bin 이 있는 폴더",
+    )
+    parser.add_argument("--slots", type=int, default=DEFAULT_SLOTS, help="동시 전송 장치 수")
+    parser.add_argument("--listen", default="0.0.0.0", help="이미지 서버 주소")
+    parser.add_argument("--server-port", type=int, default=DEFAULT_SERVER_PORT)
+    parser.add_argument(
+        "--advertise", default=None, help="장치가 이 PC 에 접속할 주소 (기본: 자동)"
+    )
+    parser.add_argument("--metrics-port", type=int, default=None, help="모니터링 지표 포트")
+    args = parser.parse_args(argv)
+
+    targets = list(args.device)
+    if args.devices_file:
+        targets += load_targets(args.devices_file)
+    if not targets:
+        parser.error("--device 또는 --devices-file 이 필요합니다")
+    firmware = os.path.join(args.images, "firmware.bin")
+    if not os.path.isfile(firmware):
+        print(f"[ERROR] 파일을 찾을 수 없습니다: {firmware}")
+        return 2
+
+    if args.metrics_port is not None:
+        try:
+            print(f"[INFO] 모니터링 지표: {start_server(args.metrics_port).address}")
+        except OSError as e:
+            print(f"[WARNING] 지표 서버를 시작할 수 없습니다: {e}")
+
+    image = OtaImage(firmware)
+    manifest = manifest_hash({image.name: image.sha256})
+    history = HistoryWriter()
+    cancel_event = threading.Event()
+    print(f"[INFO] {image.name} ({image.size} 바이트) → 장치 {len(targets)}대, 동시 {args.slots}대")
+
+    def log_factory(target):
+        return lambda message, level="INFO": print(f"[{level}] [{target}] {message}")
+
+    def on_result(result, info):
+        print(f"세션 결과 - {result.summary()}")
+        history.record_result(result, manifest, image.name, info)
+
+    try:
+        results = run_push_devices(
+            targets,
+            firmware,
+            slots=args.slots,
+            log_factory=log_factory,
+            on_result=on_result,
+            cancel_event=cancel_event,
+            server_port=args.server_port,
+            advertise=args.advertise,
+            listen=args.listen,
+        )
+    except KeyboardInterrupt:
+        print("\n[WARNING] 취소됨")
+        history.close()
+        return 130
+    history.close()
+    ok = sum(r.success for r in results)
+    print(f"[INFO] 완료 {ok}/{len(results)}대")
+    return 0 if ok == len(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ESP 파티션 테이블 파서 및 최소 쓰기 계획
+partitions.bin 을 해석해서 실제로 필요한 영역만 쓰고 지우도록 계획을 만든다.
+"""
+
+import hashlib
+import os
+import struct
+
+PARTITION_TABLE_OFFSET = 0x8000
+PARTITION_TABLE_MAX_SIZE = 0xC00
+FLASH_SECTOR_SIZE = 0x1000
+
+ENTRY_SIZE = 32
+ENTRY_MAGIC = b"\xaa\x50"
+MD5_MAGIC = b"\xeb\xeb" + b"\xff" * 14
+
+TYPE_APP = 0x00
+TYPE_DATA = 0x01
+
+SUBTYPE_FACTORY = 0x00
+SUBTYPE_OTA_MIN = 0x10
+SUBTYPE_OTA_MAX = 0x1F
+SUBTYPE_OTADATA = 0x00
+SUBTYPE_PHY = 0x01
+SUBTYPE_NVS = 0x02
+SUBTYPE_COREDUMP = 0x03
+SUBTYPE_FAT = 0x81
+SUBTYPE_SPIFFS = 0x82
+SUBTYPE_LITTLEFS = 0x83
+
+
+class PartitionTableError(Exception):
+    """파티션 테이블 형식 오류"""
+
+
+class Partition:
+    """파티션 테이블 항목 하나"""
+
+    def __init__(self, name, ptype, subtype, offset, size, flags=0):
+        self.name = name
+        self.type = ptype
+        self.subtype = subtype
+        self.offset = offset
+        self.size = size
+        self.flags = flags
+
+    @property
+    def end(self):
+        return self.offset + self.size
+
+    @property
+    def is_app(self):
+        return self.type == TYPE_APP
+
+    @property
+    def is_otadata(self):
+        return self.type == TYPE_DATA and self.subtype == SUBTYPE_OTADATA
+
+    @property
+    def is_nvs(self):
+        return self.type == TYPE_DATA and self.subtype == SUBTYPE_NVS
+
+    @property
+    def is_filesystem(self):
+        return self.type == TYPE_DATA and self.subtype in (
+            SUBTYPE_FAT,
+            SUBTYPE_SPIFFS,
+            SUBTYPE_LITTLEFS,
+        )
+
+    def __repr__(self):
+        return (
+            f"Partition({self.name!r}, type=0x{self.type:02x}, "
+            f"subtype=0x{self.subtype:02x}, offset=0x{self.offset:x}, "
+            f"size=0x{self.size:x})"
+        )
+
+
+class PartitionTable:
+    """파싱된 파티션 테이블"""
+
+    def __init__(self, partitions, md5_ok=None):
+        self.partitions = partitions
+        # None: MD5 항목이 없는 테이블, True/False: MD5 검사 결과
+        self.md5_ok = md5_ok
+
+    def __iter__(self):
+        return iter(self.partitions)
+
+    def find(self, name):
+        for part in self.partitions:
+            if part.name == name:
+                return part
+        return None
+
+    @property
+    def app_partitions(self):
+        return [part for part in self.partitions if part.is_app]
+
+    @property
+    def boot_app(self):
+        """부트로더가 otadata 가 비어 있을 때 선택하는 앱 파티션"""
+        apps = self.app_partitions
+        for part in apps:
+            if part.subtype == SUBTYPE_FACTORY:
+                return part
+        for part in apps:
+            if SUBTYPE_OTA_MIN <= part.subtype <= SUBTYPE_OTA_MAX:
+                return part
+        return apps[0] if apps else None
+
+    @property
+    def otadata(self):
+        for part in self.partitions:
+            if part.is_otadata:
+                return part
+        return None
+
+    @property
+    def nvs(self):
+        for part in self.partitions:
+            if part.is_nvs:
+                return part
+        return None
+
+
+def parse_partition_table(data):
+    """partitions.bin 바이트열을 파싱 (MD5 항목이 있으면 검증)"""
+    if len(data) > PARTITION_TABLE_MAX_SIZE:
+        data = data[:PARTITION_TABLE_MAX_SIZE]
+
+    partitions = []
+    md5_ok = None
+    for pos in range(0, len(data) - ENTRY_SIZE + 1, ENTRY_SIZE):
+        entry = data[pos : pos + ENTRY_SIZE]
+        if entry == b"\xff" * ENTRY_SIZE:
+            break
+        if entry[:16] == MD5_MAGIC:
+            md5_ok = hashlib.md5(data[:pos]).digest() == entry[16:]
+            continue
+        if entry[:2] != ENTRY_MAGIC:
+            raise PartitionTableError(
+                f"잘못된 파티션 항목 (offset 0x{pos:x}): {entry[:2].hex()}"
+            )
+
+        ptype, subtype, offset, size = struct.unpack_from("<BBII", entry, 2)
+        name = entry[12:28].split(b"\x00", 1)[0].decode("ascii", "replace")
+        flags = struct.unpack_from("<I", entry, 28)[0]
+        partitions.append(Partition(name, ptype, subtype, offset, size, flags))
+
+    if not partitions:
+        raise PartitionTableError("파티션 항목이 없습니다")
+    if md5_ok is False:
+        raise PartitionTableError("파티션 테이블 MD5 불일치 (파일 손상)")
+
+    ordered = sorted(partitions, key=lambda p: p.offset)
+    for prev, cur in zip(ordered, ordered[1:]):
+        if cur.offset < prev.end:
+            raise PartitionTableError(f"파티션이 겹칩니다: {prev.name}, {cur.name}")
+    for part in partitions:
+        if part.offset % FLASH_SECTOR_SIZE:
+            raise PartitionTableError(
+                f"{part.name} 파티션이 섹터 경계에 정렬되어 있지 않습니다"
+            )
+
+    return PartitionTable(partitions, md5_ok)
+
+
+def load_partition_table(path):
+    """파일에서 파티션 테이블 읽기"""
+    with open(path, "rb") as f:
+        return parse_partition_table(f.read(PARTITION_TABLE_MAX_SIZE))
+
+
+def sector_align(size):
+    """섹터(4KB) 단위로 올림"""
+    return (size + FLASH_SECTOR_SIZE - 1) // FLASH_SECTOR_SIZE * FLASH_SECTOR_SIZE
+
+
+class FlashRegion:
+    """플래시 계획의 쓰기 단위 (파일 또는 0xFF 채움)"""
+
+    def __init__(self, name, offset, size, path=None):
+        self.name = name
+        self.offset = offset
+        self.size = size
+        # path 가 None 이면 해당 영역을 0xFF 로 지우는 항목
+        self.path = path
+
+    @property
+    def is_erase(self):
+        return self.path is None
+
+    @property
+    def erase_size(self):
+        """FLASH_BEGIN 이 실제로 지우는 크기"""
+        return sector_align(self.size)
+
+    @property
+    def address(self):
+        return f"0x{self.offset:x}"
+
+    def __repr__(self):
+        kind = "erase" if self.is_erase else os.path.basename(self.path)
+        return f"FlashRegion({self.name!r}, 0x{self.offset:x}, {self.size}, {kind})"
+
+
+def esptool_region_args(regions, work_dir):
+    """write_flash 에 넘길 주소/파일 인자 (지우기 영역은 0xFF 파일 생성)"""
+    args = []
+    for region in regions:
+        path = region.path
+        if region.is_erase:
+            path = os.path.join(work_dir, f"erase_{region.name}.bin")
+            with open(path, "wb") as f:
+                f.write(b"\xff" * region.size)
+        args += [region.address, path]
+    return args
+
+
+class FlashPlan:
+    """최소 쓰기/지우기 계획"""
+
+    def __init__(self, table, regions, preserved):
+        self.table = table
+        self.regions = sorted(regions, key=lambda r: r.offset)
+        self.preserved = preserved
+
+    @property
+    def erase_bytes(self):
+        return sum(region.erase_size for region in self.regions)
+
+    @property
+    def write_bytes(self):
+        return sum(region.size for region in self.regions)
+
+    def region(self, name):
+        for region in self.regions:
+            if region.name == name:
+                return region
+        return None
+
+    def set_region(self, region):
+        """영역 추가 (같은 위치를 지우던 항목은 대체하고 유지 목록에서 제외)"""
+        self.regions = sorted(
+            [r for r in self.regions if r.offset != region.offset] + [region],
+            key=lambda r: r.offset,
+        )
+        if region.name in self.preserved:
+            self.preserved.remove(region.name)
+
+    def esptool_args(self, work_dir):
+        """write_flash 에 넘길 주소/파일 인자"""
+        return esptool_region_args(self.regions, work_dir)
+
+    def describe(self):
+        """로그용 요약"""
+        lines = []
+        for region in self.regions:
+            action = "지우기" if region.is_erase else "쓰기"
+            lines.append(
+                f"{region.name}: 0x{region.offset:05x} ~ "
+                f"0x{region.offset + region.erase_size:05x} {action}"
+            )
+        if self.preserved:
+            lines.append("유지: " + ", ".join(self.preserved))
+        lines.append(f"총 지우기 {self.erase_bytes // 1024}KB")
+        return lines
+
+
+def plan_flash(
+    table,
+    bootloader_path,
+    partitions_path,
+    firmware_path,
+    bootloader_offset=0x0,
+    reset_otadata=True,
+    clear_nvs=False,
+):
+    """파티션 테이블을 기준으로 필요한 섹터만 지우고 쓰는 계획 생성"""
+    regions = []
+    preserved = []
+
+    bootloader_size = os.path.getsize(bootloader_path)
+    if bootloader_offset + bootloader_size > PARTITION_TABLE_OFFSET:
+        raise PartitionTableError("bootloader.bin 이 파티션 테이블 영역을 침범합니다")
+    regions.append(
+        FlashRegion("Bootloader", bootloader_offset, bootloader_size, bootloader_path)
+    )
+    regions.append(
+        FlashRegion(
+            "Partitions",
+            PARTITION_TABLE_OFFSET,
+            os.path.getsize(partitions_path),
+            partitions_path,
+        )
+    )
+
+    app = table.boot_app
+    if app is None:
+        raise PartitionTableError("앱 파티션이 없습니다")
+    firmware_size = os.path.getsize(firmware_path)
+    if firmware_size > app.size:
+        raise PartitionTableError(
+            f"firmware.bin ({firmware_size} bytes) 이 {app.name} 파티션 "
+            f"({app.size} bytes) 보다 큽니다"
+        )
+    regions.append(FlashRegion("Firmware", app.offset, firmware_size, firmware_path))
+
+    # otadata 가 남아 있으면 이전 OTA 슬롯으로 부팅될 수 있으므로 초기화
+    otadata = table.otadata
+    if otadata is not None:
+        if reset_otadata:
+            regions.append(FlashRegion("otadata", otadata.offset, otadata.size))
+        else:
+            preserved.append(otadata.name)
+
+    nvs = table.nvs
+    if nvs is not None:
+        if clear_nvs:
+            regions.append(FlashRegion("nvs", nvs.offset, nvs.size))
+        else:
+            preserved.append(nvs.name)
+
+    for part in table:
+        if part.is_filesystem or (
+            part.type == TYPE_DATA and part.subtype == SUBTYPE_COREDUMP
+        ):
+            preserved.append(part.name)
+
+    return FlashPlan(table, regions, preserved)
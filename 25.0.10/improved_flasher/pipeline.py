@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+스테이션 파이프라인
+감지 → 연결 → 업로드 → 부팅 확인 단계를 각자의 작업 스레드 풀과 제한된 큐로 실행해서
+장치 N+1 연결, 장치 N 업로드, 장치 N-1 부팅 확인이 동시에 진행되도록 한다.
+
+연결 단계는 장치를 다운로드 모드로 남겨 두고, 업로드 단계의 esptool 은 리셋 없이 동기화만 한다.
+쓴 영역의 해시 검증(장치 MD5)은 업로드 단계의 esptool 이 영역마다 한다.
+"""
+
+import queue
+import threading
+import time
+
+import serial.tools.list_ports
+
+from flash_core import probe_device, reset_device
+import profiling
+from metrics import FAILURES, PIPELINE_STAGE_SECONDS, QUEUE_DEPTH
+
+# 단계 간 큐 크기 (가득 차면 앞 단계가 기다림)
+DEFAULT_QUEUE_SIZE = 4
+# 평균 지연 시간 계산용 지수 이동 평균 계수
+LATENCY_SMOOTHING = 0.3
+
+
+class PipelineSkip(Exception):
+    """더 처리할 필요가 없는 장치 (예: 이미 업로드된 보드)"""
+
+
+class PipelineItem:
+    """파이프라인을 지나가는 장치 한 대"""
+
+    def __init__(self, port):
+        self.port = port
+        self.info = {}
+        # 연결 단계가 다운로드 모드로 남겨 뒀는지 (업로드 단계에서 리셋 생략)
+        self.in_download_mode = False
+        self.job = None
+        self.result = None
+        self.error = None
+        self.skipped = False
+        self.failed_stage = None
+        self.stage_times = {}
+        self.created = time.monotonic()
+
+    @property
+    def total_time(self):
+        return sum(self.stage_times.values())
+
+
+class Stage:
+    """파이프라인 단계 하나 (작업 함수 + 스레드 풀 + 입력 큐)"""
+
+    def __init__(self, name, func, workers=1, queue_size=DEFAULT_QUEUE_SIZE, key=None):
+        self.name = name
+        # 모니터링 지표 라벨 (영문)
+        self.key = key or name
+        self.func = func
+        self.workers = workers
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.lock = threading.Lock()
+        self.busy = 0
+        self.done = 0
+        self.failed = 0
+        self.avg_latency = 0.0
+        self.last_latency = 0.0
+
+    def record(self, latency, ok):
+        PIPELINE_STAGE_SECONDS.observe(latency, self.key)
+        with self.lock:
+            self.busy -= 1
+            if ok:
+                self.done += 1
+            else:
+                self.failed += 1
+            self.last_latency = latency
+            if self.done + self.failed == 1:
+                self.avg_latency = latency
+            else:
+                self.avg_latency += LATENCY_SMOOTHING * (latency - self.avg_latency)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "name": self.name,
+                "queued": self.queue.qsize(),
+                "busy": self.busy,
+                "done": self.done,
+                "failed": self.failed,
+                "avg_latency": self.avg_latency,
+            }
+
+
+class StationPipeline:
+    """단계별 스레드 풀로 구성된 파이프라인"""
+
+    def __init__(self, stages, on_done=None, on_fail=None, on_skip=None):
+        self.stages = stages
+        self.on_done = on_done
+        self.on_fail = on_fail
+        self.on_skip = on_skip
+        self.stop_event = threading.Event()
+        self.active = {}
+        self.active_lock = threading.Lock()
+        self.threads = []
+
+    def start(self):
+        self.stop_event.clear()
+        QUEUE_DEPTH.remove_source(self.queue_depth)
+        QUEUE_DEPTH.add_source(self.queue_depth)
+        for idx, stage in enumerate(self.stages):
+            for n in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._worker,
+                    args=(idx,),
+                    name=f"{stage.name}-{n}",
+                    daemon=True,
+                )
+                thread.start()
+                self.threads.append(thread)
+
+    def stop(self):
+        self.stop_event.set()
+
+    def submit(self, item):
+        """장치 추가 (이미 처리 중인 포트거나 첫 단계 큐가 가득 차면 False)"""
+        with self.active_lock:
+            if item.port in self.active:
+                return False
+            self.active[item.port] = item
+        try:
+            self.stages[0].queue.put_nowait(item)
+        except queue.Full:
+            self._release(item)
+            return False
+        return True
+
+    def is_active(self, port):
+        with self.active_lock:
+            return port in self.active
+
+    def cancel_all(self):
+        """파이프라인 정지 및 진행 중인 업로드 취소"""
+        self.stop()
+        # 아직 큐에서 기다리던 장치는 바로 해제
+        for stage in self.stages:
+            while True:
+                try:
+                    item = stage.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item.job is not None and item.job.boot_pending:
+                    # 쓰기 후 부팅 확인(재시작)을 기다리던 보드는 다운로드 모드에 남아 있음
+                    item.job.skip_boot_check()
+                self._release(item)
+        with self.active_lock:
+            items = list(self.active.values())
+        for item in items:
+            if item.job is not None:
+                item.job.cancel()
+
+    def _release(self, item):
+        with self.active_lock:
+            self.active.pop(item.port, None)
+
+    def _put(self, stage, item):
+        # 다음 단계 큐가 가득 차면 여기서 대기 (역압)
+        while not self.stop_event.is_set():
+            try:
+                stage.queue.put(item, timeout=0.2)
+                return
+            except queue.Full:
+                continue
+
+    def _worker(self, idx):
+        stage = self.stages[idx]
+        next_stage = self.stages[idx + 1] if idx + 1 < len(self.stages) else None
+        while not self.stop_event.is_set():
+            try:
+                item = stage.queue.get(timeout=0.2)
+            except queue.Empty:
+                continue
+
+            with stage.lock:
+                stage.busy += 1
+            started = time.monotonic()
+            try:
+                with profiling.span(f"pipeline.{stage.key}", "pipeline", port=item.port):
+                    stage.func(item)
+                ok = True
+            except PipelineSkip as e:
+                item.skipped = True
+                item.error = str(e)
+                ok = True
+            except Exception as e:
+                item.error = str(e)
+                item.failed_stage = stage.name
+                ok = False
+            latency = time.monotonic() - started
+            item.stage_times[stage.name] = latency
+            stage.record(latency, ok)
+
+            if not ok:
+                # 업로드 세션 실패는 세션 쪽에서 이미 원인별로 셌음
+                if item.result is None or item.result.success:
+                    FAILURES.inc(1, "pipeline_" + stage.key)
+                self._finish(item, self.on_fail)
+            elif item.skipped:
+                self._finish(item, self.on_skip)
+            elif next_stage is not None:
+                self._put(next_stage, item)
+            else:
+                self._finish(item, self.on_done)
+
+    def _finish(self, item, callback):
+        # 콜백이 끝난 뒤 해제 (콜백이 남긴 기록보다 같은 포트의 재제출이 먼저 오지 않게)
+        try:
+            if callback:
+                callback(item)
+        finally:
+            self._release(item)
+
+    def stats(self):
+        return [stage.stats() for stage in self.stages]
+
+    def queue_depth(self):
+        """단계별 입력 큐 길이 (metrics.QUEUE_DEPTH 수집용)"""
+        return {(stage.key,): stage.queue.qsize() for stage in self.stages}
+
+    @property
+    def in_flight(self):
+        with self.active_lock:
+            return len(self.active)
+
+
+def build_station_pipeline(
+    job_factory,
+    flash_workers=4,
+    on_done=None,
+    on_fail=None,
+    on_skip=None,
+    is_flashed=None,
+    efuse_regs=(),
+):
+    """감지 → 연결 → 업로드 → 부팅 확인 파이프라인 구성
+
+    job_factory(item) 는 해당 장치용 FlashJob 을 만들어 반환한다.
+    is_flashed(mac) 이 True 인 보드는 연결 단계에서 앱으로 재시작하고 건너뛴다.
+    efuse_regs 는 연결 단계에서 함께 읽을 eFuse 레지스터 (프로필 선택용).
+    부팅 확인 설정이 없는 작업은 부팅 확인 단계를 바로 통과한다.
+    """
+
+    def detect(item):
+        ports = {port.device for port in serial.tools.list_ports.comports()}
+        if item.port not in ports:
+            raise Exception(f"{item.port} 포트가 연결되어 있지 않습니다")
+
+    def connect(item):
+        item.info = probe_device(item.port, efuse_regs)
+        if is_flashed is not None and is_flashed(item.info["mac"]):
+            reset_device(item.port)
+            raise PipelineSkip(f"이미 업로드된 보드 (MAC {item.info['mac']})")
+        item.in_download_mode = True
+
+    def flash(item):
+        job = item.job = job_factory(item)
+        job.in_download_mode = item.in_download_mode
+        job.defer_boot_check = True
+        item.result = job.run()
+        if not item.result.success:
+            raise Exception(item.result.error)
+
+    def boot_check(item):
+        if not item.job.boot_pending:
+            return
+        item.result = item.job.run_boot_check()
+        if not item.result.success:
+            raise Exception(item.result.error)
+
+    return StationPipeline(
+        [
+            Stage("감지", detect, workers=1, key="detect"),
+            Stage("연결", connect, workers=flash_workers, key="connect"),
+            Stage("업로드", flash, workers=flash_workers, key="flash"),
+            Stage("부팅 확인", boot_check, workers=flash_workers, key="boot_check"),
+        ],
+        on_done=on_done,
+        on_fail=on_fail,
+        on_skip=on_skip,
+    )
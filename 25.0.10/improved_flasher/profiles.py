@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+펌웨어 프로필 (보드 변형별 이미지 묶음)
+프로필마다 이미지, 부트로더 위치, 플래시 설정과 선택 조건을 가진다.
+연결 단계에서 읽은 칩 종류/플래시 크기/MAC/eFuse 값으로 보드마다 맞는 프로필을 고르고,
+모든 프로필은 시작할 때 한 번 읽어 두므로 보드가 바뀌어도 추가 비용이 없다.
+
+이미지 폴더 구성 (profiles 폴더가 없으면 이미지 폴더 자체가 "default" 프로필 하나):
+
+    profiles/
+        s3-8mb/profile.json, bootloader.bin, partitions.bin, firmware.bin
+        s3-16mb-rev1/profile.json, ...
+
+profile.json 예시 (모든 항목 선택, 경로는 프로필 폴더 기준):
+
+    {
+        "description": "16MB 보드, 보정 eFuse 버전 1",
+        "flash": {"mode": "dio", "freq": "80m", "size": "detect"},
+        "match": {
+            "chip": "ESP32-S3",
+            "flash_size": ["16MB"],
+            "mac_prefix": ["7c:df:a1"],
+            "efuse": {"0x6000705c": {"mask": "0x000f0000", "value": "0x00010000"}}
+        },
+        "priority": 0
+    }
+
+조건을 많이 만족하는 프로필이 먼저, 같으면 priority 가 큰 것, 그다음 이름 순으로 고른다.
+조건이 없는 프로필은 다른 프로필이 맞지 않을 때 쓰는 기본값이 된다.
+이미지 헤더의 chip id 로 대상 칩을 알 수 있으므로 다른 칩의 보드에는 고르지 않으며,
+부트로더 위치는 그 칩의 기본값(chip_layouts)을 쓴다 ("bootloader_offset" 로 바꿀 수 있음).
+"""
+
+import json
+import os
+
+from chip_layouts import ChipLayoutError, image_layout, layout_for, layout_for_image_id
+from history_db import manifest_hash
+from image_check import ImageSetValidator
+from partition_table import (
+    PARTITION_TABLE_OFFSET,
+    PartitionTableError,
+    load_partition_table,
+    plan_flash,
+)
+
+PROFILE_DIR_NAME = "profiles"
+PROFILE_FILE_NAME = "profile.json"
+DEFAULT_PROFILE = "default"
+IMAGE_FILES = {
+    "bootloader": "bootloader.bin",
+    "partitions": "partitions.bin",
+    "firmware": "firmware.bin",
+}
+FLASH_DEFAULTS = {"mode": "dio", "freq": "80m", "size": "detect"}
+MATCH_KEYS = ("chip", "flash_size", "mac_prefix", "efuse")
+
+
+class ProfileError(Exception):
+    """프로필 파일 오류 또는 맞는 프로필 없음"""
+
+    # 실패 원인 키 (flash_core.failure_cause)
+    cause = "profile"
+
+
+def _int(value):
+    return int(value, 0) if isinstance(value, str) else int(value)
+
+
+def _as_list(value):
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+
+class FirmwareProfile:
+    """이름 붙은 이미지 묶음 하나"""
+
+    def __init__(
+        self,
+        name,
+        directory,
+        images=None,
+        bootloader_offset=None,
+        flash=None,
+        match=None,
+        priority=0,
+        description="",
+    ):
+        self.name = name
+        self.directory = os.path.abspath(directory)
+        images = dict(IMAGE_FILES, **(images or {}))
+        self.bootloader_path = os.path.join(self.directory, images["bootloader"])
+        self.partitions_path = os.path.join(self.directory, images["partitions"])
+        self.firmware_path = os.path.join(self.directory, images["firmware"])
+        # None 이면 대상 칩의 기본 위치
+        self.custom_bootloader_offset = bootloader_offset
+        self.flash = dict(FLASH_DEFAULTS, **(flash or {}))
+        self.match = match or {}
+        unknown = set(self.match) - set(MATCH_KEYS)
+        if unknown:
+            raise ProfileError(f"{name}: 알 수 없는 선택 조건 {', '.join(sorted(unknown))}")
+        # eFuse 조건 {레지스터 주소: (마스크, 값)}
+        self.efuse = {}
+        for addr, cond in (self.match.get("efuse") or {}).items():
+            if isinstance(cond, dict):
+                mask, value = _int(cond.get("mask", 0xFFFFFFFF)), _int(cond["value"])
+            else:
+                mask, value = 0xFFFFFFFF, _int(cond)
+            self.efuse[_int(addr)] = (mask, value & mask)
+        # "chip" 조건이 칩 하나면 이미지도 그 칩용이어야 함
+        chips = _as_list(self.match.get("chip", []))
+        try:
+            self.declared_layout = layout_for(chips[0]) if len(chips) == 1 else None
+        except ChipLayoutError as e:
+            raise ProfileError(f"{name}: {e}")
+        self.priority = priority
+        self.description = description
+        self.table = None
+        self._layout = None
+
+    @classmethod
+    def load(cls, directory, name=None):
+        """프로필 폴더의 profile.json 읽기 (없으면 기본 설정)"""
+        name = name or os.path.basename(os.path.normpath(directory))
+        path = os.path.join(directory, PROFILE_FILE_NAME)
+        config = {}
+        if os.path.isfile(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    config = json.load(f)
+            except (OSError, ValueError) as e:
+                raise ProfileError(f"{name}: {PROFILE_FILE_NAME} 을 읽을 수 없습니다: {e}")
+        try:
+            return cls(
+                config.get("name", name),
+                directory,
+                images=config.get("images"),
+                bootloader_offset=(
+                    _int(config["bootloader_offset"]) if "bootloader_offset" in config else None
+                ),
+                flash=config.get("flash"),
+                match=config.get("match"),
+                priority=int(config.get("priority", 0)),
+                description=config.get("description", ""),
+            )
+        except (KeyError, TypeError, ValueError) as e:
+            raise ProfileError(f"{name}: {PROFILE_FILE_NAME} 형식 오류: {e}")
+
+    @property
+    def layout(self):
+        """대상 칩 레이아웃 (펌웨어 헤더의 chip id, 읽을 수 없으면 "chip" 조건, 모르면 None)"""
+        if self._layout is None:
+            self._layout = image_layout(self.firmware_path) or self.declared_layout
+        return self._layout
+
+    @property
+    def bootloader_offset(self):
+        if self.custom_bootloader_offset is not None:
+            return self.custom_bootloader_offset
+        layout = self.layout
+        return layout.bootloader_offset if layout is not None else 0x0
+
+    def validator(self):
+        """이 프로필용 이미지 검사기 ("chip" 조건이 칩 하나면 그 칩 이미지만 허용)"""
+        expected = self.declared_layout.image_chip_id if self.declared_layout else None
+        return ImageSetValidator(self.directory, expected)
+
+    @property
+    def image_paths(self):
+        return [
+            ("Bootloader", self.bootloader_path, "app"),
+            ("Partitions", self.partitions_path, "partitions"),
+            ("Firmware", self.firmware_path, "app"),
+        ]
+
+    def preload(self, validator=None):
+        """파일 확인, 이미지 검사, 파티션 테이블 읽기 → 오류 메시지 목록"""
+        missing = [p for _, p, _ in self.image_paths if not os.path.isfile(p)]
+        if missing:
+            return [f"[{self.name}] 파일 없음: {os.path.basename(p)}" for p in missing]
+        validator = validator or self.validator()
+        errors = [f"[{self.name}] {e}" for e in validator.validate(self.image_paths)]
+        if not errors:
+            errors += self._check_chip(validator)
+        try:
+            self.table = load_partition_table(self.partitions_path)
+        except (OSError, PartitionTableError) as e:
+            errors.append(f"[{self.name}] 파티션 테이블 오류: {e}")
+        return errors
+
+    def _check_chip(self, validator):
+        """부트로더와 펌웨어가 같은 칩용이고 지원하는 칩인지 확인 (검사 결과 캐시 사용)"""
+        chip_ids = {
+            validator.check(path, kind)[1]["chip_id"]
+            for _, path, kind in self.image_paths
+            if kind == "app"
+        }
+        if len(chip_ids) > 1:
+            return [f"[{self.name}] 부트로더와 펌웨어의 대상 칩이 다릅니다 (chip id {sorted(chip_ids)})"]
+        chip_id = chip_ids.pop()
+        layout = layout_for_image_id(chip_id)
+        if layout is None:
+            return [f"[{self.name}] 지원하지 않는 칩용 이미지입니다 (chip id {chip_id})"]
+        self._layout = layout
+        return []
+
+    def matches_chip(self, info):
+        """장치 칩이 이미지 대상 칩과 같은지 (둘 중 하나라도 모르면 True)"""
+        layout = self.layout
+        if layout is None or not info.get("chip"):
+            return True
+        try:
+            return layout_for(info["chip"]) is layout
+        except ChipLayoutError:
+            return False
+
+    def plan(self, clear_nvs=False):
+        """이 프로필의 쓰기 계획 (읽어 둔 파티션 테이블 사용)"""
+        table = self.table or load_partition_table(self.partitions_path)
+        return plan_flash(
+            table,
+            self.bootloader_path,
+            self.partitions_path,
+            self.firmware_path,
+            bootloader_offset=self.bootloader_offset,
+            clear_nvs=clear_nvs,
+        )
+
+    def score(self, info):
+        """장치 정보가 조건을 모두 만족하면 만족한 조건 수, 하나라도 어긋나면 None
+
+        연결 단계에서 읽지 못한 값(예: asyncio 전송의 플래시 크기)은 어긋난 것으로 본다.
+        """
+        if not self.matches_chip(info):
+            return None
+        score = 0
+        if "chip" in self.match:
+            chip = (info.get("chip") or "").upper().split(" ", 1)[0]
+            if chip not in (c.upper() for c in _as_list(self.match["chip"])):
+                return None
+            score += 1
+        if "flash_size" in self.match:
+            if info.get("flash_size") not in _as_list(self.match["flash_size"]):
+                return None
+            score += 1
+        if "mac_prefix" in self.match:
+            mac = (info.get("mac") or "").lower()
+            if not mac or not any(mac.startswith(p.lower()) for p in _as_list(self.match["mac_prefix"])):
+                return None
+            score += 1
+        values = info.get("efuse") or {}
+        for addr, (mask, value) in self.efuse.items():
+            if addr not in values or values[addr] & mask != value:
+                return None
+            score += 1
+        return score
+
+    def describe(self):
+        """화면/로그용 한 줄 요약"""
+        parts = []
+        for key in ("chip", "flash_size", "mac_prefix"):
+            if key in self.match:
+                parts.append("/".join(_as_list(self.match[key])))
+        if self.efuse:
+            parts.append(f"eFuse {len(self.efuse)}개")
+        condition = ", ".join(parts) if parts else "기본"
+        chip = self.layout.name if self.layout is not None else "칩 알 수 없음"
+        return f"{self.name} ({chip}, {condition}, 부트로더 0x{self.bootloader_offset:x})"
+
+    def offsets(self):
+        """영역 이름 → 쓰기 위치 (화면 표시용, 파티션 테이블을 읽을 수 없으면 앱 위치 생략)"""
+        offsets = {"Bootloader": self.bootloader_offset, "Partitions": PARTITION_TABLE_OFFSET}
+        try:
+            table = self.table or load_partition_table(self.partitions_path)
+        except (OSError, PartitionTableError):
+            return offsets
+        if table.boot_app is not None:
+            offsets["Firmware"] = table.boot_app.offset
+        return offsets
+
+
+class ProfileSet:
+    """이미지 폴더의 모든 프로필 (시작할 때 한 번 읽어 둠)"""
+
+    def __init__(self, profiles):
+        if not profiles:
+            raise ProfileError("프로필이 없습니다")
+        self.profiles = sorted(profiles, key=lambda p: p.name)
+        names = [p.name for p in self.profiles]
+        if len(set(names)) != len(names):
+            raise ProfileError("프로필 이름이 중복됩니다")
+
+    @classmethod
+    def load(cls, base_dir):
+        """base_dir/profiles/*/ 를 읽음 (폴더가 없으면 base_dir 자체가 기본 프로필)"""
+        root = os.path.join(base_dir, PROFILE_DIR_NAME)
+        if not os.path.isdir(root):
+            return cls([FirmwareProfile.load(base_dir, DEFAULT_PROFILE)])
+        return cls(
+            [
+                FirmwareProfile.load(os.path.join(root, name), name)
+                for name in sorted(os.listdir(root))
+                if os.path.isdir(os.path.join(root, name)) and not name.startswith(".")
+            ]
+        )
+
+    def __iter__(self):
+        return iter(self.profiles)
+
+    def __len__(self):
+        return len(self.profiles)
+
+    def get(self, name):
+        for profile in self.profiles:
+            if profile.name == name:
+                return profile
+        return None
+
+    @property
+    def default(self):
+        """조건 없는 프로필 (없으면 첫 프로필, 화면 표시용)"""
+        for profile in self.profiles:
+            if not profile.match:
+                return profile
+        return self.profiles[0]
+
+    @property
+    def chips(self):
+        """프로필 이미지의 대상 칩 이름 (알 수 있는 것만, 중복 없이)"""
+        return sorted({p.layout.name for p in self.profiles if p.layout is not None})
+
+    @property
+    def needs_device_info(self):
+        """선택에 장치 정보가 필요한지 (조건 없는 프로필 하나뿐이면 필요 없음)"""
+        return len(self.profiles) > 1 or bool(self.profiles[0].match)
+
+    @property
+    def efuse_regs(self):
+        """연결 단계에서 읽어야 하는 eFuse 레지스터 주소"""
+        return sorted({addr for p in self.profiles for addr in p.efuse})
+
+    def preload(self):
+        """모든 프로필 검사 + 파티션 테이블 읽기 → 오류 메시지 목록"""
+        errors = []
+        validators = {}
+        for profile in self.profiles:
+            key = (profile.directory, profile.declared_layout)
+            if key not in validators:
+                validators[key] = profile.validator()
+            errors += profile.preload(validators[key])
+        return errors
+
+    def missing_partition(self, name):
+        """name 파티션이 없는 프로필의 오류 메시지 목록 (장치별 데이터 확인용, preload 후)"""
+        return [
+            f"[{p.name}] 파티션 테이블에 {name} 파티션이 없습니다"
+            for p in self.profiles
+            if p.table is not None and p.table.find(name) is None
+        ]
+
+    def plans(self, clear_nvs=False):
+        """프로필별 쓰기 계획 {이름: FlashPlan}"""
+        return {profile.name: profile.plan(clear_nvs) for profile in self.profiles}
+
+    def select(self, info):
+        """장치 정보에 맞는 프로필 (없으면 ProfileError)"""
+        if not self.needs_device_info:
+            profile = self.profiles[0]
+            if not profile.matches_chip(info):
+                raise ProfileError(
+                    f"{profile.layout.name} 용 이미지를 {info['chip']} 보드에 쓸 수 없습니다"
+                )
+            return profile
+        best = None
+        for profile in self.profiles:
+            score = profile.score(info)
+            if score is None:
+                continue
+            key = (score, profile.priority)
+            if best is None or key > best[0]:
+                best = (key, profile)
+        if best is None:
+            found = ", ".join(
+                f"{k} {info[k]}" for k in ("chip", "flash_size", "mac") if info.get(k)
+            )
+            raise ProfileError(f"이 보드에 맞는 프로필이 없습니다 ({found or '정보 없음'})")
+        return best[1]
+
+    def digest(self):
+        """모든 프로필 펌웨어를 합친 식별값 (업로드 완료 보드 기록용)"""
+        digests = {}
+        for profile in self.profiles:
+            ok, info = profile.validator().check(profile.firmware_path)
+            if ok and info.get("sha256"):
+                digests[profile.name] = info["sha256"]
+            else:
+                st = os.stat(profile.firmware_path)
+                digests[profile.name] = f"{st.st_size}:{st.st_mtime_ns}"
+        if len(digests) == 1:
+            return next(iter(digests.values()))
+        return manifest_hash(digests)
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+프로파일링 (느린 스테이션에서 시간이 어디에 쓰이는지 확인)
+켜 두면 모든 스레드(UI, 파이프라인 작업 스레드, 이벤트 루프)의 호출 스택을 주기적으로 샘플링하고,
+코드에 표시한 구간(span)의 시작/길이를 기록해서 Chrome trace JSON 으로 저장한다.
+chrome://tracing 또는 https://ui.perfetto.dev 에서 열 수 있다.
+
+cProfile 은 켠 스레드 하나만 측정하고 호출마다 비용이 들어서, 여러 스레드를 함께 보는
+스택 샘플링을 쓴다. 샘플은 "스택 샘플", 구간은 "구간" 프로세스로 나눠서 보여 준다.
+
+꺼져 있을 때 span() 은 전역 변수 하나를 확인하고 공용 빈 컨텍스트를 돌려줄 뿐이다.
+이벤트 루프에서 여러 장치의 코루틴이 번갈아 도는 구간은 track 을 주면 장치별 줄에 따로 그린다.
+
+    with profiling.span("esptool.line", "parse"):
+        ...
+    with profiling.span("rom.block", "device", track=port):
+        await ...
+
+    python flasher_cli.py --port COM4 --trace trace.json
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+
+# 스택 샘플링 주기 (초)
+DEFAULT_INTERVAL = 0.005
+# 메모리 보호용 최대 이벤트 수 (넘으면 버리고 개수만 셈)
+MAX_EVENTS = 2_000_000
+MAX_STACK_DEPTH = 64
+
+# trace 안의 가상 프로세스 번호
+SPAN_PID = 1
+SAMPLE_PID = 2
+# track 구간에 붙이는 가상 스레드 번호 시작값 (실제 스레드 id 와 겹치지 않게 음수)
+TRACK_TID_BASE = -1
+
+# 실행 중인 기록기 (None 이면 꺼짐)
+_active = None
+_lock = threading.Lock()
+# 코드 객체 → 프레임 라벨
+_labels = {}
+
+
+class _NullSpan:
+    """꺼져 있을 때 돌려주는 빈 컨텍스트 (하나를 공유)"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("recorder", "name", "cat", "args", "track", "start")
+
+    def __init__(self, recorder, name, cat, args, track):
+        self.recorder = recorder
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self.track = track
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.recorder.complete(
+            self.name, self.cat, self.start, time.perf_counter_ns(), self.args, self.track
+        )
+        return False
+
+
+def span(name, cat="app", track=None, **args):
+    """구간 기록 컨텍스트 (꺼져 있으면 아무것도 하지 않음)
+
+    track 을 주면 현재 스레드 대신 그 이름의 가상 줄에 기록한다 (asyncio 코루틴용).
+    """
+    recorder = _active
+    if recorder is None:
+        return _NULL_SPAN
+    return _Span(recorder, name, cat, args, track)
+
+
+def instant(name, cat="app", **args):
+    """한 시점 이벤트 기록"""
+    recorder = _active
+    if recorder is not None:
+        recorder.instant(name, cat, args)
+
+
+def is_enabled():
+    return _active is not None
+
+
+def _frame_label(code):
+    label = _labels.get(code)
+    if label is None:
+        label = _labels[code] = (
+            f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+        )
+    return label
+
+
+def _stack(frame):
+    """프레임 → 바깥부터 안쪽 순서의 라벨 목록"""
+    labels = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    labels.reverse()
+    return labels
+
+
+class TraceRecorder:
+    """구간과 스택 샘플을 Chrome trace 이벤트로 모음"""
+
+    def __init__(self, path, interval=DEFAULT_INTERVAL, sample=True):
+        self.path = path
+        self.interval = interval
+        self.origin = time.perf_counter_ns()
+        self.events = []
+        self.dropped = 0
+        self.thread_names = {}
+        # track 이름 → 가상 스레드 번호
+        self.tracks = {}
+        # 스레드별 아직 끝나지 않은 샘플 프레임 [(라벨, 시작 ns)]
+        self.open_stacks = {}
+        self.samples = 0
+        self.sample_ns = 0
+        self.stop_event = threading.Event()
+        self.sampler = None
+        if sample:
+            self.sampler = threading.Thread(target=self._sample_loop, name="profiler", daemon=True)
+
+    def start(self):
+        if self.sampler is not None:
+            self.sampler.start()
+        return self
+
+    def _ts(self, ns):
+        return (ns - self.origin) / 1000.0
+
+    def _add(self, event):
+        # list.append 는 GIL 아래에서 원자적이라 잠금 없이 여러 스레드가 기록
+        if len(self.events) >= MAX_EVENTS:
+            self.dropped += 1
+            return
+        self.events.append(event)
+
+    def _tid(self):
+        tid = threading.get_ident()
+        if tid not in self.thread_names:
+            self.thread_names[tid] = threading.current_thread().name
+        return tid
+
+    def _track_tid(self, track):
+        tid = self.tracks.get(track)
+        if tid is None:
+            with _lock:
+                tid = self.tracks.setdefault(track, TRACK_TID_BASE - len(self.tracks))
+        return tid
+
+    def complete(self, name, cat, start, end, args, track=None):
+        event = {
+            "name": name,
+            "cat": cat,
+            "ph": "X",
+            "ts": self._ts(start),
+            "dur": (end - start) / 1000.0,
+            "pid": SPAN_PID,
+            "tid": self._tid() if track is None else self._track_tid(track),
+        }
+        if args:
+            event["args"] = args
+        self._add(event)
+
+    def instant(self, name, cat, args):
+        event = {
+            "name": name,
+            "cat": cat,
+            "ph": "i",
+            "s": "t",
+            "ts": self._ts(time.perf_counter_ns()),
+            "pid": SPAN_PID,
+            "tid": self._tid(),
+        }
+        if args:
+            event["args"] = args
+        self._add(event)
+
+    def _update_stack(self, tid, stack, now):
+        """새 샘플과 달라진 프레임은 닫고(이벤트 기록) 새 프레임은 연다"""
+        opened = self.open_stacks.get(tid, [])
+        common = 0
+        limit = min(len(opened), len(stack))
+        while common < limit and opened[common][0] == stack[common]:
+            common += 1
+        for label, start in reversed(opened[common:]):
+            self._add(
+                {
+                    "name": label,
+                    "cat": "sample",
+                    "ph": "X",
+                    "ts": self._ts(start),
+                    "dur": (now - start) / 1000.0,
+                    "pid": SAMPLE_PID,
+                    "tid": tid,
+                }
+            )
+        opened = opened[:common] + [(label, now) for label in stack[common:]]
+        if opened:
+            self.open_stacks[tid] = opened
+        else:
+            self.open_stacks.pop(tid, None)
+
+    def _sample_loop(self):
+        own = threading.get_ident()
+        while not self.stop_event.wait(self.interval):
+            started = time.perf_counter_ns()
+            frames = sys._current_frames()
+            for tid, frame in frames.items():
+                if tid != own:
+                    self._update_stack(tid, _stack(frame), started)
+            # 끝난 스레드의 프레임 닫기
+            for tid in [t for t in self.open_stacks if t not in frames]:
+                self._update_stack(tid, [], started)
+            for thread in threading.enumerate():
+                self.thread_names.setdefault(thread.ident, thread.name)
+            del frames
+            self.samples += 1
+            self.sample_ns += time.perf_counter_ns() - started
+        now = time.perf_counter_ns()
+        for tid in list(self.open_stacks):
+            self._update_stack(tid, [], now)
+
+    def stop(self):
+        """샘플링을 멈추고 파일로 저장"""
+        self.stop_event.set()
+        if self.sampler is not None and self.sampler.is_alive():
+            self.sampler.join()
+        self.save()
+
+    def trace(self):
+        """Chrome trace JSON 객체"""
+        metadata = [
+            {"name": "process_name", "ph": "M", "pid": SPAN_PID, "args": {"name": "구간"}},
+            {"name": "process_name", "ph": "M", "pid": SAMPLE_PID, "args": {"name": "스택 샘플"}},
+        ]
+        for tid, name in list(self.thread_names.items()):
+            for pid in (SPAN_PID, SAMPLE_PID):
+                metadata.append(
+                    {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+                )
+        for track, tid in list(self.tracks.items()):
+            metadata.append(
+                {"name": "thread_name", "ph": "M", "pid": SPAN_PID, "tid": tid, "args": {"name": str(track)}}
+            )
+        return {
+            "traceEvents": metadata + self.events,
+            "displayTimeUnit": "ms",
+            "otherData": {
+                "samples": self.samples,
+                "sample_interval_ms": self.interval * 1e3,
+                "sample_overhead_ms": round(self.sample_ns / 1e6, 1),
+                "dropped_events": self.dropped,
+            },
+        }
+
+    def save(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(self.trace(), f, ensure_ascii=False, separators=(",", ":"))
+
+    def summary(self):
+        spans = sum(1 for e in self.events if e.get("pid") == SPAN_PID)
+        text = f"{self.path}: 구간 {spans}개, 스택 샘플 {self.samples}회"
+        if self.samples:
+            text += f" (샘플당 {self.sample_ns / self.samples / 1e3:.0f}us)"
+        if self.dropped:
+            text += f", 버린 이벤트 {self.dropped}개"
+        return text
+
+
+def start(path, interval=DEFAULT_INTERVAL, sample=True):
+    """기록 시작 (이미 기록 중이면 RuntimeError)"""
+    global _active
+    with _lock:
+        if _active is not None:
+            raise RuntimeError("이미 트레이스를 기록 중입니다")
+        _active = TraceRecorder(path, interval, sample).start()
+        return _active
+
+
+def stop():
+    """기록을 멈추고 저장한 기록기 반환 (기록 중이 아니면 None)"""
+    global _active
+    with _lock:
+        recorder, _active = _active, None
+    if recorder is not None:
+        recorder.stop()
+    return recorder
+
+
+def default_trace_path(directory):
+    return os.path.join(directory, time.strftime("trace_%Y%m%d_%H%M%S.json"))
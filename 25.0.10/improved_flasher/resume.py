@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+중단된 업로드 이어쓰기
+영역별로 어디까지 썼는지 세션 저널에 기록하고, 재연결 시 장치의 MD5 로
+이미 쓴 블록을 확인해서 처음으로 틀린 블록부터 다시 쓴다.
+"""
+
+import hashlib
+import json
+import os
+import re
+import time
+
+import esptool
+
+from flash_core import app_data_dir
+from partition_table import FlashRegion
+
+# 이어쓰기 단위 (섹터 4개). 재개 주소가 항상 섹터 경계가 되도록 4KB 의 배수
+RESUME_BLOCK_SIZE = 0x4000
+
+# 저널이 이보다 오래되면 무시
+JOURNAL_MAX_AGE = 24 * 3600
+
+
+def region_bytes(region):
+    """영역에 실제로 쓰일 내용"""
+    if region.is_erase:
+        return b"\xff" * region.size
+    with open(region.path, "rb") as f:
+        return f.read()
+
+
+class SessionJournal:
+    """포트별 업로드 진행 기록 (영역별 마지막으로 쓴/검증된 블록)"""
+
+    def __init__(self, port, regions, block_size=RESUME_BLOCK_SIZE, digests=None):
+        self.port = port
+        self.block_size = block_size
+        self.regions = list(regions)
+        safe_port = re.sub(r"[^0-9A-Za-z]+", "_", port).strip("_")
+        self.path = os.path.join(app_data_dir(), f"journal_{safe_port}.json")
+        # digests: 미리 계산한 영역별 SHA-256 (없으면 여기서 계산)
+        self.digests = digests or {
+            region.name: hashlib.sha256(region_bytes(region)).hexdigest()
+            for region in self.regions
+        }
+        self.entries = {}
+        self._load()
+
+    def _load(self):
+        """같은 이미지 묶음으로 기록된 저널만 불러오기"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if time.time() - data.get("updated", 0) > JOURNAL_MAX_AGE:
+            return
+        if data.get("block_size") != self.block_size:
+            return
+        for region in self.regions:
+            entry = data.get("regions", {}).get(region.name)
+            if (
+                entry
+                and entry.get("sha256") == self.digests[region.name]
+                and entry.get("offset") == region.offset
+            ):
+                self.entries[region.name] = entry
+
+    def save(self):
+        data = {
+            "port": self.port,
+            "block_size": self.block_size,
+            "updated": time.time(),
+            "regions": self.entries,
+        }
+        try:
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+        except OSError:
+            pass
+
+    def clear(self):
+        self.entries = {}
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def _entry(self, region):
+        return self.entries.setdefault(
+            region.name,
+            {
+                "offset": region.offset,
+                "sha256": self.digests[region.name],
+                "written_blocks": 0,
+                "verified_blocks": 0,
+            },
+        )
+
+    def block_count(self, region):
+        return (region.size + self.block_size - 1) // self.block_size
+
+    def region_named(self, name):
+        for region in self.regions:
+            if region.name == name:
+                return region
+        return None
+
+    def region_at(self, address):
+        for region in self.regions:
+            if region.offset <= address < region.offset + max(region.size, 1):
+                return region
+        return None
+
+    def mark_written(self, address):
+        """'Writing at 0x...' 주소 기록 (그 주소 이전 블록까지는 전송 완료)"""
+        region = self.region_at(address)
+        if region is None:
+            return
+        entry = self._entry(region)
+        blocks = (address - region.offset) // self.block_size
+        if blocks > entry["written_blocks"]:
+            entry["written_blocks"] = blocks
+            self.save()
+
+    def mark_verified(self, name, blocks=None):
+        """esptool 해시 검증 또는 장치 MD5 확인이 끝난 블록 수 기록"""
+        region = self.region_named(name)
+        if region is None:
+            return
+        if blocks is None:
+            blocks = self.block_count(region)
+        entry = self._entry(region)
+        entry["verified_blocks"] = blocks
+        entry["written_blocks"] = blocks
+        self.save()
+
+    def has_progress(self):
+        return any(entry["written_blocks"] for entry in self.entries.values())
+
+    def candidate_blocks(self, region):
+        """장치에서 확인해 볼 블록 수"""
+        entry = self.entries.get(region.name)
+        if not entry:
+            return 0
+        return min(entry["written_blocks"], self.block_count(region))
+
+
+def _first_bad_block(esp, region, data, blocks, block_size):
+    """장치 MD5 로 이미 쓴 블록을 확인해서 처음으로 다른 블록 번호 반환"""
+    # 전체 구간이 맞으면 명령 한 번으로 끝
+    length = min(blocks * block_size, region.size)
+    if esp.flash_md5sum(region.offset, length) == hashlib.md5(data[:length]).hexdigest():
+        return blocks
+
+    for idx in range(blocks):
+        start = idx * block_size
+        chunk = data[start : start + block_size]
+        device_md5 = esp.flash_md5sum(region.offset + start, len(chunk))
+        if device_md5 != hashlib.md5(chunk).hexdigest():
+            return idx
+    return blocks
+
+
+def resume_regions(port, baud, journal, work_dir, log=print, reset=True):
+    """저널과 장치 MD5 를 비교해서 남은 부분만 쓰는 영역 목록 반환
+
+    남은 영역이 있으면 ROM 전송 속도로 되돌려서 다운로드 모드로 남긴다
+    (이어서 esptool 을 --before no_reset 으로 실행 가능).
+    reset=False 면 이미 다운로드 모드인 장치에 동기화만 한다.
+    """
+    candidates = [r for r in journal.regions if journal.candidate_blocks(r)]
+    if not candidates:
+        return journal.regions
+
+    rom_baud = esptool.ESPLoader.ESP_ROM_BAUD
+    esp = esptool.detect_chip(port, rom_baud, "default_reset" if reset else "no_reset")
+    try:
+        if int(baud) != rom_baud:
+            esp.change_baud(int(baud))
+        esp.flash_spi_attach(0)
+
+        remaining = []
+        for region in journal.regions:
+            blocks = journal.candidate_blocks(region)
+            if not blocks:
+                remaining.append(region)
+                continue
+
+            data = region_bytes(region)
+            good = _first_bad_block(esp, region, data, blocks, journal.block_size)
+            journal.mark_verified(region.name, good)
+            start = good * journal.block_size
+            if start >= region.size:
+                log(f"{region.name}: 이미 기록 완료, 건너뜀")
+                continue
+
+            if start == 0:
+                remaining.append(region)
+                continue
+
+            # 남은 부분만 별도 파일로 만들어서 이어쓰기
+            path = os.path.join(work_dir, f"resume_{region.name}.bin")
+            with open(path, "wb") as f:
+                f.write(data[start:])
+            log(
+                f"{region.name}: {good}/{journal.block_count(region)} 블록 확인, "
+                f"0x{region.offset + start:x} 부터 이어쓰기"
+            )
+            remaining.append(
+                FlashRegion(region.name, region.offset + start, region.size - start, path)
+            )
+        if not remaining:
+            # 모든 영역이 이미 기록되어 있으면 재시작만
+            esp.hard_reset()
+        elif int(baud) != rom_baud:
+            esp.change_baud(rom_baud)
+        return remaining
+    finally:
+        esp._port.close()
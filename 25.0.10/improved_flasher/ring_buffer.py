@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+고정 크기 바이트 링 버퍼
+시리얼 콘솔 출력처럼 끝없이 들어오는 데이터를 메모리 사용량 고정으로 보관한다.
+쓰는 쪽(수신 스레드)과 읽는 쪽(검사/화면)이 절대 위치로 주고받으므로 덮어쓴 양을 알 수 있다.
+"""
+
+import threading
+
+
+class ByteRingBuffer:
+    """최근 capacity 바이트만 보관하는 링 버퍼 (스레드 안전)"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.buf = bytearray(capacity)
+        # 지금까지 쓴 전체 바이트 수 (절대 위치)
+        self.total = 0
+        self.lock = threading.Lock()
+
+    def write(self, data):
+        n = len(data)
+        if not n:
+            return
+        with self.lock:
+            if n >= self.capacity:
+                # 버퍼보다 크면 마지막 capacity 바이트만 남음
+                data = memoryview(data)[n - self.capacity :]
+                start = (self.total + n - self.capacity) % self.capacity
+                first = self.capacity - start
+                self.buf[start:] = data[:first]
+                self.buf[:start] = data[first:]
+            else:
+                start = self.total % self.capacity
+                first = min(n, self.capacity - start)
+                self.buf[start : start + first] = data[:first]
+                if first < n:
+                    self.buf[: n - first] = data[first:]
+            self.total += n
+
+    @property
+    def oldest(self):
+        """아직 남아 있는 가장 오래된 바이트의 절대 위치"""
+        return max(0, self.total - self.capacity)
+
+    def read_since(self, position):
+        """position 이후 데이터 반환 → (data, 새 위치, 덮어써서 잃은 바이트 수)"""
+        with self.lock:
+            total = self.total
+            oldest = max(0, total - self.capacity)
+            dropped = max(0, oldest - position)
+            start = max(position, oldest)
+            n = total - start
+            if n <= 0:
+                return b"", total, dropped
+            i = start % self.capacity
+            if i + n <= self.capacity:
+                data = bytes(self.buf[i : i + n])
+            else:
+                data = bytes(self.buf[i:]) + bytes(self.buf[: n - (self.capacity - i)])
+            return data, total, dropped
+
+    def tail(self, size=None):
+        """최근 size 바이트 (기본: 남아 있는 전체)"""
+        with self.lock:
+            total = self.total
+        size = self.capacity if size is None else min(size, self.capacity)
+        data, _, _ = self.read_since(max(0, total - size))
+        return data
+
+    def clear(self):
+        with self.lock:
+            self.total = 0
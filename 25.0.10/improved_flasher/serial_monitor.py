@@ -0,0 +1,430 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+시리얼 모니터 패널
+수신 스레드는 포트에서 읽은 바이트를 링 버퍼에 넣기만 하고, 화면은 주기적으로 새 데이터를
+한꺼번에 줄 단위로 나눈 뒤 보이는 줄만 Text 위젯에 그린다 (가상화).
+2Mbaud 연속 출력에서도 UI 가 멈추지 않도록 Tk 쪽 작업량은 화면 줄 수에만 비례한다.
+"""
+
+import bisect
+import re
+import sys
+import threading
+import tkinter as tk
+from tkinter import font as tkfont
+from tkinter import ttk
+
+import serial
+
+from ring_buffer import ByteRingBuffer
+
+MONITOR_BAUD_RATES = ["115200", "230400", "460800", "921600", "2000000"]
+# 2Mbaud(약 200KB/s) 기준 40초 분량 - 화면 갱신이 잠시 늦어도 잃지 않음
+MONITOR_BUFFER_SIZE = 8 * 1024 * 1024
+# 화면에 보관하는 최대 줄 수 (넘으면 오래된 줄부터 버림)
+MAX_LINES = 200_000
+TRIM_LINES = 20_000
+# 보관하는 줄의 메모리 상한 (긴 줄만 계속 들어와도 줄 수 상한보다 먼저 적용)
+MAX_STORE_BYTES = 64 * 1024 * 1024
+TRIM_BYTES = 8 * 1024 * 1024
+# 줄바꿈 없이 이 길이를 넘으면 강제로 줄을 나눔
+MAX_LINE_LENGTH = 4096
+RENDER_INTERVAL = 50  # ms
+SEARCH_DELAY = 150  # ms
+READ_TIMEOUT = 0.05
+
+ANSI_ESCAPE = re.compile(r"\x1b\[[0-9;]*[A-Za-z]")
+
+
+class SerialReader:
+    """백그라운드 수신 스레드 (읽은 바이트는 링 버퍼로)"""
+
+    def __init__(self, port, baud, ring):
+        self.port = port
+        self.baud = int(baud)
+        self.ring = ring
+        self.error = None
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self):
+        self.error = None
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name="serial-monitor", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=1.0):
+        """수신 중지 후 포트가 닫힐 때까지 대기"""
+        self.stop_event.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout)
+
+    def _run(self):
+        try:
+            with serial.Serial() as ser:
+                ser.port = self.port
+                ser.baudrate = self.baud
+                ser.timeout = READ_TIMEOUT
+                # 모니터를 열 때 보드가 리셋/다운로드 모드로 들어가지 않도록
+                ser.dtr = False
+                ser.rts = False
+                ser.open()
+                if hasattr(ser, "set_buffer_size"):
+                    ser.set_buffer_size(rx_size=1 << 20)
+                while not self.stop_event.is_set():
+                    data = ser.read(max(1, ser.in_waiting))
+                    if data:
+                        self.ring.write(data)
+        except (OSError, serial.SerialException) as e:
+            self.error = str(e)
+
+
+class LineStore:
+    """링 버퍼에서 가져온 바이트를 줄 목록으로 (검색 결과도 함께 관리)"""
+
+    def __init__(self):
+        self.lines = []
+        self.partial = b""
+        # lines[0] 의 절대 줄 번호 (오래된 줄을 버려도 검색 위치가 유지되도록)
+        self.first = 0
+        self.query = ""
+        self.matches = []
+        # 현재 선택한 검색 결과 (matches 의 인덱스, 없으면 -1)
+        self.current = -1
+        # 보관 중인 줄의 대략적인 메모리 크기 (_line_size 합)
+        self.size = 0
+
+    def __len__(self):
+        return len(self.lines) + (1 if self.partial else 0)
+
+    @property
+    def end(self):
+        return self.first + len(self.lines)
+
+    def line(self, index):
+        """index 는 현재 목록 기준 (마지막은 아직 끝나지 않은 줄일 수 있음)"""
+        if index < len(self.lines):
+            return self.lines[index]
+        return _decode(self.partial)
+
+    def append(self, data):
+        chunks = (self.partial + data).split(b"\n")
+        self.partial = chunks.pop()
+        while len(self.partial) > MAX_LINE_LENGTH:
+            chunks.append(self.partial[:MAX_LINE_LENGTH])
+            self.partial = self.partial[MAX_LINE_LENGTH:]
+        if not chunks:
+            return 0
+        start = self.end
+        new_lines = [_decode(chunk) for chunk in chunks]
+        self.lines.extend(new_lines)
+        self.size += sum(map(_line_size, new_lines))
+        if self.query:
+            # 새로 들어온 줄만 검사 (증분 검색)
+            self.matches.extend(
+                start + i for i, line in enumerate(new_lines) if self.query in line.lower()
+            )
+        return len(new_lines)
+
+    def trim(self):
+        """줄 수나 메모리 상한을 넘으면 오래된 줄 삭제 → 삭제한 줄 수"""
+        if len(self.lines) <= MAX_LINES and self.size <= MAX_STORE_BYTES:
+            return 0
+        # 상한보다 조금 더 지워서 매번 목록 앞부분을 옮기지 않음
+        keep_lines = MAX_LINES - TRIM_LINES
+        keep_bytes = MAX_STORE_BYTES - TRIM_BYTES
+        count = 0
+        size = self.size
+        while count < len(self.lines) and (
+            len(self.lines) - count > keep_lines or size > keep_bytes
+        ):
+            size -= _line_size(self.lines[count])
+            count += 1
+        del self.lines[:count]
+        self.size = size
+        self.first += count
+        if self.matches and self.matches[0] < self.first:
+            dropped = bisect.bisect_left(self.matches, self.first)
+            del self.matches[:dropped]
+            # 선택한 결과가 지워졌으면 선택 해제, 남았으면 같은 줄을 가리키도록 이동
+            self.current = self.current - dropped if self.current >= dropped else -1
+        return count
+
+    def search(self, query):
+        self.query = query.lower()
+        self.current = -1
+        if not self.query:
+            self.matches = []
+            return
+        q = self.query
+        self.matches = [self.first + i for i, line in enumerate(self.lines) if q in line.lower()]
+
+    def clear(self):
+        self.first = self.end
+        self.lines = []
+        self.partial = b""
+        self.matches = []
+        self.current = -1
+        self.size = 0
+
+
+def _line_size(line):
+    # str 객체 크기 (글자 종류에 따라 글자당 1~4바이트) + 목록 슬롯
+    return sys.getsizeof(line) + 8
+
+
+def _decode(raw):
+    return ANSI_ESCAPE.sub("", raw.decode("utf-8", "replace").rstrip("\r"))
+
+
+class SerialMonitorPanel:
+    """시리얼 모니터 창 (FirmwareFlasher 에서 열고 닫음)"""
+
+    def __init__(self, master, port, baud="115200", on_close=None):
+        self.master = master
+        self.on_close = on_close
+        self.ring = ByteRingBuffer(MONITOR_BUFFER_SIZE)
+        self.read_pos = 0
+        self.dropped = 0
+        self.store = LineStore()
+        self.reader = None
+        self.released = False
+        # 보이는 첫 줄 (store.lines 기준), follow=True 면 마지막 줄을 따라감
+        self.top = 0
+        self.follow = True
+        self.dirty = True
+        self.search_job = None
+        self.tick_job = None
+
+        self.window = tk.Toplevel(master)
+        self.window.title(f"시리얼 모니터 - {port}")
+        self.window.geometry("900x560")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+        self.setup_ui(port, baud)
+        self.open_port()
+        self.tick()
+
+    def setup_ui(self, port, baud):
+        top = ttk.Frame(self.window, padding=5)
+        top.grid(row=0, column=0, columnspan=2, sticky=(tk.W, tk.E))
+
+        ttk.Label(top, text="포트:").grid(row=0, column=0)
+        self.port_var = tk.StringVar(value=port)
+        ttk.Entry(top, textvariable=self.port_var, width=12).grid(row=0, column=1, padx=5)
+        ttk.Label(top, text="속도:").grid(row=0, column=2)
+        self.baud_var = tk.StringVar(value=baud)
+        ttk.Combobox(
+            top, textvariable=self.baud_var, values=MONITOR_BAUD_RATES, width=10
+        ).grid(row=0, column=3, padx=5)
+        ttk.Button(top, text="다시 열기", command=self.open_port).grid(row=0, column=4, padx=5)
+        ttk.Button(top, text="지우기", command=self.clear).grid(row=0, column=5, padx=5)
+
+        ttk.Label(top, text="검색:").grid(row=0, column=6, padx=(15, 0))
+        self.search_var = tk.StringVar()
+        self.search_var.trace_add("write", lambda *args: self.schedule_search())
+        search_entry = ttk.Entry(top, textvariable=self.search_var, width=20)
+        search_entry.grid(row=0, column=7, padx=5)
+        search_entry.bind("<Return>", lambda e: self.jump_match(1))
+        search_entry.bind("<Shift-Return>", lambda e: self.jump_match(-1))
+        ttk.Button(top, text="▲", width=3, command=lambda: self.jump_match(-1)).grid(row=0, column=8)
+        ttk.Button(top, text="▼", width=3, command=lambda: self.jump_match(1)).grid(row=0, column=9)
+
+        self.font = tkfont.Font(family="Consolas", size=9)
+        self.text = tk.Text(
+            self.window, height=30, font=self.font, wrap=tk.NONE, state="disabled"
+        )
+        self.text.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.text.tag_configure("match", background="#fff59d")
+        self.text.tag_configure("current", background="#ffb74d")
+        self.text.bind("<MouseWheel>", self.on_wheel)
+        self.text.bind("<Button-4>", lambda e: self.scroll_lines(-3))
+        self.text.bind("<Button-5>", lambda e: self.scroll_lines(3))
+        self.text.bind("<Configure>", lambda e: self.mark_dirty())
+
+        self.scrollbar = ttk.Scrollbar(self.window, orient="vertical", command=self.on_scroll)
+        self.scrollbar.grid(row=1, column=1, sticky=(tk.N, tk.S))
+
+        self.status_var = tk.StringVar()
+        ttk.Label(self.window, textvariable=self.status_var, padding=3).grid(
+            row=2, column=0, columnspan=2, sticky=tk.W
+        )
+
+        self.window.columnconfigure(0, weight=1)
+        self.window.rowconfigure(1, weight=1)
+
+    @property
+    def port(self):
+        return self.port_var.get().strip()
+
+    # ---- 포트 ----
+
+    def open_port(self):
+        if self.reader is not None:
+            self.reader.stop()
+        self.released = False
+        self.reader = SerialReader(self.port, self.baud_var.get(), self.ring)
+        self.reader.start()
+
+    def release_port(self, port):
+        """업로드가 시작되면 포트 해제 (해당 포트를 열고 있었으면 True)"""
+        if self.reader is None or not self.reader.running or port != self.reader.port:
+            return False
+        self.reader.stop()
+        self.released = True
+        return True
+
+    def resume_port(self, port):
+        """업로드가 끝나면 해제했던 포트를 다시 열기"""
+        if self.released and self.reader is not None and self.reader.port == port:
+            self.released = False
+            self.reader.start()
+
+    def close(self):
+        if self.tick_job is not None:
+            self.window.after_cancel(self.tick_job)
+        if self.reader is not None:
+            self.reader.stop()
+        self.window.destroy()
+        if self.on_close:
+            self.on_close()
+
+    # ---- 데이터/화면 ----
+
+    def clear(self):
+        _, self.read_pos, _ = self.ring.read_since(self.read_pos)
+        self.store.clear()
+        self.top = 0
+        self.follow = True
+        self.mark_dirty()
+
+    def mark_dirty(self):
+        self.dirty = True
+
+    @property
+    def visible_rows(self):
+        line_height = max(1, self.font.metrics("linespace"))
+        return max(1, self.text.winfo_height() // line_height - 1)
+
+    def tick(self):
+        """RENDER_INTERVAL 마다 링 버퍼의 새 데이터를 모아서 한 번만 그림"""
+        data, self.read_pos, dropped = self.ring.read_since(self.read_pos)
+        if dropped:
+            self.dropped += dropped
+        if data:
+            self.store.append(data)
+            removed = self.store.trim()
+            if removed and not self.follow:
+                self.top = max(0, self.top - removed)
+            self.dirty = True
+        if self.dirty:
+            self.render()
+        self.update_status()
+        self.tick_job = self.window.after(RENDER_INTERVAL, self.tick)
+
+    def render(self):
+        self.dirty = False
+        rows = self.visible_rows
+        total = len(self.store)
+        if self.follow:
+            self.top = max(0, total - rows)
+        self.top = max(0, min(self.top, max(0, total - rows)))
+        end = min(total, self.top + rows)
+
+        lines = [self.store.line(i) for i in range(self.top, end)]
+        self.text.configure(state="normal")
+        self.text.delete("1.0", tk.END)
+        self.text.insert("1.0", "\n".join(lines))
+        self.highlight(lines)
+        self.text.configure(state="disabled")
+
+        if total:
+            self.scrollbar.set(self.top / total, end / total)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def highlight(self, lines):
+        query = self.store.query
+        if not query:
+            return
+        current = None
+        if 0 <= self.store.current < len(self.store.matches):
+            current = self.store.matches[self.store.current] - self.store.first
+        for row, line in enumerate(lines):
+            lower = line.lower()
+            start = lower.find(query)
+            tag = "current" if self.top + row == current else "match"
+            while start >= 0:
+                self.text.tag_add(
+                    tag, f"{row + 1}.{start}", f"{row + 1}.{start + len(query)}"
+                )
+                start = lower.find(query, start + len(query))
+
+    def update_status(self):
+        if self.reader is not None and self.reader.error:
+            state = f"오류: {self.reader.error}"
+        elif self.released:
+            state = "업로드 중 - 포트 해제됨"
+        elif self.reader is not None and self.reader.running:
+            state = f"수신 중 ({self.reader.port}, {self.reader.baud} baud)"
+        else:
+            state = "닫힘"
+        text = f"{state} | {self.store.end:,}줄 | 수신 {self.ring.total:,}바이트"
+        if self.dropped:
+            text += f" | 놓친 데이터 {self.dropped:,}바이트"
+        if self.store.query:
+            text += f" | 검색 {len(self.store.matches):,}건"
+        self.status_var.set(text)
+
+    # ---- 스크롤 ----
+
+    def scroll_lines(self, delta):
+        self.follow = False
+        self.top = max(0, self.top + delta)
+        if self.top + self.visible_rows >= len(self.store):
+            self.follow = True
+        self.mark_dirty()
+
+    def on_wheel(self, event):
+        self.scroll_lines(-3 if event.delta > 0 else 3)
+
+    def on_scroll(self, *args):
+        rows = self.visible_rows
+        if args[0] == "moveto":
+            self.follow = False
+            self.top = int(float(args[1]) * len(self.store))
+            if self.top + rows >= len(self.store):
+                self.follow = True
+            self.mark_dirty()
+        elif args[0] == "scroll":
+            step = int(args[1]) * (rows if args[2] == "pages" else 1)
+            self.scroll_lines(step)
+
+    # ---- 검색 ----
+
+    def schedule_search(self):
+        # 입력할 때마다 전체를 다시 찾지 않도록 잠시 모아서 실행
+        if self.search_job is not None:
+            self.window.after_cancel(self.search_job)
+        self.search_job = self.window.after(SEARCH_DELAY, self.run_search)
+
+    def run_search(self):
+        self.search_job = None
+        self.store.search(self.search_var.get())
+        if self.store.matches:
+            self.jump_match(1)
+        self.mark_dirty()
+
+    def jump_match(self, step):
+        matches = self.store.matches
+        if not matches:
+            return
+        self.store.current = (self.store.current + step) % len(matches)
+        line = matches[self.store.current] - self.store.first
+        self.follow = False
+        self.top = max(0, line - self.visible_rows // 2)
+        self.mark_dirty()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+저지연 시리얼 포트 설정
+Linux 에서는 ASYNC_LOW_LATENCY 플래그와 USB-시리얼(FTDI 등) latency_timer 를 낮춰서
+SYNC/블록 쓰기 응답마다 생기는 지연(기본 16ms)을 줄이고, 끝나면 원래 값으로 되돌린다.
+Windows 는 수신/송신 버퍼만 키운다 (FTDI 지연 시간은 드라이버 설정에서만 바꿀 수 있음).
+권한이 없거나 드라이버가 지원하지 않으면 조용히 건너뛴다.
+"""
+
+import array
+import os
+import sys
+
+ASYNC_LOW_LATENCY = 1 << 13
+LOW_LATENCY_TIMER_MS = 1
+LATENCY_TIMER_PATH = "/sys/bus/usb-serial/devices/{name}/latency_timer"
+WINDOWS_BUFFER_SIZE = 64 * 1024
+
+# struct serial_struct 에서 flags 의 위치 (int 배열 기준, pyserial 과 같음)
+_SERIAL_FLAGS_INDEX = 4
+
+
+def latency_timer_path(port):
+    """포트의 latency_timer sysfs 경로 (없으면 None)"""
+    if not sys.platform.startswith("linux"):
+        return None
+    name = os.path.basename(os.path.realpath(port))
+    path = LATENCY_TIMER_PATH.format(name=name)
+    return path if os.path.exists(path) else None
+
+
+class PortTuning:
+    """포트 하나에 적용한 저지연 설정과 원래 값 (restore 로 되돌림)"""
+
+    def __init__(self, port):
+        self.port = port
+        self.applied = []
+        self.fd = None
+        self.original_flags = None
+        self.timer_path = None
+        self.original_timer = None
+
+    def apply_low_latency(self, fd):
+        """ASYNC_LOW_LATENCY 설정 (열린 포트의 fd)"""
+        try:
+            import fcntl
+            import termios
+
+            buf = array.array("i", [0] * 32)
+            fcntl.ioctl(fd, termios.TIOCGSERIAL, buf)
+            flags = buf[_SERIAL_FLAGS_INDEX]
+            if flags & ASYNC_LOW_LATENCY:
+                return
+            buf[_SERIAL_FLAGS_INDEX] = flags | ASYNC_LOW_LATENCY
+            fcntl.ioctl(fd, termios.TIOCSSERIAL, buf)
+        except (ImportError, AttributeError, OSError):
+            return
+        self.fd = fd
+        self.original_flags = flags
+        self.applied.append("low_latency")
+
+    def apply_latency_timer(self):
+        """USB-시리얼 칩의 latency_timer 를 1ms 로 (포트를 열지 않아도 됨)"""
+        path = latency_timer_path(self.port)
+        if path is None:
+            return
+        try:
+            with open(path, "r") as f:
+                original = int(f.read().strip())
+            if original <= LOW_LATENCY_TIMER_MS:
+                return
+            with open(path, "w") as f:
+                f.write(str(LOW_LATENCY_TIMER_MS))
+        except (OSError, ValueError):
+            return
+        self.timer_path = path
+        self.original_timer = original
+        self.applied.append(f"latency_timer {original}→{LOW_LATENCY_TIMER_MS}ms")
+
+    def apply_buffers(self, ser):
+        if hasattr(ser, "set_buffer_size"):
+            try:
+                ser.set_buffer_size(rx_size=WINDOWS_BUFFER_SIZE, tx_size=WINDOWS_BUFFER_SIZE)
+                self.applied.append(f"buffer {WINDOWS_BUFFER_SIZE // 1024}KB")
+            except Exception:
+                pass
+
+    def restore(self):
+        """원래 값으로 되돌림 (포트를 닫기 전에 호출)"""
+        if self.original_flags is not None:
+            try:
+                import fcntl
+                import termios
+
+                buf = array.array("i", [0] * 32)
+                fcntl.ioctl(self.fd, termios.TIOCGSERIAL, buf)
+                buf[_SERIAL_FLAGS_INDEX] = self.original_flags
+                fcntl.ioctl(self.fd, termios.TIOCSSERIAL, buf)
+            except (ImportError, AttributeError, OSError):
+                pass
+            self.original_flags = None
+        if self.original_timer is not None:
+            try:
+                with open(self.timer_path, "w") as f:
+                    f.write(str(self.original_timer))
+            except OSError:
+                pass
+            self.original_timer = None
+        self.applied = []
+
+    def describe(self):
+        return ", ".join(self.applied) if self.applied else "변경 없음"
+
+
+def tune_serial(ser):
+    """열린 pyserial 포트에 저지연 설정 적용 → PortTuning"""
+    tuning = PortTuning(getattr(ser, "port", None) or "")
+    fd = getattr(ser, "fd", None)
+    if fd is not None:
+        tuning.apply_low_latency(fd)
+    if tuning.port:
+        tuning.apply_latency_timer()
+    if sys.platform == "win32":
+        tuning.apply_buffers(ser)
+    return tuning
+
+
+def tune_port(port):
+    """포트를 열지 않고 적용할 수 있는 설정만 (esptool 하위 프로세스 경로)"""
+    tuning = PortTuning(port)
+    tuning.apply_latency_timer()
+    return tuning
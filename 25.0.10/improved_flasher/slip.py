@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SLIP 프레이밍 (ROM 부트로더/스텁 시리얼 프로토콜)
+바이트 단위 파이썬 루프 대신 bytes.replace(C 수준 split/join)로 이스케이프하고,
+디코더는 새로 들어온 바이트에서만 0xC0 을 찾는다 (받아 둔 부분은 다시 훑지 않음).
+"""
+
+import re
+
+SLIP_END = 0xC0
+SLIP_ESC = 0xDB
+SLIP_ESC_END = 0xDC
+SLIP_ESC_ESC = 0xDD
+
+_END = b"\xc0"
+_ESC = b"\xdb"
+_ESCAPED_END = b"\xdb\xdc"
+_ESCAPED_ESC = b"\xdb\xdd"
+# memoryview 에는 find/in 이 없으므로 버퍼 프로토콜을 받는 정규식으로 확인
+_SPECIAL = re.compile(b"[\xc0\xdb]")
+
+
+def escape(data):
+    """0xDB → DB DD, 0xC0 → DB DC (특수 바이트가 없는 bytes 는 복사 없이 그대로)"""
+    if type(data) is not bytes:
+        data = bytes(data)
+    # ESC 를 먼저 바꿔야 END 를 바꾸며 생긴 ESC 를 다시 바꾸지 않는다
+    return data.replace(_ESC, _ESCAPED_ESC).replace(_END, _ESCAPED_END)
+
+
+def unescape(data):
+    """escape 의 역변환. 잘못된 이스케이프(DB 뒤에 DC/DD 가 아닌 바이트)가 있으면 None"""
+    if type(data) is not bytes:
+        data = bytes(data)
+    escapes = data.count(_ESC)
+    if not escapes:
+        return data
+    if escapes != data.count(_ESCAPED_END) + data.count(_ESCAPED_ESC):
+        return None
+    return data.replace(_ESCAPED_END, _END).replace(_ESCAPED_ESC, _ESC)
+
+
+def encode(packet):
+    """패킷 하나를 SLIP 프레임으로 변환"""
+    return _END + escape(packet) + _END
+
+
+def escape_into(out, pos, data):
+    """data 를 이스케이프해서 out(쓰기 가능한 memoryview)의 pos 부터 쓰고 끝 위치를 돌려준다
+
+    out 은 최악의 경우(2배) 길이를 담을 수 있어야 한다.
+    """
+    escaped = escape(data) if _SPECIAL.search(data) is not None else data
+    size = len(escaped)
+    out[pos : pos + size] = escaped
+    return pos + size
+
+
+class SlipDecoder:
+    """수신 바이트를 받아 완성된 프레임을 돌려주는 점진적 SLIP 디코더
+
+    프레임 밖의 바이트(부트 로그 등)와 빈 프레임은 무시하고,
+    잘못된 이스케이프가 있는 프레임은 버린다.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.pending = bytearray()
+        self.in_frame = False
+
+    def feed(self, data):
+        frames = []
+        pos = 0
+        if not self.in_frame:
+            pos = data.find(_END)
+            if pos < 0:
+                return frames
+            pos += 1
+            self.in_frame = True
+        while True:
+            end = data.find(_END, pos)
+            if end < 0:
+                self.pending += data[pos:]
+                return frames
+            if self.pending:
+                self.pending += data[pos:end]
+                raw = self.pending
+                self.pending = bytearray()
+            else:
+                raw = data[pos:end]
+            # 빈 프레임은 다음 프레임의 시작 구분자로 취급
+            if raw:
+                frame = unescape(raw)
+                if frame is not None:
+                    frames.append(frame)
+            pos = end + 1
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OTA 가상 장치 (tests/test_ota_push.py, benchmarks/bench_ota_push.py 에서 같이 씀)
+ota_push.py 의 장치 쪽 약속(POST /ota → Range 로 받기 → 결과 보고 → 재시작 후 GET /ota)을
+흉내 내고, behavior 로 끊김/거부/멈춤/해시 불일치 같은 실패를 만든다.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ota_push  # noqa: E402
+
+# 가상 장치 동작 → 기대 결과 (None 이면 성공)
+BEHAVIORS = {
+    "ok": None,
+    "drop": None,
+    "refuse": "ota_rejected",
+    "offline": "connect",
+    "silent": "stall",
+    "stall_midway": "stall",
+    "corrupt": "verify",
+    "old_image": "boot_check",
+}
+
+
+async def read_request(reader):
+    """HTTP 요청 하나 → (메서드, 경로, 헤더, 본문)"""
+    line = await reader.readline()
+    if not line:
+        return None
+    method, path, _ = line.decode("ascii").split(" ", 2)
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        key, _, value = line.decode("latin-1").partition(":")
+        headers[key.strip().lower()] = value.strip()
+    body = await reader.readexactly(int(headers.get("content-length", 0) or 0))
+    return method, path, headers, body
+
+
+async def http_call(url, method="GET", data=None, headers=None):
+    """간단한 HTTP 클라이언트 → (상태, 헤더, reader, writer) (본문은 호출한 쪽이 읽음)"""
+    rest = url.split("://", 1)[1]
+    hostport, _, path = rest.partition("/")
+    host, _, port = hostport.partition(":")
+    reader, writer = await asyncio.open_connection(host, int(port or 80))
+    body = json.dumps(data).encode("utf-8") if data is not None else b""
+    extra = "".join(f"{k}: {v}\r\n" for k, v in (headers or {}).items())
+    writer.write(
+        (
+            f"{method} /{path} HTTP/1.1\r\nHost: {hostport}\r\nConnection: close\r\n{extra}"
+            f"Content-Length: {len(body)}\r\n\r\n"
+        ).encode("ascii")
+        + body
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    response_headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        key, _, value = line.decode("latin-1").partition(":")
+        response_headers[key.strip().lower()] = value.strip()
+    return status, response_headers, reader, writer
+
+
+class StandInDevice:
+    """OTA 를 지원하는 펌웨어를 흉내 내는 가상 장치 (이벤트 루프 하나에서 여러 대)"""
+
+    def __init__(self, behavior, rate, chunk, reboot_delay):
+        self.behavior = behavior
+        self.rate = rate
+        self.chunk = chunk
+        self.reboot_delay = reboot_delay
+        self.mac = os.urandom(6).hex(":")
+        self.image_sha256 = hashlib.sha256(b"old firmware").hexdigest()
+        self.state = "idle"
+        self.booting_until = 0.0
+        self.range_requests = 0
+        self.server = None
+        self.port = None
+        self.task = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+        if self.behavior == "offline":
+            # 주소는 있지만 아무도 듣지 않는 장치
+            self.server.close()
+            await self.server.wait_closed()
+        return self
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+        if self.behavior != "offline":
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def handle(self, reader, writer):
+        try:
+            request = await read_request(reader)
+            if request is None:
+                return
+            method, path, _, body = request
+            loop = asyncio.get_running_loop()
+            if loop.time() < self.booting_until:
+                # 재시작 중: 연결을 받자마자 끊음
+                return
+            if method == "POST" and path == ota_push.OTA_PATH:
+                if self.behavior == "refuse" or self.state == "updating":
+                    self.respond(writer, 409, {"error": "busy"})
+                    return
+                self.state = "updating"
+                self.task = loop.create_task(self.update(json.loads(body)))
+                self.respond(
+                    writer, 202, {"mac": self.mac, "chip": "ESP32-S3", "version": "25.0.9"}
+                )
+            elif method == "GET" and path == ota_push.OTA_PATH:
+                self.respond(writer, 200, {"state": self.state, "image_sha256": self.image_sha256})
+            else:
+                self.respond(writer, 404, None)
+        finally:
+            writer.close()
+
+    def respond(self, writer, status, data):
+        body = json.dumps(data).encode("utf-8") if data is not None else b""
+        writer.write(
+            f"HTTP/1.1 {status} X\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("ascii")
+            + body
+        )
+
+    async def update(self, request):
+        if self.behavior == "silent":
+            return
+        size = request["size"]
+        image = bytearray()
+        dropped = False
+        # esp_https_ota 의 부분 다운로드처럼 chunk 크기 Range 요청을 이어서 보냄
+        while len(image) < size:
+            end = min(size, len(image) + self.chunk) - 1
+            status, headers, reader, writer = await http_call(
+                request["url"], headers={"Range": f"bytes={len(image)}-{end}"}
+            )
+            self.range_requests += 1
+            try:
+                assert status == 206, status
+                length = int(headers["content-length"])
+                got = 0
+                while got < length:
+                    piece = await reader.read(min(16384, length - got))
+                    if not piece:
+                        break
+                    image += piece
+                    got += len(piece)
+                    await asyncio.sleep(len(piece) / self.rate)
+                    if self.behavior == "drop" and not dropped and len(image) > size // 2:
+                        # Wi-Fi 끊김: 연결을 버리고 받은 곳부터 다시 요청
+                        dropped = True
+                        break
+                    if self.behavior == "stall_midway" and len(image) > size // 3:
+                        await asyncio.sleep(3600)
+            finally:
+                writer.close()
+        if self.behavior == "corrupt":
+            image[len(image) // 2] ^= 0xFF
+        digest = hashlib.sha256(image).hexdigest()
+        if digest != request["sha256"]:
+            self.state = "idle"
+            await self.report(request, {"state": "failed", "error": "sha256 mismatch"})
+            return
+        await self.report(request, {"state": "done"})
+        # 재시작
+        self.booting_until = asyncio.get_running_loop().time() + self.reboot_delay
+        if self.behavior != "old_image":
+            self.image_sha256 = digest
+        self.state = "running"
+
+    async def report(self, request, data):
+        status, _, _, writer = await http_call(request["report"], "POST", data)
+        writer.close()
+        assert status == 204, status
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+부팅 확인 검사
+가상 콘솔 포트로 성공/실패 패턴 판정과, 재시작으로 USB 가 다시 열거되어 읽기가 끊겨도
+같은 포트를 다시 열고 이어서 판정하는지 확인한다.
+
+    python -m pytest tests/test_boot_check.py
+"""
+
+import os
+import sys
+
+import pytest
+import serial
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import boot_check  # noqa: E402
+from boot_check import BootCheckConfig, run_boot_check  # noqa: E402
+
+
+class FakeConsole:
+    """열릴 때마다 scripts 의 다음 출력 목록을 차례로 내보내는 포트
+
+    출력 항목이 예외면 읽기에서 그 예외를 던진다 (포트 끊김).
+    출력 목록을 다 쓴 뒤의 열기는 SerialException (다시 나타나지 않는 포트).
+    """
+
+    def __init__(self, scripts):
+        self.scripts = list(scripts)
+        self.opened = 0
+
+    def factory(self):
+        console = self
+
+        class Port:
+            def __init__(self):
+                self.port = None
+                self.baudrate = None
+                self.timeout = None
+                self.dtr = False
+                self.rts = False
+                self.output = []
+
+            def open(self):
+                if not console.scripts:
+                    raise serial.SerialException("장치 없음")
+                console.opened += 1
+                self.output = list(console.scripts.pop(0))
+
+            @property
+            def in_waiting(self):
+                return 0
+
+            def read(self, size):
+                if not self.output:
+                    return b""
+                item = self.output.pop(0)
+                if isinstance(item, Exception):
+                    raise item
+                return item
+
+            def close(self):
+                pass
+
+        return Port
+
+
+@pytest.fixture
+def console(monkeypatch):
+    def install(scripts):
+        fake = FakeConsole(scripts)
+        monkeypatch.setattr(boot_check.serial, "Serial", fake.factory())
+        monkeypatch.setattr(boot_check.time, "sleep", lambda seconds: None)
+        return fake
+
+    return install
+
+
+def config(**kwargs):
+    return BootCheckConfig(timeout=kwargs.pop("timeout", 2.0), settle=0.0, **kwargs)
+
+
+def test_success_pattern(console):
+    console([[b"boot...\n", b"Setup completed ", b"successfully\n"]])
+    result = run_boot_check("COM1", config())
+    assert result.ok
+    assert result.reason == "Setup completed successfully"
+
+
+def test_failure_pattern_wins(console):
+    console([[b"Guru Meditation Error: Core 0 panic'ed\n"]])
+    result = run_boot_check("COM1", config())
+    assert not result.ok
+    assert "Guru Meditation Error" in result.reason
+
+
+def test_reopens_after_usb_reenumeration(console):
+    # 재시작 직후 읽기가 끊기고, 다시 연 포트에서 부팅 메시지가 나옴
+    fake = console(
+        [
+            [b"rst:0x15\n", serial.SerialException("device reports readiness to read")],
+            [b"Setup completed successfully\n"],
+        ]
+    )
+    result = run_boot_check("COM1", config())
+    assert result.ok, result.reason
+    assert fake.opened == 2
+    assert b"rst:0x15" in result.console
+
+
+def test_reopen_gives_up_at_timeout(console):
+    # 끊긴 뒤로는 포트가 다시 나타나지 않음
+    console([[OSError(5, "Input/output error")]])
+    result = run_boot_check("COM1", config(timeout=0.05))
+    assert not result.ok
+    assert "포트가 다시 열리지 않았습니다" in result.reason
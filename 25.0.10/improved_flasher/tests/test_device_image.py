@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+장치별 NVS 이미지 검사
+만든 이미지를 NVS 형식(ESP-IDF nvs_partition_gen.py 버전 2)대로 다시 읽어서
+페이지 헤더/항목 CRC, 항목 상태 비트맵, blob 조각 + 인덱스 배치가 맞는지 확인한다.
+
+    python -m pytest tests/test_device_image.py
+"""
+
+import os
+import struct
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from device_image import (  # noqa: E402
+    ENTRY_ERASED,
+    ENTRY_WRITTEN,
+    INTEGER_TYPES,
+    NVS_ENTRIES_PER_PAGE,
+    NVS_ENTRY_SIZE,
+    NVS_FIRST_ENTRY,
+    NVS_PAGE_SIZE,
+    NVS_VERSION,
+    PAGE_STATE_ACTIVE,
+    TYPE_BLOB_DATA,
+    TYPE_BLOB_INDEX,
+    TYPE_STRING,
+    DeviceImageError,
+    DeviceImageTemplate,
+    encode_item,
+    nvs_crc,
+)
+
+PARTITION_SIZE = 0x6000
+MAC = "a0:b1:c2:d3:e4:f5"
+FIELDS = [
+    {"key": "hw_rev", "type": "u8", "value": 3},
+    {"key": "offset", "type": "i32", "value": "-0x10"},
+    {"key": "model", "type": "string", "value": "X" * 40},
+    {"key": "gain", "type": "float", "value": 1.5},
+    {"key": "cert", "type": "blob", "value": "00ff" * 50},
+    {"key": "serial", "type": "string", "source": "mac_hex", "max_length": 32},
+    {"key": "id", "type": "u32", "source": "mac_id"},
+    {"key": "key", "type": "blob", "source": "key", "max_length": 64},
+]
+
+
+def entry_state(page, index):
+    return (page[32 + index // 4] >> ((index % 4) * 2)) & 0b11
+
+
+def read_items(page):
+    """페이지의 쓴 항목들 → [(ns, 형식, 키, 조각 번호, 값 또는 8바이트 데이터, 항목 번호)]
+
+    항목 CRC 와 가변 길이 데이터 CRC 를 같이 확인한다.
+    """
+    items = []
+    index = 0
+    while index < NVS_ENTRIES_PER_PAGE:
+        if entry_state(page, index) != ENTRY_WRITTEN:
+            index += 1
+            continue
+        pos = NVS_FIRST_ENTRY + index * NVS_ENTRY_SIZE
+        entry = page[pos : pos + NVS_ENTRY_SIZE]
+        ns, type_code, span, chunk_index = entry[0:4]
+        stored_crc = struct.unpack_from("<I", entry, 4)[0]
+        assert stored_crc == nvs_crc(entry[0:4] + entry[8:32]), f"항목 {index} CRC"
+        key = entry[8:24].split(b"\x00", 1)[0].decode("ascii")
+        data = entry[24:32]
+        if type_code in (TYPE_STRING, TYPE_BLOB_DATA):
+            size, _, data_crc = struct.unpack_from("<HHI", data)
+            payload = page[pos + NVS_ENTRY_SIZE : pos + NVS_ENTRY_SIZE + size]
+            assert data_crc == nvs_crc(payload), f"{key} 데이터 CRC"
+            assert span == 1 + -(-size // NVS_ENTRY_SIZE)
+            for i in range(1, span):
+                assert entry_state(page, index + i) == ENTRY_WRITTEN
+            data = payload
+        else:
+            assert span == 1
+        items.append((ns, type_code, key, chunk_index, data, index))
+        index += span
+    return items
+
+
+def make_template(fields=FIELDS):
+    return DeviceImageTemplate("nvs", PARTITION_SIZE, "device", fields)
+
+
+def render(template=None, **identity):
+    template = template or make_template()
+    values = template.identity(MAC)
+    values.setdefault("key", bytes(range(20)))
+    values.update(identity)
+    return template.render(values)
+
+
+def test_page_header():
+    image = render()
+    assert len(image) == PARTITION_SIZE
+    page = image[:NVS_PAGE_SIZE]
+    state, seq, version = struct.unpack_from("<IIB", page)
+    assert (state, seq, version) == (PAGE_STATE_ACTIVE, 0, NVS_VERSION)
+    assert page[9:28] == b"\xff" * 19
+    assert struct.unpack_from("<I", page, 28)[0] == nvs_crc(page[4:28])
+    # 나머지 페이지는 빈 페이지 (NVS 가 초기화할 때 필요)
+    assert image[NVS_PAGE_SIZE:] == b"\xff" * (PARTITION_SIZE - NVS_PAGE_SIZE)
+
+
+def test_items_decode():
+    items = read_items(render()[:NVS_PAGE_SIZE])
+    by_key = {}
+    for ns, type_code, key, chunk_index, data, index in items:
+        by_key.setdefault(key, []).append((ns, type_code, chunk_index, data, index))
+
+    # 네임스페이스 항목: ns 0, u8 값이 네임스페이스 번호
+    [(ns, type_code, _, data, _)] = by_key["device"]
+    assert (ns, type_code, data[0]) == (0, INTEGER_TYPES["u8"][0], 1)
+
+    def value(key):
+        [(ns, type_code, _, data, _)] = by_key[key]
+        assert ns == 1
+        return type_code, data
+
+    assert value("hw_rev") == (0x01, b"\x03" + b"\xff" * 7)
+    assert value("offset")[1][:4] == struct.pack("<i", -16)
+    assert value("model") == (TYPE_STRING, b"X" * 40 + b"\x00")
+    assert value("serial") == (TYPE_STRING, b"A0B1C2D3E4F5\x00")
+    assert value("id")[1][:4] == struct.pack("<I", 0xC2D3E4F5)
+
+
+@pytest.mark.parametrize(
+    "key, payload",
+    [
+        ("gain", struct.pack("<f", 1.5)),
+        ("cert", bytes.fromhex("00ff" * 50)),
+        ("key", bytes(range(20))),
+    ],
+)
+def test_blob_index_layout(key, payload):
+    items = [item for item in read_items(render()[:NVS_PAGE_SIZE]) if item[2] == key]
+    data_item, index_item = items
+    _, data_type, _, chunk_index, data, data_at = data_item
+    _, index_type, _, index_chunk, index, index_at = index_item
+    # 조각 하나 (chunk 0) 뒤에 바로 인덱스 항목
+    assert (data_type, chunk_index, data) == (TYPE_BLOB_DATA, 0, payload)
+    assert index_at == data_at + 1 + -(-len(payload) // NVS_ENTRY_SIZE)
+    assert (index_type, index_chunk) == (TYPE_BLOB_INDEX, 0xFF)
+    size, chunk_count, chunk_start, reserved = struct.unpack("<IBBH", index)
+    assert (size, chunk_count, chunk_start, reserved) == (len(payload), 1, 0, 0xFFFF)
+
+
+def test_unused_reserved_entries_are_erased():
+    template = make_template()
+    page = render(template, key=b"\x01")[:NVS_PAGE_SIZE]
+    _, start, span = next(slot for slot in template.slots if slot[0]["key"] == "key")
+    # 값 1바이트 → 데이터 항목 + 조각 1개 + 인덱스, 남는 자리는 지워진 항목
+    used = 3
+    assert [entry_state(page, start + i) for i in range(span)] == (
+        [ENTRY_WRITTEN] * used + [ENTRY_ERASED] * (span - used)
+    )
+    assert template.next_index < NVS_ENTRIES_PER_PAGE
+    assert entry_state(page, template.next_index) == 0b11
+
+
+def test_render_does_not_touch_template():
+    template = make_template()
+    before = bytes(template.page)
+    first = render(template, mac_hex="000000000001")
+    second = render(template, mac_hex="000000000002")
+    assert bytes(template.page) == before
+    assert first != second
+    assert read_items(second[:NVS_PAGE_SIZE])
+
+
+def test_value_longer_than_reserved():
+    # max_length 32 는 항목 단위로 올림해서 자리를 잡으므로 63자까지는 들어감
+    render(mac_hex="F" * 63)
+    with pytest.raises(DeviceImageError, match="max_length"):
+        render(mac_hex="F" * 64)
+
+
+def test_bad_values():
+    with pytest.raises(DeviceImageError, match="u8"):
+        encode_item(1, "x", "u8", 256)
+    with pytest.raises(DeviceImageError, match="지원하지 않는"):
+        encode_item(1, "x", "double", 1.0)
+    with pytest.raises(DeviceImageError, match="크기"):
+        DeviceImageTemplate("nvs", NVS_PAGE_SIZE, "device", [])
+    with pytest.raises(DeviceImageError, match="한 페이지"):
+        make_template(
+            [{"key": f"k{i}", "type": "u8", "value": i} for i in range(NVS_ENTRIES_PER_PAGE)]
+        )
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+오프라인 이미지 검사
+ESP 이미지 헤더/세그먼트/체크섬/SHA-256 이 하나라도 어긋나면 원인과 함께 거부되는지,
+부트로더 헤더의 플래시 설정을 바꾸면 해시가 다시 계산되는지 확인한다.
+
+    python -m pytest tests/test_image_check.py
+"""
+
+import hashlib
+import os
+import random
+import struct
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from image_check import (  # noqa: E402
+    CHIP_ID_ESP32S3,
+    IMAGE_HEADER_SIZE,
+    ImageCheckError,
+    check_image,
+    checksum,
+    patch_flash_params,
+)
+from partition_table import MD5_MAGIC  # noqa: E402
+
+ENTRY = 0x40380000
+SEGMENTS = [(0x3FC88000, os.urandom(100)), (0x40374000, os.urandom(2000))]
+
+
+def make_app_image(chip_id=CHIP_ID_ESP32S3, segments=SEGMENTS, hash_appended=False):
+    """헤더/세그먼트/체크섬(+SHA-256)이 맞는 ESP 앱 이미지"""
+    image = struct.pack("<BBBBI", 0xE9, len(segments), 2, 0x2F, ENTRY)
+    image += struct.pack(
+        "<B3sHBHH4xB", 0xEE, bytes(3), chip_id, 0, 0, 0xFFFF, int(hash_appended)
+    )
+    chk = 0xEF
+    for load_addr, data in segments:
+        image += struct.pack("<II", load_addr, len(data)) + data
+        for b in data:
+            chk ^= b
+    image += b"\x00" * (15 - len(image) % 16) + bytes([chk])
+    if hash_appended:
+        image += hashlib.sha256(image).digest()
+    return image
+
+
+def check(tmp_path, data, **kwargs):
+    path = tmp_path / "firmware.bin"
+    path.write_bytes(data)
+    return check_image(str(path), **kwargs)
+
+
+@pytest.mark.parametrize("length", [0, 1, 2, 3, 15, 16, 17, 255, 4096])
+def test_checksum_matches_byte_xor(length):
+    data = random.Random(length).randbytes(length)
+    expected = 0xEF
+    for b in data:
+        expected ^= b
+    assert checksum(data) == expected
+    assert checksum(data, 0) == expected ^ 0xEF
+
+
+def test_valid_image(tmp_path):
+    image = make_app_image()
+    info = check(tmp_path, image)
+    assert info["chip_id"] == CHIP_ID_ESP32S3
+    assert info["entry"] == ENTRY
+    assert info["segments"] == [(addr, len(data)) for addr, data in SEGMENTS]
+    assert info["sha256"] is None
+    assert info["length"] == len(image)
+
+
+def test_valid_image_with_hash(tmp_path):
+    image = make_app_image(hash_appended=True)
+    info = check(tmp_path, image)
+    assert info["sha256"] == image[-32:].hex()
+    assert info["length"] == len(image) - 32
+
+
+def corrupt(image, pos, value=None):
+    data = bytearray(image)
+    data[pos] = data[pos] ^ 0xFF if value is None else value
+    return bytes(data)
+
+
+@pytest.mark.parametrize(
+    "build, message",
+    [
+        (lambda: make_app_image()[:IMAGE_HEADER_SIZE - 1], "너무 작습니다"),
+        (lambda: corrupt(make_app_image(), 0, 0xE8), "ESP 이미지가 아닙니다"),
+        (lambda: corrupt(make_app_image(), 1, 0), "세그먼트 개수"),
+        (lambda: corrupt(make_app_image(), 1, 17), "세그먼트 개수"),
+        (lambda: make_app_image(chip_id=0), "다른 칩용"),
+        (lambda: make_app_image()[: IMAGE_HEADER_SIZE + 4], "세그먼트 0 헤더가 잘렸"),
+        (lambda: make_app_image()[: IMAGE_HEADER_SIZE + 8 + 50], "세그먼트 0 데이터가 잘렸"),
+        (lambda: make_app_image()[: IMAGE_HEADER_SIZE + 8 + 100 + 4], "세그먼트 1 헤더가 잘렸"),
+        (lambda: make_app_image()[:-1], "체크섬 바이트가 없습니다"),
+        (lambda: corrupt(make_app_image(), -1), "체크섬 불일치"),
+        # 세그먼트 데이터가 바뀌면 체크섬이 어긋남
+        (lambda: corrupt(make_app_image(), IMAGE_HEADER_SIZE + 8), "체크섬 불일치"),
+        (lambda: make_app_image(hash_appended=True)[:-1], "SHA-256 해시가 잘렸습니다"),
+        (lambda: corrupt(make_app_image(hash_appended=True), -1), "SHA-256 불일치"),
+        # 헤더만 바뀌어도 체크섬은 맞지만 해시가 어긋남
+        (lambda: corrupt(make_app_image(hash_appended=True), 2, 0), "SHA-256 불일치"),
+    ],
+)
+def test_rejects(tmp_path, build, message):
+    with pytest.raises(ImageCheckError, match=message):
+        check(tmp_path, build())
+
+
+def test_rejects_empty_file(tmp_path):
+    with pytest.raises(ImageCheckError, match="빈 파일"):
+        check(tmp_path, b"")
+
+
+def test_chip_id_not_checked_when_none(tmp_path):
+    assert check(tmp_path, make_app_image(chip_id=0), expected_chip_id=None)["chip_id"] == 0
+
+
+def test_partitions_need_md5(tmp_path):
+    entry = b"\xaa\x50" + struct.pack("<BBII", 0x01, 0x02, 0x9000, 0x6000)
+    entry += b"nvs".ljust(16, b"\x00") + bytes(4)
+    with pytest.raises(ImageCheckError, match="MD5 항목이 없습니다"):
+        check(tmp_path, entry + b"\xff" * 32, kind="partitions")
+    table = entry + MD5_MAGIC + hashlib.md5(entry).digest()
+    assert check(tmp_path, table + b"\xff" * 32, kind="partitions") == {"partitions": ["nvs"]}
+
+
+@pytest.mark.parametrize("hash_appended", [False, True])
+def test_patch_flash_params(tmp_path, hash_appended):
+    path = tmp_path / "bootloader.bin"
+    path.write_bytes(make_app_image(hash_appended=hash_appended))
+    # esptool 의 FLASH_SIZES 값은 이미 상위 4비트 자리 (예: 4MB = 0x20)
+    patched = patch_flash_params(str(path), mode=3, freq=0x0, size=0x20)
+    assert patched[2] == 3
+    assert patched[3] == 0x20
+    # 헤더를 바꾼 뒤에도 체크섬/해시 검사를 통과
+    assert check(tmp_path, patched)["sha256"] == (
+        hashlib.sha256(patched[:-32]).hexdigest() if hash_appended else None
+    )
+
+
+def test_patch_flash_params_keeps_unset_fields(tmp_path):
+    path = tmp_path / "bootloader.bin"
+    path.write_bytes(make_app_image())
+    patched = patch_flash_params(str(path), size=0x30)
+    assert patched[2:4] == bytes([2, 0x3F])
+
+
+def test_patch_flash_params_ignores_non_esp_image(tmp_path):
+    path = tmp_path / "data.bin"
+    path.write_bytes(b"\x00" * 64)
+    assert patch_flash_params(str(path), mode=0, freq=0, size=0) == b"\x00" * 64
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OTA 일괄 업데이트 검사 (localhost 가상 장치)
+Range 헤더 해석, 서버의 부분 전송/416 응답, 끊긴 장치의 이어받기, 실패 원인 분류를 확인한다.
+가상 장치는 tests/ota_device.py 의 StandInDevice (benchmarks/bench_ota_push.py 와 같이 씀).
+
+    python -m pytest tests/test_ota_push.py
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "tests"))
+
+import ota_push  # noqa: E402
+from ota_device import BEHAVIORS, StandInDevice, http_call  # noqa: E402
+from ota_push import parse_range  # noqa: E402
+
+SIZE = 256 * 1024
+CHUNK = 64 * 1024
+RATE = 50e6
+REBOOT_DELAY = 0.1
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        (None, None),
+        ("", None),
+        ("bytes=0-99", (0, 100)),
+        ("bytes=100-", (100, 1000)),
+        ("bytes=900-5000", (900, 1000)),
+        ("bytes=999-999", (999, 1000)),
+        # 마지막 n 바이트 (파일보다 길면 전체)
+        ("bytes=-100", (900, 1000)),
+        ("bytes=-5000", (0, 1000)),
+        # 여러 구간 / 모르는 단위는 전체 전송
+        ("bytes=0-1,5-6", None),
+        ("items=0-1", None),
+    ],
+)
+def test_parse_range(header, expected):
+    assert parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize(
+    "header", ["bytes=1000-", "bytes=5000-6000", "bytes=10-5", "bytes=-", "bytes=-0"]
+)
+def test_parse_range_unsatisfiable(header):
+    with pytest.raises(ValueError):
+        parse_range(header, 1000)
+
+
+@pytest.fixture
+def image_path(tmp_path):
+    path = tmp_path / "firmware.bin"
+    path.write_bytes(os.urandom(SIZE))
+    return str(path)
+
+
+@pytest.fixture
+def fast_timeouts(monkeypatch):
+    # 지연 시간을 줄여서 실패 경로도 빨리 확인
+    monkeypatch.setattr(ota_push, "FIRST_BYTE_TIMEOUT", 1.0)
+    monkeypatch.setattr(ota_push, "DOWNLOAD_STALL_TIMEOUT", 1.0)
+    monkeypatch.setattr(ota_push, "REPORT_TIMEOUT", 1.0)
+    monkeypatch.setattr(ota_push, "BOOT_TIMEOUT", 1.0)
+    monkeypatch.setattr(ota_push, "BOOT_POLL_INTERVAL", 0.05)
+
+
+def test_server_range_and_416(image_path):
+    async def fetch(url, headers):
+        status, response_headers, reader, writer = await http_call(url, headers=headers)
+        try:
+            body = await reader.read()
+        finally:
+            writer.close()
+        return status, response_headers, body
+
+    async def run():
+        image = ota_push.OtaImage(image_path)
+        server = ota_push.OtaServer(image, 0, "127.0.0.1", "127.0.0.1").start()
+        try:
+            transfer = ota_push._Transfer(asyncio.get_running_loop())
+            _, url, _ = server.open_session(transfer, "127.0.0.1")
+            partial = await fetch(url, {"Range": "bytes=1000-"})
+            suffix = await fetch(url, {"Range": "bytes=-16"})
+            past_end = await fetch(url, {"Range": f"bytes={SIZE}-"})
+        finally:
+            server.stop()
+        return partial, suffix, past_end
+
+    partial, suffix, past_end = asyncio.run(run())
+    with open(image_path, "rb") as f:
+        data = f.read()
+
+    status, headers, body = partial
+    assert status == 206
+    assert headers["content-range"] == f"bytes 1000-{SIZE - 1}/{SIZE}"
+    assert body == data[1000:]
+
+    status, headers, body = suffix
+    assert status == 206
+    assert body == data[-16:]
+
+    status, headers, body = past_end
+    assert status == 416
+    assert headers["content-range"] == f"bytes */{SIZE}"
+    assert body == b""
+
+
+def push(image_path, behaviors):
+    async def run():
+        devices = [
+            await StandInDevice(kind, RATE, CHUNK, REBOOT_DELAY).start() for kind in behaviors
+        ]
+        try:
+            results = await ota_push.push_devices(
+                [f"127.0.0.1:{d.port}" for d in devices],
+                image_path,
+                log_factory=lambda target: lambda message, level="INFO": None,
+                server_port=0,
+                advertise="127.0.0.1",
+                listen="127.0.0.1",
+            )
+        finally:
+            for device in devices:
+                await device.stop()
+        return devices, results
+
+    return asyncio.run(run())
+
+
+def test_resume_after_drop(image_path, fast_timeouts):
+    devices, results = push(image_path, ["ok", "drop"])
+    image = ota_push.OtaImage(image_path)
+    for device, result in zip(devices, results):
+        assert result.success, f"{device.behavior}: {result.error}"
+        assert device.image_sha256 == image.sha256
+    ok, drop = devices
+    assert ok.range_requests == SIZE // CHUNK
+    # 끊긴 구간을 받은 곳부터 다시 요청
+    assert drop.range_requests > SIZE // CHUNK
+
+
+@pytest.mark.parametrize("behavior", [k for k, cause in BEHAVIORS.items() if cause is not None])
+def test_failure_cause(image_path, fast_timeouts, behavior):
+    _, (result,) = push(image_path, [behavior])
+    assert not result.success
+    assert result.cause == BEHAVIORS[behavior], result.error
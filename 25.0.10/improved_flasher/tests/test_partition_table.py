@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+파티션 테이블 파서 검사
+항목 필드 해석, MD5 항목 검증(일치/불일치/없음), 형식 오류(매직, 겹침, 정렬) 거부를 확인한다.
+
+    python -m pytest tests/test_partition_table.py
+"""
+
+import hashlib
+import os
+import struct
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from partition_table import (  # noqa: E402
+    ENTRY_SIZE,
+    MD5_MAGIC,
+    PARTITION_TABLE_MAX_SIZE,
+    PartitionTableError,
+    parse_partition_table,
+)
+
+DEFAULT_ENTRIES = [
+    # (type, subtype, offset, size, name, flags)
+    (0x01, 0x02, 0x9000, 0x6000, "nvs", 0),
+    (0x01, 0x00, 0xF000, 0x2000, "otadata", 0),
+    (0x01, 0x01, 0x11000, 0x1000, "phy_init", 0),
+    (0x00, 0x10, 0x20000, 0x100000, "ota_0", 0),
+    (0x00, 0x11, 0x120000, 0x100000, "ota_1", 1),
+]
+
+
+def entry(ptype, subtype, offset, size, name, flags=0):
+    return (
+        b"\xaa\x50"
+        + struct.pack("<BBII", ptype, subtype, offset, size)
+        + name.encode("ascii").ljust(16, b"\x00")
+        + struct.pack("<I", flags)
+    )
+
+
+def make_table(entries=DEFAULT_ENTRIES, md5=True):
+    table = b"".join(entry(*e) for e in entries)
+    if md5:
+        table += MD5_MAGIC + hashlib.md5(table).digest()
+    return table + b"\xff" * (PARTITION_TABLE_MAX_SIZE - len(table))
+
+
+def test_entries():
+    table = parse_partition_table(make_table())
+    assert table.md5_ok is True
+    assert [p.name for p in table] == ["nvs", "otadata", "phy_init", "ota_0", "ota_1"]
+    for part, (ptype, subtype, offset, size, name, flags) in zip(table, DEFAULT_ENTRIES):
+        assert (part.type, part.subtype, part.offset, part.size, part.flags) == (
+            ptype,
+            subtype,
+            offset,
+            size,
+            flags,
+        )
+    assert table.nvs.name == "nvs"
+    assert table.otadata.name == "otadata"
+    # factory 가 없으면 첫 OTA 파티션에서 부팅
+    assert table.boot_app.name == "ota_0"
+    assert table.find("ota_1").end == 0x220000
+    assert table.find("missing") is None
+
+
+def test_factory_is_boot_app():
+    entries = DEFAULT_ENTRIES + [(0x00, 0x00, 0x220000, 0x100000, "factory", 0)]
+    assert parse_partition_table(make_table(entries)).boot_app.name == "factory"
+
+
+def test_without_md5():
+    table = parse_partition_table(make_table(md5=False))
+    assert table.md5_ok is None
+    assert len(table.partitions) == len(DEFAULT_ENTRIES)
+
+
+def test_md5_mismatch():
+    data = bytearray(make_table())
+    # 두 번째 항목의 크기를 바꿈 (MD5 는 그대로)
+    data[ENTRY_SIZE + 8] ^= 0x10
+    with pytest.raises(PartitionTableError, match="MD5"):
+        parse_partition_table(bytes(data))
+
+
+def test_md5_covers_only_entries_before_it():
+    # MD5 항목 뒤의 바이트는 검사 대상이 아님
+    data = bytearray(make_table())
+    data[-1] = 0x00
+    assert parse_partition_table(bytes(data)).md5_ok is True
+
+
+def test_longer_input_is_cut_at_max_size():
+    data = make_table() + entry(0x01, 0x82, 0x300000, 0x1000, "spiffs")
+    assert [p.name for p in parse_partition_table(data)][-1] == "ota_1"
+
+
+@pytest.mark.parametrize(
+    "entries, message",
+    [
+        ([], "항목이 없습니다"),
+        (
+            [(0x01, 0x02, 0x9000, 0x6000, "nvs", 0), (0x01, 0x01, 0xE000, 0x1000, "phy", 0)],
+            "겹칩니다",
+        ),
+        ([(0x01, 0x02, 0x9100, 0x6000, "nvs", 0)], "정렬"),
+    ],
+)
+def test_rejects_bad_layout(entries, message):
+    with pytest.raises(PartitionTableError, match=message):
+        parse_partition_table(make_table(entries))
+
+
+def test_rejects_bad_magic():
+    data = bytearray(make_table())
+    data[ENTRY_SIZE * 2 : ENTRY_SIZE * 2 + 2] = b"\x12\x34"
+    with pytest.raises(PartitionTableError, match="1234"):
+        parse_partition_table(bytes(data))